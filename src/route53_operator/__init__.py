@@ -1,5 +1,17 @@
-"""Base of the pacakge"""
-import kopf
+"""Base of the pacakge
 
-# kopf_registry is the global registry for kopf handlers
-kopf_registry = kopf.OperatorRegistry()
+kopf takes a third of a second to import, so it and the registry are only imported when something asks for them. The
+r53operator import and adopt commands and the CRD generator never do.
+"""
+from typing import Any
+
+
+def __getattr__(name: str) -> Any:
+    # kopf_registry is the global registry for kopf handlers
+    if name in ("kopf", "kopf_registry"):
+        import kopf
+
+        globals().setdefault("kopf", kopf)
+        globals().setdefault("kopf_registry", kopf.OperatorRegistry())
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
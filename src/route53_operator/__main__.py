@@ -1,16 +1,138 @@
 """This is our poetry entrypoint, run with r53operator. It loads the kopf handlers and
-registry and starts the kopf operator"""
+registry and starts the kopf operator
+
+r53operator import imports the records of a BIND zone file instead, see r53operator import --help, and
+r53operator adopt adopts the records already in a hosted zone, see r53operator adopt --help
+
+Each command imports only what it runs: the import and adopt commands don't load kopf or the handlers, and the
+operator doesn't load the importer or the adopter."""
+import argparse
+import asyncio
+import json
 import logging
+import sys
+from pathlib import Path
 
-from . import handlers  # noqa: F401
-from . import kopf
-from . import kopf_registry
+from .lib.config import get_config
 
 
 def cli(args=None):
+    parsed = _parser().parse_args(args)
+    if parsed.command == "import":
+        sys.exit(import_zone(parsed))
+    if parsed.command == "adopt":
+        sys.exit(adopt_zone(parsed))
+    from . import handlers  # noqa: F401
+    from . import kopf
+    from . import kopf_registry
+    from .lib.logs import setup_logging
+
+    # records are written by a background thread, see lib.logs
+    listener = setup_logging(get_config())
     settings = kopf.OperatorSettings()
-    settings.posting.level = logging.DEBUG
-    kopf.run(registry=kopf_registry, namespace="default", settings=settings)
+    # handler logs are not posted as Events below event_log_level, transitions are posted aggregated, see lib.events
+    settings.posting.level = getattr(logging, get_config().event_log_level)
+    try:
+        kopf.run(
+            registry=kopf_registry,
+            namespace="default",
+            settings=settings,
+            liveness_endpoint=get_config().liveness_endpoint,
+        )
+    finally:
+        listener.stop()
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="r53operator", description="Manage Route53 records from Kubernetes")
+    commands = parser.add_subparsers(dest="command")
+    importer = commands.add_parser(
+        "import",
+        help="Import the records of a BIND zone file",
+        description="Import the A, CNAME and TXT records of a BIND zone file, as record objects written to YAML "
+        + "files or straight into Route53",
+    )
+    importer.add_argument("zone_file", type=Path, help="The zone file, - reads it from stdin")
+    importer.add_argument("--hosted-zone-id", required=True, help="Route53 hosted zone to import into")
+    importer.add_argument("--origin", required=True, help="Name of the zone, e.g. example.com.")
+    importer.add_argument("--account", default=None, help="AWS account the hosted zone is in")
+    importer.add_argument("--ttl", type=int, default=3600, help="TTL of records the file gives none")
+    importer.add_argument("--batch-size", type=int, default=500, help="Record sets validated at a time")
+    output = importer.add_mutually_exclusive_group()
+    output.add_argument("--output-dir", type=Path, default=Path("records"), help="Directory to write YAML files to")
+    output.add_argument("--apply", action="store_true", help="Upsert the records into Route53 instead of writing YAML")
+    importer.add_argument("--namespace", default="default", help="Namespace of the record objects")
+    importer.add_argument("--chunk-size", type=int, default=500, help="Record objects per YAML file")
+    adopter = commands.add_parser(
+        "adopt",
+        help="Adopt the records of a hosted zone",
+        description="Create record objects for the A, CNAME and TXT records already in a hosted zone, marked so the "
+        + "operator doesn't write them to Route53 again",
+    )
+    adopter.add_argument("--hosted-zone-id", required=True, help="Route53 hosted zone to adopt")
+    adopter.add_argument("--account", default=None, help="AWS account the hosted zone is in")
+    adopter.add_argument("--namespace", default="default", help="Namespace to create the record objects in")
+    adopter.add_argument("--concurrency", type=int, default=16, help="Record objects created at a time")
+    adopter.add_argument("--dry-run", action="store_true", help="Only report what would be adopted")
+    return parser
+
+
+def import_zone(args: argparse.Namespace) -> int:
+    """Run r53operator import, prints a report of what was imported and returns the exit code"""
+    from .lib.zone_import import ZoneImporter
+
+    logging.basicConfig(level=logging.INFO)
+    config = get_config()
+    importer = ZoneImporter(
+        config,
+        hosted_zone_id=args.hosted_zone_id,
+        origin=args.origin,
+        account=args.account,
+        default_ttl=args.ttl,
+        batch_size=args.batch_size,
+    )
+    if args.apply and config.ownership_enabled:
+        print("Ownership is enabled, import the records as record objects instead of --apply", file=sys.stderr)
+        return 2
+    with sys.stdin if str(args.zone_file) == "-" else open(args.zone_file) as lines:
+        if args.apply:
+            report = asyncio.run(_apply(config, importer, lines))
+        else:
+            report = importer.write_objects(lines, args.output_dir, namespace=args.namespace, chunk_size=args.chunk_size)
+    print(json.dumps(report.summary(), indent=2))
+    return 1 if report.invalid else 0
+
+
+async def _apply(config, importer, lines):
+    from .lib.aws import AccountPool
+
+    async with AccountPool(config) as accounts:
+        return await importer.apply(lines, accounts)
+
+
+def adopt_zone(args: argparse.Namespace) -> int:
+    """Run r53operator adopt, prints a report of what was adopted and returns the exit code"""
+    from .lib.adopt import ZoneAdopter
+
+    logging.basicConfig(level=logging.INFO)
+    config = get_config()
+    adopter = ZoneAdopter(
+        config,
+        hosted_zone_id=args.hosted_zone_id,
+        namespace=args.namespace,
+        account=args.account,
+        concurrency=args.concurrency,
+    )
+    report = asyncio.run(_adopt(config, adopter, args.dry_run))
+    print(json.dumps(report.summary(), indent=2))
+    return 1 if report.invalid else 0
+
+
+async def _adopt(config, adopter, dry_run):
+    from .lib.aws import AccountPool
+
+    async with AccountPool(config) as accounts:
+        return await adopter.adopt(accounts, dry_run=dry_run)
 
 
 if __name__ == "__main__":
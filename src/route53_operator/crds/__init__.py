@@ -1,6 +1,27 @@
-"""CRDs convert the Pydantic schemas into Kubernetes CRDs"""
-from .a import ARecordCRD  # noqa: F401
-from .cname import CNAMERecordCRD  # noqa: F401
-from .txt import TXTRecordCRD  # noqa: F401
+"""CRDs convert the Pydantic schemas into Kubernetes CRDs
 
-CRDS = [ARecordCRD, CNAMERecordCRD, TXTRecordCRD]
+The CRD classes build their CRDSpec when their module is imported, so each one is only imported when it is asked for.
+"""
+from importlib import import_module
+from typing import Any
+
+_CRD_MODULES = {
+    "ARecordCRD": ".a",
+    "CNAMERecordCRD": ".cname",
+    "TXTRecordCRD": ".txt",
+    "RecordSetCRD": ".record_set",
+}
+
+__all__ = [*_CRD_MODULES, "CRDS"]
+
+
+def __getattr__(name: str) -> Any:
+    if name == "CRDS":
+        crds = [__getattr__(crd) for crd in _CRD_MODULES]
+        globals()["CRDS"] = crds
+        return crds
+    if name in _CRD_MODULES:
+        crd = getattr(import_module(_CRD_MODULES[name], __name__), name)
+        globals()[name] = crd
+        return crd
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
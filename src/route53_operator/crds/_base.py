@@ -22,17 +22,32 @@ def get_crd_properties(
     Returns:
         dict[str, Any]: A CRD properties dict
     """
-    # title and description are not used in a CRD
-    strip_from_schema = ("title", "description")
+    json_schema = schema.schema()
+    definitions = json_schema.get("definitions", {})
     to_return = {}
-    for key, value in schema.schema()["properties"].items():
+    for key, value in json_schema["properties"].items():
         if key in remove_fields:
             continue
+        to_return[key] = _crd_property(value, definitions)
+    return to_return
+
+
+def _crd_property(value: dict[str, Any], definitions: dict[str, Any]) -> dict[str, Any]:
+    """
+    Turns the JSON schema of a property into a CRD property
 
-        for stripped_key in strip_from_schema:
-            if stripped_key in value:
-                del value[stripped_key]
-        to_return[key] = value
+    CRDs can't refer to definitions, the nested models pydantic puts in definitions are inlined where they are used.
+    """
+    if "$ref" in value:
+        value = definitions[value["$ref"].rsplit("/", 1)[-1]]
+    # title and description are not used in a CRD
+    to_return = {key: item for key, item in value.items() if key not in ("title", "description")}
+    if "properties" in to_return:
+        to_return["properties"] = {
+            key: _crd_property(item, definitions) for key, item in to_return["properties"].items()
+        }
+    if "items" in to_return:
+        to_return["items"] = _crd_property(to_return["items"], definitions)
     return to_return
 
 
@@ -0,0 +1,34 @@
+"""CRD for a RecordSet"""
+from ..schemas.v1 import RecordSet as V1RecordSet
+from ._base import CRDBase
+from ._base import CRDMetadata
+from ._base import CRDNames
+from ._base import CRDSpec
+from ._base import CRDStatus
+from ._base import CRDVersion
+
+
+class RecordSetCRD(CRDBase):
+    """
+    CRD for a RecordSet
+    """
+
+    metadata: CRDMetadata = CRDMetadata(name=".".join(reversed(V1RecordSet._namespace)))
+    spec: CRDSpec = CRDSpec(
+        group=".".join(tuple(reversed(V1RecordSet._namespace))[-2:]),
+        versions=[
+            CRDVersion(
+                name="v1",
+                served=True,
+                storage=True,
+                crd_schema=V1RecordSet,
+                status=CRDStatus(),
+            ),
+        ],
+        names=CRDNames(
+            plural=V1RecordSet._plural,
+            singular=V1RecordSet._singular,
+            kind=V1RecordSet._kind,
+            short_names=V1RecordSet._shortnames,
+        ),
+    )
@@ -4,7 +4,21 @@ CRUDs are objects that can create, update, delete and get Route53 record objects
 CRUDs are used by handlers to translate k8s requests into AWS API changes.
 """
 from .a import ACrud
+from .authoritative import ZoneReconciler
+from .batch import DeleteAggregator
 from .cname import CNAMECrud
+from .gc import OrphanCollector
+from .reads import ReadBatcher
+from .record_set import RecordSetCrud
 from .txt import TXTCrud
 
-__all__ = ["ACrud", "CNAMECrud", "TXTCrud"]
+__all__ = [
+    "ACrud",
+    "CNAMECrud",
+    "DeleteAggregator",
+    "OrphanCollector",
+    "ReadBatcher",
+    "RecordSetCrud",
+    "TXTCrud",
+    "ZoneReconciler",
+]
@@ -7,12 +7,29 @@ from typing import TypeVar
 from aiobotocore.session import AioSession
 from pydantic import BaseModel
 
-from ..exceptions import RecordNotFoundError
 from ..exceptions import InvalidRecordChange
-from ..lib.aws import get_session
+from ..exceptions import RecordNotFoundError
+from ..lib.aws import AccountPool
+from ..lib.aws import get_account_pool
+from ..lib.changes import Change
+from ..lib.changes import error_code
+from ..lib.changes import REJECTED_BATCH_CODES
+from ..lib.changes import submit_changes
 from ..lib.config import Config
+from ..lib.journal import ChangeJournal
+from ..lib.journal import DONE
+from ..lib.journal import FAILED
+from ..lib.journal import get_change_journal
+from ..lib.logs import log_fields
+from ..lib.ownership import claim_changes
+from ..lib.singleflight import get_read_flights
+from ..lib.singleflight import SingleFlight
+from ..lib.zone_cache import get_zone_cache
+from ..lib.zone_cache import ZoneCache
+from ..lib.zone_cache import ZoneSnapshot
 from ..schemas._base import RecordBase
-from botocore import exceptions as botocore_exceptions
+from .reads import get_read_batcher
+from .reads import ReadBatcher
 
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
@@ -26,30 +43,62 @@ class CRUDBase(Generic[SchemaType, CreateSchemaType, UpdateSchemaType]):
     """
 
     def __init__(
-        self, schema: type[SchemaType], config: Config, logger: Logger, aws_session: AioSession | None = None
+        self,
+        schema: type[SchemaType],
+        config: Config,
+        logger: Logger,
+        aws_session: AioSession | None = None,
+        accounts: AccountPool | None = None,
+        zone_cache: ZoneCache | None = None,
+        journal: ChangeJournal | None = None,
+        reads: SingleFlight | None = None,
+        read_batcher: ReadBatcher | None = None,
     ):
         """
         CRUD object with default methods to Create, Read, Update, Delete (CRUD).
+
+        Every AWS call goes through an AccountPool, which holds a long lived client and a rate limit per AWS account.
+        Passing aws_session builds a pool around that session instead of using the operator's shared pool.
+        Changes are applied to the zone cache, which also holds the ownership claims checked before every change,
+        and journaled to the change journal when there is one. Concurrent reads of the same record share one call,
+        and with a read batcher reads of a zone are answered together by range scans.
+
+        Each dependency that isn't passed is the operator's shared one. The zone cache and read batcher make calls
+        with the pool, so with a pool other than the shared one they are built around that pool instead.
         """
         self.schema = schema
         self._config = config
         self._logger = logger
-        self._session = aws_session if aws_session is not None else get_session()
+        if accounts is None:
+            accounts = AccountPool(config, session=aws_session) if aws_session is not None else get_account_pool(config)
+        shared = accounts is get_account_pool(config)
+        if zone_cache is None:
+            zone_cache = get_zone_cache(config) if shared else ZoneCache(accounts)
+        if read_batcher is None and config.read_batch_window:
+            read_batcher = get_read_batcher(config) if shared else ReadBatcher(config, accounts)
+        self._accounts = accounts
+        self._zone_cache = zone_cache
+        self._journal = journal if journal is not None else get_change_journal(config)
+        self._reads = reads if reads is not None else get_read_flights(config)
+        self._read_batcher = read_batcher
 
     async def get(
         self,
         *,
         hosted_zone_id: str,
         name: str,
+        account: str | None = None,
     ) -> SchemaType:
         """
         Get an AWS record by name and hosted zone id.
 
-        Uses list_resource_record_sets to look up the record from the AWS API.
+        Uses list_resource_record_sets to look up the record from the AWS API. Gets of the same record that run at the
+        same time share one call.
 
         Args:
             hosted_zone_id (str): The Route53 hosted zone id to search in
             name (str): Name of the DNS Record to get
+            account (str | None, optional): AWS account the hosted zone is in. Defaults to the operator's account.
 
         Raises:
             RecordNotFoundError: Raised when the record is not found
@@ -57,8 +106,18 @@ class CRUDBase(Generic[SchemaType, CreateSchemaType, UpdateSchemaType]):
         Returns:
             SchemaType: A pydantic model of the record
         """
+        # the record returned carries the hosted_zone_id it was asked for, so ids are not normalized
+        key = (account, hosted_zone_id, name, self.schema._record_type)
+        return await self._reads.do(key, lambda: self._get(hosted_zone_id=hosted_zone_id, name=name, account=account))
+
+    async def _get(self, *, hosted_zone_id: str, name: str, account: str | None = None) -> SchemaType:
+        if self._read_batcher is not None:
+            record_set = await self._read_batcher.get(hosted_zone_id, name, self.schema._record_type, account)
+            if record_set is None:
+                raise RecordNotFoundError("No records found")
+            return self.schema.from_recordset(hosted_zone_id=hosted_zone_id, record_set=record_set, account=account)
         # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/route53.html#Route53.Client.list_resource_record_sets
-        async with self._session.create_client("route53", **self._config.aws_client_kwargs) as client:
+        async with self._accounts.client(account, "list_resource_record_sets") as client:
             response = await client.list_resource_record_sets(
                 HostedZoneId=hosted_zone_id,
                 StartRecordName=name,
@@ -71,30 +130,41 @@ class CRUDBase(Generic[SchemaType, CreateSchemaType, UpdateSchemaType]):
         if record_sets[0].get("Name", "") != name or record_sets[0].get("Type", "") != self.schema._record_type:
             raise RecordNotFoundError("No records found")
 
-        return self.schema.from_recordset(hosted_zone_id=hosted_zone_id, record_set=record_sets[0])
+        return self.schema.from_recordset(hosted_zone_id=hosted_zone_id, record_set=record_sets[0], account=account)
 
     async def create(
         self,
         *,
         record_in: CreateSchemaType | SchemaType,
+        ref: str | None = None,
     ) -> SchemaType:
         """
         Create a new record Route53 record.
 
         Args:
             record_in (CreateSchemaType | SchemaType): The record to create
+            ref (str | None, optional): namespace/name of the record object, journaled with the change. A record the
+                journal replayed for the object is not created again. Defaults to None.
 
         Returns:
             SchemaType: A pydantic model of the record
         """
         # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/route53.html#Route53.Client.change_resource_record_sets
+        if ref is not None and self._journal is not None and self._journal.recovered(ref) == DONE:
+            self._logger.info("Record %s was created before a restart", record_in.name)
+            return await self.get(
+                hosted_zone_id=record_in.hosted_zone_id,
+                name=record_in.name,
+                account=record_in.account,
+            )
         change_type = "CREATE"
-        self._logger.debug(
-            "Creating record %s type %s in %s",
-            record_in.name,
-            self.schema._record_type,
-            record_in.hosted_zone_id,
+        fields = log_fields(
+            record=record_in.name,
+            record_type=self.schema._record_type,
+            zone=record_in.hosted_zone_id,
+            account=record_in.account,
         )
+        self._logger.debug("Creating record %s", record_in.name, extra=fields)
         comment = (
             f"route53-operator creating {record_in.name} {self.schema._record_type} in {record_in.hosted_zone_id}"
         )
@@ -104,11 +174,20 @@ class CRUDBase(Generic[SchemaType, CreateSchemaType, UpdateSchemaType]):
             change_type=change_type,
             resource_record_set=resource_record_set,
             comment=comment,
+            account=record_in.account,
+            ref=ref,
+        )
+        self._logger.debug(
+            "Change %s for %s is %s",
+            result["Id"],
+            record_in.name,
+            result["Status"],
+            extra={**fields, "change_id": result["Id"]},
         )
-        self._logger.debug(result)
         return await self.get(
             hosted_zone_id=record_in.hosted_zone_id,
             name=record_in.name,
+            account=record_in.account,
         )
 
     async def update(
@@ -129,12 +208,13 @@ class CRUDBase(Generic[SchemaType, CreateSchemaType, UpdateSchemaType]):
         """
         # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/route53.html#Route53.Client.change_resource_record_sets
         change_type = "UPSERT"
-        self._logger.debug(
-            "Upserting record %s type %s in %s",
-            record_current.name,
-            self.schema._record_type,
-            record_current.hosted_zone_id,
+        fields = log_fields(
+            record=record_current.name,
+            record_type=self.schema._record_type,
+            zone=record_current.hosted_zone_id,
+            account=record_current.account,
         )
+        self._logger.debug("Upserting record %s", record_current.name, extra=fields)
         comment = (
             f"route53-operator upserting {record_current.name} "
             f"{self.schema._record_type} in {record_current.hosted_zone_id}"
@@ -154,11 +234,19 @@ class CRUDBase(Generic[SchemaType, CreateSchemaType, UpdateSchemaType]):
             change_type=change_type,
             resource_record_set=resource_record_set,
             comment=comment,
+            account=record_current.account,
+        )
+        self._logger.debug(
+            "Change %s for %s is %s",
+            result["Id"],
+            record_current.name,
+            result["Status"],
+            extra={**fields, "change_id": result["Id"]},
         )
-        self._logger.debug(result)
         return await self.get(
             hosted_zone_id=record_current.hosted_zone_id,
             name=record_current.name,
+            account=record_current.account,
         )
 
     async def remove(
@@ -176,19 +264,27 @@ class CRUDBase(Generic[SchemaType, CreateSchemaType, UpdateSchemaType]):
         name = record_in.name
         hosted_zone_id = record_in.hosted_zone_id
         change_type = "DELETE"
-        self._logger.debug("Deleting record %s type %s in %s", name, type, hosted_zone_id)
+        fields = log_fields(
+            record=name, record_type=self.schema._record_type, zone=hosted_zone_id, account=record_in.account
+        )
+        self._logger.debug("Deleting record %s", name, extra=fields)
         comment = f"route53-operator deleting {name} {self.schema._record_type} in {hosted_zone_id}"
-        resource_record_set = {
-            "Name": name,
-            "Type": self.schema._record_type,
-        }
+        # Route53 only deletes a record set when the TTL and values match the live record exactly
+        resource_record_set = record_in.recordset
         result = await self._change_record_set(
             hosted_zone_id=hosted_zone_id,
             change_type=change_type,
             resource_record_set=resource_record_set,
             comment=comment,
+            account=record_in.account,
+        )
+        self._logger.debug(
+            "Change %s for %s is %s",
+            result["Id"],
+            name,
+            result["Status"],
+            extra={**fields, "change_id": result["Id"]},
         )
-        self._logger.debug(result)
         return
 
     async def _change_record_set(
@@ -197,6 +293,8 @@ class CRUDBase(Generic[SchemaType, CreateSchemaType, UpdateSchemaType]):
         change_type: str,
         resource_record_set: dict[str, str | bool | dict[str, str | bool]],
         comment: str = "",
+        account: str | None = None,
+        ref: str | None = None,
     ) -> dict[str, str | datetime]:
         """
         Uses botocore change_resource_record_sets to update a route53 record using the AWS API.
@@ -206,26 +304,60 @@ class CRUDBase(Generic[SchemaType, CreateSchemaType, UpdateSchemaType]):
             change_type (str): The changetype, one of
             resource_record_set (dict[str, str  |  bool  |  dict[str, str  |  bool]]): _description_
             comment (str, optional): _description_. Defaults to "".
+            account (str | None, optional): AWS account the hosted zone is in. Defaults to the operator's account.
+            ref (str | None, optional): namespace/name of the record object the change is for. Defaults to None.
+
+        Raises:
+            InvalidRecordChange: Raised when Route53 rejects the change
+            RecordOwnershipError: Raised when ownership is enabled and the record is not the operator's to change. A
+                batch rejected while ownership is enabled is retried once against a freshly loaded snapshot, so a
+                claim another owner created in the meantime fails the change with this.
 
         Returns:
             dict[str, str | datetime]: the ChangeInfo from the AWS API
         """
         # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/route53.html#Route53.Client.change_resource_record_sets
+        changes = [{"Action": change_type, "ResourceRecordSet": resource_record_set}]
+        if not self._config.ownership_enabled:
+            return await self._submit(hosted_zone_id, changes, comment, account, ref)
+        # the ownership check is a lookup in the zone snapshot, the claim goes in the same ChangeBatch
+        snapshot = await self._zone_cache.get(hosted_zone_id, account)
+        try:
+            claims = self._claims(snapshot, changes[0])
+            return await self._submit(hosted_zone_id, changes + claims, comment, account, ref)
+        except InvalidRecordChange as exc:
+            if error_code(exc) not in REJECTED_BATCH_CODES:
+                raise
+        # a claim created since the snapshot was loaded rejects the CREATE of ours, the retry checks the zone as it is
+        snapshot = await self._zone_cache.load(hosted_zone_id, account)
+        claims = self._claims(snapshot, changes[0])
+        return await self._submit(hosted_zone_id, changes + claims, comment, account, ref)
 
-        async with self._session.create_client("route53", **self._config.aws_client_kwargs) as client:
-            try:
-                response = await client.change_resource_record_sets(
-                    HostedZoneId=hosted_zone_id,
-                    ChangeBatch={
-                        "Comment": comment,
-                        "Changes": [
-                            {
-                                "Action": change_type,
-                                "ResourceRecordSet": resource_record_set,
-                            },
-                        ],
-                    },
-                )
-            except botocore_exceptions.ClientError as exc:
-                raise InvalidRecordChange("Invalid record change") from exc
-        return response["ChangeInfo"]
+    def _claims(self, snapshot: ZoneSnapshot, change: Change) -> list[Change]:
+        """The claim changes that go in the same ChangeBatch as a record change"""
+        return claim_changes(
+            snapshot,
+            change,
+            self._config.ownership_owner_id,
+            adopt_unowned=self._config.ownership_adopt_unowned,
+        )
+
+    async def _submit(
+        self, hosted_zone_id: str, changes: list[Change], comment: str, account: str | None, ref: str | None
+    ) -> dict[str, str | datetime]:
+        """Journal and send one ChangeBatch, and apply it to the zone cache once Route53 accepted it"""
+        entry = None
+        if self._journal is not None:
+            entry = await self._journal.intend(hosted_zone_id, changes, account, refs=[ref] if ref is not None else [])
+        try:
+            result = await submit_changes(self._accounts, hosted_zone_id, changes, comment=comment, account=account)
+        except Exception:
+            if entry is not None:
+                self._journal.finish(entry, FAILED)
+            raise
+        self._zone_cache.apply(hosted_zone_id, changes, account)
+        if entry is not None:
+            # a crash from here on leaves the change id in the journal, replay polls it instead of listing the zone
+            await self._journal.submitted(entry, result["Id"])
+            self._journal.finish(entry, DONE)
+        return result
@@ -0,0 +1,291 @@
+"""
+Whole-zone reconciliation of authoritative zones
+
+A zone listed in authoritative_zones belongs entirely to the cluster. Instead of every record object reading its record
+on resume, the ZoneReconciler takes the desired state of the zone from every record object and RecordSet that targets
+it, streams the zone from Route53 once, and computes the minimal diff: records that are missing or differ are
+UPSERTed, records no object manages are DELETEd, and the rest are left alone. The diff goes out in as few full
+ChangeBatches as possible. The SOA and NS records of the zone apex are never touched.
+
+Two objects that name the same record are resolved like the conflict index does: the oldest object wins. An object
+whose spec doesn't validate still keeps the record it names, it is neither written nor deleted. A record claimed by
+another owner, see lib.ownership, is left to that owner with its claim. When Route53 rejects a ChangeBatch it is split
+in halves until the rejected changes are isolated, so one of them doesn't hold up the rest.
+"""
+import asyncio
+from collections.abc import Awaitable
+from collections.abc import Callable
+from collections.abc import Iterable
+from collections.abc import Mapping
+from dataclasses import asdict
+from dataclasses import dataclass
+from functools import lru_cache
+from logging import getLogger
+from logging import Logger
+from typing import Any
+
+from pydantic import ValidationError
+
+from ..exceptions import InvalidRecordChange
+from ..lib.aws import AccountPool
+from ..lib.aws import get_account_pool
+from ..lib.changes import Change
+from ..lib.changes import chunk_change_groups
+from ..lib.changes import error_code
+from ..lib.changes import normalize_zone_id
+from ..lib.changes import record_key
+from ..lib.changes import REJECTED_BATCH_CODES
+from ..lib.changes import submit_changes
+from ..lib.config import Config
+from ..lib.kube import list_objects
+from ..lib.kube import live_records
+from ..lib.ownership import claim_record_set
+from ..lib.ownership import parse_claim
+from ..lib.ratelimit import DRIFT
+from ..lib.ratelimit import priority
+from ..lib.zone_cache import get_zone_cache
+from ..lib.zone_cache import ZoneCache
+from ..lib.zone_cache import ZoneKey
+from ..lib.zone_store import parse_zone_key
+from ..schemas.v1 import RecordSet
+from .record_set import same_record_set
+
+ObjectSource = Callable[[], Awaitable[Iterable[tuple[type, Mapping[str, Any]]]]]
+RecordKey = tuple[str, str]
+# record types of the zone apex that belong to Route53
+APEX_TYPES = ("SOA", "NS")
+
+
+@dataclass
+class ReconcileReport:
+    """What a reconcile of an authoritative zone found and did"""
+
+    zone: str
+    dry_run: bool
+    record_sets: int = 0
+    desired: int = 0
+    unchanged: int = 0
+    upserts: int = 0
+    deletes: int = 0
+    change_batches: int = 0
+    failed: int = 0
+    # records claimed by another owner, left alone
+    foreign: int = 0
+
+
+@dataclass
+class ZoneState:
+    """The records the objects targeting a zone want, and every record an object holds on to"""
+
+    # (name, type) to the record set and the (creationTimestamp, namespace/name) of the object that won it
+    desired: dict[RecordKey, tuple[dict[str, Any], tuple[str, str]]]
+    kept: set[RecordKey]
+
+
+def desired_state(
+    objects: Iterable[tuple[type, Mapping[str, Any]]], zones: Iterable[ZoneKey]
+) -> dict[ZoneKey, ZoneState]:
+    """
+    The desired state of zones from the record objects and RecordSets in the cluster
+
+    Args:
+        objects (Iterable[tuple[type, Mapping[str, Any]]]): The schema of every object and the object
+        zones (Iterable[ZoneKey]): The zones to collect
+
+    Returns:
+        dict[ZoneKey, ZoneState]: The state of each zone
+    """
+    states = {zone: ZoneState({}, set()) for zone in zones}
+    for schema, obj in objects:
+        spec = obj.get("spec", {})
+        for record in live_records(schema, spec):
+            state = states.get((record.account, record.hosted_zone_id))
+            if state is not None:
+                state.kept.add((record.name, record.record_type))
+        try:
+            records = schema(**spec).records() if schema is RecordSet else [schema(**spec)]
+        except ValidationError:
+            continue
+        metadata = obj.get("metadata", {})
+        # objects without a creationTimestamp sort last, ties are broken by namespace/name
+        owner = (metadata.get("creationTimestamp") or "~", f"{metadata.get('namespace')}/{metadata.get('name')}")
+        for record in records:
+            state = states.get((record.account, normalize_zone_id(record.hosted_zone_id)))
+            if state is None:
+                continue
+            key = record_key(record.name, record._record_type)
+            if key not in state.desired or owner < state.desired[key][1]:
+                state.desired[key] = (record.recordset, owner)
+    return states
+
+
+class ZoneReconciler:
+    """Reconciles every authoritative zone as a whole"""
+
+    def __init__(
+        self,
+        config: Config,
+        accounts: AccountPool,
+        objects: ObjectSource = list_objects,
+        zone_cache: ZoneCache | None = None,
+        logger: Logger | None = None,
+    ):
+        """
+        Args:
+            config (Config): Operator config
+            accounts (AccountPool): Pool to make the calls with
+            objects (ObjectSource, optional): Lists every record object and RecordSet with its schema. Defaults to
+                listing them from the Kubernetes API.
+            zone_cache (ZoneCache | None, optional): Zone snapshots to keep current with the changes
+            logger (Logger | None, optional): Python logger
+        """
+        self._config = config
+        self._accounts = accounts
+        self._objects = objects
+        self._zone_cache = zone_cache if zone_cache is not None else ZoneCache(accounts)
+        self._logger = logger if logger is not None else getLogger(__name__)
+        self._zones = {parse_zone_key(zone) for zone in config.authoritative_zones}
+        self._task: asyncio.Task | None = None
+
+    def authoritative(self, hosted_zone_id: str, account: str | None = None) -> bool:
+        """Whether a zone is reconciled as a whole"""
+        return (account, normalize_zone_id(hosted_zone_id)) in self._zones
+
+    def start(self) -> None:
+        """Reconcile now and every authoritative_interval seconds in the background, when there are zones to"""
+        if self._zones and self._task is None:
+            self._task = asyncio.create_task(self._reconcile_loop())
+
+    async def close(self) -> None:
+        """Stop reconciling in the background"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _reconcile_loop(self) -> None:
+        while True:
+            try:
+                await self.reconcile()
+            except Exception:
+                interval = self._config.authoritative_interval
+                self._logger.exception("Reconciling authoritative zones failed, retrying in %s seconds", interval)
+            await asyncio.sleep(self._config.authoritative_interval)
+
+    async def reconcile(self, dry_run: bool | None = None) -> list[ReconcileReport]:
+        """
+        Reconcile every authoritative zone against the objects in the cluster, listed once for all of them
+
+        The calls are made in the drift priority class, behind the calls for users and resumes.
+
+        Args:
+            dry_run (bool | None, optional): Only report the changes. Defaults to authoritative_dry_run.
+
+        Returns:
+            list[ReconcileReport]: What was found and done in each zone
+        """
+        dry_run = self._config.authoritative_dry_run if dry_run is None else dry_run
+        states = desired_state(await self._objects(), self._zones)
+        reports = []
+        for zone in sorted(states, key=lambda zone: (zone[0] or "", zone[1])):
+            report = ReconcileReport(zone=zone[1] if zone[0] is None else f"{zone[0]}:{zone[1]}", dry_run=dry_run)
+            with priority(DRIFT):
+                await self._reconcile_zone(zone, states[zone], report)
+            self._logger.info("Reconciled authoritative zone: %s", asdict(report))
+            reports.append(report)
+        return reports
+
+    async def _reconcile_zone(self, zone: ZoneKey, state: ZoneState, report: ReconcileReport) -> None:
+        """Diff one streamed listing of a zone against its desired state and apply the diff"""
+        account, hosted_zone_id = zone
+        report.desired = len(state.desired)
+        # the changes of each record, a claim sorts after its record so a record claimed by another owner is dropped
+        # once its claim is seen
+        groups: dict[RecordKey, list[Change]] = {}
+        seen: set[RecordKey] = set()
+        claimed: set[RecordKey] = set()
+        foreign: set[RecordKey] = set()
+        apex = None
+        async for record_set in self._zone_cache.stream(hosted_zone_id, account):
+            report.record_sets += 1
+            key = record_key(record_set["Name"], record_set["Type"])
+            # the apex sorts first in Route53's order, the zone's SOA and NS records are there
+            apex = apex if apex is not None else key[0]
+            if key[0] == apex and key[1] in APEX_TYPES:
+                continue
+            seen.add(key)
+            claim = parse_claim(record_set)
+            if claim is not None and claim[1] != self._config.ownership_owner_id:
+                foreign.add(claim[0])
+                groups.pop(claim[0], None)
+                continue
+            if claim is not None and (claim[0] in state.desired or claim[0] in state.kept):
+                claimed.add(claim[0])
+                continue
+            if key in foreign:
+                continue
+            if key in state.desired:
+                desired = state.desired[key][0]
+                if same_record_set(record_set, desired):
+                    report.unchanged += 1
+                else:
+                    groups[key] = [{"Action": "UPSERT", "ResourceRecordSet": desired}]
+            elif key not in state.kept:
+                groups[key] = [{"Action": "DELETE", "ResourceRecordSet": record_set}]
+        for key, (desired, _) in state.desired.items():
+            if key not in seen and key not in foreign:
+                groups[key] = [{"Action": "UPSERT", "ResourceRecordSet": desired}]
+        report.foreign = len(foreign)
+        if foreign:
+            self._logger.info("Leaving %s records claimed by other owners in %s alone", len(foreign), hosted_zone_id)
+        if self._config.ownership_enabled:
+            # every record written is claimed in the same ChangeBatch, unless it already is
+            for key, group in groups.items():
+                record_set = group[0]["ResourceRecordSet"]
+                if group[0]["Action"] == "UPSERT" and key not in claimed:
+                    claim = claim_record_set(record_set["Name"], record_set["Type"], self._config.ownership_owner_id)
+                    group.append({"Action": "CREATE", "ResourceRecordSet": claim})
+        report.upserts = sum(group[0]["Action"] == "UPSERT" for group in groups.values())
+        report.deletes = len(groups) - report.upserts
+        if report.dry_run:
+            return
+        for batch in chunk_change_groups(list(groups.values())):
+            await self._submit(zone, batch, report)
+
+    async def _submit(self, zone: ZoneKey, batch: list[list[Change]], report: ReconcileReport) -> None:
+        """
+        Send one ChangeBatch of the diff of a zone
+
+        A batch Route53 rejects is split in halves until the rejected changes are isolated and failed on their own.
+        """
+        account, hosted_zone_id = zone
+        changes = [change for group in batch for change in group]
+        try:
+            await submit_changes(
+                self._accounts,
+                hosted_zone_id,
+                changes,
+                comment=f"route53-operator reconciling {len(batch)} records",
+                account=account,
+            )
+        except InvalidRecordChange as exc:
+            if error_code(exc) in REJECTED_BATCH_CODES and len(batch) > 1:
+                middle = len(batch) // 2
+                await self._submit(zone, batch[:middle], report)
+                await self._submit(zone, batch[middle:], report)
+                return
+            # the zone changed since it was streamed, the next reconcile sees it as it is now
+            self._logger.warning("Could not apply %s changes to %s", len(batch), hosted_zone_id, exc_info=True)
+            report.failed += len(batch)
+            return
+        self._zone_cache.apply(hosted_zone_id, changes, account)
+        report.change_batches += 1
+
+
+@lru_cache
+def get_zone_reconciler(config: Config) -> ZoneReconciler:
+    """Get the zone reconciler for a config, used with an LRU Cache to return the same one every time its called"""
+    return ZoneReconciler(config, get_account_pool(config), zone_cache=get_zone_cache(config))
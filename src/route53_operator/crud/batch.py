@@ -0,0 +1,277 @@
+"""
+Coalesced record deletes
+
+Deleting thousands of records one ChangeBatch at a time costs one rate limited call per record. The DeleteAggregator
+collects the deletes for a hosted zone over a short window, fills in the exact record sets Route53 has from the zone
+cache, and removes them in as few full ChangeBatches as possible. Every delete waiting on a batch is released together
+once the batch is INSYNC, so kopf drops the finalizers of all those objects at once. With ownership enabled each delete
+takes its claim with it in the same batch. With a change journal every batch is journaled with the record objects it
+deletes, so a crash while it is in flight is finished on the next start.
+"""
+import asyncio
+from dataclasses import dataclass
+from dataclasses import field
+from functools import lru_cache
+from logging import getLogger
+from logging import Logger
+from typing import Any
+
+from ..exceptions import InvalidRecordChange
+from ..exceptions import RecordOwnershipError
+from ..lib.aws import AccountPool
+from ..lib.aws import get_account_pool
+from ..lib.changes import Change
+from ..lib.changes import chunk_change_groups
+from ..lib.changes import error_code
+from ..lib.changes import normalize_zone_id
+from ..lib.changes import REJECTED_BATCH_CODES
+from ..lib.changes import submit_changes
+from ..lib.changes import wait_for_insync
+from ..lib.config import Config
+from ..lib.journal import ChangeJournal
+from ..lib.journal import DONE
+from ..lib.journal import FAILED
+from ..lib.journal import get_change_journal
+from ..lib.journal import JournalEntry
+from ..lib.logs import log_fields
+from ..lib.ownership import claim_changes
+from ..lib.zone_cache import get_zone_cache
+from ..lib.zone_cache import ZoneCache
+from ..lib.zone_cache import ZoneKey
+from ..lib.zone_cache import ZoneSnapshot
+from ..schemas._base import RecordBase
+
+
+@dataclass
+class PendingDelete:
+    """A record waiting to be deleted, and the future its handler waits on"""
+
+    record: RecordBase
+    future: asyncio.Future
+    # namespace/name of the record object
+    ref: str | None = None
+    # the record's DELETE and the DELETE of its claim, these always go in the same ChangeBatch
+    changes: list[Change] = field(default_factory=list)
+
+
+class DeleteAggregator:
+    """Collects record deletes per hosted zone and sends them in as few ChangeBatches as possible"""
+
+    def __init__(
+        self,
+        config: Config,
+        accounts: AccountPool,
+        zone_cache: ZoneCache,
+        logger: Logger | None = None,
+        journal: ChangeJournal | None = None,
+    ):
+        """
+        Args:
+            config (Config): Operator config
+            accounts (AccountPool): Pool to make the calls with
+            zone_cache (ZoneCache): Snapshots of the hosted zones, used for the exact record sets to delete
+            logger (Logger | None, optional): Python logger
+            journal (ChangeJournal | None, optional): Journals every batch before it is sent. Defaults to None.
+        """
+        self._config = config
+        self._accounts = accounts
+        self._zone_cache = zone_cache
+        self._journal = journal
+        self._logger = logger if logger is not None else getLogger(__name__)
+        self._pending: dict[ZoneKey, list[PendingDelete]] = {}
+        self._flushes: dict[ZoneKey, asyncio.Task] = {}
+        # one flush per zone at a time, overlapping changes to a zone are rejected with PriorRequestNotComplete
+        self._zone_locks: dict[ZoneKey, asyncio.Lock] = {}
+
+    async def delete(self, record: RecordBase, ref: str | None = None) -> None:
+        """
+        Delete a record, returns once the ChangeBatch it was sent in is INSYNC
+
+        A record that is already gone from Route53 is not an error.
+
+        Args:
+            record (RecordBase): The record to delete
+            ref (str | None, optional): namespace/name of the record object, journaled with the batch. Defaults to None.
+
+        Raises:
+            InvalidRecordChange: Raised when Route53 rejects the delete
+            RecordOwnershipError: Raised when ownership is enabled and the record is not the operator's to delete
+        """
+        # /hostedzone/Z1 and Z1 are the same zone, and share its window and lock
+        key = (record.account, normalize_zone_id(record.hosted_zone_id))
+        pending = PendingDelete(record=record, future=asyncio.get_running_loop().create_future(), ref=ref)
+        self._pending.setdefault(key, []).append(pending)
+        if key not in self._flushes:
+            self._flushes[key] = asyncio.create_task(self._flush_later(key))
+        await pending.future
+
+    async def _flush_later(self, key: ZoneKey) -> None:
+        """Wait out the batch window, then send everything collected for the zone"""
+        await asyncio.sleep(self._config.delete_batch_window)
+        lock = self._zone_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            # deletes that arrive from here on start the next window, and wait for this flush on the lock
+            del self._flushes[key]
+            pending = self._pending.pop(key, [])
+            try:
+                await self._flush(key, pending)
+            except Exception as exc:
+                _fail(pending, exc)
+
+    async def _flush(self, key: ZoneKey, pending: list[PendingDelete]) -> None:
+        """Delete the pending records of a zone"""
+        account, hosted_zone_id = key
+        if self._config.ownership_enabled:
+            snapshot = await self._zone_cache.get(hosted_zone_id, account)
+        else:
+            snapshot = self._zone_cache.snapshot(hosted_zone_id, account)
+        if snapshot is not None and not snapshot.verified:
+            # a restored snapshot misses what changed while the operator was down, a record it lacks isn't gone
+            snapshot = await self._zone_cache.load(hosted_zone_id, account)
+        pending = self._fill(pending, snapshot)
+        if not pending:
+            return
+        submitted = []
+        for batch in _chunk(pending):
+            submitted.extend(await self._submit(key, batch, refreshed=snapshot is not None))
+        await asyncio.gather(*(self._release(key, entry, batch) for entry, batch in submitted))
+
+    def _fill(self, pending: list[PendingDelete], snapshot: ZoneSnapshot | None) -> list[PendingDelete]:
+        """
+        Set the changes of each pending delete to the exact record set to delete, and its claim
+
+        The record set comes from the zone snapshot when one is loaded and verified, deletes of records the snapshot
+        doesn't have are done already. Without a snapshot the record set is built from the spec. Deletes of records the
+        operator doesn't own are failed.
+
+        Returns:
+            list[PendingDelete]: The deletes that still have to be sent
+        """
+        remaining = []
+        for item in pending:
+            record_set: dict[str, Any] | None = item.record.recordset
+            if snapshot is not None:
+                record_set = snapshot.get(item.record.name, item.record._record_type)
+                if record_set is None:
+                    self._logger.info("Record %s was already deleted", item.record.name)
+                    _resolve([item])
+                    continue
+            change = {"Action": "DELETE", "ResourceRecordSet": record_set}
+            item.changes = [change]
+            if self._config.ownership_enabled:
+                try:
+                    item.changes += claim_changes(
+                        snapshot,
+                        change,
+                        self._config.ownership_owner_id,
+                        adopt_unowned=self._config.ownership_adopt_unowned,
+                    )
+                except RecordOwnershipError as exc:
+                    _fail([item], exc)
+                    continue
+            remaining.append(item)
+        return remaining
+
+    async def _submit(
+        self, key: ZoneKey, batch: list[PendingDelete], refreshed: bool
+    ) -> list[tuple[JournalEntry, list[PendingDelete]]]:
+        """
+        Send one ChangeBatch
+
+        When Route53 rejects the batch the zone is loaded once to correct the record sets, after that the batch is
+        split in halves until the records Route53 rejects are isolated and failed on their own.
+
+        Returns:
+            list[tuple[JournalEntry, list[PendingDelete]]]: Every accepted batch with its change id, and its deletes
+        """
+        account, hosted_zone_id = key
+        changes = [change for item in batch for change in item.changes]
+        refs = [item.ref for item in batch if item.ref is not None]
+        if self._journal is not None:
+            entry = await self._journal.intend(hosted_zone_id, changes, account, refs)
+        else:
+            entry = JournalEntry("", hosted_zone_id, account, changes, refs)
+        try:
+            change_info = await submit_changes(
+                self._accounts, hosted_zone_id, changes, comment=f"Delete {len(changes)} records", account=account
+            )
+        except InvalidRecordChange as exc:
+            self._finish(entry, FAILED)
+            if error_code(exc) not in REJECTED_BATCH_CODES:
+                _fail(batch, exc)
+                return []
+            if not refreshed:
+                snapshot = await self._zone_cache.load(hosted_zone_id, account)
+                submitted = []
+                for retry in _chunk(self._fill(batch, snapshot)):
+                    submitted.extend(await self._submit(key, retry, refreshed=True))
+                return submitted
+            if len(batch) == 1:
+                _fail(batch, exc)
+                return []
+            middle = len(batch) // 2
+            return await self._submit(key, batch[:middle], refreshed) + await self._submit(
+                key, batch[middle:], refreshed
+            )
+        self._zone_cache.apply(hosted_zone_id, changes, account)
+        if self._journal is not None:
+            await self._journal.submitted(entry, change_info["Id"])
+        else:
+            entry.change_id = change_info["Id"]
+        self._logger.debug(
+            "Deleting %s records from %s in change %s",
+            len(changes),
+            hosted_zone_id,
+            change_info["Id"],
+            extra=log_fields(zone=hosted_zone_id, change_id=change_info["Id"], account=account),
+        )
+        return [(entry, batch)]
+
+    async def _release(self, key: ZoneKey, entry: JournalEntry, batch: list[PendingDelete]) -> None:
+        """Release every delete in an accepted batch once it is INSYNC"""
+        if self._config.change_wait_for_insync:
+            try:
+                await wait_for_insync(
+                    self._accounts,
+                    entry.change_id,
+                    account=key[0],
+                    poll_interval=self._config.change_poll_interval,
+                    timeout=self._config.change_insync_timeout,
+                )
+            except Exception as exc:
+                # still open in the journal, the next start polls it again
+                _fail(batch, exc)
+                return
+        self._finish(entry, DONE)
+        _resolve(batch)
+
+    def _finish(self, entry: JournalEntry, status: str) -> None:
+        if self._journal is not None:
+            self._journal.finish(entry, status)
+
+
+def _chunk(pending: list[PendingDelete]) -> list[list[PendingDelete]]:
+    """Split pending deletes into full ChangeBatches"""
+    by_changes = {id(item.changes): item for item in pending}
+    batches = chunk_change_groups([item.changes for item in pending])
+    return [[by_changes[id(changes)] for changes in batch] for batch in batches]
+
+
+def _resolve(pending: list[PendingDelete]) -> None:
+    for item in pending:
+        if not item.future.done():
+            item.future.set_result(None)
+
+
+def _fail(pending: list[PendingDelete], exc: Exception) -> None:
+    for item in pending:
+        if not item.future.done():
+            item.future.set_exception(exc)
+
+
+@lru_cache
+def get_delete_aggregator(config: Config) -> DeleteAggregator:
+    """Get the delete aggregator for a config, used with an LRU Cache to return the same one every time its called"""
+    return DeleteAggregator(
+        config, get_account_pool(config), get_zone_cache(config), journal=get_change_journal(config)
+    )
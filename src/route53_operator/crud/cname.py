@@ -12,5 +12,5 @@ class CNAMECrud(CRUDBase):
     A CRUD for CNAME Records
     """
 
-    def __init__(self, config: Config, logger: Logger, aws_session: AioSession | None = None):
-        super().__init__(schema=CNAMERecord, config=config, logger=logger, aws_session=aws_session)
+    def __init__(self, config: Config, logger: Logger, aws_session: AioSession | None = None, **kwargs):
+        super().__init__(schema=CNAMERecord, config=config, logger=logger, aws_session=aws_session, **kwargs)
@@ -0,0 +1,284 @@
+"""
+Garbage collection of orphaned records
+
+A record object deleted while the operator is down leaves its record behind in Route53. The OrphanCollector finds
+those records by their ownership claims (see lib.ownership): a claim with the operator's owner id and no record object
+for it is an orphan.
+
+Each zone is streamed one page at a time in Route53's order and merge-joined against the record objects of that zone,
+sorted the same way, so memory does not grow with the size of the zone. Orphans are deleted with their claims in full
+ChangeBatches. Garbage collection gets its own share of each account's rate limit and a budget of calls per run, and
+its calls are in the lowest priority class, so it never crowds out the handlers.
+"""
+import asyncio
+import heapq
+from collections.abc import Awaitable
+from collections.abc import Callable
+from collections.abc import Iterable
+from dataclasses import asdict
+from dataclasses import dataclass
+from dataclasses import field
+from functools import lru_cache
+from logging import getLogger
+from logging import Logger
+from typing import Any
+
+from ..exceptions import InvalidRecordChange
+from ..lib.aws import AccountPool
+from ..lib.aws import get_account_pool
+from ..lib.changes import Change
+from ..lib.changes import ChangeBatchBuffer
+from ..lib.changes import record_key
+from ..lib.changes import route53_sort_key
+from ..lib.changes import submit_changes
+from ..lib.config import Config
+from ..lib.kube import list_live_records
+from ..lib.kube import LiveRecord
+from ..lib.ownership import CLAIM_SORT_BOUND
+from ..lib.ownership import claim_name
+from ..lib.ownership import parse_claim
+from ..lib.ratelimit import GC
+from ..lib.ratelimit import priority
+from ..lib.ratelimit import TokenBucket
+from ..lib.zone_cache import get_zone_cache
+from ..lib.zone_cache import ZoneCache
+from ..lib.zone_cache import ZoneKey
+from ..lib.zone_store import parse_zone_key
+
+LiveRecordSource = Callable[[], Awaitable[Iterable[LiveRecord]]]
+
+# orphan names kept in a report
+REPORT_ORPHAN_NAMES = 100
+
+
+class _BudgetExhausted(Exception):
+    pass
+
+
+@dataclass
+class GCReport:
+    """What a garbage collection run found and did"""
+
+    dry_run: bool
+    zones: int = 0
+    record_sets: int = 0
+    orphans: int = 0
+    deleted: int = 0
+    failed: int = 0
+    api_calls: int = 0
+    budget_exhausted: bool = False
+    orphan_names: list[str] = field(default_factory=list)
+
+
+class _Budget:
+    """Garbage collection's share of every account's rate limit, and the calls one run may make"""
+
+    def __init__(self, rate: float, max_calls: int):
+        self.max_calls = max_calls
+        self.calls = 0
+        self._rate = rate
+        self._limits: dict[str | None, _AccountLimit] = {}
+
+    def limit(self, account: str | None) -> "_AccountLimit":
+        """The limit to enter for every call to an account"""
+        if account not in self._limits:
+            self._limits[account] = _AccountLimit(self, TokenBucket(self._rate))
+        return self._limits[account]
+
+
+class _AccountLimit:
+    def __init__(self, budget: _Budget, bucket: TokenBucket):
+        self._budget = budget
+        self._bucket = bucket
+
+    async def __aenter__(self) -> None:
+        if self._budget.calls >= self._budget.max_calls:
+            raise _BudgetExhausted()
+        self._budget.calls += 1
+        await self._bucket.acquire()
+
+    async def __aexit__(self, *exc_info) -> bool:
+        return False
+
+
+class OrphanCollector:
+    """Finds the records the operator owns that have no record object, and deletes them"""
+
+    def __init__(
+        self,
+        config: Config,
+        accounts: AccountPool,
+        live_records: LiveRecordSource = list_live_records,
+        zone_cache: ZoneCache | None = None,
+        logger: Logger | None = None,
+    ):
+        """
+        Args:
+            config (Config): Operator config
+            accounts (AccountPool): Pool to make the calls with
+            live_records (LiveRecordSource, optional): Lists the records of every record object. Defaults to listing
+                them from the Kubernetes API.
+            zone_cache (ZoneCache | None, optional): Zone snapshots to keep current with the deletes
+            logger (Logger | None, optional): Python logger
+        """
+        self._config = config
+        self._accounts = accounts
+        self._live_records = live_records
+        self._zone_cache = zone_cache if zone_cache is not None else ZoneCache(accounts)
+        self._logger = logger if logger is not None else getLogger(__name__)
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        """Collect garbage every gc_interval seconds in the background, when gc_interval is set"""
+        if self._config.gc_interval and self._task is None:
+            self._task = asyncio.create_task(self._collect_loop())
+
+    async def close(self) -> None:
+        """Stop collecting garbage in the background"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _collect_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self._config.gc_interval)
+            try:
+                await self.collect()
+            except Exception:
+                self._logger.exception("Garbage collection failed, retrying in %s seconds", self._config.gc_interval)
+
+    async def collect(self, dry_run: bool | None = None) -> GCReport:
+        """
+        Find orphaned records in every zone with record objects or listed in gc_hosted_zones, and delete them
+
+        Args:
+            dry_run (bool | None, optional): Only report orphans. Defaults to gc_dry_run.
+
+        Returns:
+            GCReport: What was found and done
+        """
+        report = GCReport(dry_run=self._config.gc_dry_run if dry_run is None else dry_run)
+        if not self._config.ownership_enabled:
+            self._logger.warning("Ownership is not enabled, only records claimed before it was turned off are collected")
+        live = _live_sort_keys(await self._live_records())
+        zones = set(live) | {parse_zone_key(zone) for zone in self._config.gc_hosted_zones}
+        budget = _Budget(
+            self._config.aws_requests_per_second * self._config.gc_rate_fraction, self._config.gc_max_api_calls
+        )
+        try:
+            with priority(GC):
+                for zone in sorted(zones, key=lambda zone: (zone[0] or "", zone[1])):
+                    await self._collect_zone(zone, live.get(zone, []), budget.limit(zone[0]), report)
+        except _BudgetExhausted:
+            report.budget_exhausted = True
+            self._logger.warning("Garbage collection used its budget of %s calls", budget.max_calls)
+        report.api_calls = budget.calls
+        self._logger.info("Garbage collection finished: %s", asdict(report))
+        return report
+
+    async def _collect_zone(
+        self, zone: ZoneKey, live: list[str], limit: _AccountLimit, report: GCReport
+    ) -> None:
+        """
+        Merge-join a zone against the sort keys of the claims its record objects would have
+
+        A claim sorts after the record it claims, so the record sets seen since then are held until the stream passes
+        the point where their claims would be. Only that window is in memory, never the whole zone.
+        """
+        account, hosted_zone_id = zone
+        report.zones += 1
+        held: dict[tuple[str, str], dict[str, Any]] = {}
+        release_at: list[tuple[str, tuple[str, str]]] = []
+        live_index = 0
+        batch: ChangeBatchBuffer[tuple[str, str]] = ChangeBatchBuffer()
+        async for record_set in self._zone_cache.stream(hosted_zone_id, account, rate_limit=limit):
+            report.record_sets += 1
+            sort_key = route53_sort_key(record_set["Name"])
+            while release_at and release_at[0][0] < sort_key:
+                held.pop(heapq.heappop(release_at)[1], None)
+            claim = parse_claim(record_set)
+            if claim is None:
+                key = record_key(record_set["Name"], record_set["Type"])
+                held[key] = record_set
+                heapq.heappush(release_at, (sort_key + CLAIM_SORT_BOUND, key))
+                continue
+            claimed, owner = claim
+            if owner != self._config.ownership_owner_id:
+                continue
+            while live_index < len(live) and live[live_index] < sort_key:
+                live_index += 1
+            if live_index < len(live) and live[live_index] == sort_key:
+                continue
+
+            report.orphans += 1
+            if len(report.orphan_names) < REPORT_ORPHAN_NAMES:
+                report.orphan_names.append(f"{claimed[0]} {claimed[1]}")
+            if report.dry_run:
+                continue
+            changes = [{"Action": "DELETE", "ResourceRecordSet": record_set}]
+            if claimed in held:
+                changes.insert(0, {"Action": "DELETE", "ResourceRecordSet": held.pop(claimed)})
+            full = batch.add(claimed, changes)
+            if full is not None:
+                await self._delete(zone, full, limit, report)
+        if batch:
+            await self._delete(zone, batch.flush(), limit, report)
+
+    async def _delete(
+        self,
+        zone: ZoneKey,
+        batch: list[tuple[tuple[str, str], list[Change]]],
+        limit: _AccountLimit,
+        report: GCReport,
+    ) -> None:
+        """
+        Delete a batch of orphans and their claims in one ChangeBatch
+
+        The record objects are listed again first. A record object created after the zone was streamed, whose record
+        was created since, is not deleted.
+        """
+        account, hosted_zone_id = zone
+        fresh = {
+            (record.name, record.record_type)
+            for record in await self._live_records()
+            if (record.account, record.hosted_zone_id) == zone
+        }
+        batch = [(claimed, changes) for claimed, changes in batch if claimed not in fresh]
+        if not batch:
+            return
+        changes = [change for _, group in batch for change in group]
+        try:
+            async with limit:
+                await submit_changes(
+                    self._accounts,
+                    hosted_zone_id,
+                    changes,
+                    comment=f"route53-operator garbage collecting {len(batch)} records",
+                    account=account,
+                )
+        except InvalidRecordChange:
+            # the zone changed since it was streamed, the next run sees it as it is now
+            self._logger.warning("Could not delete %s orphaned records in %s", len(batch), hosted_zone_id, exc_info=True)
+            report.failed += len(batch)
+            return
+        self._zone_cache.apply(hosted_zone_id, changes, account)
+        report.deleted += len(batch)
+
+
+def _live_sort_keys(records: Iterable[LiveRecord]) -> dict[ZoneKey, list[str]]:
+    """The sort keys of the claims of live records, sorted per zone"""
+    live: dict[ZoneKey, set[str]] = {}
+    for record in records:
+        zone = (record.account, record.hosted_zone_id)
+        live.setdefault(zone, set()).add(route53_sort_key(claim_name(record.name, record.record_type)))
+    return {zone: sorted(keys) for zone, keys in live.items()}
+
+
+@lru_cache
+def get_orphan_collector(config: Config) -> OrphanCollector:
+    """Get the orphan collector for a config, used with an LRU Cache to return the same one every time its called"""
+    return OrphanCollector(config, get_account_pool(config), zone_cache=get_zone_cache(config))
@@ -0,0 +1,135 @@
+"""
+Range-scan record reads
+
+Reading a record on its own costs a list_resource_record_sets call with MaxItems 1, so resuming thousands of objects
+costs a call per object. Route53 lists a zone in order though, one page of up to 300 record sets per call. The
+ReadBatcher collects the reads for a hosted zone over a short window, sorts them in Route53's order and answers them with
+as few pages as cover them: every page starts at the first read the previous pages didn't answer, and answers every read
+up to the last name on it, whether the record is there or not.
+"""
+import asyncio
+from dataclasses import dataclass
+from functools import lru_cache
+from logging import getLogger
+from logging import Logger
+from typing import Any
+
+from ..lib.aws import AccountPool
+from ..lib.aws import get_account_pool
+from ..lib.changes import normalize_name
+from ..lib.changes import normalize_zone_id
+from ..lib.changes import route53_sort_key
+from ..lib.config import Config
+from ..lib.zone_cache import ZoneKey
+
+# the most record sets list_resource_record_sets returns in one page
+PAGE_SIZE = 300
+
+
+@dataclass
+class PendingRead:
+    """A record waiting to be read, and the future its caller waits on"""
+
+    name: str
+    record_type: str
+    future: asyncio.Future
+
+    @property
+    def sort_key(self) -> tuple[str, str]:
+        return route53_sort_key(self.name), self.record_type
+
+
+class ReadBatcher:
+    """Collects record reads per hosted zone and answers them with as few list calls as possible"""
+
+    def __init__(self, config: Config, accounts: AccountPool, logger: Logger | None = None):
+        """
+        Args:
+            config (Config): Operator config
+            accounts (AccountPool): Pool to make the calls with
+            logger (Logger | None, optional): Python logger
+        """
+        self._config = config
+        self._accounts = accounts
+        self._logger = logger if logger is not None else getLogger(__name__)
+        self._pending: dict[ZoneKey, list[PendingRead]] = {}
+        self._flushes: dict[ZoneKey, asyncio.Task] = {}
+        # list calls made and reads answered, reads / calls is how many reads a call answers
+        self.calls = 0
+        self.reads = 0
+
+    async def get(
+        self, hosted_zone_id: str, name: str, record_type: str, account: str | None = None
+    ) -> dict[str, Any] | None:
+        """
+        Read a record set
+
+        Args:
+            hosted_zone_id (str): The Route53 hosted zone id
+            name (str): Name of the record
+            record_type (str): Type of the record
+            account (str | None, optional): AWS account the hosted zone is in. Defaults to the operator's account.
+
+        Returns:
+            dict[str, Any] | None: The record set from the AWS API, None when the zone doesn't have it
+        """
+        key = (account, hosted_zone_id)
+        pending = PendingRead(normalize_name(name), record_type, asyncio.get_running_loop().create_future())
+        self._pending.setdefault(key, []).append(pending)
+        if key not in self._flushes:
+            self._flushes[key] = asyncio.create_task(self._flush_later(key))
+        return await pending.future
+
+    async def _flush_later(self, key: ZoneKey) -> None:
+        """Wait out the batch window, then answer everything collected for the zone"""
+        await asyncio.sleep(self._config.read_batch_window)
+        del self._flushes[key]
+        pending = sorted(self._pending.pop(key, []), key=lambda item: item.sort_key)
+        try:
+            await self._scan(key, pending)
+        except Exception as exc:
+            for item in pending:
+                if not item.future.done():
+                    item.future.set_exception(exc)
+
+    async def _scan(self, key: ZoneKey, pending: list[PendingRead]) -> None:
+        """Answer sorted reads one page at a time"""
+        account, hosted_zone_id = key
+        reads, calls = len(pending), 0
+        while pending:
+            first = pending[0]
+            # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/route53.html#Route53.Client.list_resource_record_sets
+            async with self._accounts.client(account, "list_resource_record_sets") as client:
+                response = await client.list_resource_record_sets(
+                    HostedZoneId=hosted_zone_id,
+                    StartRecordName=first.name,
+                    StartRecordType=first.record_type,
+                    MaxItems=str(PAGE_SIZE),
+                )
+            calls += 1
+            record_sets = response.get("ResourceRecordSets", [])
+            page = {(normalize_name(record_set["Name"]), record_set["Type"]): record_set for record_set in record_sets}
+            if response.get("IsTruncated") and record_sets:
+                # the types of the last name on the page may go on on the next page
+                last = route53_sort_key(record_sets[-1]["Name"])
+                answered = [item for item in pending if item.sort_key[0] < last]
+            else:
+                answered = pending
+            # a page always answers the read it starts at, Route53 returns it first when it exists
+            if not answered:
+                answered = [first]
+            for item in answered:
+                if not item.future.done():
+                    item.future.set_result(page.get((item.name, item.record_type)))
+            pending = pending[len(answered) :]
+        self.calls += calls
+        self.reads += reads
+        self._logger.debug("Answered %s reads in %s with %s list calls", reads, normalize_zone_id(hosted_zone_id), calls)
+
+
+@lru_cache
+def get_read_batcher(config: Config) -> ReadBatcher | None:
+    """Get the read batcher for a config, None when read_batch_window is 0"""
+    if not config.read_batch_window:
+        return None
+    return ReadBatcher(config, get_account_pool(config))
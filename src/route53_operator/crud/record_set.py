@@ -0,0 +1,208 @@
+"""
+The CRUD for RecordSets, bundles of records in one hosted zone
+
+A RecordSet is reconciled as one diff against the snapshot of its hosted zone: entries that are missing from the zone or
+differ from it are UPSERTed, entries dropped from the spec are DELETEd, and entries that already match are left alone.
+Every change, and with ownership enabled every claim, goes to Route53 in a single ChangeBatch, so the set is applied
+atomically: all of it or none of it. One object, one handler run, one status write and one call for dozens of records.
+"""
+from collections.abc import Collection
+from logging import Logger
+from typing import Any
+
+from ..exceptions import InvalidRecordChange
+from ..lib.aws import AccountPool
+from ..lib.aws import get_account_pool
+from ..lib.changes import Change
+from ..lib.changes import chunk_changes
+from ..lib.changes import error_code
+from ..lib.changes import record_key
+from ..lib.changes import REJECTED_BATCH_CODES
+from ..lib.changes import submit_changes
+from ..lib.config import Config
+from ..lib.journal import ChangeJournal
+from ..lib.journal import DONE
+from ..lib.journal import FAILED
+from ..lib.journal import get_change_journal
+from ..lib.logs import log_fields
+from ..lib.ownership import claim_changes
+from ..lib.zone_cache import get_zone_cache
+from ..lib.zone_cache import ZoneCache
+from ..lib.zone_cache import ZoneSnapshot
+from ..schemas.v1 import RecordSet
+
+# the state of each entry after a RecordSet is applied
+CREATED = "Created"
+UPDATED = "Updated"
+UNCHANGED = "Unchanged"
+DELETED = "Deleted"
+# another object manages the record, the entry is left alone
+CONFLICT = "Conflict"
+
+
+def same_record_set(current: dict[str, Any], desired: dict[str, Any]) -> bool:
+    """Whether a record set in the zone has the TTL and values of the desired one"""
+    return current.get("TTL") == desired["TTL"] and sorted(
+        record["Value"] for record in current.get("ResourceRecords", [])
+    ) == sorted(record["Value"] for record in desired["ResourceRecords"])
+
+
+class RecordSetCrud:
+    """A CRUD for RecordSets"""
+
+    def __init__(
+        self,
+        config: Config,
+        logger: Logger,
+        accounts: AccountPool | None = None,
+        zone_cache: ZoneCache | None = None,
+        journal: ChangeJournal | None = None,
+    ):
+        """
+        Uses the operator's shared account pool, zone cache and change journal for each of them that isn't passed. With
+        a pool other than the shared one the zone cache is built around that pool instead.
+
+        Args:
+            config (Config): Operator config
+            logger (Logger): Python logger
+            accounts (AccountPool | None, optional): Pool to make the calls with
+            zone_cache (ZoneCache | None, optional): Snapshots the sets are diffed against
+            journal (ChangeJournal | None, optional): Journal the ChangeBatches are written to
+        """
+        self._config = config
+        self._logger = logger
+        accounts = accounts if accounts is not None else get_account_pool(config)
+        if zone_cache is None:
+            # the zone cache makes calls with the pool, the shared one only goes with the shared pool
+            zone_cache = get_zone_cache(config) if accounts is get_account_pool(config) else ZoneCache(accounts)
+        self._accounts = accounts
+        self._zone_cache = zone_cache
+        self._journal = journal if journal is not None else get_change_journal(config)
+
+    async def apply(
+        self,
+        record_set: RecordSet,
+        previous: RecordSet | None = None,
+        ref: str | None = None,
+        conflicts: Collection[tuple[str, str]] = (),
+    ) -> dict[str, Any]:
+        """
+        Make the zone match a RecordSet in one ChangeBatch
+
+        Args:
+            record_set (RecordSet): The desired set
+            previous (RecordSet | None, optional): The set before its spec changed, its entries that are no longer in
+                the set are deleted. Defaults to None.
+            ref (str | None, optional): namespace/name of the RecordSet object. Defaults to None.
+            conflicts (Collection[tuple[str, str]], optional): (name, type) of the records other objects manage, they
+                are neither written nor deleted. Defaults to ().
+
+        Raises:
+            InvalidRecordChange: Raised when Route53 rejects the changes, or they don't fit in one ChangeBatch
+            RecordOwnershipError: Raised when ownership is enabled and an entry is not the operator's to change
+
+        Returns:
+            dict[str, Any]: The zone, the id of the change, None when nothing changed, and the state of every entry
+        """
+        snapshot = await self._zone_cache.get(record_set.hosted_zone_id, record_set.account)
+        changes = []
+        entries = []
+        for record in record_set.records():
+            desired = record.recordset
+            current = snapshot.get(record.name, record._record_type)
+            if record_key(record.name, record._record_type) in conflicts:
+                state = CONFLICT
+            elif current is not None and same_record_set(current, desired):
+                state = UNCHANGED
+            else:
+                changes.append({"Action": "UPSERT", "ResourceRecordSet": desired})
+                state = CREATED if current is None else UPDATED
+            entries.append({"name": record.name, "type": record._record_type, "state": state})
+        if previous is not None:
+            kept = {record_key(entry.name, entry.type) for entry in record_set.entries}
+            for entry in previous.entries:
+                # Route53 only deletes a record set when the TTL and values match the zone exactly
+                current = snapshot.get(entry.name, entry.type)
+                key = record_key(entry.name, entry.type)
+                if key in kept or key in conflicts or current is None:
+                    continue
+                changes.append({"Action": "DELETE", "ResourceRecordSet": current})
+                entries.append({"name": entry.name, "type": entry.type, "state": DELETED})
+        change_id = None
+        if changes:
+            comment = f"route53-operator applying {len(changes)} changes of {ref or 'a RecordSet'}"
+            change_id = await self._submit(record_set, snapshot, changes, comment, ref)
+        return {"hosted_zone_id": record_set.hosted_zone_id, "change_id": change_id, "entries": entries}
+
+    async def delete(
+        self, record_set: RecordSet, ref: str | None = None, conflicts: Collection[tuple[str, str]] = ()
+    ) -> None:
+        """
+        Delete every entry of a RecordSet in one ChangeBatch, entries that are already gone are not an error
+
+        Args:
+            record_set (RecordSet): The set
+            ref (str | None, optional): namespace/name of the RecordSet object. Defaults to None.
+            conflicts (Collection[tuple[str, str]], optional): (name, type) of the records other objects manage, they
+                are left alone. Defaults to ().
+        """
+        snapshot = await self._zone_cache.get(record_set.hosted_zone_id, record_set.account)
+        changes = []
+        for entry in record_set.entries:
+            current = snapshot.get(entry.name, entry.type)
+            if current is not None and record_key(entry.name, entry.type) not in conflicts:
+                changes.append({"Action": "DELETE", "ResourceRecordSet": current})
+        if changes:
+            comment = f"route53-operator deleting {len(changes)} records of {ref or 'a RecordSet'}"
+            await self._submit(record_set, snapshot, changes, comment, ref)
+
+    async def _submit(
+        self, record_set: RecordSet, snapshot: ZoneSnapshot, changes: list[Change], comment: str, ref: str | None
+    ) -> str:
+        """Send the changes of a set and their claims as one ChangeBatch, and return the id of the change"""
+        hosted_zone_id = record_set.hosted_zone_id
+        account = record_set.account
+        if self._config.ownership_enabled:
+            # every claim goes in the same ChangeBatch as the records, checking them is a lookup in the snapshot
+            changes = changes + [
+                claim
+                for change in changes
+                for claim in claim_changes(
+                    snapshot,
+                    change,
+                    self._config.ownership_owner_id,
+                    adopt_unowned=self._config.ownership_adopt_unowned,
+                )
+            ]
+        if len(chunk_changes(changes)) > 1:
+            raise InvalidRecordChange(
+                f"{len(changes)} changes to {hosted_zone_id} don't fit in one ChangeBatch, split the RecordSet"
+            )
+        entry = None
+        if self._journal is not None:
+            entry = await self._journal.intend(hosted_zone_id, changes, account, refs=[ref] if ref is not None else [])
+        try:
+            result = await submit_changes(self._accounts, hosted_zone_id, changes, comment=comment, account=account)
+        except InvalidRecordChange as exc:
+            if entry is not None:
+                self._journal.finish(entry, FAILED)
+            if error_code(exc) in REJECTED_BATCH_CODES:
+                # the snapshot didn't match the zone, the retry diffs against the zone as it is
+                await self._zone_cache.load(hosted_zone_id, account)
+            raise
+        except Exception:
+            if entry is not None:
+                self._journal.finish(entry, FAILED)
+            raise
+        self._zone_cache.apply(hosted_zone_id, changes, account)
+        if entry is not None:
+            await self._journal.submitted(entry, result["Id"])
+            self._journal.finish(entry, DONE)
+        self._logger.debug(
+            "Change %s for %s records is %s",
+            result["Id"],
+            len(changes),
+            result["Status"],
+            extra=log_fields(zone=hosted_zone_id, change_id=result["Id"], account=account),
+        )
+        return result["Id"]
@@ -10,5 +10,5 @@ from aiobotocore.session import AioSession
 class TXTCrud(CRUDBase):
     """A CRUD for TXT Records"""
 
-    def __init__(self, config: Config, logger: Logger, aws_session: AioSession | None = None):
-        super().__init__(schema=TXTRecord, config=config, logger=logger, aws_session=aws_session)
+    def __init__(self, config: Config, logger: Logger, aws_session: AioSession | None = None, **kwargs):
+        super().__init__(schema=TXTRecord, config=config, logger=logger, aws_session=aws_session, **kwargs)
@@ -8,3 +8,35 @@ class InvalidRecordChange(Exception):
     """Raised when a change is invalid"""
 
     pass
+
+
+class UnknownAccountError(Exception):
+    """Raised when a record names an AWS account that is not configured"""
+
+    pass
+
+
+class RecordOwnershipError(Exception):
+    """Raised when a change would clobber a record the operator does not own"""
+
+    pass
+
+
+class ZoneFileError(Exception):
+    """Raised when a zone file can not be parsed"""
+
+    pass
+
+
+class RecordConflictError(Exception):
+    """Raised when another record object manages the same Route53 record"""
+
+    pass
+
+
+class CircuitOpenError(Exception):
+    """Raised when calls to Route53 fail fast because their circuit is open"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
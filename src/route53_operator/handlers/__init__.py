@@ -4,7 +4,10 @@ Handlers have to be registered with the kopf registry and imported into the main
 # https://kopf.readthedocs.io/en/stable/handlers/
 """
 from . import v1
+from .cleanup import cleanup_fn
 from .login import login_fn
+from .probes import circuits_fn
+from .probes import tenant_queues_fn
 from .startup import startup_fn
 
-__all__ = ["startup_fn", "v1", "login_fn"]
+__all__ = ["startup_fn", "cleanup_fn", "v1", "login_fn", "tenant_queues_fn", "circuits_fn"]
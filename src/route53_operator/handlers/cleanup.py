@@ -0,0 +1,34 @@
+"""Handlers that are run when the operator shuts down"""
+from logging import Logger
+
+from .. import kopf
+from .. import kopf_registry
+from ..crud.authoritative import get_zone_reconciler
+from ..crud.gc import get_orphan_collector
+from ..lib.aws import get_account_pool
+from ..lib.config import get_config
+from ..lib.events import get_event_aggregator
+from ..lib.journal import get_change_journal
+from ..lib.zone_cache import get_zone_cache
+
+
+@kopf.on.cleanup(registry=kopf_registry)
+async def cleanup_fn(logger: Logger, **kwargs) -> None:
+    """
+    This is a handler that is run when the operator shuts down. It stops garbage
+    collection and the reconciles of the authoritative zones, posts the pending Events,
+    closes the zone cache, the change journal and the AWS clients and stops the
+    credential refreshes.
+
+    Args:
+        logger (Logger): python logger
+    """
+    logger.info("Shutting down")
+    await get_orphan_collector(get_config()).close()
+    await get_zone_reconciler(get_config()).close()
+    await get_event_aggregator(get_config()).close()
+    await get_zone_cache(get_config()).close()
+    journal = get_change_journal(get_config())
+    if journal is not None:
+        await journal.close()
+    await get_account_pool(get_config()).close()
@@ -0,0 +1,30 @@
+"""Contains the probes reported at the liveness endpoint"""
+from typing import Any
+
+from .. import kopf
+from .. import kopf_registry
+from ..lib.aws import get_account_pool
+from ..lib.config import get_config
+
+
+@kopf.on.probe(id="tenant_queues", registry=kopf_registry)
+def tenant_queues_fn(**kwargs) -> dict[str, Any]:
+    """
+    Report the calls every tenant has waiting for each AWS account, was granted, and how long they waited
+
+    Returns:
+        dict[str, Any]: Account name to tenant to its stats
+    """
+    # https://kopf.readthedocs.io/en/stable/probing/
+    return get_account_pool(get_config()).tenant_stats()
+
+
+@kopf.on.probe(id="circuits", registry=kopf_registry)
+def circuits_fn(**kwargs) -> dict[str, Any]:
+    """
+    Report the state of the circuit of every operation called to each AWS account
+
+    Returns:
+        dict[str, Any]: Account name to operation to the state of its circuit
+    """
+    return get_account_pool(get_config()).circuit_states()
@@ -3,6 +3,12 @@ from logging import Logger
 
 from .. import kopf
 from .. import kopf_registry
+from ..crud.authoritative import get_zone_reconciler
+from ..crud.gc import get_orphan_collector
+from ..lib.aws import get_account_pool
+from ..lib.config import get_config
+from ..lib.journal import get_change_journal
+from ..lib.zone_cache import get_zone_cache
 
 
 @kopf.on.startup(registry=kopf_registry)
@@ -11,7 +17,20 @@ async def startup_fn(logger: Logger, **kwargs) -> None:
     This is a handler that is run on startup of the operator. It is used to
     log a message that the operator has started.
 
+    Restores the zone snapshots persisted to zone_state_path, starts every configured
+    AWS account so that credentials are assumed and clients are open before the first
+    record is handled, replays the change batches left open in the change journal,
+    then starts garbage collection when gc_interval is set and the reconciles of the
+    authoritative zones.
+
     Args:
         logger (Logger): python logger
     """
     logger.info("Starting up")
+    get_zone_cache(get_config()).restore()
+    await get_account_pool(get_config()).start()
+    journal = get_change_journal(get_config())
+    if journal is not None:
+        await journal.replay(get_account_pool(get_config()), get_zone_cache(get_config()), get_config())
+    get_orphan_collector(get_config()).start()
+    get_zone_reconciler(get_config()).start()
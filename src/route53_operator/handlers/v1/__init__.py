@@ -6,5 +6,43 @@ when the operator starts up
 
 """
 from .a import create_a_record
+from .a import delete_a_record
+from .a import resume_a_record
+from .a import update_a_record
+from .a import watch_a_record
+from .cname import create_cname_record
+from .cname import delete_cname_record
+from .cname import resume_cname_record
+from .cname import update_cname_record
+from .cname import watch_cname_record
+from .record_set import create_record_set
+from .record_set import delete_record_set
+from .record_set import resume_record_set
+from .record_set import update_record_set
+from .txt import create_txt_record
+from .txt import delete_txt_record
+from .txt import resume_txt_record
+from .txt import update_txt_record
+from .txt import watch_txt_record
 
-__all__ = ["create_a_record"]
+__all__ = [
+    "create_a_record",
+    "update_a_record",
+    "delete_a_record",
+    "resume_a_record",
+    "watch_a_record",
+    "create_cname_record",
+    "update_cname_record",
+    "delete_cname_record",
+    "resume_cname_record",
+    "watch_cname_record",
+    "create_txt_record",
+    "update_txt_record",
+    "delete_txt_record",
+    "resume_txt_record",
+    "watch_txt_record",
+    "create_record_set",
+    "update_record_set",
+    "delete_record_set",
+    "resume_record_set",
+]
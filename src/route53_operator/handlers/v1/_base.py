@@ -0,0 +1,313 @@
+"""Shared logic for the v1 record handlers
+
+Each record type registers its own kopf handlers in its module and calls these with its CRUD and schemas.
+"""
+import json
+from collections.abc import Iterator
+from collections.abc import Mapping
+from contextlib import contextmanager
+from typing import Any
+
+from ... import kopf
+from ...crud._base import CRUDBase
+from ...crud.authoritative import ZoneReconciler
+from ...crud.batch import DeleteAggregator
+from ...exceptions import CircuitOpenError
+from ...exceptions import RecordConflictError
+from ...exceptions import RecordNotFoundError
+from ...lib.changes import error_code
+from ...lib.config import get_config
+from ...lib.conflicts import ConflictIndex
+from ...lib.events import APPLIED
+from ...lib.events import CONFLICT
+from ...lib.events import DRIFTED
+from ...lib.events import EventAggregator
+from ...lib.events import THROTTLED
+from ...lib.events import THROTTLED_CODES
+from ...lib.debounce import Debouncer
+from ...lib.kube import ADOPTED_ANNOTATION
+from ...lib.kube import is_adopted
+from ...lib.ratelimit import priority
+from ...lib.ratelimit import RESUME
+from ...lib.ratelimit import tenant
+from ...schemas._base import RecordBase
+from ...schemas._base import RecordMutable
+from ...schemas.v1 import RecordSet
+
+# fields that identify a record in Route53, changing them would be a different record
+IMMUTABLE_FIELDS = ("hosted_zone_id", "name", "account")
+
+
+def record_status(record: RecordBase) -> dict[str, Any]:
+    """The record as a JSON compatible dict, returned by handlers so kopf stores it in the CR status"""
+    return json.loads(record.json())
+
+
+def object_ref(body: Mapping[str, Any]) -> str:
+    """namespace/name of a CR"""
+    return f"{body['metadata'].get('namespace')}/{body['metadata']['name']}"
+
+
+def object_tenant(body: Mapping[str, Any] | None) -> str:
+    """The tenant the calls made for a CR are queued for: the value of its tenant_label, or its namespace"""
+    if body is None:
+        return ""
+    metadata = body["metadata"]
+    label = get_config().tenant_label
+    if label is not None and label in (metadata.get("labels") or {}):
+        return metadata["labels"][label]
+    return metadata.get("namespace") or ""
+
+
+def record_transition(
+    events: EventAggregator | None, body: Mapping[str, Any] | None, reason: str, message: str
+) -> None:
+    """Record a transition of a CR as an Event, when there is an aggregator and a body to post it for"""
+    if events is not None and body is not None:
+        events.record(body, reason, message)
+
+
+@contextmanager
+def throttled(events: EventAggregator | None, body: Mapping[str, Any] | None) -> Iterator[None]:
+    """
+    Record a throttled transition for a CR when Route53 throttles a call made for it
+
+    A call that failed fast because the circuit to Route53 is open is retried by kopf once the circuit may let it
+    through, instead of after kopf's own backoff.
+    """
+    try:
+        yield
+    except CircuitOpenError as exc:
+        raise kopf.TemporaryError(str(exc), delay=exc.retry_after) from exc
+    except Exception as exc:
+        if error_code(exc) in THROTTLED_CODES:
+            record_transition(events, body, THROTTLED, f"Route53 throttled the change: {exc}")
+        raise
+
+
+def check_conflicts(
+    index: ConflictIndex,
+    schema: type[RecordBase],
+    body: Mapping[str, Any],
+    patch: kopf.Patch,
+    events: EventAggregator | None = None,
+) -> None:
+    """
+    Make sure a CR is the one that may write its record before it is written
+
+    A CR that loses its record to an older CR gets a conflict in its status, and is retried until the older CR is gone.
+
+    Args:
+        index (ConflictIndex): The records claimed by every CR
+        schema (type[RecordBase]): Schema for the record type
+        body (Mapping[str, Any]): Body of the CR
+        patch (kopf.Patch): Patch of the CR, for its status
+        events (EventAggregator | None, optional): Records the conflict as an Event
+
+    Raises:
+        kopf.TemporaryError: Raised when an older CR manages the same record
+    """
+    ref = object_ref(body)
+    index.observe(schema, ref, body["spec"], body["metadata"].get("creationTimestamp", ""))
+    try:
+        index.check(schema, ref, body["spec"])
+    except RecordConflictError as exc:
+        patch.status["conflict"] = str(exc)
+        record_transition(events, body, CONFLICT, str(exc))
+        raise kopf.TemporaryError(str(exc), delay=index.retry_delay) from exc
+    if body.get("status", {}).get("conflict"):
+        patch.status["conflict"] = None
+
+
+def release_claim(index: ConflictIndex, schema: type[RecordBase], body: Mapping[str, Any]) -> bool:
+    """
+    Forget the record a CR that is being deleted claims
+
+    Returns:
+        bool: Whether the CR managed the record, a CR that lost its record to another CR must not delete it
+    """
+    ref = object_ref(body)
+    index.observe(schema, ref, body["spec"], body["metadata"].get("creationTimestamp", ""))
+    record_managed = True
+    try:
+        index.check(schema, ref, body["spec"])
+    except RecordConflictError:
+        record_managed = False
+    index.forget(schema, ref)
+    return record_managed
+
+
+def watch_record(
+    index: ConflictIndex, schema: type[RecordBase] | type[RecordSet], event: Mapping[str, Any]
+) -> None:
+    """Keep the conflict index current with a watch event of a CR"""
+    body = event["object"]
+    if event["type"] == "DELETED":
+        index.forget(schema, object_ref(body))
+    else:
+        index.observe(schema, object_ref(body), body.get("spec", {}), body["metadata"].get("creationTimestamp", ""))
+
+
+def in_sync(current: RecordBase, desired: RecordBase) -> bool:
+    """Whether the record in Route53 matches the desired record"""
+    return current.ttl == desired.ttl and sorted(rr["Value"] for rr in current.resource_records) == sorted(
+        rr["Value"] for rr in desired.resource_records
+    )
+
+
+async def create_record(
+    crud: CRUDBase,
+    schema: type[RecordBase],
+    spec: Mapping[str, Any],
+    annotations: Mapping[str, str] | None = None,
+    ref: str | None = None,
+    events: EventAggregator | None = None,
+    body: Mapping[str, Any] | None = None,
+) -> dict[str, Any]:
+    """
+    Create the record for a CR
+
+    A CR adopted from Route53 whose spec is unchanged since it was adopted already matches its record, so it is not
+    written again. One whose spec changed updates the record it was adopted from.
+
+    Args:
+        crud (CRUDBase): CRUD for the record type
+        schema (type[RecordBase]): Schema for the record type
+        spec (Mapping[str, Any]): Spec of the CR
+        annotations (Mapping[str, str] | None, optional): Annotations of the CR
+        ref (str | None, optional): namespace/name of the CR
+        events (EventAggregator | None, optional): Records the transitions of the CR as Events
+        body (Mapping[str, Any] | None, optional): Body of the CR, the Events are posted for
+
+    Returns:
+        dict[str, Any]: The created record
+    """
+    record_in = schema(**spec)
+    if annotations and is_adopted(schema, spec, annotations):
+        return record_status(record_in)
+    with tenant(object_tenant(body)), throttled(events, body):
+        if annotations and ADOPTED_ANNOTATION in annotations:
+            # the record an adopted CR was adopted from is in Route53 already, Route53 rejects a CREATE of it
+            record = await crud.update(record_current=record_in, record_update=record_in)
+        else:
+            record = await crud.create(record_in=record_in, ref=ref)
+    record_transition(events, body, APPLIED, f"Created {schema._record_type} {record.name} in {record.hosted_zone_id}")
+    return record_status(record)
+
+
+async def update_record(
+    crud: CRUDBase,
+    schema: type[RecordBase],
+    update_schema: type[RecordMutable],
+    old: Mapping[str, Any],
+    new: Mapping[str, Any],
+    events: EventAggregator | None = None,
+    body: Mapping[str, Any] | None = None,
+    debouncer: Debouncer | None = None,
+) -> dict[str, Any]:
+    """
+    Update the record for a CR after its spec changed
+
+    With a debouncer, the update waits until the spec stopped changing and applies the latest one. The run kopf makes
+    for the edits that came in meanwhile finds them applied already and makes no call.
+
+    Args:
+        crud (CRUDBase): CRUD for the record type
+        schema (type[RecordBase]): Schema for the record type
+        update_schema (type[RecordMutable]): Update schema for the record type
+        old (Mapping[str, Any]): Spec of the CR before the change
+        new (Mapping[str, Any]): Spec of the CR after the change
+        events (EventAggregator | None, optional): Records the transitions of the CR as Events
+        body (Mapping[str, Any] | None, optional): Body of the CR, the Events are posted for
+        debouncer (Debouncer | None, optional): Coalesces rapid edits of the CR, needs its body
+
+    Raises:
+        kopf.PermanentError: Raised when a field that identifies the record changed
+
+    Returns:
+        dict[str, Any]: The updated record
+    """
+    debounced = debouncer is not None and body is not None
+    if debounced:
+        if debouncer.applied(body, new):
+            return record_status(schema(**new))
+        new = await debouncer.settle(schema, body)
+    changed = [field for field in IMMUTABLE_FIELDS if old.get(field) != new.get(field)]
+    if changed:
+        raise kopf.PermanentError(f"{', '.join(changed)} can not be changed, create a new record instead")
+    record_update = update_schema(**{key: value for key, value in new.items() if key in update_schema.__fields__})
+    with tenant(object_tenant(body)), throttled(events, body):
+        record = await crud.update(record_current=schema(**old), record_update=record_update)
+    if debounced:
+        debouncer.done(body, new)
+    record_transition(events, body, APPLIED, f"Updated {schema._record_type} {record.name} in {record.hosted_zone_id}")
+    return record_status(record)
+
+
+async def delete_record(
+    aggregator: DeleteAggregator,
+    schema: type[RecordBase],
+    spec: Mapping[str, Any],
+    ref: str | None = None,
+    body: Mapping[str, Any] | None = None,
+) -> None:
+    """
+    Delete the record for a CR, a record that is already gone is not an error
+
+    Deletes go through the aggregator, which sends the deletes for a zone together and returns once they are INSYNC.
+
+    Args:
+        aggregator (DeleteAggregator): Collects the deletes for each zone
+        schema (type[RecordBase]): Schema for the record type
+        spec (Mapping[str, Any]): Spec of the CR
+        ref (str | None, optional): namespace/name of the CR
+        body (Mapping[str, Any] | None, optional): Body of the CR, for the tenant the delete is queued for
+    """
+    with tenant(object_tenant(body)), throttled(None, body):
+        await aggregator.delete(schema(**spec), ref=ref)
+
+
+async def resume_record(
+    crud: CRUDBase,
+    schema: type[RecordBase],
+    update_schema: type[RecordMutable],
+    spec: Mapping[str, Any],
+    events: EventAggregator | None = None,
+    body: Mapping[str, Any] | None = None,
+    reconciler: ZoneReconciler | None = None,
+) -> dict[str, Any]:
+    """
+    Make sure the record for a CR matches its spec when the operator resumes handling it
+
+    A record in an authoritative zone is not read, the zone is reconciled as a whole instead. The calls are made in
+    the resume priority class, behind the creates, updates and deletes for users.
+
+    Args:
+        crud (CRUDBase): CRUD for the record type
+        schema (type[RecordBase]): Schema for the record type
+        update_schema (type[RecordMutable]): Update schema for the record type
+        spec (Mapping[str, Any]): Spec of the CR
+        events (EventAggregator | None, optional): Records the transitions of the CR as Events
+        body (Mapping[str, Any] | None, optional): Body of the CR, the Events are posted for
+        reconciler (ZoneReconciler | None, optional): Reconciles the authoritative zones
+
+    Returns:
+        dict[str, Any]: The record
+    """
+    desired = schema(**spec)
+    if reconciler is not None and reconciler.authoritative(desired.hosted_zone_id, desired.account):
+        return record_status(desired)
+    where = f"{schema._record_type} {desired.name} in {desired.hosted_zone_id}"
+    with priority(RESUME), tenant(object_tenant(body)), throttled(events, body):
+        try:
+            current = await crud.get(hosted_zone_id=desired.hosted_zone_id, name=desired.name, account=desired.account)
+        except RecordNotFoundError:
+            record = await crud.create(record_in=desired)
+            record_transition(events, body, DRIFTED, f"{where} was missing from Route53, created it")
+            return record_status(record)
+        if in_sync(current, desired):
+            return record_status(current)
+        record_update = update_schema(ttl=desired.ttl, value=desired.value)
+        record = await crud.update(record_current=current, record_update=record_update)
+    record_transition(events, body, DRIFTED, f"{where} differed from its spec in Route53, updated it")
+    return record_status(record)
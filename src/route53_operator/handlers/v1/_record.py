@@ -0,0 +1,144 @@
+"""The kopf handlers of a single record type
+
+A, CNAME and TXT record objects are handled the same way, only their CRUD and schemas differ, so their handlers are
+built and registered by register_record_handlers instead of being written out for each type.
+"""
+from collections.abc import Awaitable
+from collections.abc import Callable
+from logging import Logger
+from typing import Any
+from typing import NamedTuple
+
+from ... import kopf
+from ... import kopf_registry
+from ...crud._base import CRUDBase
+from ...crud.authoritative import get_zone_reconciler
+from ...crud.batch import get_delete_aggregator
+from ...lib.config import get_config
+from ...lib.conflicts import get_conflict_index
+from ...lib.debounce import get_debouncer
+from ...lib.events import get_event_aggregator
+from ...schemas._base import RecordBase
+from ...schemas._base import RecordMutable
+from ._base import check_conflicts
+from ._base import create_record
+from ._base import delete_record
+from ._base import release_claim
+from ._base import resume_record
+from ._base import update_record
+from ._base import watch_record
+
+Handler = Callable[..., Awaitable[Any]]
+
+
+class RecordHandlers(NamedTuple):
+    """The handlers registered for a record type"""
+
+    create: Handler
+    update: Handler
+    delete: Handler
+    resume: Handler
+    watch: Handler
+
+
+# record type to its handlers, e.g. for driving them without Kubernetes
+RECORD_HANDLERS: dict[str, RecordHandlers] = {}
+
+
+def _named(fn: Handler, name: str, doc: str) -> Handler:
+    # kopf derives the handler id, and with it the status field of the result, from the qualified name
+    fn.__name__ = fn.__qualname__ = name
+    fn.__doc__ = doc
+    return fn
+
+
+def register_record_handlers(
+    schema: type[RecordBase], update_schema: type[RecordMutable], crud_class: type[CRUDBase]
+) -> RecordHandlers:
+    """
+    Build the handlers of a record type and register them with kopf
+
+    The handlers are named <action>_<type>_record, e.g. create_a_record.
+
+    Args:
+        schema (type[RecordBase]): Schema of the record type
+        update_schema (type[RecordMutable]): Schema of the fields of the record type that can be updated
+        crud_class (type[CRUDBase]): CRUD for the record type
+
+    Returns:
+        RecordHandlers: The registered handlers
+    """
+    kind = schema._record_type.lower()
+
+    async def create(spec: dict[str, Any], name: str, namespace: str, logger: Logger, **kwargs) -> dict[str, Any]:
+        events = get_event_aggregator(get_config())
+        check_conflicts(get_conflict_index(get_config()), schema, kwargs["body"], kwargs["patch"], events)
+        crud = crud_class(config=get_config(), logger=logger)
+        return await create_record(
+            crud,
+            schema,
+            spec,
+            kwargs.get("annotations"),
+            ref=f"{namespace}/{name}",
+            events=events,
+            body=kwargs["body"],
+        )
+
+    async def update(
+        old: dict[str, Any], new: dict[str, Any], name: str, namespace: str, logger: Logger, **kwargs
+    ) -> dict[str, Any]:
+        events = get_event_aggregator(get_config())
+        check_conflicts(get_conflict_index(get_config()), schema, kwargs["body"], kwargs["patch"], events)
+        crud = crud_class(config=get_config(), logger=logger)
+        debouncer = get_debouncer(get_config())
+        return await update_record(
+            crud, schema, update_schema, old, new, events=events, body=kwargs["body"], debouncer=debouncer
+        )
+
+    async def delete(spec: dict[str, Any], name: str, namespace: str, logger: Logger, **kwargs) -> None:
+        get_event_aggregator(get_config()).forget(kwargs["body"])
+        get_debouncer(get_config()).forget(kwargs["body"])
+        if not release_claim(get_conflict_index(get_config()), schema, kwargs["body"]):
+            logger.info("Not deleting %s, it is managed by another object", spec.get("name"))
+            return
+        await delete_record(
+            get_delete_aggregator(get_config()), schema, spec, ref=f"{namespace}/{name}", body=kwargs["body"]
+        )
+
+    async def resume(spec: dict[str, Any], name: str, namespace: str, logger: Logger, **kwargs) -> dict[str, Any]:
+        events = get_event_aggregator(get_config())
+        check_conflicts(get_conflict_index(get_config()), schema, kwargs["body"], kwargs["patch"], events)
+        crud = crud_class(config=get_config(), logger=logger)
+        return await resume_record(
+            crud,
+            schema,
+            update_schema,
+            spec,
+            events=events,
+            body=kwargs["body"],
+            reconciler=get_zone_reconciler(get_config()),
+        )
+
+    async def watch(event: dict[str, Any], **kwargs) -> None:
+        watch_record(get_conflict_index(get_config()), schema, event)
+
+    objects = f"{schema._record_type} record objects"
+    handlers = RecordHandlers(
+        create=kopf.on.create(schema._plural, registry=kopf_registry)(
+            _named(create, f"create_{kind}_record", f"Handle {objects} being created")
+        ),
+        update=kopf.on.update(schema._plural, field="spec", registry=kopf_registry)(
+            _named(update, f"update_{kind}_record", f"Handle the spec of {objects} changing")
+        ),
+        delete=kopf.on.delete(schema._plural, registry=kopf_registry)(
+            _named(delete, f"delete_{kind}_record", f"Handle {objects} being deleted")
+        ),
+        resume=kopf.on.resume(schema._plural, registry=kopf_registry)(
+            _named(resume, f"resume_{kind}_record", f"Handle the operator resuming {objects} it already knows")
+        ),
+        watch=kopf.on.event(schema._plural, registry=kopf_registry)(
+            _named(watch, f"watch_{kind}_record", f"Keep the conflict index current with {objects}")
+        ),
+    )
+    RECORD_HANDLERS[schema._record_type] = handlers
+    return handlers
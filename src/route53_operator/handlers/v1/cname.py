@@ -0,0 +1,9 @@
+"""Handlers for CNAME Records"""
+from ...crud.cname import CNAMECrud
+from ...schemas.v1 import CNAMERecord
+from ...schemas.v1 import CNAMERecordUpdate
+from ._record import register_record_handlers
+
+create_cname_record, update_cname_record, delete_cname_record, resume_cname_record, watch_cname_record = (
+    register_record_handlers(CNAMERecord, CNAMERecordUpdate, CNAMECrud)
+)
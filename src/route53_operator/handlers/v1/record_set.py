@@ -0,0 +1,238 @@
+"""Handlers for RecordSets
+
+A RecordSet is applied as a whole, see crud.record_set. The state of every entry is returned so kopf stores it in the
+status of the object. Entries naming a record an older object manages, see lib.conflicts, are neither written nor
+deleted: they get the Conflict state, the object a conflict status, and it is retried until the other object is gone.
+"""
+from collections.abc import Mapping
+from logging import Logger
+from typing import Any
+
+from ... import kopf
+from ... import kopf_registry
+from ...crud.authoritative import get_zone_reconciler
+from ...crud.record_set import CONFLICT as CONFLICT_STATE
+from ...crud.record_set import RecordSetCrud
+from ...crud.record_set import UNCHANGED
+from ...lib.changes import record_key
+from ...lib.config import get_config
+from ...lib.conflicts import ConflictIndex
+from ...lib.conflicts import get_conflict_index
+from ...lib.events import APPLIED
+from ...lib.events import CONFLICT
+from ...lib.events import DRIFTED
+from ...lib.events import EventAggregator
+from ...lib.events import get_event_aggregator
+from ...lib.ratelimit import priority
+from ...lib.ratelimit import RESUME
+from ...lib.ratelimit import tenant
+from ...schemas.v1 import RecordSet
+from ._base import object_ref
+from ._base import object_tenant
+from ._base import record_transition
+from ._base import throttled
+from ._base import watch_record
+
+# fields that identify the zone of a RecordSet, changing them would move every record to another zone
+IMMUTABLE_FIELDS = ("hosted_zone_id", "account")
+
+
+def changed_entries(status: dict[str, Any]) -> list[str]:
+    """The entries of an applied set that were written to Route53, as <type> <name>"""
+    left_alone = (UNCHANGED, CONFLICT_STATE)
+    return [f"{entry['type']} {entry['name']}" for entry in status["entries"] if entry["state"] not in left_alone]
+
+
+def entry_conflicts(
+    index: ConflictIndex,
+    body: Mapping[str, Any],
+    patch: kopf.Patch,
+    events: EventAggregator | None = None,
+    old: Mapping[str, Any] | None = None,
+) -> list[tuple[str, str]]:
+    """
+    Find the entries of a RecordSet whose records an older object manages
+
+    The entries are noted in the conflict index first, a conflict is recorded in the status of the object and as an
+    Event, and cleared once there is none.
+
+    Args:
+        index (ConflictIndex): The records claimed by every object
+        body (Mapping[str, Any]): Body of the RecordSet
+        patch (kopf.Patch): Patch of the RecordSet, for its status
+        events (EventAggregator | None, optional): Records the conflict as an Event
+        old (Mapping[str, Any] | None, optional): The spec before it changed, its entries another object manages
+            now are not deleted either. Defaults to None.
+
+    Returns:
+        list[tuple[str, str]]: (name, type) of the entries to leave alone
+    """
+    ref = object_ref(body)
+    index.observe(RecordSet, ref, body["spec"], body["metadata"].get("creationTimestamp", ""))
+    lost = index.lost(RecordSet, ref, body["spec"])
+    if lost:
+        message = index.describe(lost)
+        patch.status["conflict"] = message
+        record_transition(events, body, CONFLICT, message)
+    elif body.get("status", {}).get("conflict"):
+        patch.status["conflict"] = None
+    if old is not None:
+        lost += index.lost(RecordSet, ref, old)
+    return [record_key(record.name, record.record_type) for record in lost]
+
+
+def retry_conflicts(
+    index: ConflictIndex, status: dict[str, Any], patch: kopf.Patch, handler_id: str
+) -> dict[str, Any]:
+    """
+    Return the status of an applied RecordSet, or retry it while entries are in conflict
+
+    Raises:
+        kopf.TemporaryError: Raised when another object manages one of the entries
+    """
+    if patch.status.get("conflict"):
+        # kopf keeps no result of a handler that is retried, the state of every entry is stored where it would be
+        patch.status[handler_id] = status
+        raise kopf.TemporaryError(patch.status["conflict"], delay=index.retry_delay)
+    return status
+
+
+@kopf.on.create(RecordSet._plural, registry=kopf_registry)
+async def create_record_set(
+    spec: dict[str, Any], name: str, namespace: str, logger: Logger, **kwargs
+) -> dict[str, Any]:
+    """
+    Handle a RecordSet object being created
+
+    Args:
+        spec (dict[str, Any]): The spec of the RecordSet
+        name (str): Name of the RecordSet
+        namespace (str): Namespace of the RecordSet
+        logger (Logger): Python Logger
+
+    Raises:
+        kopf.TemporaryError: Raised when entries are managed by other objects, once the others are applied
+
+    Returns:
+        dict[str, Any]: The change made, and the state of every entry
+    """
+    events = get_event_aggregator(get_config())
+    index = get_conflict_index(get_config())
+    conflicts = entry_conflicts(index, kwargs["body"], kwargs["patch"], events)
+    crud = RecordSetCrud(config=get_config(), logger=logger)
+    with tenant(object_tenant(kwargs["body"])), throttled(events, kwargs["body"]):
+        status = await crud.apply(RecordSet(**spec), ref=f"{namespace}/{name}", conflicts=conflicts)
+    written = changed_entries(status)
+    if written:
+        message = f"Applied {len(written)} records in {status['hosted_zone_id']}"
+        record_transition(events, kwargs["body"], APPLIED, message)
+    return retry_conflicts(index, status, kwargs["patch"], "create_record_set")
+
+
+@kopf.on.update(RecordSet._plural, field="spec", registry=kopf_registry)
+async def update_record_set(
+    old: dict[str, Any], new: dict[str, Any], name: str, namespace: str, logger: Logger, **kwargs
+) -> dict[str, Any]:
+    """
+    Handle the spec of a RecordSet object changing, entries removed from the spec are deleted
+
+    Args:
+        old (dict[str, Any]): The spec of the RecordSet before the change
+        new (dict[str, Any]): The spec of the RecordSet after the change
+        name (str): Name of the RecordSet
+        namespace (str): Namespace of the RecordSet
+        logger (Logger): Python Logger
+
+    Raises:
+        kopf.PermanentError: Raised when the hosted zone or account changed
+        kopf.TemporaryError: Raised when entries are managed by other objects, once the others are applied
+
+    Returns:
+        dict[str, Any]: The change made, and the state of every entry
+    """
+    changed = [field for field in IMMUTABLE_FIELDS if old.get(field) != new.get(field)]
+    if changed:
+        raise kopf.PermanentError(f"{', '.join(changed)} can not be changed, create a new RecordSet instead")
+    events = get_event_aggregator(get_config())
+    index = get_conflict_index(get_config())
+    conflicts = entry_conflicts(index, kwargs["body"], kwargs["patch"], events, old=old)
+    crud = RecordSetCrud(config=get_config(), logger=logger)
+    with tenant(object_tenant(kwargs["body"])), throttled(events, kwargs["body"]):
+        status = await crud.apply(
+            RecordSet(**new), previous=RecordSet(**old), ref=f"{namespace}/{name}", conflicts=conflicts
+        )
+    written = changed_entries(status)
+    if written:
+        message = f"Applied {len(written)} records in {status['hosted_zone_id']}"
+        record_transition(events, kwargs["body"], APPLIED, message)
+    return retry_conflicts(index, status, kwargs["patch"], "update_record_set/spec")
+
+
+@kopf.on.delete(RecordSet._plural, registry=kopf_registry)
+async def delete_record_set(spec: dict[str, Any], name: str, namespace: str, logger: Logger, **kwargs) -> None:
+    """
+    Handle a RecordSet object being deleted, every entry is deleted in one ChangeBatch
+
+    Args:
+        spec (dict[str, Any]): The spec of the RecordSet
+        name (str): Name of the RecordSet
+        namespace (str): Namespace of the RecordSet
+        logger (Logger): Python Logger
+    """
+    get_event_aggregator(get_config()).forget(kwargs["body"])
+    index = get_conflict_index(get_config())
+    ref = object_ref(kwargs["body"])
+    index.observe(RecordSet, ref, spec, kwargs["body"]["metadata"].get("creationTimestamp", ""))
+    # records another object manages now are not the set's to delete
+    conflicts = [record_key(record.name, record.record_type) for record in index.lost(RecordSet, ref, spec)]
+    index.forget(RecordSet, ref)
+    if conflicts:
+        managed = ", ".join(f"{record_type} {record_name}" for record_name, record_type in conflicts)
+        logger.info("Not deleting %s, they are managed by other objects", managed)
+    crud = RecordSetCrud(config=get_config(), logger=logger)
+    with tenant(object_tenant(kwargs["body"])), throttled(None, kwargs["body"]):
+        await crud.delete(RecordSet(**spec), ref=f"{namespace}/{name}", conflicts=conflicts)
+
+
+@kopf.on.resume(RecordSet._plural, registry=kopf_registry)
+async def resume_record_set(
+    spec: dict[str, Any], name: str, namespace: str, logger: Logger, **kwargs
+) -> dict[str, Any] | None:
+    """
+    Handle the operator resuming a RecordSet object it already knows, e.g. after a restart
+
+    Entries that match the zone are not written again, a set that matches entirely makes no call. A set in an
+    authoritative zone is left to the reconcile of the whole zone.
+
+    Args:
+        spec (dict[str, Any]): The spec of the RecordSet
+        name (str): Name of the RecordSet
+        namespace (str): Namespace of the RecordSet
+        logger (Logger): Python Logger
+
+    Raises:
+        kopf.TemporaryError: Raised when entries are managed by other objects, once the others are applied
+
+    Returns:
+        dict[str, Any] | None: The change made, and the state of every entry. None in an authoritative zone
+    """
+    record_set = RecordSet(**spec)
+    if get_zone_reconciler(get_config()).authoritative(record_set.hosted_zone_id, record_set.account):
+        return None
+    events = get_event_aggregator(get_config())
+    index = get_conflict_index(get_config())
+    conflicts = entry_conflicts(index, kwargs["body"], kwargs["patch"], events)
+    crud = RecordSetCrud(config=get_config(), logger=logger)
+    with priority(RESUME), tenant(object_tenant(kwargs["body"])), throttled(events, kwargs["body"]):
+        status = await crud.apply(record_set, ref=f"{namespace}/{name}", conflicts=conflicts)
+    written = changed_entries(status)
+    if written:
+        message = f"{', '.join(written)} in {status['hosted_zone_id']} differed from the spec in Route53, updated them"
+        record_transition(events, kwargs["body"], DRIFTED, message)
+    return retry_conflicts(index, status, kwargs["patch"], "resume_record_set")
+
+
+@kopf.on.event(RecordSet._plural, registry=kopf_registry)
+async def watch_record_set(event: dict[str, Any], **kwargs) -> None:
+    """Keep the conflict index current with RecordSet objects"""
+    watch_record(get_conflict_index(get_config()), RecordSet, event)
@@ -0,0 +1,9 @@
+"""Handlers for TXT Records"""
+from ...crud.txt import TXTCrud
+from ...schemas.v1 import TXTRecord
+from ...schemas.v1 import TXTRecordUpdate
+from ._record import register_record_handlers
+
+create_txt_record, update_txt_record, delete_txt_record, resume_txt_record, watch_txt_record = (
+    register_record_handlers(TXTRecord, TXTRecordUpdate, TXTCrud)
+)
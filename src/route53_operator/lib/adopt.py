@@ -0,0 +1,276 @@
+"""Adopts the records already in a hosted zone as record objects
+
+The zone is streamed one page of 300 record sets at a time, so adopting a zone costs one list call per 300 records.
+Every A, CNAME and TXT record set becomes a record object through its schema's from_recordset, created with
+server-side apply a bounded number at a time. Records claimed by any operator (see lib.ownership) are left alone.
+
+Adopted objects carry the ADOPTED_ANNOTATION with a hash of their spec. The create handler trusts an object whose spec
+still matches the hash, and reports the record without a call to Route53. With ownership enabled, the adopted records
+are claimed in full ChangeBatches so later changes pass the ownership check. Claims are CREATEd, so a record another
+owner claimed in the meantime is not taken from it: the claims of a rejected batch are split in halves until the
+rejected ones are isolated, and those end up in the report's errors.
+"""
+import asyncio
+import heapq
+import json
+import time
+from collections import Counter
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from dataclasses import field
+from logging import getLogger
+from logging import Logger
+from typing import Any
+
+from pydantic import ValidationError
+
+from ..exceptions import InvalidRecordChange
+from ..schemas._base import RecordBase
+from .aws import AccountPool
+from .changes import ChangeBatchBuffer
+from .changes import error_code
+from .changes import record_key
+from .changes import REJECTED_BATCH_CODES
+from .changes import route53_sort_key
+from .changes import submit_changes
+from .config import Config
+from .kube import ADOPTED_ANNOTATION
+from .kube import apply_object
+from .kube import kube_api
+from .kube import record_object
+from .kube import spec_hash
+from .ownership import CLAIM_SORT_BOUND
+from .ownership import claim_record_set
+from .ownership import parse_claim
+from .zone_cache import ZoneCache
+from .zone_import import SCHEMAS
+
+# errors kept in a report
+REPORT_ERRORS = 100
+
+ObjectApplier = Callable[[dict[str, Any]], None]
+
+
+@dataclass
+class AdoptReport:
+    """What an adoption found and did"""
+
+    record_sets: int = 0
+    adopted: int = 0
+    invalid: int = 0
+    skipped: Counter = field(default_factory=Counter)
+    list_calls: int = 0
+    change_calls: int = 0
+    seconds: float = 0
+    errors: list[str] = field(default_factory=list)
+
+    def summary(self) -> dict[str, Any]:
+        """The report as a JSON compatible dict"""
+        return {
+            "record_sets": self.record_sets,
+            "adopted": self.adopted,
+            "invalid": self.invalid,
+            "skipped": dict(self.skipped),
+            "list_calls": self.list_calls,
+            "change_calls": self.change_calls,
+            "seconds": round(self.seconds, 3),
+            "records_per_second": round(self.adopted / self.seconds, 1) if self.seconds else 0.0,
+            "errors": self.errors,
+        }
+
+
+class _CallCounter:
+    """Counts the list calls of a zone stream"""
+
+    def __init__(self, report: AdoptReport):
+        self._report = report
+
+    async def __aenter__(self) -> None:
+        self._report.list_calls += 1
+
+    async def __aexit__(self, *exc_info) -> bool:
+        return False
+
+
+class ZoneAdopter:
+    """Adopts the records of a hosted zone as record objects"""
+
+    def __init__(
+        self,
+        config: Config,
+        hosted_zone_id: str,
+        namespace: str,
+        account: str | None = None,
+        concurrency: int = 16,
+        apply: ObjectApplier | None = None,
+        logger: Logger | None = None,
+    ):
+        """
+        Args:
+            config (Config): Operator config
+            hosted_zone_id (str): The hosted zone to adopt
+            namespace (str): Namespace to create the record objects in
+            account (str | None, optional): AWS account the hosted zone is in. Defaults to the operator's account.
+            concurrency (int, optional): Record objects applied at the same time. Defaults to 16.
+            apply (ObjectApplier | None, optional): Applies one record object. Defaults to server-side apply.
+            logger (Logger | None, optional): Python logger
+        """
+        self._config = config
+        self.hosted_zone_id = hosted_zone_id
+        self.namespace = namespace
+        self.account = account
+        self.concurrency = concurrency
+        self._apply = apply
+        self._logger = logger if logger is not None else getLogger(__name__)
+
+    async def adopt(self, accounts: AccountPool, dry_run: bool = False) -> AdoptReport:
+        """
+        Adopt every supported record in the zone that no operator claims
+
+        A record's claim comes after it in the zone, so each record is held until the stream passes the point where
+        its claim would be, and only then adopted.
+
+        Args:
+            accounts (AccountPool): Pool to make the calls with
+            dry_run (bool, optional): Only report what would be adopted. Defaults to False.
+
+        Returns:
+            AdoptReport: What was adopted
+        """
+        report = AdoptReport()
+        started = time.perf_counter()
+        apply = self._apply
+        executor = None
+        if apply is None and not dry_run:
+            api = kube_api()
+            executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="adopt")
+
+            def apply(obj: dict[str, Any]) -> None:
+                apply_object(api, obj)
+
+        slots = asyncio.Semaphore(self.concurrency)
+        applying: set[asyncio.Task] = set()
+        claims: ChangeBatchBuffer[str] = ChangeBatchBuffer()
+        held: dict[tuple[str, str], RecordBase] = {}
+        release_at: list[tuple[str, tuple[str, str]]] = []
+
+        async def release(record: RecordBase) -> None:
+            report.adopted += 1
+            if dry_run:
+                return
+            await slots.acquire()
+            task = asyncio.create_task(self._apply_record(apply, executor, record, report, accounts, claims))
+            task.add_done_callback(lambda _: slots.release())
+            applying.add(task)
+            task.add_done_callback(applying.discard)
+
+        try:
+            zone = ZoneCache(accounts)
+            async for record_set in zone.stream(self.hosted_zone_id, self.account, rate_limit=_CallCounter(report)):
+                report.record_sets += 1
+                sort_key = route53_sort_key(record_set["Name"])
+                while release_at and release_at[0][0] < sort_key:
+                    record = held.pop(heapq.heappop(release_at)[1], None)
+                    if record is not None:
+                        await release(record)
+                claim = parse_claim(record_set)
+                if claim is not None:
+                    if held.pop(claim[0], None) is not None:
+                        report.skipped["claimed"] += 1
+                    continue
+                record = self._record(record_set, report)
+                if record is not None:
+                    key = record_key(record_set["Name"], record_set["Type"])
+                    held[key] = record
+                    heapq.heappush(release_at, (sort_key + CLAIM_SORT_BOUND, key))
+            for _, key in sorted(release_at):
+                record = held.pop(key, None)
+                if record is not None:
+                    await release(record)
+            if applying:
+                await asyncio.gather(*applying)
+            if claims:
+                await self._claim(accounts, claims.flush(), report)
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False)
+        report.seconds = time.perf_counter() - started
+        self._logger.info(
+            "Adopted %s of %s record sets in %s with %s list calls",
+            report.adopted,
+            report.record_sets,
+            self.hosted_zone_id,
+            report.list_calls,
+        )
+        return report
+
+    def _record(self, record_set: dict[str, Any], report: AdoptReport) -> RecordBase | None:
+        """The record for a record set, None when it can't be adopted"""
+        schema = SCHEMAS.get(record_set["Type"])
+        if schema is None:
+            report.skipped[record_set["Type"]] += 1
+            return None
+        if "ResourceRecords" not in record_set:
+            report.skipped["alias"] += 1
+            return None
+        if schema is not SCHEMAS["A"] and len(record_set["ResourceRecords"]) > 1:
+            report.skipped[f"{record_set['Type']} with more than one value"] += 1
+            return None
+        try:
+            return schema.from_recordset(self.hosted_zone_id, record_set, account=self.account)
+        except ValidationError as exc:
+            report.invalid += 1
+            if len(report.errors) < REPORT_ERRORS:
+                report.errors.append(f"{record_set['Name']} {record_set['Type']}: {exc}")
+            return None
+
+    async def _apply_record(
+        self,
+        apply: ObjectApplier,
+        executor: ThreadPoolExecutor | None,
+        record: RecordBase,
+        report: AdoptReport,
+        accounts: AccountPool,
+        claims: ChangeBatchBuffer[str],
+    ) -> None:
+        """Apply the record object for a record, and only once it exists queue the record's claim"""
+        spec = json.loads(record.json(exclude_none=True))
+        obj = record_object(record, self.namespace, {ADOPTED_ANNOTATION: spec_hash(spec)})
+        try:
+            await asyncio.get_running_loop().run_in_executor(executor, apply, obj)
+        except Exception as exc:
+            report.adopted -= 1
+            report.invalid += 1
+            if len(report.errors) < REPORT_ERRORS:
+                report.errors.append(f"{record.name} {record._record_type}: {exc}")
+            return
+        if self._config.ownership_enabled:
+            # a claim without an object would make the record an orphan garbage collection deletes
+            claim = claim_record_set(record.name, record._record_type, self._config.ownership_owner_id)
+            full = claims.add(record.name, [{"Action": "CREATE", "ResourceRecordSet": claim}])
+            if full is not None:
+                await self._claim(accounts, full, report)
+
+    async def _claim(self, accounts: AccountPool, groups: list[tuple[str, list]], report: AdoptReport) -> None:
+        """Claim adopted records in one ChangeBatch, the claims Route53 rejects are kept in the report's errors"""
+        try:
+            await submit_changes(
+                accounts,
+                self.hosted_zone_id,
+                [change for _, group in groups for change in group],
+                comment=f"route53-operator claiming {len(groups)} adopted records",
+                account=self.account,
+            )
+        except Exception as exc:
+            report.change_calls += 1
+            if isinstance(exc, InvalidRecordChange) and error_code(exc) in REJECTED_BATCH_CODES and len(groups) > 1:
+                middle = len(groups) // 2
+                await self._claim(accounts, groups[:middle], report)
+                await self._claim(accounts, groups[middle:], report)
+                return
+            for name, _ in groups:
+                if len(report.errors) < REPORT_ERRORS:
+                    report.errors.append(f"{name}: could not claim the record: {exc}")
+            return
+        report.change_calls += 1
@@ -1,11 +1,398 @@
 """Methods related to AWS"""
+import asyncio
+import os
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from contextlib import AsyncExitStack
+from datetime import datetime
+from datetime import timezone
 from functools import lru_cache
+from logging import getLogger
+from logging import Logger
+from typing import Any
 
 from aiobotocore.session import AioSession
 from aiobotocore.session import get_session as aiobotocore_get_session
+from botocore.exceptions import UnknownServiceError
+from botocore.loaders import instance_cache
+from botocore.loaders import Loader
+
+from ..exceptions import UnknownAccountError
+from .config import Config
+from .circuit import CircuitBreaker
+from .ratelimit import FairTokenBucket
+
+# client kwargs that carry the operator's own credentials, these are never used for clients of an assumed role
+CREDENTIAL_KWARGS = ("aws_access_key_id", "aws_secret_access_key", "aws_session_token")
+# how long to wait before retrying a failed credential refresh
+REFRESH_RETRY_SECONDS = 30
+# the only services the operator makes clients for
+SERVICES = ("route53", "sts")
+# the data files creating and using a client of each service loads
+SERVICE_DATA = ("service-2", "endpoint-rule-set-1", "paginators-1")
+
+
+class ServiceDataLoader(Loader):
+    """
+    A botocore data loader that only knows about a few services
+
+    botocore finds a service by listing every one of the 350 or so service directories it ships, and keeps every
+    service of every partition from endpoints.json in memory. This loader lists only its own services and drops every
+    other service from the endpoints. One loader is shared by every session, so each model is read from disk once.
+    """
+
+    def __init__(self, services: tuple[str, ...] = SERVICES, **kwargs):
+        """
+        Args:
+            services (tuple[str, ...], optional): Services to load. Defaults to SERVICES.
+        """
+        super().__init__(**kwargs)
+        self.services = services
+
+    def list_available_services(self, type_name: str) -> list[str]:
+        """The loader's services that have type_name data, without listing every service botocore has"""
+        return [
+            service
+            for service in self.services
+            if any(os.path.isdir(os.path.join(path, service)) for path in self.search_paths)
+        ]
+
+    def load_service_model(self, service_name: str, type_name: str, api_version: str | None = None) -> Any:
+        """Load a service's data, raises UnknownServiceError for a service the loader doesn't know about"""
+        if service_name not in self.services:
+            raise UnknownServiceError(service_name=service_name, known_service_names=", ".join(self.services))
+        return super().load_service_model(service_name, type_name, api_version)
+
+    # cached under the same key as Loader's method, so only the slimmed endpoints are kept
+    @instance_cache
+    def load_data_with_path(self, name: str) -> tuple[Any, str]:
+        data, path = super().load_data_with_path(name)
+        if name == "endpoints":
+            data = {
+                **data,
+                "partitions": [
+                    {
+                        **partition,
+                        "services": {
+                            service: endpoints
+                            for service, endpoints in partition["services"].items()
+                            if service in self.services
+                        },
+                    }
+                    for partition in data["partitions"]
+                ],
+            }
+        return data, path
+
+    def preload(self, services: tuple[str, ...] = ("route53",)) -> None:
+        """Load everything creating a client of each of services loads, so the first client doesn't wait on disk"""
+        for name in ("endpoints", "partitions", "sdk-default-configuration", "_retry"):
+            self.load_data(name)
+        for service in services:
+            for type_name in SERVICE_DATA:
+                self.load_service_model(service, type_name)
+
+
+@lru_cache
+def get_data_loader() -> ServiceDataLoader:
+    """
+    Get the data loader shared by every session, used with an LRU Cache to return the same one every time its called
+
+    Every session makes a route53 client, so its data is preloaded. STS data is loaded by the first account with a role.
+    """
+    # the search paths botocore's own loader would have, see botocore.loaders.create_loader
+    data_path = os.environ.get("AWS_DATA_PATH")
+    paths = [os.path.expanduser(path) for path in data_path.split(os.pathsep)] if data_path else []
+    loader = ServiceDataLoader(extra_search_paths=paths)
+    loader.preload()
+    return loader
+
+
+def new_session() -> AioSession:
+    """A new aiobotocore session that loads its data with the shared data loader"""
+    session = aiobotocore_get_session()
+    session.register_component("data_loader", get_data_loader())
+    return session
 
 
 @lru_cache
 def get_session() -> AioSession:
     """Get an aiobotocore session, used with an LRU Cache to return the same session every time its called"""
-    return aiobotocore_get_session()
+    return new_session()
+
+
+class AWSAccount:
+    """
+    An AWS account the operator manages records in.
+
+    Each account has its own session, its own long lived route53 client and its own rate limit, shared between the
+    priority classes and the tenants of the calls. Accounts with a role_arn assume that role with STS. The assumed
+    role credentials are cached and refreshed by a background task before they expire, so a request never waits on
+    STS once the account is started.
+    """
+
+    def __init__(
+        self,
+        name: str | None,
+        config: Config,
+        role_arn: str | None = None,
+        session: AioSession | None = None,
+        logger: Logger | None = None,
+    ):
+        """
+        Args:
+            name (str | None): Name of the account, None for the operator's own credentials
+            config (Config): Operator config
+            role_arn (str | None, optional): IAM role to assume for this account. Defaults to None.
+            session (AioSession | None, optional): Session used for the operator's own credentials.
+                Defaults to the shared session.
+            logger (Logger | None, optional): Python logger
+        """
+        self.name = name
+        self.role_arn = role_arn
+        self.rate_limit = FairTokenBucket(
+            config.aws_requests_per_second,
+            config.aws_priority_weights,
+            tenant_weights=config.tenant_weights,
+            tenant_quotas=config.tenant_quotas,
+        )
+        self.credentials_expiration: datetime | None = None
+        # operation to its circuit, see lib.circuit
+        self.circuits: dict[str, CircuitBreaker] = {}
+        self._config = config
+        self._base_session = session if session is not None else get_session()
+        # an assumed role gets a session of its own so its credentials never leak into other accounts
+        self._session = new_session() if role_arn is not None else self._base_session
+        self._logger = logger if logger is not None else getLogger(__name__)
+        self._credentials = None
+        self._client = None
+        self._exit_stack: AsyncExitStack | None = None
+        self._refresh_task: asyncio.Task | None = None
+        self._start_lock = asyncio.Lock()
+
+    @property
+    def started(self) -> bool:
+        """Whether the account has a client ready for requests"""
+        return self._client is not None
+
+    async def start(self) -> None:
+        """Assume the account's role, if it has one, and open its route53 client"""
+        async with self._start_lock:
+            if self.started:
+                return
+            client_kwargs = self._config.aws_client_kwargs
+            if self.role_arn is not None:
+                await self._refresh_credentials()
+                client_kwargs = {k: v for k, v in client_kwargs.items() if k not in CREDENTIAL_KWARGS}
+                self._refresh_task = asyncio.create_task(self._refresh_credentials_loop())
+            self._exit_stack = AsyncExitStack()
+            self._client = await self._exit_stack.enter_async_context(
+                self._session.create_client("route53", **client_kwargs)
+            )
+
+    async def close(self) -> None:
+        """Stop refreshing credentials and close the account's client"""
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+        if self._exit_stack is not None:
+            await self._exit_stack.aclose()
+            self._exit_stack = None
+        self._client = None
+
+    def circuit(self, operation: str | None = None) -> CircuitBreaker | None:
+        """
+        The circuit of an operation, calls that don't name theirs share one
+
+        Returns:
+            CircuitBreaker | None: The circuit, None when circuit breaking is off
+        """
+        if not self._config.circuit_failure_threshold:
+            return None
+        operation = operation if operation is not None else "route53"
+        if operation not in self.circuits:
+            self.circuits[operation] = CircuitBreaker(
+                f"{operation} in account {self.name}",
+                self._config.circuit_failure_threshold,
+                self._config.circuit_open_seconds,
+                self._config.circuit_max_open_seconds,
+                self._config.circuit_half_open_calls,
+                logger=self._logger,
+            )
+        return self.circuits[operation]
+
+    @asynccontextmanager
+    async def client(self, operation: str | None = None) -> AsyncIterator[Any]:
+        """
+        Wait for the account's rate limit and yield its route53 client
+
+        The call made with the client counts towards the circuit of its operation, and fails fast while that is open.
+
+        Args:
+            operation (str | None, optional): The operation called, e.g. change_resource_record_sets
+
+        Raises:
+            CircuitOpenError: Raised when the circuit of the operation is open
+
+        Yields:
+            The account's aiobotocore route53 client
+        """
+        if not self.started:
+            await self.start()
+        circuit = self.circuit(operation)
+        probe = circuit.before_call() if circuit is not None else False
+        try:
+            await self.rate_limit.acquire()
+            yield self._client
+        except BaseException as exc:
+            if circuit is not None:
+                circuit.after_call(probe, exc)
+            raise
+        if circuit is not None:
+            circuit.after_call(probe)
+
+    async def _assume_role(self) -> dict[str, Any]:
+        """Assume the account's role with the operator's own credentials, returns the STS Credentials"""
+        # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/sts.html#STS.Client.assume_role
+        sts_kwargs = self._config.aws_client_kwargs
+        sts_kwargs.pop("endpoint_url", None)
+        if self._config.aws_sts_endpoint_url is not None:
+            sts_kwargs["endpoint_url"] = self._config.aws_sts_endpoint_url
+        async with self._base_session.create_client("sts", **sts_kwargs) as sts:
+            response = await sts.assume_role(
+                RoleArn=self.role_arn,
+                RoleSessionName=self._config.aws_role_session_name,
+                DurationSeconds=self._config.aws_assume_role_duration,
+            )
+        return response["Credentials"]
+
+    async def _refresh_credentials(self) -> None:
+        """Assume the role and swap the new credentials into the account's session"""
+        credentials = await self._assume_role()
+        if self._credentials is None:
+            self._session.set_credentials(
+                credentials["AccessKeyId"], credentials["SecretAccessKey"], credentials["SessionToken"]
+            )
+            # clients sign every request with the session's credentials object, updating it in place
+            # rotates the credentials of clients that are already open
+            self._credentials = await self._session.get_credentials()
+        else:
+            self._credentials.access_key = credentials["AccessKeyId"]
+            self._credentials.secret_key = credentials["SecretAccessKey"]
+            self._credentials.token = credentials["SessionToken"]
+        self.credentials_expiration = credentials["Expiration"]
+        self._logger.debug("Refreshed credentials for account %s, expire at %s", self.name, self.credentials_expiration)
+
+    def _seconds_until_refresh(self) -> float:
+        remaining = (self.credentials_expiration - datetime.now(timezone.utc)).total_seconds()
+        return max(remaining - self._config.aws_credential_refresh_margin, 0)
+
+    async def _refresh_credentials_loop(self) -> None:
+        """Refresh the credentials aws_credential_refresh_margin seconds before they expire"""
+        while True:
+            await asyncio.sleep(self._seconds_until_refresh())
+            try:
+                await self._refresh_credentials()
+            except Exception:
+                self._logger.exception("Unable to refresh credentials for account %s, retrying", self.name)
+                await asyncio.sleep(REFRESH_RETRY_SECONDS)
+
+
+class AccountPool:
+    """
+    A pool of the AWS accounts the operator manages records in.
+
+    The account named None uses the operator's own credentials, every other account is configured in
+    Config.aws_accounts as a map of account name to the IAM role to assume.
+    """
+
+    def __init__(self, config: Config, session: AioSession | None = None, logger: Logger | None = None):
+        """
+        Args:
+            config (Config): Operator config
+            session (AioSession | None, optional): Session for the operator's own credentials.
+                Defaults to the shared session.
+            logger (Logger | None, optional): Python logger
+        """
+        self._accounts = {None: AWSAccount(None, config, session=session, logger=logger)}
+        for name, role_arn in config.aws_accounts.items():
+            self._accounts[name] = AWSAccount(name, config, role_arn=role_arn, session=session, logger=logger)
+
+    def account(self, name: str | None = None) -> AWSAccount:
+        """
+        Get an account by name
+
+        Args:
+            name (str | None, optional): Name of the account. Defaults to None, the operator's own credentials.
+
+        Raises:
+            UnknownAccountError: Raised when the account is not configured
+
+        Returns:
+            AWSAccount: The account
+        """
+        try:
+            return self._accounts[name]
+        except KeyError:
+            raise UnknownAccountError(f"AWS account {name} is not configured") from None
+
+    def tenant_stats(self) -> dict[str, dict[str, dict[str, float]]]:
+        """
+        The calls every tenant has waiting for each account, was granted, and how long they waited
+
+        Returns:
+            dict[str, dict[str, dict[str, float]]]: Account name to tenant to its stats, the operator's own
+                credentials are the empty account name and the operator's own work the empty tenant
+        """
+        return {name or "": account.rate_limit.tenant_stats() for name, account in self._accounts.items()}
+
+    async def start(self) -> None:
+        """Start every account, so that no request has to wait for STS"""
+        await asyncio.gather(*(account.start() for account in self._accounts.values()))
+
+    async def close(self) -> None:
+        """Close every account"""
+        await asyncio.gather(*(account.close() for account in self._accounts.values()))
+
+    @asynccontextmanager
+    async def client(self, account: str | None = None, operation: str | None = None) -> AsyncIterator[Any]:
+        """
+        Wait for an account's rate limit and yield its route53 client
+
+        Args:
+            account (str | None, optional): Name of the account. Defaults to None, the operator's own credentials.
+            operation (str | None, optional): The operation called, for its circuit, e.g. change_resource_record_sets
+
+        Raises:
+            CircuitOpenError: Raised when the circuit of the operation is open
+
+        Yields:
+            The account's aiobotocore route53 client
+        """
+        async with self.account(account).client(operation) as client:
+            yield client
+
+    def circuit_states(self) -> dict[str, dict[str, str]]:
+        """
+        The state of the circuit of every operation called
+
+        Returns:
+            dict[str, dict[str, str]]: Account name to operation to its state, the operator's own credentials are the
+                empty account name
+        """
+        return {
+            name or "": {operation: circuit.state for operation, circuit in account.circuits.items()}
+            for name, account in self._accounts.items()
+        }
+
+    async def __aenter__(self) -> "AccountPool":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.close()
+
+
+@lru_cache
+def get_account_pool(config: Config) -> AccountPool:
+    """Get the account pool for a config, used with an LRU Cache to return the same pool every time its called"""
+    return AccountPool(config)
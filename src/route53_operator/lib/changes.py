@@ -0,0 +1,224 @@
+"""Helpers for Route53 ChangeBatches
+
+https://docs.aws.amazon.com/Route53/latest/DeveloperGuide/DNSLimitations.html#limits-api-requests-changeresourcerecordsets
+"""
+import asyncio
+import time
+from typing import Any
+from typing import Generic
+from typing import TypeVar
+
+from botocore import exceptions as botocore_exceptions
+
+from ..exceptions import InvalidRecordChange
+
+# A ChangeBatch can hold at most 1000 ResourceRecord elements and 32000 characters across all Value elements.
+# UPSERTs count twice against both limits.
+MAX_BATCH_RECORDS = 1000
+MAX_BATCH_VALUE_CHARS = 32000
+
+# error codes Route53 rejects a ChangeBatch with when its content doesn't match the zone, e.g. a DELETE of a record
+# that is gone or whose values changed. Nothing in the batch is applied.
+REJECTED_BATCH_CODES = ("InvalidChangeBatch", "InvalidInput")
+
+Change = dict[str, Any]
+K = TypeVar("K")
+
+
+def normalize_name(name: str) -> str:
+    """Normalize a record name the way Route53 stores it, lower case and fully qualified"""
+    name = name.lower()
+    return name if name.endswith(".") else f"{name}."
+
+
+def normalize_zone_id(hosted_zone_id: str) -> str:
+    """A hosted zone id without the /hostedzone/ prefix some API responses carry"""
+    return hosted_zone_id.rsplit("/", 1)[-1]
+
+
+def record_key(name: str, record_type: str) -> tuple[str, str]:
+    """The (name, type) key of a record set"""
+    return normalize_name(name), record_type
+
+
+def route53_sort_key(name: str) -> str:
+    """
+    The key Route53 sorts record sets by, the name with its labels reversed
+
+    list_resource_record_sets returns www.example.com. as com.example.www. in ASCII order. The trailing dot is part of
+    the key, it sorts a-b.example.com. before a.example.com.
+    """
+    return ".".join(reversed(normalize_name(name)[:-1].split("."))) + "."
+
+
+def change_weight(change: Change) -> tuple[int, int]:
+    """The number of records and value characters a change counts for against the ChangeBatch limits"""
+    records = change["ResourceRecordSet"].get("ResourceRecords", [])
+    multiplier = 2 if change["Action"] == "UPSERT" else 1
+    return max(len(records), 1) * multiplier, sum(len(record["Value"]) for record in records) * multiplier
+
+
+def chunk_changes(
+    changes: list[Change], max_records: int = MAX_BATCH_RECORDS, max_chars: int = MAX_BATCH_VALUE_CHARS
+) -> list[list[Change]]:
+    """
+    Split changes into the fewest ChangeBatches that fit the Route53 limits, keeping their order
+
+    Args:
+        changes (list[Change]): The changes
+        max_records (int, optional): ResourceRecords allowed per batch. Defaults to MAX_BATCH_RECORDS.
+        max_chars (int, optional): Value characters allowed per batch. Defaults to MAX_BATCH_VALUE_CHARS.
+
+    Returns:
+        list[list[Change]]: Lists of changes, each fits in one ChangeBatch
+    """
+    batches = chunk_change_groups([[change] for change in changes], max_records=max_records, max_chars=max_chars)
+    return [[group[0] for group in batch] for batch in batches]
+
+
+def chunk_change_groups(
+    groups: list[list[Change]], max_records: int = MAX_BATCH_RECORDS, max_chars: int = MAX_BATCH_VALUE_CHARS
+) -> list[list[list[Change]]]:
+    """
+    Split groups of changes into the fewest ChangeBatches that fit the Route53 limits, never splitting a group
+
+    Used for changes that have to be applied together, like a record and its ownership claim.
+
+    Args:
+        groups (list[list[Change]]): The groups of changes
+        max_records (int, optional): ResourceRecords allowed per batch. Defaults to MAX_BATCH_RECORDS.
+        max_chars (int, optional): Value characters allowed per batch. Defaults to MAX_BATCH_VALUE_CHARS.
+
+    Returns:
+        list[list[list[Change]]]: Lists of groups, each fits in one ChangeBatch
+    """
+    batches = []
+    current: list[list[Change]] = []
+    records = chars = 0
+    for group in groups:
+        weights = [change_weight(change) for change in group]
+        group_records = sum(weight[0] for weight in weights)
+        group_chars = sum(weight[1] for weight in weights)
+        if current and (records + group_records > max_records or chars + group_chars > max_chars):
+            batches.append(current)
+            current, records, chars = [], 0, 0
+        current.append(group)
+        records += group_records
+        chars += group_chars
+    if current:
+        batches.append(current)
+    return batches
+
+
+class ChangeBatchBuffer(Generic[K]):
+    """
+    Collects groups of changes from a stream until the next group would not fit in the ChangeBatch
+
+    Each group is kept whole and carries a key, e.g. the record it changes. Memory is bounded by one ChangeBatch.
+    """
+
+    def __init__(self, max_records: int = MAX_BATCH_RECORDS, max_chars: int = MAX_BATCH_VALUE_CHARS):
+        self._max_records = max_records
+        self._max_chars = max_chars
+        self._groups: list[tuple[K, list[Change]]] = []
+        self._records = self._chars = 0
+
+    def __len__(self) -> int:
+        return len(self._groups)
+
+    def add(self, key: K, changes: list[Change]) -> list[tuple[K, list[Change]]] | None:
+        """
+        Add a group of changes
+
+        Returns:
+            list[tuple[K, list[Change]]] | None: The groups collected so far when the new group did not fit with
+                them, they make a full ChangeBatch to send. None while there is room.
+        """
+        weights = [change_weight(change) for change in changes]
+        records = sum(weight[0] for weight in weights)
+        chars = sum(weight[1] for weight in weights)
+        full = None
+        if self._groups and (self._records + records > self._max_records or self._chars + chars > self._max_chars):
+            full = self.flush()
+        self._groups.append((key, changes))
+        self._records += records
+        self._chars += chars
+        return full
+
+    def flush(self) -> list[tuple[K, list[Change]]]:
+        """Take every group collected so far"""
+        groups = self._groups
+        self._groups = []
+        self._records = self._chars = 0
+        return groups
+
+
+def error_code(exc: Exception) -> str | None:
+    """The AWS error code behind an exception, following the chain of causes"""
+    while exc is not None:
+        if isinstance(exc, botocore_exceptions.ClientError):
+            return exc.response.get("Error", {}).get("Code")
+        exc = exc.__cause__
+    return None
+
+
+async def submit_changes(
+    accounts, hosted_zone_id: str, changes: list[Change], comment: str = "", account: str | None = None
+) -> dict[str, Any]:
+    """
+    Submit changes to a hosted zone as one ChangeBatch
+
+    Args:
+        accounts (AccountPool): Pool to make the call with
+        hosted_zone_id (str): The Route53 hosted zone id
+        changes (list[Change]): The changes, must fit in one ChangeBatch
+        comment (str, optional): Comment for the ChangeBatch. Defaults to "".
+        account (str | None, optional): AWS account the hosted zone is in. Defaults to the operator's account.
+
+    Raises:
+        InvalidRecordChange: Raised when Route53 rejects the ChangeBatch
+
+    Returns:
+        dict[str, Any]: the ChangeInfo from the AWS API
+    """
+    # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/route53.html#Route53.Client.change_resource_record_sets
+    async with accounts.client(account, "change_resource_record_sets") as client:
+        try:
+            response = await client.change_resource_record_sets(
+                HostedZoneId=hosted_zone_id,
+                ChangeBatch={"Comment": comment, "Changes": changes},
+            )
+        except botocore_exceptions.ClientError as exc:
+            raise InvalidRecordChange("Invalid record change") from exc
+    return response["ChangeInfo"]
+
+
+async def wait_for_insync(
+    accounts, change_id: str, account: str | None = None, poll_interval: float = 5, timeout: float = 300
+) -> dict[str, Any]:
+    """
+    Poll get_change until a change is INSYNC
+
+    Args:
+        accounts (AccountPool): Pool to make the calls with
+        change_id (str): Id from the ChangeInfo of the change
+        account (str | None, optional): AWS account the change was made in. Defaults to the operator's account.
+        poll_interval (float, optional): Seconds between polls. Defaults to 5.
+        timeout (float, optional): Seconds to wait before giving up. Defaults to 300.
+
+    Raises:
+        asyncio.TimeoutError: Raised when the change is not INSYNC after timeout seconds
+
+    Returns:
+        dict[str, Any]: The final ChangeInfo
+    """
+    # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/route53.html#Route53.Client.get_change
+    deadline = time.monotonic() + timeout
+    while True:
+        async with accounts.client(account, "get_change") as client:
+            response = await client.get_change(Id=change_id)
+        if response["ChangeInfo"]["Status"] == "INSYNC":
+            return response["ChangeInfo"]
+        if time.monotonic() + poll_interval > deadline:
+            raise asyncio.TimeoutError(f"Change {change_id} was not INSYNC after {timeout} seconds")
+        await asyncio.sleep(poll_interval)
@@ -0,0 +1,150 @@
+"""Circuit breaking for calls to the AWS API
+
+During a Route53 incident every handler keeps retrying its calls, which piles up kopf retries and hammers an API that
+is already degraded. A CircuitBreaker watches the calls of one operation to one account instead:
+
+- closed: calls go through. circuit_failure_threshold failures in a row of the kinds an outage causes, throttling,
+  5xx errors, timeouts and connection errors, open it.
+- open: calls fail at once with a CircuitOpenError, without a request, until the open period passed. The period
+  doubles every time the circuit opens again before it closed, up to circuit_max_open_seconds.
+- half open: circuit_half_open_calls probe calls go through at a time and the others fail at once. A probe that
+  succeeds closes the circuit, one that fails opens it again.
+
+Errors that are answers, like an InvalidChangeBatch, show the API works and count as successes. The retry delay of a
+call that failed at once is spread over the open period, so the retries of every handler don't arrive together when
+the circuit closes.
+"""
+import asyncio
+import random
+import time
+from collections.abc import Callable
+from logging import getLogger
+from logging import Logger
+
+from botocore import exceptions as botocore_exceptions
+
+from ..exceptions import CircuitOpenError
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+# error codes Route53 answers with when it can't serve a call, rather than because the call is wrong
+# https://docs.aws.amazon.com/Route53/latest/APIReference/CommonErrors.html
+OUTAGE_CODES = ("Throttling", "ThrottlingException", "ServiceUnavailable", "InternalFailure", "RequestTimeout")
+OUTAGE_EXCEPTIONS = (botocore_exceptions.ConnectionError, botocore_exceptions.HTTPClientError, asyncio.TimeoutError)
+
+
+def is_outage(exc: BaseException | None) -> bool:
+    """Whether an error is one an outage of the API causes, following the chain of causes"""
+    while exc is not None:
+        if isinstance(exc, botocore_exceptions.ClientError):
+            status = exc.response.get("ResponseMetadata", {}).get("HTTPStatusCode", 0)
+            return exc.response.get("Error", {}).get("Code") in OUTAGE_CODES or status >= 500
+        if isinstance(exc, OUTAGE_EXCEPTIONS):
+            return True
+        exc = exc.__cause__
+    return False
+
+
+class CircuitBreaker:
+    """Fails the calls of one operation to one account fast while the API fails them anyway"""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int,
+        open_seconds: float,
+        max_open_seconds: float,
+        half_open_calls: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+        logger: Logger | None = None,
+    ):
+        """
+        Args:
+            name (str): Name of the circuit in errors and logs, e.g. <operation> in account <account>
+            failure_threshold (int): Failures in a row that open the circuit
+            open_seconds (float): Seconds the circuit stays open the first time
+            max_open_seconds (float): Seconds the circuit stays open at most
+            half_open_calls (int, optional): Probe calls let through at a time while half open. Defaults to 1.
+            clock (Callable[[], float], optional): Monotonic clock. Defaults to time.monotonic.
+            logger (Logger | None, optional): Python logger
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.half_open_calls = half_open_calls
+        self.state = CLOSED
+        # failures in a row while closed
+        self.failures = 0
+        # times opened since the circuit last closed
+        self.opened = 0
+        self._clock = clock
+        self._logger = logger if logger is not None else getLogger(__name__)
+        self._open_until = 0.0
+        self._period = open_seconds
+        self._probes = 0
+
+    def retry_after(self) -> float:
+        """Seconds a call that failed fast should be retried after, spread over the open period"""
+        remaining = max(self._open_until - self._clock(), 0)
+        return remaining + random.uniform(0, self._period)  # nosec B311
+
+    def before_call(self) -> bool:
+        """
+        Let a call through, or fail it fast
+
+        Raises:
+            CircuitOpenError: Raised when the circuit is open, or half open with every probe taken
+
+        Returns:
+            bool: Whether the call is a probe, it is passed to after_call
+        """
+        if self.state == OPEN:
+            if self._clock() < self._open_until:
+                raise CircuitOpenError(f"Circuit for {self.name} is open", self.retry_after())
+            self.state = HALF_OPEN
+            self._logger.info("Circuit for %s is half open, probing", self.name)
+        if self.state == HALF_OPEN:
+            if self._probes >= self.half_open_calls:
+                raise CircuitOpenError(f"Circuit for {self.name} is half open", self.retry_after())
+            self._probes += 1
+            return True
+        return False
+
+    def after_call(self, probe: bool, exc: BaseException | None = None) -> None:
+        """
+        Count the outcome of a call that was let through
+
+        Args:
+            probe (bool): Whether the call was a probe, as before_call returned
+            exc (BaseException | None, optional): The error the call failed with. Defaults to None, it succeeded.
+        """
+        if probe:
+            self._probes -= 1
+        if is_outage(exc):
+            self._failure()
+        elif exc is None or isinstance(exc, Exception):
+            # a cancelled call says nothing about the API
+            self._success()
+
+    def _failure(self) -> None:
+        if self.state == OPEN:
+            return
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self._period = min(self.open_seconds * 2**self.opened, self.max_open_seconds)
+            self._open_until = self._clock() + self._period
+            self.opened += 1
+            self.state = OPEN
+            self.failures = 0
+            self._logger.warning("Circuit for %s is open for %s seconds", self.name, self._period)
+
+    def _success(self) -> None:
+        self.failures = 0
+        if self.state == HALF_OPEN:
+            self.state = CLOSED
+            self.opened = 0
+            self._period = self.open_seconds
+            self._logger.info("Circuit for %s is closed", self.name)
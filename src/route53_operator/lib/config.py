@@ -1,11 +1,24 @@
 """Config for the Operator"""
 import os
 from functools import lru_cache
+from typing import Literal
+from typing import TYPE_CHECKING
 
-from aiobotocore.config import AioConfig
 from pydantic import AnyUrl
 from pydantic import BaseSettings
 from pydantic import Field
+from pydantic import PositiveFloat
+from pydantic.types import ConstrainedFloat
+
+if TYPE_CHECKING:  # pragma: no cover
+    from aiobotocore.config import AioConfig
+
+
+class Fraction(ConstrainedFloat):
+    """A float between 0 and 1"""
+
+    ge = 0
+    le = 1
 
 
 class Config(BaseSettings):
@@ -39,13 +52,214 @@ class Config(BaseSettings):
         None, description="The complete URL to use for the constructed client."
     )
 
+    # AWS transport profile
+    # botocore's defaults are tuned for interactive use, these are tuned for a long running controller
+    # https://botocore.amazonaws.com/v1/documentation/api/latest/reference/config.html
+    aws_max_pool_connections: int = Field(
+        50, ge=1, description="Maximum number of connections to keep in the connection pool of an AWS client"
+    )
+    aws_connect_timeout: float = Field(5, gt=0, description="Seconds to wait when opening a connection to AWS")
+    aws_read_timeout: float = Field(20, gt=0, description="Seconds to wait for a response from AWS")
+    aws_tcp_keepalive: bool = Field(True, description="Whether to enable TCP keepalive on AWS connections")
+    aws_keepalive_timeout: float | None = Field(
+        12,
+        gt=0,
+        description="Seconds an idle pooled connection is kept open. AWS closes idle connections after 20 seconds",
+    )
+    aws_retry_mode: Literal["legacy", "standard", "adaptive"] = Field(
+        "adaptive",
+        description="botocore retry mode. adaptive adds client side rate limiting when Route53 throttles",
+    )
+    aws_max_attempts: int = Field(
+        5, ge=1, description="Total number of attempts for an AWS request, including the initial attempt"
+    )
+
+    # AWS accounts
+    aws_accounts: dict[str, str] = Field(
+        {},
+        description="AWS accounts records can be managed in, a map of account name to the IAM role ARN to assume. "
+        + "Records name their account with spec.account and use the operator's own credentials when they don't",
+    )
+    aws_role_session_name: str = Field("route53-operator", description="Session name used when assuming roles")
+    aws_assume_role_duration: int = Field(
+        3600, ge=900, le=43200, description="Seconds that assumed role credentials are valid for"
+    )
+    aws_credential_refresh_margin: int = Field(
+        600, ge=0, description="Seconds before assumed role credentials expire that they are refreshed"
+    )
+    aws_sts_endpoint_url: AnyUrl | None = Field(None, description="The complete URL to use for STS clients")
+    aws_requests_per_second: float = Field(
+        5, gt=0, description="Requests per second allowed to each AWS account. Route53 allows 5 per account"
+    )
+    aws_priority_weights: dict[Literal["interactive", "resume", "drift", "gc"], PositiveFloat] = Field(
+        {"interactive": 8, "resume": 4, "drift": 2, "gc": 1},
+        description="Share of each account's requests per second that every class of work gets while several wait: "
+        + "creates, updates and deletes for users, resumes, drift correction of authoritative zones and garbage "
+        + "collection. A class that waits alone gets all of it",
+    )
+
+    # Tenant fair queuing
+    # the calls to each AWS account are shared between tenants, so a tenant applying thousands of records only slows
+    # itself down
+    tenant_label: str | None = Field(
+        None,
+        description="Label of record objects naming the tenant their calls are queued for. Objects without it, and "
+        + "every object when unset, are queued for their namespace",
+    )
+    tenant_weights: dict[str, PositiveFloat] = Field(
+        {},
+        description="Tenant to the calls it gets per turn while tenants wait for an account, tenants without one get 1",
+    )
+    tenant_quotas: dict[str, PositiveFloat] = Field(
+        {},
+        description="Tenant to the requests per second it may make to each AWS account at most, even when no other "
+        + "tenant waits. Tenants without one are not limited",
+    )
+    liveness_endpoint: str | None = Field(
+        None,
+        description="URL kopf serves its liveness probe at, e.g. http://0.0.0.0:8080/healthz. The probe reports the "
+        + "calls every tenant has waiting and how long they waited. Not served when unset",
+    )
+
+    # Circuit breaking
+    # calls of an operation to an account fail fast while Route53 fails them anyway, see lib.circuit
+    circuit_failure_threshold: int = Field(
+        5,
+        ge=0,
+        description="Failures in a row of an operation to an account, of the kinds an outage causes, that open its "
+        + "circuit. 0 turns circuit breaking off",
+    )
+    circuit_open_seconds: float = Field(
+        10,
+        gt=0,
+        description="Seconds a circuit stays open before probe calls are let through, doubled every time it opens "
+        + "again before it closed",
+    )
+    circuit_max_open_seconds: float = Field(300, gt=0, description="Seconds a circuit stays open at most")
+    circuit_half_open_calls: int = Field(
+        1, ge=1, description="Probe calls let through at a time by a half open circuit"
+    )
+
+    # Route53 changes
+    # https://docs.aws.amazon.com/Route53/latest/APIReference/API_GetChange.html
+    delete_batch_window: float = Field(
+        1, ge=0, description="Seconds deletes to a hosted zone are collected for before they are sent in one ChangeBatch"
+    )
+    read_batch_window: float = Field(
+        0.05,
+        ge=0,
+        description="Seconds to collect record reads for a hosted zone before answering them with as few list calls "
+        + "as cover them, 0 reads every record on its own",
+    )
+    change_wait_for_insync: bool = Field(
+        True, description="Whether to wait for batched changes to be INSYNC before their objects are released"
+    )
+    change_poll_interval: float = Field(5, gt=0, description="Seconds between get_change polls for INSYNC")
+    change_insync_timeout: float = Field(300, gt=0, description="Seconds to wait for a change to be INSYNC")
+
+    # Record ownership
+    ownership_enabled: bool = Field(
+        False,
+        description="Whether to claim the records the operator creates with TXT records, and refuse to change records "
+        + "it has no claim on",
+    )
+    ownership_owner_id: str = Field(
+        "default", description="Owner written in claims. Operators sharing a hosted zone need different owners"
+    )
+    ownership_adopt_unowned: bool = Field(
+        False, description="Whether records that exist without a claim can be taken over, e.g. when turning ownership on"
+    )
+
+    # Orphan garbage collection
+    gc_interval: float = Field(
+        0, ge=0, description="Seconds between garbage collections of orphaned records, 0 turns garbage collection off"
+    )
+    gc_dry_run: bool = Field(True, description="Whether garbage collection only reports orphans instead of deleting")
+    gc_rate_fraction: float = Field(
+        0.2, gt=0, le=1, description="Fraction of each account's aws_requests_per_second garbage collection may use"
+    )
+    gc_max_api_calls: int = Field(1000, ge=1, description="Route53 calls a single garbage collection may make")
+    gc_hosted_zones: list[str] = Field(
+        [],
+        description="Hosted zones to garbage collect even when no records in them exist, as <zone id> or "
+        + "<account>:<zone id>. Zones with records are always collected",
+    )
+
+    # Authoritative zones
+    authoritative_zones: list[str] = Field(
+        [],
+        description="Hosted zones that belong entirely to the cluster, as <zone id> or <account>:<zone id>. Each is "
+        + "reconciled as a whole against every record object and RecordSet in it, and records no object manages are "
+        + "deleted, except the SOA and NS records of the zone apex. Record objects in them are not read on resume",
+    )
+    authoritative_interval: float = Field(300, gt=0, description="Seconds between reconciles of authoritative zones")
+    authoritative_dry_run: bool = Field(
+        False, description="Whether reconciles of authoritative zones only report the changes they would make"
+    )
+
+    # Debounced updates
+    update_quiet_period: float = Field(
+        0,
+        ge=0,
+        description="Seconds the spec of a record object has to stay unchanged before an update is applied, so a burst "
+        + "of edits is one change. 0 applies every update right away",
+    )
+    update_max_delay: float = Field(10, gt=0, description="Seconds an update is held back for a quiet spec at most")
+
+    # Conflicts between record objects
+    conflict_retry_delay: float = Field(
+        60, gt=0, description="Seconds before retrying a record object that conflicts with another one for its record"
+    )
+
+    # Zone state
+    zone_state_path: str | None = Field(
+        None,
+        description="SQLite file zone snapshots are persisted to, e.g. on an emptyDir or PVC volume, so a restart "
+        + "doesn't list every zone again. Not persisted when unset",
+    )
+
+    change_journal_path: str | None = Field(
+        None,
+        description="File every ChangeBatch is journaled to before it is sent, replayed on startup to finish the "
+        + "batches a crash interrupted. Not journaled when unset",
+    )
+
+    # Logging
+    log_level: Literal["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"] = Field(
+        "INFO", description="Lowest level logged"
+    )
+    log_format: Literal["json", "text"] = Field("json", description="Log one JSON object per line, or plain text")
+    log_sample_rates: dict[str, Fraction] = Field(
+        {},
+        description="Logger name to the fraction of its debug records to keep, between 0 and 1, e.g. "
+        + "{'route53_operator.crud': 0.01}. Loggers under a name share its rate",
+    )
+    log_queue_size: int = Field(
+        10000, ge=1, description="Records waiting to be written at most, later ones are dropped instead of waiting"
+    )
+
+    # Kubernetes Events
+    # https://kopf.readthedocs.io/en/stable/configuration/#logging-events
+    event_log_level: Literal["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"] = Field(
+        "ERROR",
+        description="Handler log messages at or above this level are also posted as Events, one Event per message. "
+        + "Applied, drifted, conflict and throttled transitions are always posted, aggregated",
+    )
+    event_flush_interval: float = Field(5, gt=0, description="Seconds transition Events are aggregated for")
+    event_object_rate: float = Field(0.1, gt=0, description="Transition Events posted per second for one object")
+    event_object_burst: int = Field(3, ge=1, description="Transition Events one object may post at once")
+    event_rate: float = Field(5, gt=0, description="Transition Events posted per second for every object together")
+    event_max_pending: int = Field(
+        10000, ge=1, description="Distinct transition Events held back at most, later ones are dropped"
+    )
+
     class Config:
         """Pydantic base setting config"""
 
         env_prefix = os.environ.get("CONFIG_PREFIX", "")
 
     @property
-    def aws_client_kwargs(self) -> dict[str, str | bool | AnyUrl | AioConfig]:
+    def aws_client_kwargs(self) -> "dict[str, str | bool | AnyUrl | AioConfig]":
         """
         Convert our config settings into keyword arguments for creating an Aiobotocore AWS client
 
@@ -86,7 +300,7 @@ def get_config() -> Config:
     return Config()
 
 
-def _build_botoconfig(config: "Config") -> AioConfig:
+def _build_botoconfig(config: "Config") -> "AioConfig":
     """
     Converts config settings into a botoconfig object
 
@@ -116,4 +330,19 @@ def _build_botoconfig(config: "Config") -> AioConfig:
             proxies_config[var.lstrip("aws_")] = getattr(config, var)
     if len(proxies_config.keys()) > 0:
         config_kwargs["proxies"] = proxies_config
-    return AioConfig(**config_kwargs)
+    transport_vars = {
+        "aws_max_pool_connections": "max_pool_connections",
+        "aws_connect_timeout": "connect_timeout",
+        "aws_read_timeout": "read_timeout",
+        "aws_tcp_keepalive": "tcp_keepalive",
+    }
+    for var, kwarg in transport_vars.items():
+        config_kwargs[kwarg] = getattr(config, var)
+    config_kwargs["retries"] = {
+        "mode": config.aws_retry_mode,
+        "total_max_attempts": config.aws_max_attempts,
+    }
+    # botocore takes a tenth of a second to import, the import and adopt commands only need it once they call AWS
+    from aiobotocore.config import AioConfig
+
+    return AioConfig(connector_args={"keepalive_timeout": config.aws_keepalive_timeout}, **config_kwargs)
@@ -0,0 +1,120 @@
+"""Record objects that claim the same Route53 record
+
+Nothing stops two record objects, e.g. in different namespaces, or a record object and an entry of a RecordSet, from
+naming the same hosted zone, name and type. With different values each reconcile overwrites the other and the two flap
+forever. The ConflictIndex maps every Route53 record to the objects that claim it, kept current from kopf's watch
+events, and picks a single winner per record: the oldest object, ties broken by namespace/name. Only the winner may
+write the record. The others are marked with a conflict status and retried until the winner goes away.
+"""
+from collections.abc import Iterable
+from collections.abc import Mapping
+from functools import lru_cache
+from logging import getLogger
+from logging import Logger
+from typing import Any
+
+from ..exceptions import RecordConflictError
+from ..schemas._base import RecordBase
+from ..schemas.v1 import RecordSet
+from .config import Config
+from .kube import live_records
+from .kube import LiveRecord
+
+ObjectKey = tuple[str, str]
+
+
+class ConflictIndex:
+    """The record objects claiming each Route53 record"""
+
+    def __init__(self, retry_delay: float = 60, logger: Logger | None = None):
+        """
+        Args:
+            retry_delay (float, optional): Seconds before an object that lost its record is retried. Defaults to 60.
+            logger (Logger | None, optional): Python logger
+        """
+        self.retry_delay = retry_delay
+        self._logger = logger if logger is not None else getLogger(__name__)
+        # record to the namespace/name of each object claiming it, and when the object was created
+        self._claims: dict[LiveRecord, dict[str, str]] = {}
+        # (kind, namespace/name) to the records the object claims, one for a record object, every entry of a RecordSet
+        self._records: dict[ObjectKey, set[LiveRecord]] = {}
+
+    def observe(
+        self, schema: type[RecordBase] | type[RecordSet], ref: str, spec: Mapping[str, Any], created: str = ""
+    ) -> None:
+        """
+        Note the records an object claims, replacing what it claimed before
+
+        Args:
+            schema (type[RecordBase] | type[RecordSet]): Schema of the object
+            ref (str): namespace/name of the object
+            spec (Mapping[str, Any]): Spec of the object
+            created (str, optional): creationTimestamp of the object. Defaults to "".
+        """
+        records = set(live_records(schema, spec))
+        key = (schema._kind, ref)
+        previous = self._records.get(key, set())
+        for record in previous - records:
+            self._release(key, record)
+        if not records:
+            self._records.pop(key, None)
+            return
+        self._records[key] = records
+        for record in records:
+            claims = self._claims.setdefault(record, {})
+            claims[ref] = created or claims.get(ref, "")
+            if len(claims) > 1 and record not in previous:
+                self._logger.warning(
+                    "%s record %s is claimed by %s", record.record_type, record.name, ", ".join(claims)
+                )
+
+    def forget(self, schema: type[RecordBase] | type[RecordSet], ref: str) -> None:
+        """Forget an object that is gone"""
+        key = (schema._kind, ref)
+        for record in self._records.pop(key, set()):
+            self._release(key, record)
+
+    def _release(self, key: ObjectKey, record: LiveRecord) -> None:
+        claims = self._claims.get(record, {})
+        claims.pop(key[1], None)
+        if not claims:
+            self._claims.pop(record, None)
+
+    def winner(self, record: LiveRecord) -> str | None:
+        """The object that may write a record, None when no object claims it"""
+        claims = self._claims.get(record)
+        if not claims:
+            return None
+        # timestamps are ISO 8601, objects without one sort last
+        return min(claims, key=lambda ref: (claims[ref] or "~", ref))
+
+    def lost(self, schema: type[RecordBase] | type[RecordSet], ref: str, spec: Mapping[str, Any]) -> list[LiveRecord]:
+        """The records of an object's spec that another object manages"""
+        return [record for record in live_records(schema, spec) if self.winner(record) not in (None, ref)]
+
+    def check(self, schema: type[RecordBase] | type[RecordSet], ref: str, spec: Mapping[str, Any]) -> None:
+        """
+        Check that an object may write its records
+
+        Raises:
+            RecordConflictError: Raised when an older object claims one of the records
+        """
+        lost = self.lost(schema, ref, spec)
+        if lost:
+            raise RecordConflictError(self.describe(lost))
+
+    def describe(self, records: Iterable[LiveRecord]) -> str:
+        """Which object manages each of some records, e.g. A record www.example.com. is managed by team-a/www"""
+        return "; ".join(
+            f"{record.record_type} record {record.name} is managed by {self.winner(record)}" for record in records
+        )
+
+    def conflicts(self) -> dict[LiveRecord, list[str]]:
+        """Every record claimed by more than one object, and the objects claiming it"""
+        return {record: sorted(claims) for record, claims in self._claims.items() if len(claims) > 1}
+
+
+@lru_cache
+def get_conflict_index(config: Config) -> ConflictIndex:
+    """Get the conflict index for a config, used with an LRU Cache to return the same index every time its called"""
+    return ConflictIndex(retry_delay=config.conflict_retry_delay)
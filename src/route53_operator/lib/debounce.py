@@ -0,0 +1,105 @@
+"""Coalescing of rapid spec edits to a record object
+
+CI pipelines often patch the same record object several times within seconds, and each patch would be an UPSERT of its
+own. kopf handles one object at a time and hands a handler the object as it was when the handler started, so the
+Debouncer waits for the spec to go quiet instead: after every update_quiet_period it reads the object again, and once
+its generation stopped changing, or update_max_delay passed, the latest spec is applied in one change.
+
+kopf then runs the update handler once more for the edits that arrived while it waited. The Debouncer remembers the
+spec it applied for each object, so that run finds nothing left to do and makes no call.
+"""
+import asyncio
+import time
+from collections.abc import Awaitable
+from collections.abc import Callable
+from collections.abc import Mapping
+from functools import lru_cache
+from logging import getLogger
+from logging import Logger
+from typing import Any
+
+from .config import Config
+from .kube import get_object
+from .kube import spec_hash
+
+# reads an object again: schema, namespace, name to the object, None when it is gone
+ObjectFetcher = Callable[[type, str, str], Awaitable[Mapping[str, Any] | None]]
+
+
+class Debouncer:
+    """Holds the updates of an object back until its spec is quiet, and applies the latest spec once"""
+
+    def __init__(
+        self,
+        quiet_period: float,
+        max_delay: float,
+        fetch: ObjectFetcher = get_object,
+        logger: Logger | None = None,
+    ):
+        """
+        Args:
+            quiet_period (float): Seconds an object's spec has to stay unchanged before it is applied, 0 turns it off
+            max_delay (float): Seconds an update is held back at most
+            fetch (ObjectFetcher, optional): Reads an object again. Defaults to reading it from the Kubernetes API.
+            logger (Logger | None, optional): Python logger
+        """
+        self.quiet_period = quiet_period
+        self.max_delay = max_delay
+        self._fetch = fetch
+        self._logger = logger if logger is not None else getLogger(__name__)
+        # uid of each object to the hash of the spec last applied for it
+        self._applied: dict[str, str] = {}
+        # edits folded into a later one
+        self.coalesced = 0
+
+    def applied(self, body: Mapping[str, Any], spec: Mapping[str, Any]) -> bool:
+        """Whether a spec is the one last applied for an object"""
+        return self._applied.get(body["metadata"].get("uid", "")) == spec_hash(spec)
+
+    def done(self, body: Mapping[str, Any], spec: Mapping[str, Any]) -> None:
+        """Note the spec applied for an object"""
+        self._applied[body["metadata"].get("uid", "")] = spec_hash(spec)
+
+    def forget(self, body: Mapping[str, Any]) -> None:
+        """Forget an object that is gone"""
+        self._applied.pop(body["metadata"].get("uid", ""), None)
+
+    async def settle(self, schema: type, body: Mapping[str, Any]) -> Mapping[str, Any]:
+        """
+        Wait until the spec of an object stopped changing
+
+        Args:
+            schema (type): Schema of the object
+            body (Mapping[str, Any]): Body of the object as the handler got it
+
+        Returns:
+            Mapping[str, Any]: The latest spec of the object
+        """
+        spec = body["spec"]
+        if self.quiet_period <= 0:
+            return spec
+        metadata = body["metadata"]
+        generation = metadata.get("generation")
+        deadline = time.monotonic() + self.max_delay
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return spec
+            await asyncio.sleep(min(self.quiet_period, remaining))
+            try:
+                latest = await self._fetch(schema, metadata.get("namespace"), metadata["name"])
+            except Exception:
+                # the spec the handler got is still a valid one to apply
+                self._logger.warning("Could not read %s again, applying its spec", metadata["name"], exc_info=True)
+                return spec
+            if latest is None or latest["metadata"].get("generation") == generation:
+                return spec
+            self.coalesced += 1
+            spec = latest["spec"]
+            generation = latest["metadata"].get("generation")
+
+
+@lru_cache
+def get_debouncer(config: Config) -> Debouncer:
+    """Get the debouncer for a config, used with an LRU Cache to return the same one every time its called"""
+    return Debouncer(config.update_quiet_period, config.update_max_delay)
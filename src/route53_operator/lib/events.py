@@ -0,0 +1,183 @@
+"""Kubernetes Events for the transitions of record objects
+
+kopf posts a Kubernetes Event for every message handlers log at or above its posting level, one API write per message.
+Handlers only record the transitions worth an Event instead: a record was applied, drifted from its spec, conflicts with
+another object, or was throttled by Route53. The EventAggregator collects them off the handler path, folds repeats of
+an Event for an object into one Event with a count, and posts them every event_flush_interval seconds. Each object and
+the operator as a whole are rate limited, Events over the limit wait for a later flush and keep counting.
+"""
+import asyncio
+from collections.abc import Callable
+from collections.abc import Mapping
+from dataclasses import dataclass
+from functools import lru_cache
+from logging import getLogger
+from logging import Logger
+from typing import Any
+
+from .. import kopf
+from .config import Config
+from .ratelimit import TokenBucket
+
+APPLIED = "Applied"
+DRIFTED = "Drifted"
+CONFLICT = "Conflict"
+THROTTLED = "Throttled"
+# the Event type of each transition
+TRANSITIONS = {APPLIED: "Normal", DRIFTED: "Warning", CONFLICT: "Warning", THROTTLED: "Warning"}
+# AWS error codes Route53 throttles with
+THROTTLED_CODES = ("Throttling", "PriorRequestNotComplete")
+
+# posts an Event for an object: object reference, type, reason, message
+EventPoster = Callable[[dict[str, Any], str, str, str], None]
+EventKey = tuple[str, str, str]
+
+
+def object_reference(body: Mapping[str, Any]) -> dict[str, Any]:
+    """The parts of an object's body an Event refers to it with, so the body itself isn't held on to"""
+    metadata = body.get("metadata", {})
+    return {
+        "apiVersion": body.get("apiVersion"),
+        "kind": body.get("kind"),
+        "metadata": {key: metadata[key] for key in ("name", "namespace", "uid") if key in metadata},
+    }
+
+
+def kopf_poster(reference: dict[str, Any], event_type: str, reason: str, message: str) -> None:
+    """Post an Event through kopf's event queue"""
+    kopf.event(reference, type=event_type, reason=reason, message=message)
+
+
+@dataclass
+class PendingEvent:
+    """An Event waiting to be posted, and how many times it happened"""
+
+    reference: dict[str, Any]
+    reason: str
+    message: str
+    count: int = 1
+
+    @property
+    def object_key(self) -> str:
+        metadata = self.reference["metadata"]
+        return metadata.get("uid") or f"{self.reference['kind']}/{metadata.get('namespace')}/{metadata['name']}"
+
+
+class EventAggregator:
+    """Aggregates and rate limits the transition Events of record objects"""
+
+    def __init__(self, config: Config, post: EventPoster | None = None, logger: Logger | None = None):
+        """
+        Args:
+            config (Config): Operator config
+            post (EventPoster | None, optional): Posts an Event. Defaults to posting through kopf.
+            logger (Logger | None, optional): Python logger
+        """
+        self._config = config
+        self._post = post if post is not None else kopf_poster
+        self._logger = logger if logger is not None else getLogger(__name__)
+        self._pending: dict[EventKey, PendingEvent] = {}
+        self._object_limits: dict[str, TokenBucket] = {}
+        # objects that are gone but still have Events pending, their rate limit is dropped once those are posted
+        self._forgotten: set[str] = set()
+        self._limit = TokenBucket(config.event_rate, config.event_rate * config.event_flush_interval)
+        self._flush: asyncio.Task | None = None
+        # Events recorded, posted, folded into an Event already pending, and dropped with too many pending
+        self.recorded = 0
+        self.posted = 0
+        self.folded = 0
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def record(self, body: Mapping[str, Any], reason: str, message: str) -> None:
+        """
+        Record a transition of an object, to be posted with the next flush
+
+        Args:
+            body (Mapping[str, Any]): Body of the object
+            reason (str): The transition, one of TRANSITIONS
+            message (str): What happened
+        """
+        if reason not in TRANSITIONS:
+            raise ValueError(f"{reason} is not a transition, expected one of {', '.join(TRANSITIONS)}")
+        self.recorded += 1
+        event = PendingEvent(object_reference(body), reason, message)
+        key = (event.object_key, reason, message)
+        self._forgotten.discard(event.object_key)
+        if key in self._pending:
+            self._pending[key].count += 1
+            self.folded += 1
+        elif len(self._pending) >= self._config.event_max_pending:
+            self.dropped += 1
+            return
+        else:
+            self._pending[key] = event
+        if self._flush is None:
+            self._flush = asyncio.create_task(self._flush_later())
+
+    def forget(self, body: Mapping[str, Any]) -> None:
+        """Drop the rate limit of an object that is gone, its pending Events are still posted"""
+        object_key = PendingEvent(object_reference(body), "", "").object_key
+        if any(event.object_key == object_key for event in self._pending.values()):
+            self._forgotten.add(object_key)
+        else:
+            self._object_limits.pop(object_key, None)
+
+    async def close(self) -> None:
+        """Stop flushing, and post what the rate limits allow of the Events still pending"""
+        if self._flush is not None:
+            self._flush.cancel()
+            self._flush = None
+        self.flush()
+
+    async def _flush_later(self) -> None:
+        """Flush every event_flush_interval seconds while Events are pending"""
+        try:
+            while self._pending:
+                await asyncio.sleep(self._config.event_flush_interval)
+                self.flush()
+        finally:
+            self._flush = None
+
+    def flush(self) -> int:
+        """
+        Post the pending Events the rate limits allow, the rest stay pending
+
+        Returns:
+            int: Events posted
+        """
+        posted = 0
+        for key, event in list(self._pending.items()):
+            if not self._limit.available():
+                # the operator is over its limit, everything left waits for the next flush
+                break
+            limit = self._object_limits.get(event.object_key)
+            if limit is None:
+                limit = TokenBucket(self._config.event_object_rate, self._config.event_object_burst)
+                self._object_limits[event.object_key] = limit
+            if not limit.try_acquire():
+                continue
+            self._limit.try_acquire()
+            del self._pending[key]
+            message = event.message if event.count == 1 else f"{event.message} ({event.count} times)"
+            try:
+                self._post(event.reference, TRANSITIONS[event.reason], event.reason, message)
+            except Exception:
+                self._logger.exception("Unable to post %s Event for %s", event.reason, event.object_key)
+                continue
+            posted += 1
+        self.posted += posted
+        if self._forgotten:
+            waiting = {event.object_key for event in self._pending.values()}
+            for object_key in self._forgotten - waiting:
+                self._object_limits.pop(object_key, None)
+            self._forgotten &= waiting
+        return posted
+
+
+@lru_cache
+def get_event_aggregator(config: Config) -> EventAggregator:
+    """Get the event aggregator for a config, used with an LRU Cache to return the same one every time its called"""
+    return EventAggregator(config)
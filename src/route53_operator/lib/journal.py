@@ -0,0 +1,355 @@
+"""Write-ahead journal of the ChangeBatches the operator sends
+
+Without a journal a crash between sending a ChangeBatch and kopf storing the handler's result leaves the operator unsure
+what reached Route53: the create handler runs again and fails on the record it already created, and the only way out is
+a full resync. With change_journal_path set every ChangeBatch is appended to a local file before it is sent, with the
+record objects it covers, and again once Route53 accepted it and once it is done.
+
+On startup replay() finishes whatever the journal has open, every batch at the same time. Batches Route53 accepted are
+polled with get_change until they are INSYNC. Batches that may never have reached Route53 are checked against a fresh
+listing of their zone, and only the changes the zone doesn't have yet are sent again. The record objects of every
+replayed batch are remembered, so their handlers pick up where they were instead of repeating the change. Replaying
+costs calls for the open batches only, however many record objects there are.
+
+A batch is only sent once its line is on disk. The lines written within one loop tick share a single fsync, which runs
+in a worker thread, so a burst of changes costs one fsync and the event loop never waits on the disk. Compacting the
+file rewrites it in a worker thread too, the lines written meanwhile are appended to the rewritten file.
+"""
+import asyncio
+import json
+import os
+import threading
+from collections.abc import Iterable
+from dataclasses import dataclass
+from dataclasses import field
+from functools import lru_cache
+from logging import getLogger
+from logging import Logger
+from typing import Any
+from typing import TextIO
+from uuid import uuid4
+
+from .aws import AccountPool
+from .changes import Change
+from .changes import normalize_zone_id
+from .changes import submit_changes
+from .changes import wait_for_insync
+from .config import Config
+from .zone_cache import ZoneCache
+from .zone_cache import ZoneKey
+from .zone_cache import ZoneSnapshot
+
+# outcomes of a finished batch
+DONE = "DONE"
+FAILED = "FAILED"
+
+
+@dataclass
+class JournalEntry:
+    """A ChangeBatch in the journal"""
+
+    batch_id: str
+    hosted_zone_id: str
+    account: str | None
+    changes: list[Change]
+    # namespace/name of the record objects the batch is for
+    refs: list[str] = field(default_factory=list)
+    change_id: str | None = None
+
+
+def reflected(snapshot: ZoneSnapshot, change: Change) -> bool:
+    """Whether a zone already has a change"""
+    record_set = change["ResourceRecordSet"]
+    current = snapshot.get(record_set["Name"], record_set["Type"])
+    if change["Action"] == "DELETE":
+        return current is None
+    if current is None:
+        return False
+    if "TTL" in record_set and current.get("TTL") != record_set["TTL"]:
+        return False
+    if "ResourceRecords" not in record_set:
+        return True
+    return sorted(rr["Value"] for rr in current.get("ResourceRecords", [])) == sorted(
+        rr["Value"] for rr in record_set["ResourceRecords"]
+    )
+
+
+def _intend_record(entry: JournalEntry) -> dict[str, Any]:
+    return {
+        "op": "intend",
+        "batch": entry.batch_id,
+        "zone": entry.hosted_zone_id,
+        "account": entry.account,
+        "changes": entry.changes,
+        "refs": entry.refs,
+    }
+
+
+class ChangeJournal:
+    """An append-only file of ChangeBatches, one JSON object per line"""
+
+    def __init__(self, path: str, compact_after: int = 10000, logger: Logger | None = None):
+        """
+        Args:
+            path (str): The journal file, created when it doesn't exist
+            compact_after (int, optional): Lines after which the finished batches are dropped from the file.
+                Defaults to 10000.
+            logger (Logger | None, optional): Python logger
+        """
+        self.path = path
+        self.compact_after = compact_after
+        self._logger = logger if logger is not None else getLogger(__name__)
+        self._open: dict[str, JournalEntry] = {}
+        # outcome of replayed batches by the record objects they were for
+        self._recovered: dict[str, str] = {}
+        self._lines = 0
+        # the fsync that the lines written in this loop tick wait for
+        self._syncing: asyncio.Task | None = None
+        # held while the file is synced in a worker thread, and while it is closed
+        self._file_lock = threading.Lock()
+        # the compaction rewriting the file, lines written meanwhile are carried over to the rewritten file
+        self._compacting: asyncio.Task | None = None
+        self._carried: list[str] | None = None
+        if os.path.exists(path):
+            self._read()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def _read(self) -> None:
+        with open(self.path, encoding="utf-8") as lines:
+            for line in lines:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # the operator died writing this line, the batch it was about is still open
+                    self._logger.warning("Skipping a partly written line in %s", self.path)
+                    continue
+                self._lines += 1
+                if record["op"] == "intend":
+                    self._open[record["batch"]] = JournalEntry(
+                        record["batch"], record["zone"], record["account"], record["changes"], record["refs"]
+                    )
+                elif record["op"] == "submitted" and record["batch"] in self._open:
+                    self._open[record["batch"]].change_id = record["change_id"]
+                elif record["op"] == "finish":
+                    self._open.pop(record["batch"], None)
+
+    def _write(self, record: dict[str, Any]) -> None:
+        line = json.dumps(record) + "\n"
+        self._lines += 1
+        if self._carried is not None:
+            self._carried.append(line)
+            return
+        self._file.write(line)
+        self._file.flush()
+
+    async def _sync(self) -> None:
+        """Wait until every line written so far is on disk"""
+        if self._carried is not None:
+            # the compaction syncs the carried lines with the rewritten file
+            await asyncio.shield(self._compacting)
+            return
+        if self._syncing is None:
+            self._syncing = asyncio.create_task(self._group_sync())
+        await asyncio.shield(self._syncing)
+
+    async def _group_sync(self) -> None:
+        # lines written later in this tick are covered too, lines written once the fsync started wait for the next one
+        await asyncio.sleep(0)
+        self._syncing = None
+        await asyncio.to_thread(self._fsync)
+
+    def _fsync(self) -> None:
+        with self._file_lock:
+            # a compaction or close in the meantime synced what is open
+            if not self._file.closed:
+                os.fsync(self._file.fileno())
+
+    async def intend(
+        self, hosted_zone_id: str, changes: list[Change], account: str | None = None, refs: Iterable[str] = ()
+    ) -> JournalEntry:
+        """
+        Journal a ChangeBatch before it is sent
+
+        Args:
+            hosted_zone_id (str): The Route53 hosted zone id
+            changes (list[Change]): The changes in the batch
+            account (str | None, optional): AWS account the hosted zone is in. Defaults to the operator's account.
+            refs (Iterable[str], optional): namespace/name of the record objects the batch is for. Defaults to ().
+
+        Returns:
+            JournalEntry: The journaled batch
+        """
+        entry = JournalEntry(uuid4().hex, normalize_zone_id(hosted_zone_id), account, changes, list(refs))
+        self._write(_intend_record(entry))
+        self._open[entry.batch_id] = entry
+        await self._sync()
+        return entry
+
+    async def submitted(self, entry: JournalEntry, change_id: str) -> None:
+        """Journal that Route53 accepted a batch"""
+        entry.change_id = change_id
+        self._write({"op": "submitted", "batch": entry.batch_id, "change_id": change_id})
+        await self._sync()
+
+    def finish(self, entry: JournalEntry, status: str = DONE) -> None:
+        """Journal that a batch is done or failed"""
+        # losing this line to a crash only means the batch is checked once more on replay, it isn't synced
+        self._write({"op": "finish", "batch": entry.batch_id, "status": status})
+        self._open.pop(entry.batch_id, None)
+        # open batches are rewritten by a compaction, only finished ones count towards the next
+        if self._compacting is None and self._lines - 2 * len(self._open) > self.compact_after:
+            self._compacting = asyncio.create_task(self._compact())
+
+    def pending(self) -> list[JournalEntry]:
+        """The batches that are not finished"""
+        return list(self._open.values())
+
+    def recovered(self, ref: str) -> str | None:
+        """
+        Take the outcome of a replayed batch for a record object
+
+        Returns:
+            str | None: DONE or FAILED, None when no replayed batch was for the object
+        """
+        return self._recovered.pop(ref, None)
+
+    async def compact(self) -> None:
+        """Rewrite the file with only the batches that are not finished"""
+        if self._compacting is None:
+            self._compacting = asyncio.create_task(self._compact())
+        await asyncio.shield(self._compacting)
+
+    async def _compact(self) -> None:
+        # the file is rewritten in a worker thread, lines written meanwhile are kept in memory and appended after
+        lines = []
+        for entry in self._open.values():
+            lines.append(json.dumps(_intend_record(entry)) + "\n")
+            if entry.change_id is not None:
+                submitted = {"op": "submitted", "batch": entry.batch_id, "change_id": entry.change_id}
+                lines.append(json.dumps(submitted) + "\n")
+        temporary = f"{self.path}.tmp"
+        self._carried = []
+        compacted = None
+        try:
+            try:
+                compacted = await asyncio.to_thread(open, temporary, "w", encoding="utf-8")
+                await asyncio.to_thread(self._append, compacted, lines)
+                lines.extend(await self._carry_over(compacted))
+                await asyncio.to_thread(os.replace, temporary, self.path)
+            except OSError:
+                self._logger.warning("Could not compact %s", self.path, exc_info=True)
+                if compacted is not None:
+                    await asyncio.to_thread(compacted.close)
+                # the file at the path is still the one written to before, the carried lines go there
+                await self._carry_over(self._file)
+                return
+            previous, self._file = self._file, compacted
+            # the rewritten file is at the path now, lines written since the last append go there too
+            lines.extend(await self._carry_over(compacted))
+            self._carried = None
+            self._lines = len(lines)
+            await asyncio.to_thread(self._close_file, previous, sync=False)
+        finally:
+            self._carried = None
+            self._compacting = None
+
+    async def _carry_over(self, file: TextIO) -> list[str]:
+        """Append and sync the lines written while compacting, until none are left"""
+        carried_over = []
+        while self._carried:
+            carried, self._carried = self._carried, []
+            carried_over.extend(carried)
+            await asyncio.to_thread(self._append, file, carried)
+        return carried_over
+
+    def _close_file(self, file: TextIO, sync: bool = True) -> None:
+        with self._file_lock:
+            if sync:
+                os.fsync(file.fileno())
+            file.close()
+
+    @staticmethod
+    def _append(file: TextIO, lines: list[str]) -> None:
+        file.write("".join(lines))
+        file.flush()
+        os.fsync(file.fileno())
+
+    async def close(self) -> None:
+        """Sync and close the journal file, once a running compaction is done"""
+        if self._compacting is not None:
+            await asyncio.shield(self._compacting)
+        await asyncio.to_thread(self._close_file, self._file)
+
+    async def replay(self, accounts: AccountPool, zone_cache: ZoneCache, config: Config) -> int:
+        """
+        Finish every open batch
+
+        Args:
+            accounts (AccountPool): Pool to make the calls with
+            zone_cache (ZoneCache): Zone cache, zones of batches that may not have reached Route53 are loaded fresh
+            config (Config): Operator config, for polling get_change
+
+        Returns:
+            int: Batches replayed
+        """
+        pending = self.pending()
+        # every zone with batches that may not have reached Route53 is listed once, and the batches are replayed at
+        # the same time, so a batch stuck waiting for INSYNC doesn't hold up the others
+        keys = list(
+            dict.fromkeys((entry.account, entry.hosted_zone_id) for entry in pending if entry.change_id is None)
+        )
+        snapshots = await asyncio.gather(
+            *(zone_cache.load(hosted_zone_id, account) for account, hosted_zone_id in keys), return_exceptions=True
+        )
+        listed = dict(zip(keys, snapshots))
+        await asyncio.gather(*(self._replay(entry, listed, accounts, zone_cache, config) for entry in pending))
+        if pending:
+            self._logger.info("Replayed %s open change batches from %s", len(pending), self.path)
+        await self.compact()
+        return len(pending)
+
+    async def _replay(
+        self,
+        entry: JournalEntry,
+        listed: dict[ZoneKey, ZoneSnapshot | BaseException],
+        accounts: AccountPool,
+        zone_cache: ZoneCache,
+        config: Config,
+    ) -> None:
+        """Finish one open batch"""
+        status = DONE
+        try:
+            if entry.change_id is None:
+                snapshot = listed[(entry.account, entry.hosted_zone_id)]
+                if isinstance(snapshot, BaseException):
+                    raise snapshot
+                missing = [change for change in entry.changes if not reflected(snapshot, change)]
+                if missing:
+                    change_info = await submit_changes(
+                        accounts,
+                        entry.hosted_zone_id,
+                        missing,
+                        comment=f"route53-operator replaying {len(missing)} changes",
+                        account=entry.account,
+                    )
+                    zone_cache.apply(entry.hosted_zone_id, missing, entry.account)
+                    await self.submitted(entry, change_info["Id"])
+            if entry.change_id is not None:
+                await wait_for_insync(
+                    accounts,
+                    entry.change_id,
+                    account=entry.account,
+                    poll_interval=config.change_poll_interval,
+                    timeout=config.change_insync_timeout,
+                )
+        except Exception:
+            self._logger.warning("Could not replay the changes to %s", entry.refs, exc_info=True)
+            status = FAILED
+        self.finish(entry, status)
+        for ref in entry.refs:
+            self._recovered[ref] = status
+
+@lru_cache
+def get_change_journal(config: Config) -> ChangeJournal | None:
+    """Get the change journal for a config, None when change_journal_path is not set"""
+    return ChangeJournal(config.change_journal_path) if config.change_journal_path is not None else None
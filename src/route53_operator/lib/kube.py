@@ -0,0 +1,196 @@
+"""Reads and writes the record objects in the cluster
+
+kopf only hands the operator the objects it is handling. Work that needs every record object at once, like garbage
+collection or adopting a zone, goes to the Kubernetes API with pykube, logged in the same way as kopf. pykube is only
+imported once a client is needed, writing record objects to YAML files doesn't need it.
+"""
+import asyncio
+import hashlib
+import json
+from collections.abc import Iterable
+from collections.abc import Mapping
+from typing import Any
+from typing import NamedTuple
+from typing import TYPE_CHECKING
+
+from ..schemas._base import RecordBase
+from ..schemas.v1 import ARecord
+from ..schemas.v1 import CNAMERecord
+from ..schemas.v1 import RecordSet
+from ..schemas.v1 import TXTRecord
+from .changes import normalize_name
+from .changes import normalize_zone_id
+
+if TYPE_CHECKING:  # pragma: no cover
+    import pykube
+
+RECORD_SCHEMAS = (ARecord, CNAMERecord, TXTRecord)
+# objects that manage records, a RecordSet manages one record per entry
+LIVE_SCHEMAS = (*RECORD_SCHEMAS, RecordSet)
+PLURALS = {schema._kind: schema._plural for schema in RECORD_SCHEMAS}
+FIELD_MANAGER = "route53-operator"
+# set on the objects r53operator adopt creates, see lib.adopt
+ADOPTED_ANNOTATION = "route53.dns/adopted"
+
+
+class LiveRecord(NamedTuple):
+    """The Route53 record a record object manages"""
+
+    account: str | None
+    hosted_zone_id: str
+    name: str
+    record_type: str
+
+
+def api_group(schema: type[RecordBase]) -> str:
+    """The API group of a record schema, matching its CRD"""
+    return ".".join(tuple(reversed(schema._namespace))[-2:])
+
+
+def object_name(record: RecordBase) -> str:
+    """The metadata.name of the record object for a record, e.g. www.example.com-a"""
+    return f"{record.name.rstrip('.').lower()}-{record._record_type.lower()}"
+
+
+def record_object(record: RecordBase, namespace: str, annotations: Mapping[str, str] | None = None) -> dict[str, Any]:
+    """The record object for a record, as it is sent to the Kubernetes API"""
+    metadata = {"name": object_name(record), "namespace": namespace}
+    if annotations:
+        metadata["annotations"] = dict(annotations)
+    return {
+        "apiVersion": f"{api_group(type(record))}/{record._version}",
+        "kind": record._kind,
+        "metadata": metadata,
+        "spec": json.loads(record.json(exclude_none=True)),
+    }
+
+
+def spec_hash(spec: Mapping[str, Any]) -> str:
+    """A hash of a record object's spec"""
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:32]
+
+
+def is_adopted(schema: type[RecordBase], spec: Mapping[str, Any], annotations: Mapping[str, str]) -> bool:
+    """Whether a record object was adopted from Route53 and its spec still matches the record it was adopted from"""
+    adopted = annotations.get(ADOPTED_ANNOTATION)
+    if adopted is None:
+        return False
+    return adopted == spec_hash(json.loads(schema(**spec).json(exclude_none=True)))
+
+
+def live_record(schema: type[RecordBase], spec: Mapping[str, Any]) -> LiveRecord | None:
+    """
+    The record a record object's spec manages
+
+    The spec is not validated, an object with an invalid spec still holds on to a record that was created before the
+    spec went bad.
+
+    Returns:
+        LiveRecord | None: The record, None when the spec doesn't name one
+    """
+    if not spec.get("hosted_zone_id") or not spec.get("name"):
+        return None
+    return LiveRecord(
+        spec.get("account"), normalize_zone_id(spec["hosted_zone_id"]), normalize_name(spec["name"]), schema._record_type
+    )
+
+
+def live_records(schema: type[RecordBase] | type[RecordSet], spec: Mapping[str, Any]) -> list[LiveRecord]:
+    """The records an object's spec manages, every entry of a RecordSet or the one record of a record object"""
+    if schema is not RecordSet:
+        record = live_record(schema, spec)
+        return [record] if record is not None else []
+    if not spec.get("hosted_zone_id"):
+        return []
+    return [
+        LiveRecord(
+            spec.get("account"), normalize_zone_id(spec["hosted_zone_id"]), normalize_name(entry["name"]), entry["type"]
+        )
+        for entry in spec.get("entries", [])
+        if entry.get("name") and entry.get("type")
+    ]
+
+
+def kube_api() -> "pykube.HTTPClient":
+    """A Kubernetes API client, from the service account in the cluster or the local kubeconfig"""
+    import pykube
+
+    return pykube.HTTPClient(pykube.KubeConfig.from_env())
+
+
+def _list_objects(schemas: Iterable[type[RecordBase] | type[RecordSet]]) -> list[tuple[type, dict[str, Any]]]:
+    import pykube
+
+    api = kube_api()
+    objects = []
+    for schema in schemas:
+        resource = pykube.object_factory(api, f"{api_group(schema)}/{schema._version}", schema._kind)
+        for obj in resource.objects(api).filter(namespace=pykube.all):
+            objects.append((schema, obj.obj))
+    return objects
+
+
+async def list_objects(
+    schemas: Iterable[type[RecordBase] | type[RecordSet]] = LIVE_SCHEMAS,
+) -> list[tuple[type, dict[str, Any]]]:
+    """
+    List every record object and RecordSet in the cluster, including objects that are being deleted
+
+    Returns:
+        list[tuple[type, dict[str, Any]]]: The schema of each object and the object
+    """
+    # pykube is synchronous, keep it off the event loop
+    return await asyncio.to_thread(_list_objects, tuple(schemas))
+
+
+def _get_object(schema: type, namespace: str, name: str) -> dict[str, Any] | None:
+    import pykube
+
+    api = kube_api()
+    resource = pykube.object_factory(api, f"{api_group(schema)}/{schema._version}", schema._kind)
+    try:
+        return resource.objects(api, namespace=namespace).get_by_name(name).obj
+    except pykube.exceptions.ObjectDoesNotExist:
+        return None
+
+
+async def get_object(schema: type, namespace: str, name: str) -> dict[str, Any] | None:
+    """
+    Read a record object or RecordSet from the Kubernetes API
+
+    Returns:
+        dict[str, Any] | None: The object, None when it doesn't exist
+    """
+    return await asyncio.to_thread(_get_object, schema, namespace, name)
+
+
+async def list_live_records(
+    schemas: Iterable[type[RecordBase] | type[RecordSet]] = LIVE_SCHEMAS,
+) -> list[LiveRecord]:
+    """
+    List the records managed by every record object and RecordSet in the cluster, including objects being deleted
+
+    Returns:
+        list[LiveRecord]: The records
+    """
+    objects = await list_objects(schemas)
+    return [record for schema, obj in objects for record in live_records(schema, obj.get("spec", {}))]
+
+
+def apply_object(api: "pykube.HTTPClient", obj: Mapping[str, Any], field_manager: str = FIELD_MANAGER) -> None:
+    """
+    Create or update an object with server-side apply, taking over the fields it sets
+
+    https://kubernetes.io/docs/reference/using-api/server-side-apply/
+    """
+    plural = PLURALS[obj["kind"]]
+    response = api.patch(
+        version=obj["apiVersion"],
+        namespace=obj["metadata"]["namespace"],
+        url=f"{plural}/{obj['metadata']['name']}",
+        params={"fieldManager": field_manager, "force": "true"},
+        # JSON is YAML, so the object can be sent as an apply patch as is
+        data=json.dumps(obj),
+        headers={"Content-Type": "application/apply-patch+yaml"},
+    )
+    api.raise_for_status(response)
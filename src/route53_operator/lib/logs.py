@@ -0,0 +1,149 @@
+"""Logging that never blocks the event loop
+
+Every handler runs on one asyncio loop, so a log call that writes to a slow stdout stalls all of them. The operator's
+handlers only put records on a bounded queue, a QueueListener thread formats and writes them. A full queue drops
+records instead of waiting, and counts them. Records are written as one JSON object per line, with the record, zone,
+change id and account a message is about as fields of their own, and the object a kopf handler logged for.
+
+High volume debug messages can be sampled per logger: log_sample_rates maps a logger name, and every logger under it,
+to the fraction of its debug records that are kept.
+"""
+import json
+import logging
+import math
+import queue
+import sys
+from collections import Counter
+from collections.abc import Mapping
+from datetime import datetime
+from datetime import timezone
+from logging.handlers import QueueHandler
+from logging.handlers import QueueListener
+from typing import Any
+
+from .config import Config
+
+# record attributes written as fields of their own when a log call sets them with extra=
+FIELDS = ("record", "record_type", "zone", "change_id", "account")
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s %(message)s"
+
+
+def log_fields(**fields: Any) -> dict[str, Any]:
+    """The extra= of a log call, without the fields that are None, e.g. log_fields(record=name, zone=zone_id)"""
+    unknown = set(fields) - set(FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown log fields {', '.join(sorted(unknown))}, expected {', '.join(FIELDS)}")
+    return {key: value for key, value in fields.items() if value is not None}
+
+
+class JSONFormatter(logging.Formatter):
+    """Formats a record as one line of JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        # kopf's object loggers set k8s_ref to the object being handled
+        ref = getattr(record, "k8s_ref", None)
+        if isinstance(ref, Mapping):
+            entry["object"] = f"{ref.get('namespace')}/{ref.get('name')}"
+        for key in FIELDS:
+            value = getattr(record, key, None)
+            if value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a fraction of the debug records of some loggers, every record at a higher level is kept"""
+
+    def __init__(self, rates: Mapping[str, float]):
+        """
+        Args:
+            rates (Mapping[str, float]): Logger name to the fraction of its debug records to keep, between 0 and 1
+        """
+        super().__init__()
+        # longest names first, so the most specific logger's rate wins
+        self._rates = sorted(rates.items(), key=lambda item: len(item[0]), reverse=True)
+        self._seen: Counter = Counter()
+        self.sampled_out = 0
+
+    def _rate(self, name: str) -> float:
+        for logger, rate in self._rates:
+            if name == logger or name.startswith(f"{logger}."):
+                return rate
+        return 1.0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        rate = self._rate(record.name)
+        if rate >= 1:
+            return True
+        # keep the n-th record of a logger when n * rate passes a whole number, so exactly rate of its records are
+        # kept, evenly spread instead of random
+        self._seen[record.name] += 1
+        seen = self._seen[record.name]
+        if math.floor(seen * rate) > math.floor((seen - 1) * rate):
+            return True
+        self.sampled_out += 1
+        return False
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """A QueueHandler that drops records when its queue is full instead of waiting"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Merge the message and arguments on the loop, formatting and writing is left to the listener"""
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        # kopf's object loggers attach the operator settings, they don't need to cross the queue
+        record.__dict__.pop("settings", None)
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup_logging(config: Config, stream=None) -> QueueListener:
+    """
+    Send every record through a bounded queue to a background thread that writes it
+
+    Args:
+        config (Config): Operator config
+        stream (optional): Where records are written. Defaults to stderr.
+
+    Returns:
+        QueueListener: The started listener, stop it to write the records left on the queue
+    """
+    writer = logging.StreamHandler(stream if stream is not None else sys.stderr)
+    writer.setFormatter(JSONFormatter() if config.log_format == "json" else logging.Formatter(TEXT_FORMAT))
+    handler = NonBlockingQueueHandler(queue.Queue(config.log_queue_size))
+    if config.log_sample_rates:
+        handler.addFilter(SamplingFilter(config.log_sample_rates))
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(config.log_level)
+    listener = QueueListener(handler.queue, writer, respect_handler_level=True)
+    listener.start()
+    return listener
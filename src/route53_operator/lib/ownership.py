@@ -0,0 +1,126 @@
+"""Ownership claims for records the operator manages
+
+Route53 records carry no metadata, so the operator marks every record it owns with a claim: a TXT record next to it,
+in the style of external-dns. The claim for the A record www.example.com. is the TXT record
+_r53op-a.www.example.com. with the value "heritage=route53-operator,route53-operator/owner=<owner id>". Record names
+can't start with an underscore, so a claim never collides with a record the operator manages.
+
+Claims are written in the same ChangeBatch as the record they claim, so a record and its claim always change together.
+A new claim is a CREATE, never an UPSERT, so two owners racing for a record can't both win: Route53 rejects the batch
+of the one whose snapshot didn't have the other's claim yet.
+Zone snapshots index the claims of a zone by (name, type), which makes checking ownership before a change a dict
+lookup instead of a read.
+"""
+from typing import Any
+from typing import TYPE_CHECKING
+
+from ..exceptions import RecordOwnershipError
+from .changes import Change
+from .changes import normalize_name
+from .changes import record_key
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .zone_cache import ZoneSnapshot
+
+CLAIM_PREFIX = "_r53op-"
+CLAIM_HERITAGE = "heritage=route53-operator"
+CLAIM_OWNER = "route53-operator/owner="
+CLAIM_TTL = 300
+# in Route53's order the claims of a name come after the name, and before the name followed by this
+CLAIM_SORT_BOUND = f"{CLAIM_PREFIX}~"
+
+
+def claim_name(name: str, record_type: str) -> str:
+    """The name of the claim TXT record for a record"""
+    return f"{CLAIM_PREFIX}{record_type.lower()}.{normalize_name(name)}"
+
+
+def claim_record_set(name: str, record_type: str, owner: str) -> dict[str, Any]:
+    """The claim TXT record set for a record"""
+    return {
+        "Name": claim_name(name, record_type),
+        "Type": "TXT",
+        "TTL": CLAIM_TTL,
+        "ResourceRecords": [{"Value": f'"{CLAIM_HERITAGE},{CLAIM_OWNER}{owner}"'}],
+    }
+
+
+def parse_claim(record_set: dict[str, Any]) -> tuple[tuple[str, str], str] | None:
+    """
+    Read a claim from a record set
+
+    Args:
+        record_set (dict[str, Any]): A record set from the AWS API
+
+    Returns:
+        tuple[tuple[str, str], str] | None: The (name, type) key of the claimed record and its owner, None when the
+            record set is not a claim
+    """
+    if record_set["Type"] != "TXT" or not record_set["Name"].startswith(CLAIM_PREFIX):
+        return None
+    claimed_type, _, claimed_name = record_set["Name"][len(CLAIM_PREFIX) :].partition(".")
+    for resource_record in record_set.get("ResourceRecords", []):
+        fields = resource_record["Value"].strip('"').split(",")
+        if fields[0] != CLAIM_HERITAGE:
+            continue
+        for value in fields[1:]:
+            if value.startswith(CLAIM_OWNER):
+                return record_key(claimed_name, claimed_type.upper()), value[len(CLAIM_OWNER) :]
+    return None
+
+
+def check_ownership(
+    snapshot: "ZoneSnapshot", name: str, record_type: str, owner: str, adopt_unowned: bool = False
+) -> bool:
+    """
+    Check that a record can be changed by an owner
+
+    Args:
+        snapshot (ZoneSnapshot): Snapshot of the record's zone
+        name (str): Name of the record
+        record_type (str): Type of the record
+        owner (str): The owner making the change
+        adopt_unowned (bool, optional): Whether a record without a claim can be taken over. Defaults to False.
+
+    Raises:
+        RecordOwnershipError: Raised when the record is owned by someone else, or exists without a claim
+
+    Returns:
+        bool: Whether the record still needs a claim for the owner
+    """
+    current = snapshot.owner(name, record_type)
+    if current is not None and current != owner:
+        raise RecordOwnershipError(f"{record_type} record {name} is owned by {current}")
+    if current is None and snapshot.get(name, record_type) is not None and not adopt_unowned:
+        raise RecordOwnershipError(f"{record_type} record {name} exists and is not managed by the operator")
+    return current is None
+
+
+def claim_changes(
+    snapshot: "ZoneSnapshot", change: Change, owner: str, adopt_unowned: bool = False
+) -> list[Change]:
+    """
+    The claim changes that go in the same ChangeBatch as a record change
+
+    Args:
+        snapshot (ZoneSnapshot): Snapshot of the record's zone
+        change (Change): The record change
+        owner (str): The owner making the change
+        adopt_unowned (bool, optional): Whether a record without a claim can be taken over. Defaults to False.
+
+    Raises:
+        RecordOwnershipError: Raised when the record is owned by someone else, or exists without a claim
+
+    Returns:
+        list[Change]: Changes to the claim of the record
+    """
+    record_set = change["ResourceRecordSet"]
+    needs_claim = check_ownership(snapshot, record_set["Name"], record_set["Type"], owner, adopt_unowned)
+    if change["Action"] == "DELETE":
+        # delete the claim exactly as it is in the zone, a record without one has nothing to delete
+        claim = snapshot.get(claim_name(record_set["Name"], record_set["Type"]), "TXT")
+        return [] if claim is None else [{"Action": "DELETE", "ResourceRecordSet": claim}]
+    if not needs_claim:
+        return []
+    # a CREATE, so Route53 rejects the batch when someone else claimed the record since the snapshot was loaded
+    return [{"Action": "CREATE", "ResourceRecordSet": claim_record_set(record_set["Name"], record_set["Type"], owner)}]
@@ -0,0 +1,345 @@
+"""Rate limiting for calls to the AWS API
+
+Route53 limits every AWS account to 5 requests per second across all of its hosted zones, so every call the
+operator makes to an account has to go through that account's limiter.
+
+Calls belong to a priority class: creates, updates and deletes made for users are interactive, and resumes, drift
+correction and garbage collection are background work that can wait. Calls also belong to a tenant, the team whose
+record objects they are made for, so one namespace applying thousands of records doesn't hold up everybody else's.
+Both are set with priority() and tenant() around the work and are inherited by the tasks it starts, so the code in
+between doesn't pass them along. The FairTokenBucket of each account shares its rate between the classes that wait by
+their weights, and within a class between the tenants that wait with deficit round robin.
+"""
+import asyncio
+import time
+from collections import Counter
+from collections import deque
+from collections.abc import Iterator
+from collections.abc import Mapping
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict
+from dataclasses import dataclass
+
+INTERACTIVE = "interactive"
+RESUME = "resume"
+DRIFT = "drift"
+GC = "gc"
+# priority classes, ties between them are broken in this order
+PRIORITY_CLASSES = (INTERACTIVE, RESUME, DRIFT, GC)
+
+_priority: ContextVar[str] = ContextVar("priority", default=INTERACTIVE)
+# the operator's own work, e.g. garbage collection, belongs to no tenant
+_tenant: ContextVar[str] = ContextVar("tenant", default="")
+
+
+@contextmanager
+def priority(name: str) -> Iterator[None]:
+    """
+    Make the calls within, and those of the tasks started within, in a priority class
+
+    Args:
+        name (str): The priority class
+    """
+    token = _priority.set(name)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> str:
+    """The priority class of the calls made now, interactive unless set with priority()"""
+    return _priority.get()
+
+
+@contextmanager
+def tenant(name: str) -> Iterator[None]:
+    """
+    Make the calls within, and those of the tasks started within, for a tenant
+
+    Args:
+        name (str): The tenant
+    """
+    token = _tenant.set(name)
+    try:
+        yield
+    finally:
+        _tenant.reset(token)
+
+
+def current_tenant() -> str:
+    """The tenant the calls made now are for, the empty string unless set with tenant()"""
+    return _tenant.get()
+
+
+class TokenBucket:
+    """
+    An asyncio token bucket.
+
+    Tokens refill continuously at `rate` per second up to `burst`. Waiters are served in the order they arrived.
+    """
+
+    def __init__(self, rate: float, burst: float | None = None):
+        """
+        Args:
+            rate (float): Tokens added per second
+            burst (float | None, optional): Maximum number of tokens held. Defaults to rate (one second of burst).
+        """
+        if rate <= 0:
+            raise ValueError("rate must be greater than 0")
+        self.rate = rate
+        self.burst = max(burst if burst is not None else rate, 1)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1) -> None:
+        """
+        Wait until `tokens` are available and take them
+
+        Args:
+            tokens (float, optional): Number of tokens to take. Defaults to 1.
+        """
+        async with self._lock:
+            self._refill()
+            while self._tokens < tokens:
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= tokens
+
+    def available(self, tokens: float = 1) -> bool:
+        """
+        Whether `tokens` could be taken now, without taking them
+
+        Args:
+            tokens (float, optional): Number of tokens. Defaults to 1.
+
+        Returns:
+            bool: Whether try_acquire would take the tokens
+        """
+        self._refill()
+        return not self._lock.locked() and self._tokens >= tokens
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """
+        Take `tokens` if they are available now, without waiting
+
+        Args:
+            tokens (float, optional): Number of tokens to take. Defaults to 1.
+
+        Returns:
+            bool: Whether the tokens were taken
+        """
+        if not self.available(tokens):
+            return False
+        self._tokens -= tokens
+        return True
+
+    async def __aenter__(self) -> "TokenBucket":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        return None
+
+
+@dataclass
+class TenantStats:
+    """The calls a tenant was granted and how long they waited for it"""
+
+    granted: float = 0
+    wait_seconds: float = 0
+    max_wait_seconds: float = 0
+
+
+class FairTokenBucket(TokenBucket):
+    """
+    A token bucket shared by priority classes with weighted fair queuing, and within a class by tenants with deficit
+    round robin.
+
+    While several classes wait, each gets tokens in proportion to its weight, so no class that waits is ever starved.
+    A class that was idle starts from the current virtual time instead of claiming the share it didn't use, so a new
+    interactive call waits for at most one call of a background sweep.
+
+    Within a class, the tenants that wait take turns. Each turn adds the tenant's weight to its deficit, and it is
+    served while its deficit covers its next call, so a tenant with thousands of calls queued only delays its own.
+    A tenant with a quota waits for its own token bucket before it queues. Waiters of a tenant are served in the order
+    they arrived.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        weights: Mapping[str, float] | None = None,
+        burst: float | None = None,
+        tenant_weights: Mapping[str, float] | None = None,
+        tenant_quotas: Mapping[str, float] | None = None,
+    ):
+        """
+        Args:
+            rate (float): Tokens added per second
+            weights (Mapping[str, float] | None, optional): Weight of each priority class, classes without one weigh 1
+            burst (float | None, optional): Maximum number of tokens held. Defaults to rate (one second of burst).
+            tenant_weights (Mapping[str, float] | None, optional): Tokens each tenant gets per turn, tenants without
+                one get 1
+            tenant_quotas (Mapping[str, float] | None, optional): Tokens per second a tenant may take at most, tenants
+                without one are not limited
+        """
+        super().__init__(rate, burst)
+        self.weights = dict(weights) if weights is not None else {}
+        self.tenant_weights = dict(tenant_weights) if tenant_weights is not None else {}
+        self.tenant_quotas = dict(tenant_quotas) if tenant_quotas is not None else {}
+        self.granted: Counter[str] = Counter()
+        # priority class to tenant to the tokens, future and start of every waiter
+        self._waiters: dict[str, dict[str, deque[tuple[float, asyncio.Future, float]]]] = {}
+        # priority class to the tenants that wait in it, in the order they take turns
+        self._rings: dict[str, deque[str]] = {}
+        # priority class to the tenant whose turn it is
+        self._turns: dict[str, str | None] = {}
+        self._deficits: dict[tuple[str, str], float] = {}
+        self._quotas: dict[str, TokenBucket] = {}
+        self._tenants: dict[str, TenantStats] = {}
+        # virtual time the last grant of each class finished at
+        self._finish: dict[str, float] = {}
+        self._virtual_time = 0.0
+        self._dispatcher: asyncio.Task | None = None
+
+    def waiting(self) -> dict[str, int]:
+        """The number of waiters of every class"""
+        counts = {name: sum(len(queue) for queue in queues.values()) for name, queues in self._waiters.items()}
+        return {name: count for name, count in counts.items() if count}
+
+    def tenant_stats(self) -> dict[str, dict[str, float]]:
+        """The calls every tenant has waiting, was granted, and how long they waited"""
+        waiting: Counter[str] = Counter()
+        for queues in self._waiters.values():
+            for owner, queue in queues.items():
+                waiting[owner] += sum(not future.done() for _, future, _ in queue)
+        return {owner: {"waiting": waiting[owner], **asdict(stats)} for owner, stats in sorted(self._tenants.items())}
+
+    async def acquire(
+        self, tokens: float = 1, priority_class: str | None = None, tenant_name: str | None = None
+    ) -> None:
+        """
+        Wait until `tokens` are granted to a tenant in a priority class and take them
+
+        Args:
+            tokens (float, optional): Number of tokens to take. Defaults to 1.
+            priority_class (str | None, optional): The priority class. Defaults to the current one.
+            tenant_name (str | None, optional): The tenant. Defaults to the current one.
+        """
+        name = priority_class if priority_class is not None else current_priority()
+        owner = tenant_name if tenant_name is not None else current_tenant()
+        started = time.monotonic()
+        self._tenants.setdefault(owner, TenantStats())
+        if owner in self.tenant_quotas:
+            if owner not in self._quotas:
+                self._quotas[owner] = TokenBucket(self.tenant_quotas[owner])
+            await self._quotas[owner].acquire(tokens)
+        self._refill()
+        if self._dispatcher is None and self._tokens >= tokens:
+            self._grant(name, owner, tokens, started)
+            return
+        future = asyncio.get_running_loop().create_future()
+        queues = self._waiters.setdefault(name, {})
+        if owner not in queues:
+            queues[owner] = deque()
+            self._rings.setdefault(name, deque()).append(owner)
+        queues[owner].append((tokens, future, started))
+        if self._dispatcher is None:
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        await future
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """
+        Take `tokens` for the current priority class and tenant if they are available now and nobody waits
+
+        Args:
+            tokens (float, optional): Number of tokens to take. Defaults to 1.
+
+        Returns:
+            bool: Whether the tokens were taken
+        """
+        self._refill()
+        if self._dispatcher is not None or self._tokens < tokens:
+            return False
+        owner = current_tenant()
+        self._tenants.setdefault(owner, TenantStats())
+        self._grant(current_priority(), owner, tokens, time.monotonic())
+        return True
+
+    def _tag(self, name: str) -> tuple[float, int]:
+        """Virtual time the next grant of a class would finish at, the lowest is served first"""
+        tokens = self._waiters[name][self._rings[name][0]][0][0]
+        finish = max(self._virtual_time, self._finish.get(name, 0.0)) + tokens / self.weights.get(name, 1)
+        rank = PRIORITY_CLASSES.index(name) if name in PRIORITY_CLASSES else len(PRIORITY_CLASSES)
+        return finish, rank
+
+    def _next_tenant(self, name: str) -> str:
+        """The tenant of a class served next, deficit round robin"""
+        ring = self._rings[name]
+        while True:
+            owner = ring[0]
+            if self._turns.get(name) != owner:
+                self._turns[name] = owner
+                self._deficits[(name, owner)] = self._deficits.get((name, owner), 0) + self.tenant_weights.get(owner, 1)
+            if self._deficits[(name, owner)] >= self._waiters[name][owner][0][0]:
+                return owner
+            ring.rotate(-1)
+            self._turns[name] = None
+
+    def _prune(self, name: str) -> None:
+        """Drop the waiters of a class that were cancelled, and the tenants of it that no longer wait"""
+        queues = self._waiters[name]
+        for owner in list(queues):
+            queue = queues[owner]
+            while queue and queue[0][1].done():
+                queue.popleft()
+            if not queue:
+                # a tenant that stops waiting loses the rest of its deficit
+                del queues[owner]
+                self._rings[name].remove(owner)
+                self._deficits.pop((name, owner), None)
+                if self._turns.get(name) == owner:
+                    self._turns[name] = None
+
+    def _grant(self, name: str, owner: str, tokens: float, started: float) -> None:
+        self._tokens -= tokens
+        self._virtual_time = max(self._virtual_time, self._finish.get(name, 0.0))
+        self._finish[name] = self._virtual_time + tokens / self.weights.get(name, 1)
+        self.granted[name] += tokens
+        stats = self._tenants[owner]
+        waited = time.monotonic() - started
+        stats.granted += tokens
+        stats.wait_seconds += waited
+        stats.max_wait_seconds = max(stats.max_wait_seconds, waited)
+
+    async def _dispatch(self) -> None:
+        """Grant tokens to the waiters as they refill, until nobody waits"""
+        try:
+            while True:
+                for name in self._waiters:
+                    self._prune(name)
+                waiting = [name for name, queues in self._waiters.items() if queues]
+                if not waiting:
+                    return
+                name = min(waiting, key=self._tag)
+                owner = self._next_tenant(name)
+                tokens, future, started = self._waiters[name][owner][0]
+                self._refill()
+                if self._tokens < tokens:
+                    # a class more urgent than this one may start waiting meanwhile
+                    await asyncio.sleep((tokens - self._tokens) / self.rate)
+                    continue
+                self._waiters[name][owner].popleft()
+                self._deficits[(name, owner)] -= tokens
+                self._grant(name, owner, tokens, started)
+                future.set_result(None)
+        finally:
+            self._dispatcher = None
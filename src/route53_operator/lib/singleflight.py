@@ -0,0 +1,71 @@
+"""Concurrent identical calls share one call
+
+kopf runs many handlers at once, and after a restart or a burst of resumes several of them read the same record at the
+same moment. A SingleFlight lets the first caller for a key make the call while every other caller for that key waits
+for it, and hands all of them the same result or exception. Callers that arrive after the call finished make a new one,
+so nothing is cached.
+"""
+import asyncio
+from collections.abc import Awaitable
+from collections.abc import Callable
+from collections.abc import Hashable
+from functools import lru_cache
+from typing import Generic
+from typing import TypeVar
+
+from .config import Config
+
+T = TypeVar("T")
+
+
+class SingleFlight(Generic[T]):
+    """Deduplicates concurrent calls by key"""
+
+    def __init__(self):
+        self._flights: dict[Hashable, asyncio.Future] = {}
+        # calls asked for, and calls that waited on another caller's call
+        self.calls = 0
+        self.shared = 0
+
+    @property
+    def dedup_ratio(self) -> float:
+        """The fraction of calls that were answered by another caller's call"""
+        return self.shared / self.calls if self.calls else 0.0
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[T]]) -> T:
+        """
+        Make a call, or wait for the same call already in flight
+
+        Args:
+            key (Hashable): Identifies the call, calls with equal keys are the same call
+            call (Callable[[], Awaitable[T]]): Makes the call
+
+        Returns:
+            T: The result of the call
+        """
+        self.calls += 1
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.shared += 1
+        else:
+            # a task of its own, so a caller that is cancelled doesn't cancel the call for the others
+            flight = asyncio.ensure_future(call())
+            self._flights[key] = flight
+            flight.add_done_callback(lambda done: self._land(key, done))
+        return await asyncio.shield(flight)
+
+    def _land(self, key: Hashable, flight: asyncio.Future) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not flight.cancelled():
+            # mark the exception retrieved, every caller may have been cancelled
+            flight.exception()
+
+
+@lru_cache
+def get_read_flights(config: Config) -> SingleFlight:
+    """Get the reads in flight for a config, used with an LRU Cache to return the same one every time its called"""
+    return SingleFlight()
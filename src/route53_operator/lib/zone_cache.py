@@ -0,0 +1,295 @@
+"""In-memory snapshots of hosted zones
+
+A snapshot holds every record set in a hosted zone, keyed by (name, type), and indexes the ownership claims in the zone
+(see lib.ownership). Snapshots are loaded on demand by streaming list_resource_record_sets one page at a time, and kept
+current by applying the changes the operator makes.
+
+With a ZoneStore (see lib.zone_store) the snapshots are persisted as well. restore() loads every stored snapshot at
+startup without a call to Route53, and the first time a restored zone is used it is listed again in the background to
+catch up with changes made while the operator was down. Writes to the store run in a worker thread, so SQLite never
+blocks the event loop, and the changes applied within one loop tick are written in one transaction.
+"""
+import asyncio
+import sqlite3
+import time
+from collections.abc import AsyncIterator
+from collections.abc import Iterable
+from contextlib import nullcontext
+from functools import lru_cache
+from logging import getLogger
+from logging import Logger
+from typing import Any
+from typing import AsyncContextManager
+
+from .aws import AccountPool
+from .aws import get_account_pool
+from .changes import Change
+from .changes import normalize_zone_id
+from .changes import record_key
+from .config import Config
+from .ownership import parse_claim
+from .ratelimit import DRIFT
+from .ratelimit import priority
+from .zone_store import ZoneKey
+from .zone_store import ZoneStore
+
+
+class ZoneSnapshot:
+    """Every record set in a hosted zone, keyed by (name, type)"""
+
+    def __init__(self, hosted_zone_id: str, account: str | None = None):
+        self.hosted_zone_id = hosted_zone_id
+        self.account = account
+        self.loaded_at: float | None = None
+        # False for a snapshot restored from a ZoneStore until the zone is listed again
+        self.verified = True
+        self._record_sets: dict[tuple[str, str], dict[str, Any]] = {}
+        # (name, type) of claimed records to their owner
+        self._owners: dict[tuple[str, str], str] = {}
+
+    def __len__(self) -> int:
+        return len(self._record_sets)
+
+    def __contains__(self, key: tuple[str, str]) -> bool:
+        return record_key(*key) in self._record_sets
+
+    def get(self, name: str, record_type: str) -> dict[str, Any] | None:
+        """The record set for a name and type, None when the zone doesn't have it"""
+        return self._record_sets.get(record_key(name, record_type))
+
+    def owner(self, name: str, record_type: str) -> str | None:
+        """The owner that claims a record, None when it is not claimed"""
+        return self._owners.get(record_key(name, record_type))
+
+    def owners(self) -> dict[tuple[str, str], str]:
+        """Every claimed (name, type) in the zone and its owner"""
+        return self._owners
+
+    def put(self, record_set: dict[str, Any]) -> None:
+        """Store a record set"""
+        key = record_key(record_set["Name"], record_set["Type"])
+        self._unindex(self._record_sets.get(key))
+        self._record_sets[key] = record_set
+        claim = parse_claim(record_set)
+        if claim is not None:
+            self._owners[claim[0]] = claim[1]
+
+    def discard(self, name: str, record_type: str) -> None:
+        """Forget a record set"""
+        self._unindex(self._record_sets.pop(record_key(name, record_type), None))
+
+    def _unindex(self, record_set: dict[str, Any] | None) -> None:
+        claim = parse_claim(record_set) if record_set is not None else None
+        if claim is not None:
+            self._owners.pop(claim[0], None)
+
+    def apply(self, changes: Iterable[Change]) -> None:
+        """Apply changes that Route53 accepted"""
+        for change in changes:
+            record_set = change["ResourceRecordSet"]
+            if change["Action"] == "DELETE":
+                self.discard(record_set["Name"], record_set["Type"])
+            else:
+                self.put(record_set)
+
+    def record_sets(self) -> Iterable[dict[str, Any]]:
+        """Every record set in the snapshot"""
+        return self._record_sets.values()
+
+
+class ZoneCache:
+    """Snapshots of the hosted zones the operator manages, keyed by (account, hosted_zone_id without /hostedzone/)"""
+
+    def __init__(self, accounts: AccountPool, store: ZoneStore | None = None, logger: Logger | None = None):
+        """
+        Args:
+            accounts (AccountPool): Pool used to load zones
+            store (ZoneStore | None, optional): Persists the snapshots. Defaults to None.
+            logger (Logger | None, optional): Python logger
+        """
+        self._accounts = accounts
+        self._store = store
+        self._logger = logger if logger is not None else getLogger(__name__)
+        self._snapshots: dict[ZoneKey, ZoneSnapshot] = {}
+        self._load_locks: dict[ZoneKey, asyncio.Lock] = {}
+        self._verifying: dict[ZoneKey, asyncio.Task] = {}
+        # changes applied to each zone while it is listed, replayed onto the new snapshot
+        self._listing: dict[ZoneKey, list[Change]] = {}
+        # changes waiting to be written to the store, and the task writing them
+        self._unstored: list[tuple[str, list[Change], str | None]] = []
+        self._store_writer: asyncio.Task | None = None
+
+    def restore(self) -> int:
+        """
+        Load every snapshot in the store, each is listed from Route53 again the first time it is used
+
+        Returns:
+            int: Zones restored
+        """
+        if self._store is None:
+            return 0
+        restored = 0
+        for key in self._store.zones():
+            if key in self._snapshots:
+                continue
+            snapshot = ZoneSnapshot(key[1], key[0])
+            for record_set in self._store.record_sets(key[1], key[0]):
+                snapshot.put(record_set)
+            snapshot.verified = False
+            self._snapshots[key] = snapshot
+            restored += 1
+        self._logger.info("Restored %s zones from %s", restored, self._store.path)
+        return restored
+
+    async def close(self) -> None:
+        """Stop listing restored zones, write the changes still waiting for the store and close it"""
+        for task in self._verifying.values():
+            task.cancel()
+        await asyncio.gather(*self._verifying.values(), return_exceptions=True)
+        if self._store is not None:
+            await self.flush()
+            self._store.close()
+
+    async def flush(self) -> None:
+        """Wait until every applied change is written to the store"""
+        while self._store_writer is not None:
+            await asyncio.shield(self._store_writer)
+
+    def snapshot(self, hosted_zone_id: str, account: str | None = None) -> ZoneSnapshot | None:
+        """The loaded snapshot of a zone, None when it has not been loaded"""
+        return self._snapshots.get((account, normalize_zone_id(hosted_zone_id)))
+
+    async def stream(
+        self, hosted_zone_id: str, account: str | None = None, rate_limit: AsyncContextManager | None = None
+    ) -> AsyncIterator[dict[str, Any]]:
+        """
+        Yield every record set in a zone from Route53 in Route53's order, one page in memory at a time
+
+        Every page is its own rate limited call, so a large zone does not hog its account's budget.
+
+        Args:
+            hosted_zone_id (str): The Route53 hosted zone id
+            account (str | None, optional): AWS account the hosted zone is in. Defaults to the operator's account.
+            rate_limit (AsyncContextManager | None, optional): Entered for every page on top of the account's own
+                rate limit, e.g. a TokenBucket. Defaults to None.
+        """
+        # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/route53.html#Route53.Client.list_resource_record_sets
+        params = {"HostedZoneId": hosted_zone_id, "MaxItems": "300"}
+        while True:
+            async with rate_limit if rate_limit is not None else nullcontext():
+                async with self._accounts.client(account, "list_resource_record_sets") as client:
+                    response = await client.list_resource_record_sets(**params)
+            for record_set in response.get("ResourceRecordSets", []):
+                yield record_set
+            if not response.get("IsTruncated"):
+                return
+            params["StartRecordName"] = response["NextRecordName"]
+            params["StartRecordType"] = response["NextRecordType"]
+            if "NextRecordIdentifier" in response:
+                params["StartRecordIdentifier"] = response["NextRecordIdentifier"]
+            else:
+                params.pop("StartRecordIdentifier", None)
+
+    async def load(self, hosted_zone_id: str, account: str | None = None) -> ZoneSnapshot:
+        """
+        Load a fresh snapshot of a zone from Route53, concurrent loads of one zone share a single listing
+
+        Changes applied while the zone is listed may be on a page that was already listed, they are replayed onto the
+        new snapshot before it replaces the old one.
+
+        Returns:
+            ZoneSnapshot: The snapshot
+        """
+        key = (account, normalize_zone_id(hosted_zone_id))
+        lock = self._load_locks.setdefault(key, asyncio.Lock())
+        requested_at = time.monotonic()
+        async with lock:
+            existing = self._snapshots.get(key)
+            if existing is not None and existing.loaded_at is not None and existing.loaded_at >= requested_at:
+                return existing
+            snapshot = ZoneSnapshot(hosted_zone_id, account)
+            self._listing[key] = []
+            try:
+                async for record_set in self.stream(hosted_zone_id, account):
+                    snapshot.put(record_set)
+                snapshot.apply(self._listing[key])
+            finally:
+                del self._listing[key]
+            snapshot.loaded_at = time.monotonic()
+            self._snapshots[key] = snapshot
+            if self._store is not None:
+                record_sets = list(snapshot.record_sets())
+                drift = await asyncio.to_thread(self._store.replace, hosted_zone_id, record_sets, account)
+                if existing is not None and not existing.verified:
+                    self._logger.info("%s record sets in %s changed while it was stored", drift, hosted_zone_id)
+            return snapshot
+
+    async def get(self, hosted_zone_id: str, account: str | None = None) -> ZoneSnapshot:
+        """
+        The snapshot of a zone, loading it the first time it is asked for
+
+        A restored snapshot is returned as it is, and listed again in the background.
+        """
+        snapshot = self.snapshot(hosted_zone_id, account)
+        if snapshot is None:
+            return await self.load(hosted_zone_id, account)
+        if not snapshot.verified:
+            self._verify_later((account, normalize_zone_id(hosted_zone_id)))
+        return snapshot
+
+    def _verify_later(self, key: ZoneKey) -> None:
+        if key in self._verifying:
+            return
+        # the snapshot is already in use, listing it again is background work whoever asked for it
+        with priority(DRIFT):
+            task = asyncio.create_task(self.load(key[1], key[0]))
+        self._verifying[key] = task
+        task.add_done_callback(lambda _: self._verifying.pop(key, None))
+        task.add_done_callback(self._log_failed_verify)
+
+    def _log_failed_verify(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            self._logger.warning("Listing a restored zone failed, it is retried when next used: %s", task.exception())
+
+    def apply(self, hosted_zone_id: str, changes: Iterable[Change], account: str | None = None) -> None:
+        """
+        Apply changes Route53 accepted to the zone's snapshot, if it is loaded, and to the one being listed
+
+        Args:
+            hosted_zone_id (str): The Route53 hosted zone id
+            changes (Iterable[Change]): The accepted changes
+            account (str | None, optional): AWS account the hosted zone is in. Defaults to the operator's account.
+        """
+        changes = list(changes)
+        key = (account, normalize_zone_id(hosted_zone_id))
+        if key in self._listing:
+            self._listing[key].extend(changes)
+        snapshot = self._snapshots.get(key)
+        if snapshot is not None:
+            snapshot.apply(changes)
+            if self._store is not None:
+                self._unstored.append((hosted_zone_id, changes, account))
+                if self._store_writer is None:
+                    self._store_writer = asyncio.create_task(self._write_store())
+
+    async def _write_store(self) -> None:
+        """Write the changes applied since the last write in one transaction, until none are left"""
+        try:
+            while self._unstored:
+                # changes applied while a write runs go in the next one
+                await asyncio.sleep(0)
+                applied, self._unstored = self._unstored, []
+                try:
+                    await asyncio.to_thread(self._store.apply, applied)
+                except sqlite3.Error:
+                    # the zone is listed again the next time it is restored, which corrects the store
+                    self._logger.exception("Unable to store %s changes in %s", len(applied), self._store.path)
+        finally:
+            self._store_writer = None
+
+
+@lru_cache
+def get_zone_cache(config: Config) -> ZoneCache:
+    """Get the zone cache for a config, used with an LRU Cache to return the same cache every time its called"""
+    store = ZoneStore(config.zone_state_path) if config.zone_state_path is not None else None
+    return ZoneCache(get_account_pool(config), store)
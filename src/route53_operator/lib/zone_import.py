@@ -0,0 +1,238 @@
+"""Imports the records of a BIND zone file
+
+Record sets are parsed from the file as a stream, validated in batches through the record schemas, and then either
+written out as record objects in chunked YAML files, or upserted straight into Route53 in full ChangeBatches. Memory is
+bounded by one batch, however large the file is.
+"""
+import time
+from collections import Counter
+from collections.abc import Iterable
+from collections.abc import Iterator
+from dataclasses import dataclass
+from dataclasses import field
+from logging import getLogger
+from logging import Logger
+from pathlib import Path
+from typing import Any
+from typing import TYPE_CHECKING
+
+import yaml
+from pydantic import ValidationError
+
+from ..exceptions import RecordOwnershipError
+from ..schemas._base import RecordBase
+from ..schemas.v1 import ARecord
+from ..schemas.v1 import CNAMERecord
+from ..schemas.v1 import TXTRecord
+from .changes import ChangeBatchBuffer
+from .changes import submit_changes
+from .config import Config
+from .kube import record_object
+from .zonefile import parse_zone_file
+from .zonefile import ZoneRecordSet
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .aws import AccountPool
+
+SCHEMAS: dict[str, type[RecordBase]] = {schema._record_type: schema for schema in (ARecord, CNAMERecord, TXTRecord)}
+# errors kept in a report
+REPORT_ERRORS = 100
+
+
+@dataclass
+class ImportReport:
+    """What an import read and did"""
+
+    record_sets: int = 0
+    valid: int = 0
+    invalid: int = 0
+    skipped: Counter = field(default_factory=Counter)
+    files: int = 0
+    batches: int = 0
+    seconds: float = 0
+    errors: list[str] = field(default_factory=list)
+
+    @property
+    def records_per_second(self) -> float:
+        """Valid records imported per second"""
+        return self.valid / self.seconds if self.seconds else 0.0
+
+    def summary(self) -> dict[str, Any]:
+        """The report as a JSON compatible dict"""
+        return {
+            "record_sets": self.record_sets,
+            "valid": self.valid,
+            "invalid": self.invalid,
+            "skipped": dict(self.skipped),
+            "files": self.files,
+            "batches": self.batches,
+            "seconds": round(self.seconds, 3),
+            "records_per_second": round(self.records_per_second, 1),
+            "errors": self.errors,
+        }
+
+
+def record_spec(record_set: ZoneRecordSet, hosted_zone_id: str, account: str | None = None) -> dict[str, Any]:
+    """The spec of the record object for a record set from a zone file"""
+    spec = {"hosted_zone_id": hosted_zone_id, "name": record_set.name, "ttl": record_set.ttl}
+    if account is not None:
+        spec["account"] = account
+    # A records hold every address, the other schemas hold a single value
+    if record_set.record_type == "A":
+        spec["value"] = record_set.values
+    elif len(record_set.values) == 1:
+        spec["value"] = record_set.values[0]
+    else:
+        raise ValueError(f"{record_set.record_type} records with more than one value are not supported")
+    return spec
+
+
+class ZoneImporter:
+    """Imports the records of a BIND zone file into one hosted zone"""
+
+    def __init__(
+        self,
+        config: Config,
+        hosted_zone_id: str,
+        origin: str,
+        account: str | None = None,
+        default_ttl: int = 3600,
+        batch_size: int = 500,
+        logger: Logger | None = None,
+    ):
+        """
+        Args:
+            config (Config): Operator config
+            hosted_zone_id (str): The hosted zone to import into
+            origin (str): The zone's name, the origin of relative names in the file
+            account (str | None, optional): AWS account the hosted zone is in. Defaults to the operator's account.
+            default_ttl (int, optional): TTL of records the file gives none. Defaults to 3600.
+            batch_size (int, optional): Record sets validated at a time. Defaults to 500.
+            logger (Logger | None, optional): Python logger
+        """
+        self._config = config
+        self.hosted_zone_id = hosted_zone_id
+        self.origin = origin
+        self.account = account
+        self.default_ttl = default_ttl
+        self.batch_size = batch_size
+        self._logger = logger if logger is not None else getLogger(__name__)
+
+    def records(self, lines: Iterable[str], report: ImportReport) -> Iterator[list[RecordBase]]:
+        """
+        Parse and validate the records of a zone file in batches
+
+        Record sets of types the operator does not manage are counted as skipped, invalid ones are counted and their
+        errors kept in the report.
+
+        Yields:
+            list[RecordBase]: The valid records of each batch
+        """
+        batch: list[ZoneRecordSet] = []
+        for record_set in parse_zone_file(lines, self.origin, self.default_ttl):
+            report.record_sets += 1
+            if record_set.record_type not in SCHEMAS:
+                report.skipped[record_set.record_type] += 1
+                continue
+            batch.append(record_set)
+            if len(batch) >= self.batch_size:
+                yield self._validate(batch, report)
+                batch = []
+        if batch:
+            yield self._validate(batch, report)
+
+    def _validate(self, batch: list[ZoneRecordSet], report: ImportReport) -> list[RecordBase]:
+        valid = []
+        for record_set in batch:
+            try:
+                spec = record_spec(record_set, self.hosted_zone_id, self.account)
+                valid.append(SCHEMAS[record_set.record_type](**spec))
+            except (ValidationError, ValueError) as exc:
+                report.invalid += 1
+                if len(report.errors) < REPORT_ERRORS:
+                    report.errors.append(f"Line {record_set.line}: {record_set.name} {record_set.record_type}: {exc}")
+        report.valid += len(valid)
+        return valid
+
+    def write_objects(
+        self, lines: Iterable[str], output_dir: Path, namespace: str = "default", chunk_size: int = 500
+    ) -> ImportReport:
+        """
+        Write a record object for every valid record, chunk_size objects to a file
+
+        Args:
+            lines (Iterable[str]): Lines of the zone file
+            output_dir (Path): Directory to write records-0000.yaml, records-0001.yaml, ... to
+            namespace (str, optional): Namespace of the record objects. Defaults to "default".
+            chunk_size (int, optional): Record objects per file. Defaults to 500.
+
+        Returns:
+            ImportReport: What was imported
+        """
+        report = ImportReport()
+        started = time.perf_counter()
+        output_dir.mkdir(parents=True, exist_ok=True)
+        chunk: list[dict[str, Any]] = []
+        for records in self.records(lines, report):
+            for record in records:
+                chunk.append(record_object(record, namespace))
+                if len(chunk) >= chunk_size:
+                    self._write_chunk(output_dir, chunk, report)
+                    chunk = []
+        if chunk:
+            self._write_chunk(output_dir, chunk, report)
+        report.seconds = time.perf_counter() - started
+        return report
+
+    def _write_chunk(self, output_dir: Path, chunk: list[dict[str, Any]], report: ImportReport) -> None:
+        path = output_dir / f"records-{report.files:04d}.yaml"
+        with open(path, "w") as output:
+            yaml.safe_dump_all(chunk, output, sort_keys=False)
+        report.files += 1
+        self._logger.info("Wrote %s record objects to %s", len(chunk), path)
+
+    async def apply(self, lines: Iterable[str], accounts: "AccountPool") -> ImportReport:
+        """
+        Upsert every valid record into the hosted zone in full ChangeBatches
+
+        Records upserted straight into Route53 have no record object. With ownership enabled their claims would make
+        them orphans that garbage collection deletes, so importing straight into Route53 is refused then, write record
+        objects instead.
+
+        Args:
+            lines (Iterable[str]): Lines of the zone file
+            accounts (AccountPool): Pool to make the calls with
+
+        Raises:
+            RecordOwnershipError: Raised when ownership is enabled
+
+        Returns:
+            ImportReport: What was imported
+        """
+        if self._config.ownership_enabled:
+            raise RecordOwnershipError("Ownership is enabled, import the records as record objects instead of --apply")
+        report = ImportReport()
+        started = time.perf_counter()
+        buffer: ChangeBatchBuffer[str] = ChangeBatchBuffer()
+        for records in self.records(lines, report):
+            for record in records:
+                changes = [{"Action": "UPSERT", "ResourceRecordSet": record.recordset}]
+                full = buffer.add(record.name, changes)
+                if full is not None:
+                    await self._submit(accounts, full, report)
+        if buffer:
+            await self._submit(accounts, buffer.flush(), report)
+        report.seconds = time.perf_counter() - started
+        return report
+
+    async def _submit(self, accounts: "AccountPool", groups: list[tuple[str, list]], report: ImportReport) -> None:
+        changes = [change for _, group in groups for change in group]
+        await submit_changes(
+            accounts,
+            self.hosted_zone_id,
+            changes,
+            comment=f"route53-operator importing {len(groups)} records",
+            account=self.account,
+        )
+        report.batches += 1
+        self._logger.info("Upserted %s records into %s", len(groups), self.hosted_zone_id)
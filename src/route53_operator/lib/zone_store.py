@@ -0,0 +1,143 @@
+"""Zone snapshots persisted to a local SQLite file
+
+With zone_state_path set the zone cache writes every snapshot it loads and every change it applies to SQLite, so after a
+restart it starts from the zones it knew instead of listing each of them from Route53 again. Put the file on an emptyDir
+volume to survive container restarts, or a PVC to survive the pod.
+
+Each record set is stored with a hash of its JSON. Writing a fresh listing of a zone compares hashes and only touches
+the rows that changed, which also counts how far the stored zone drifted from Route53.
+
+The zone cache writes from a worker thread, so the connection is shared between threads and every call holds a lock.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections.abc import Iterable
+from typing import Any
+
+from .changes import Change
+from .changes import normalize_name
+from .changes import normalize_zone_id
+
+ZoneKey = tuple[str | None, str]
+
+
+def parse_zone_key(hosted_zone: str) -> ZoneKey:
+    """The key of a hosted zone named in the config, as <zone id> or <account>:<zone id>"""
+    account, _, hosted_zone_id = hosted_zone.rpartition(":")
+    return account or None, normalize_zone_id(hosted_zone_id)
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS zones (
+    account TEXT NOT NULL,
+    hosted_zone_id TEXT NOT NULL,
+    loaded_at REAL NOT NULL,
+    PRIMARY KEY (account, hosted_zone_id)
+);
+CREATE TABLE IF NOT EXISTS record_sets (
+    account TEXT NOT NULL,
+    hosted_zone_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    type TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    record_set TEXT NOT NULL,
+    PRIMARY KEY (account, hosted_zone_id, name, type)
+) WITHOUT ROWID;
+"""
+PUT_RECORD_SET = "INSERT OR REPLACE INTO record_sets VALUES (?, ?, ?, ?, ?, ?)"
+DELETE_RECORD_SET = "DELETE FROM record_sets WHERE account = ? AND hosted_zone_id = ? AND name = ? AND type = ?"
+
+
+def record_set_hash(record_set: dict[str, Any]) -> str:
+    """A hash of a record set"""
+    return hashlib.sha1(json.dumps(record_set, sort_keys=True).encode()).hexdigest()
+
+
+def _zone_row(account: str | None, hosted_zone_id: str) -> tuple[str, str]:
+    # NULLs are never equal in SQLite, so the operator's own account is stored as ""
+    return account or "", normalize_zone_id(hosted_zone_id)
+
+
+class ZoneStore:
+    """Zone snapshots in a SQLite file, keyed by (account, hosted_zone_id without /hostedzone/)"""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): The SQLite file, created when it doesn't exist
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        # the file only has to survive the operator crashing, not the node
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+    def close(self) -> None:
+        """Close the SQLite file"""
+        with self._lock:
+            self._db.close()
+
+    def zones(self) -> list[ZoneKey]:
+        """Every stored zone"""
+        with self._lock:
+            rows = self._db.execute("SELECT account, hosted_zone_id FROM zones ORDER BY loaded_at").fetchall()
+        return [(account or None, hosted_zone_id) for account, hosted_zone_id in rows]
+
+    def record_sets(self, hosted_zone_id: str, account: str | None = None) -> Iterable[dict[str, Any]]:
+        """Every stored record set in a zone"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT record_set FROM record_sets WHERE account = ? AND hosted_zone_id = ?",
+                _zone_row(account, hosted_zone_id),
+            ).fetchall()
+        return (json.loads(record_set) for (record_set,) in rows)
+
+    def replace(self, hosted_zone_id: str, record_sets: Iterable[dict[str, Any]], account: str | None = None) -> int:
+        """
+        Store a fresh listing of a zone
+
+        Returns:
+            int: Record sets that were added, changed or removed compared to the stored zone
+        """
+        zone = _zone_row(account, hosted_zone_id)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT name, type, hash FROM record_sets WHERE account = ? AND hosted_zone_id = ?", zone
+            )
+            stored = {(name, record_type): record_hash for name, record_type, record_hash in rows}
+            changed = []
+            for record_set in record_sets:
+                key = (normalize_name(record_set["Name"]), record_set["Type"])
+                record_hash = record_set_hash(record_set)
+                if stored.pop(key, None) != record_hash:
+                    changed.append((*zone, *key, record_hash, json.dumps(record_set)))
+            with self._db:
+                self._db.executemany(PUT_RECORD_SET, changed)
+                self._db.executemany(DELETE_RECORD_SET, [(*zone, *key) for key in stored])
+                self._db.execute("INSERT OR REPLACE INTO zones VALUES (?, ?, ?)", (*zone, time.time()))
+        return len(changed) + len(stored)
+
+    def apply(self, applied: Iterable[tuple[str, Iterable[Change], str | None]]) -> None:
+        """
+        Store changes Route53 accepted, in one transaction
+
+        Args:
+            applied (Iterable[tuple[str, Iterable[Change], str | None]]): (hosted_zone_id, changes, account) of every
+                accepted ChangeBatch, in the order they were accepted
+        """
+        with self._lock, self._db:
+            for hosted_zone_id, changes, account in applied:
+                zone = _zone_row(account, hosted_zone_id)
+                for change in changes:
+                    record_set = change["ResourceRecordSet"]
+                    key = (normalize_name(record_set["Name"]), record_set["Type"])
+                    if change["Action"] == "DELETE":
+                        self._db.execute(DELETE_RECORD_SET, (*zone, *key))
+                    else:
+                        row = (*zone, *key, record_set_hash(record_set), json.dumps(record_set))
+                        self._db.execute(PUT_RECORD_SET, row)
@@ -0,0 +1,194 @@
+"""A streaming parser for BIND zone files
+
+Reads a zone file one line at a time and yields its record sets, so memory does not grow with the size of the file.
+Supports $ORIGIN and $TTL, relative names and @, owners carried over from the previous record, parentheses spanning
+lines, quoted strings and comments. $INCLUDE and $GENERATE are not supported.
+
+The records of a record set are grouped when they are next to each other, the way named-compilezone and zone
+transfers write them. A record set whose records are split up by other records is an error: its first part may already
+be imported, and sending it again would drop the values of that part. Only the name and type of every record set seen
+are kept to find these.
+
+https://datatracker.ietf.org/doc/html/rfc1035#section-5
+"""
+import re
+from collections.abc import Iterable
+from collections.abc import Iterator
+from dataclasses import dataclass
+from dataclasses import field
+
+from ..exceptions import ZoneFileError
+from .changes import normalize_name
+
+CLASSES = ("IN", "CH", "HS", "CS")
+# record types whose data holds domain names that can be relative to the origin
+NAME_DATA_TYPES = ("CNAME", "NS", "PTR", "DNAME")
+TTL_UNITS = {"": 1, "s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+TTL_PATTERN = re.compile(r"^(\d+[smhdw]?)+$", re.IGNORECASE)
+TTL_PART_PATTERN = re.compile(r"(\d+)([smhdw]?)", re.IGNORECASE)
+
+
+@dataclass
+class ZoneRecordSet:
+    """The records of a name and type in a zone file"""
+
+    name: str
+    record_type: str
+    ttl: int
+    values: list[str] = field(default_factory=list)
+    line: int = 0
+
+
+def parse_ttl(value: str) -> int:
+    """Parse a TTL in seconds or BIND's units, e.g. 3600 or 1h"""
+    if not TTL_PATTERN.match(value):
+        raise ValueError(f"Invalid TTL {value}")
+    return sum(int(number) * TTL_UNITS[unit.lower()] for number, unit in TTL_PART_PATTERN.findall(value))
+
+
+def absolute_name(name: str, origin: str) -> str:
+    """Make a name from a zone file absolute, @ is the origin"""
+    if name == "@":
+        return origin
+    if name.endswith("."):
+        return normalize_name(name)
+    return normalize_name(f"{name}.{origin}")
+
+
+def _tokenize(line: str, depth: int, line_number: int) -> tuple[list[str], int]:
+    """Split a line into tokens, quoted strings keep their quotes. Returns the tokens and the parentheses depth"""
+    tokens = []
+    token = ""
+    quoted = False
+    index = 0
+    while index < len(line):
+        char = line[index]
+        if quoted:
+            token += char
+            if char == "\\" and index + 1 < len(line):
+                index += 1
+                token += line[index]
+            elif char == '"':
+                quoted = False
+        elif char == '"':
+            token += char
+            quoted = True
+        elif char == ";":
+            break
+        elif char in "()":
+            if token:
+                tokens.append(token)
+                token = ""
+            depth += 1 if char == "(" else -1
+            if depth < 0:
+                raise ZoneFileError(f"Line {line_number}: unbalanced parentheses")
+        elif char.isspace():
+            if token:
+                tokens.append(token)
+                token = ""
+        else:
+            token += char
+        index += 1
+    if quoted:
+        raise ZoneFileError(f"Line {line_number}: unterminated quoted string")
+    if token:
+        tokens.append(token)
+    return tokens, depth
+
+
+def _logical_lines(lines: Iterable[str]) -> Iterator[tuple[int, bool, list[str]]]:
+    """
+    Yield the entries of a zone file, joining lines inside parentheses
+
+    Yields:
+        tuple[int, bool, list[str]]: The line the entry starts on, whether it starts with whitespace, and its tokens
+    """
+    depth = 0
+    tokens: list[str] = []
+    start_line = 0
+    indented = False
+    line_number = 0
+    for line_number, line in enumerate(lines, start=1):
+        if depth == 0:
+            start_line = line_number
+            indented = line[:1].isspace()
+        line_tokens, depth = _tokenize(line.rstrip("\r\n"), depth, line_number)
+        tokens.extend(line_tokens)
+        if depth == 0 and tokens:
+            yield start_line, indented, tokens
+            tokens = []
+    if depth != 0:
+        raise ZoneFileError(f"Line {line_number}: unbalanced parentheses at the end of the file")
+
+
+def parse_zone_file(lines: Iterable[str], origin: str, default_ttl: int = 3600) -> Iterator[ZoneRecordSet]:
+    """
+    Parse a zone file into record sets
+
+    Args:
+        lines (Iterable[str]): Lines of the zone file, e.g. an open file
+        origin (str): The origin, the zone's name. The file can change it with $ORIGIN
+        default_ttl (int, optional): TTL for records without one, until the file sets one with $TTL.
+            Defaults to 3600.
+
+    Raises:
+        ZoneFileError: Raised when the zone file can not be parsed, or the records of a record set are not next to each
+            other
+
+    Yields:
+        ZoneRecordSet: The record sets in the file, in order
+    """
+    origin = normalize_name(origin)
+    owner: str | None = None
+    current: ZoneRecordSet | None = None
+    # (name, type) of every record set seen to the line it starts on
+    seen: dict[tuple[str, str], int] = {}
+    for line_number, indented, tokens in _logical_lines(lines):
+        if tokens[0].startswith("$"):
+            directive = tokens[0].upper()
+            if directive == "$ORIGIN" and len(tokens) == 2:
+                origin = absolute_name(tokens[1], origin)
+            elif directive == "$TTL" and len(tokens) == 2:
+                default_ttl = _ttl(tokens[1], line_number)
+            else:
+                raise ZoneFileError(f"Line {line_number}: {tokens[0]} is not supported")
+            continue
+
+        if not indented:
+            owner = absolute_name(tokens.pop(0), origin)
+        if owner is None:
+            raise ZoneFileError(f"Line {line_number}: the first record has no name")
+        ttl = default_ttl
+        while tokens and (tokens[0].upper() in CLASSES or TTL_PATTERN.match(tokens[0])):
+            token = tokens.pop(0)
+            if token.upper() not in CLASSES:
+                ttl = _ttl(token, line_number)
+        if len(tokens) < 2:
+            raise ZoneFileError(f"Line {line_number}: a record needs a type and data")
+        record_type = tokens[0].upper()
+        data = tokens[1:]
+        if record_type in NAME_DATA_TYPES:
+            data = [absolute_name(data[0], origin), *data[1:]]
+        value = " ".join(data)
+
+        if current is not None and (current.name, current.record_type) == (owner, record_type):
+            current.values.append(value)
+            continue
+        if (owner, record_type) in seen:
+            raise ZoneFileError(
+                f"Line {line_number}: {record_type} record {owner} continues the record set of line "
+                + f"{seen[(owner, record_type)]}, put its records next to each other"
+            )
+        seen[(owner, record_type)] = line_number
+        if current is not None:
+            yield current
+        current = ZoneRecordSet(name=owner, record_type=record_type, ttl=ttl, values=[value], line=line_number)
+    if current is not None:
+        yield current
+
+
+def _ttl(value: str, line_number: int) -> int:
+    try:
+        return parse_ttl(value)
+    except ValueError as exc:
+        raise ZoneFileError(f"Line {line_number}: {exc}") from exc
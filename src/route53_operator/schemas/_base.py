@@ -48,6 +48,9 @@ class RecordBase(RecordMutable):
 
     hosted_zone_id: str = Field(description="Route53 Hosted zone ID")
     name: str = Field(description="Name of the record")
+    account: str | None = Field(
+        None, description="AWS account the hosted zone is in. Defaults to the operator's own account"
+    )
 
     @validator("name")
     def validate_name(cls, v):
@@ -57,10 +60,13 @@ class RecordBase(RecordMutable):
         return v
 
     @classmethod
-    def from_recordset(cls, hosted_zone_id: str, record_set: dict[str, Any]) -> "RecordBase":
+    def from_recordset(
+        cls, hosted_zone_id: str, record_set: dict[str, Any], account: str | None = None
+    ) -> "RecordBase":
         """Convert a record set from the AWS API to a RecordObject"""
         return cls(
             hosted_zone_id=hosted_zone_id,
+            account=account,
             ttl=record_set["TTL"],
             name=record_set["Name"],
             value=record_set["ResourceRecords"][0]["Value"],
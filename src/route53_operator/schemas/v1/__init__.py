@@ -3,6 +3,8 @@ from .a_record import ARecord
 from .a_record import ARecordUpdate
 from .cname_record import CNAMERecord
 from .cname_record import CNAMERecordUpdate
+from .record_set import RecordSet
+from .record_set import RecordSetEntry
 from .txt_record import TXTRecord
 from .txt_record import TXTRecordUpdate
 
@@ -10,6 +12,8 @@ __all__ = [
     "ARecord",
     "CNAMERecord",
     "TXTRecord",
+    "RecordSet",
+    "RecordSetEntry",
     "ARecordUpdate",
     "CNAMERecordUpdate",
     "TXTRecordUpdate",
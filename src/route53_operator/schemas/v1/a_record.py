@@ -28,11 +28,12 @@ class ARecord(V1RecordBase, ARecordMutable):
 
     @classmethod
     def from_recordset(
-        cls, hosted_zone_id: str, record_set: dict[str, Any]
+        cls, hosted_zone_id: str, record_set: dict[str, Any], account: str | None = None
     ) -> "ARecord":
         """Convert a record set from the AWS API to aa A Record"""
         return cls(
             hosted_zone_id=hosted_zone_id,
+            account=account,
             ttl=record_set["TTL"],
             name=record_set["Name"],
             value=[ip["Value"] for ip in record_set["ResourceRecords"]],
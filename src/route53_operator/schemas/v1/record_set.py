@@ -0,0 +1,89 @@
+"""Schemas for RecordSets, bundles of records in one hosted zone that are applied together"""
+from typing import Literal
+
+from pydantic import BaseModel
+from pydantic import conint
+from pydantic import Field
+from pydantic import validator
+
+from ...lib.changes import record_key
+from .._base import is_valid_hostname
+from .._base import RecordBase
+from .a_record import ARecord
+from .cname_record import CNAMERecord
+from .txt_record import TXTRecord
+
+# the schema each entry type is validated with
+RECORD_TYPES: dict[str, type[RecordBase]] = {"A": ARecord, "CNAME": CNAMERecord, "TXT": TXTRecord}
+
+
+class RecordSetEntry(BaseModel):
+    """One record of a RecordSet"""
+
+    type: Literal["A", "CNAME", "TXT"] = Field(description="Type of the record")
+    name: str = Field(description="Name of the record")
+    ttl: conint(ge=0, le=2147483647) = Field(default=60, description="TTL for the record")
+    value: list[str] = Field(
+        min_items=1, description="Values for the record, IP addresses for A records, one value for CNAME and TXT"
+    )
+
+    @validator("name")
+    def validate_name(cls, v):
+        """Validates that the record name is a valid hostname"""
+        if not is_valid_hostname(v):
+            raise ValueError("Invalid hostname")
+        return v
+
+    @validator("value")
+    def validate_value(cls, v, values):
+        """Validates that CNAME and TXT entries have a single value, like CNAMERecord and TXTRecord"""
+        record_type = values.get("type")
+        if record_type in ("CNAME", "TXT") and len(v) != 1:
+            raise ValueError(f"{record_type} records have exactly one value")
+        return v
+
+    def record(self, hosted_zone_id: str, account: str | None = None) -> RecordBase:
+        """The entry as a record of its type, validated by that type's schema"""
+        schema = RECORD_TYPES[self.type]
+        value = self.value if self.type == "A" else self.value[0]
+        return schema(hosted_zone_id=hosted_zone_id, account=account, name=self.name, ttl=self.ttl, value=value)
+
+
+class RecordSet(BaseModel):
+    """Records in one hosted zone, applied together in one ChangeBatch"""
+
+    _version: str = "v1"
+    _served: bool = True
+    _storage: bool = True
+    _namespace: tuple[str] = ("dns", "route53", "record-sets")
+    _plural: str = "record-sets"
+    _singular: str = "record-set"
+    _kind: str = "RecordSet"
+    _shortnames: list[str] = ["rs"]
+
+    hosted_zone_id: str = Field(description="Route53 Hosted zone ID")
+    account: str | None = Field(
+        None, description="AWS account the hosted zone is in. Defaults to the operator's own account"
+    )
+    entries: list[RecordSetEntry] = Field(min_items=1, description="The records")
+
+    @validator("entries")
+    def validate_entries(cls, v):
+        """Validates that no record is in the set twice"""
+        seen = set()
+        for entry in v:
+            key = record_key(entry.name, entry.type)
+            if key in seen:
+                raise ValueError(f"{entry.type} record {entry.name} is in the set more than once")
+            seen.add(key)
+        return v
+
+    @validator("entries", each_item=True)
+    def validate_entry(cls, v, values):
+        """Builds each entry's record, so an entry its type's schema rejects fails here and not when it's applied"""
+        v.record(values.get("hosted_zone_id", ""), values.get("account"))
+        return v
+
+    def records(self) -> list[RecordBase]:
+        """Every entry as a record of its type"""
+        return [entry.record(self.hosted_zone_id, self.account) for entry in self.entries]
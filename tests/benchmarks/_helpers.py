@@ -0,0 +1,144 @@
+"""Shared helpers for the benchmarks: latency stats, concurrent drivers, zone seeding and result files"""
+import asyncio
+import json
+import os
+import statistics
+import time
+from collections.abc import Awaitable
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+# Route53 accepts at most 1000 changes in one ChangeBatch
+MAX_CHANGES_PER_BATCH = 1000
+
+RESULTS_DIR = Path(os.environ.get("R53_OP_BENCHMARK_RESULTS", ".benchmarks"))
+BASELINE_DIR = Path(__file__).parent / "baselines"
+UPDATE_BASELINE = os.environ.get("R53_OP_BENCHMARK_UPDATE_BASELINE", "") not in ("", "0", "false")
+# a result regresses when it is this much slower than its baseline
+TOLERANCE = float(os.environ.get("R53_OP_BENCHMARK_TOLERANCE", "0.25"))
+
+
+def env_ints(name: str, default: str) -> list[int]:
+    """Read a comma separated list of ints from the environment, used to trim the benchmark matrix"""
+    return [int(value) for value in os.environ.get(name, default).split(",") if value]
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    """Nearest rank percentile of samples"""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))]
+
+
+def summarize(latencies: list[float], elapsed: float, errors: int = 0) -> dict[str, float]:
+    """Turn per operation latencies (seconds) and the wall clock time of the run into a result"""
+    return {
+        "ops": len(latencies),
+        "ops_per_sec": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+        "errors": errors,
+    }
+
+
+async def run_concurrent(
+    operation: Callable[[int], Awaitable[Any]], count: int, concurrency: int
+) -> dict[str, float]:
+    """
+    Call operation(index) for every index in range(count) with at most concurrency calls in flight
+
+    Returns:
+        dict[str, float]: The summarized result of the run
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def timed(index: int) -> None:
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await operation(index)
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(timed(index) for index in range(count)))
+    return summarize(latencies, time.perf_counter() - start, errors)
+
+
+async def seed_zone(client, hosted_zone_id: str, zone_name: str, count: int, prefix: str = "seed") -> None:
+    """Fill a zone with count A records, in max size ChangeBatches"""
+    for offset in range(0, count, MAX_CHANGES_PER_BATCH):
+        await client.change_resource_record_sets(
+            HostedZoneId=hosted_zone_id,
+            ChangeBatch={
+                "Changes": [
+                    {
+                        "Action": "CREATE",
+                        "ResourceRecordSet": {
+                            "Name": f"{prefix}-{index}.{zone_name}",
+                            "Type": "A",
+                            "TTL": 300,
+                            "ResourceRecords": [{"Value": f"10.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}"}],
+                        },
+                    }
+                    for index in range(offset, min(offset + MAX_CHANGES_PER_BATCH, count))
+                ]
+            },
+        )
+
+
+def write_results(name: str, results: dict[str, dict[str, float]]) -> Path:
+    """Write results to RESULTS_DIR/<name>.json, and to the baseline too when updating baselines"""
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    path = RESULTS_DIR / f"{name}.json"
+    path.write_text(json.dumps(results, indent=2, sort_keys=True))
+    if UPDATE_BASELINE:
+        BASELINE_DIR.mkdir(parents=True, exist_ok=True)
+        (BASELINE_DIR / f"{name}.json").write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+    return path
+
+
+def load_baseline(name: str) -> dict[str, dict[str, float]]:
+    """Load the stored baseline for a benchmark, empty when there is none"""
+    path = BASELINE_DIR / f"{name}.json"
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text())
+
+
+def regressions(
+    results: dict[str, dict[str, float]], baseline: dict[str, dict[str, float]], tolerance: float = TOLERANCE
+) -> list[str]:
+    """
+    Compare results against a baseline
+
+    Returns:
+        list[str]: A description of every result that is more than tolerance slower than its baseline
+    """
+    found = []
+    for key, result in results.items():
+        expected = baseline.get(key)
+        if expected is None:
+            continue
+        if result["ops_per_sec"] < expected["ops_per_sec"] * (1 - tolerance):
+            found.append(f"{key}: {result['ops_per_sec']} ops/s, baseline {expected['ops_per_sec']} ops/s")
+        if result["p99_ms"] > expected["p99_ms"] * (1 + tolerance):
+            found.append(f"{key}: p99 {result['p99_ms']}ms, baseline {expected['p99_ms']}ms")
+        if result["errors"] > expected["errors"]:
+            found.append(f"{key}: {result['errors']} errors, baseline {expected['errors']}")
+    return found
+
+
+def print_results(results: dict[str, dict[str, float]]) -> None:
+    """Print results as a table"""
+    print(f"\n{'benchmark':<56}{'ops/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for key, result in sorted(results.items()):
+        print(
+            f"{key:<56}{result['ops_per_sec']:>10.1f}{result['p50_ms']:>10.2f}"
+            f"{result['p99_ms']:>10.2f}{result['errors']:>8}"
+        )
@@ -0,0 +1,20 @@
+"""Benchmarks run against the in-process moto Route53 server.
+
+They are slow and their numbers are only meaningful on a quiet machine, so they are skipped unless
+R53_OP_BENCHMARK is set. Run them with `make benchmark`.
+"""
+import os
+
+import pytest
+
+BENCHMARKS_ENABLED = os.environ.get("R53_OP_BENCHMARK", "") not in ("", "0", "false")
+
+
+def pytest_collection_modifyitems(config, items):
+    """Skip benchmarks unless they are enabled"""
+    if BENCHMARKS_ENABLED:
+        return
+    skip_benchmark = pytest.mark.skip(reason="benchmarks are disabled, set R53_OP_BENCHMARK=1 to run them")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip_benchmark)
@@ -0,0 +1,101 @@
+"""Benchmark CRUDBase get/create/update/remove throughput and latency against the in-process moto Route53
+
+The matrix is record type x zone size x concurrency. Each cell creates, gets, updates and removes
+max(MIN_OPS, concurrency) records in a zone pre-seeded with zone size records. The account rate limit is lifted so the
+numbers measure the operator's call path and not the 5 req/s Route53 budget.
+
+Trim the matrix with R53_OP_BENCHMARK_ZONE_SIZES and R53_OP_BENCHMARK_CONCURRENCY (comma separated ints).
+Results are written to .benchmarks/crud_throughput.json and compared against baselines/crud_throughput.json, set
+R53_OP_BENCHMARK_UPDATE_BASELINE=1 to store a new baseline.
+"""
+from logging import getLogger
+
+import pytest
+
+from route53_operator.crud import ACrud
+from route53_operator.crud import CNAMECrud
+from route53_operator.crud import TXTCrud
+from route53_operator.lib.aws import AccountPool
+from route53_operator.schemas.v1 import ARecord
+from route53_operator.schemas.v1 import ARecordUpdate
+from route53_operator.schemas.v1 import CNAMERecord
+from route53_operator.schemas.v1 import CNAMERecordUpdate
+from route53_operator.schemas.v1 import TXTRecord
+from route53_operator.schemas.v1 import TXTRecordUpdate
+from tests.benchmarks._helpers import env_ints
+from tests.benchmarks._helpers import load_baseline
+from tests.benchmarks._helpers import print_results
+from tests.benchmarks._helpers import regressions
+from tests.benchmarks._helpers import run_concurrent
+from tests.benchmarks._helpers import seed_zone
+from tests.benchmarks._helpers import write_results
+
+LOGGER = getLogger(__name__)
+BENCHMARK = "crud_throughput"
+
+ZONE_SIZES = env_ints("R53_OP_BENCHMARK_ZONE_SIZES", "100,1000,10000,50000")
+CONCURRENCY = env_ints("R53_OP_BENCHMARK_CONCURRENCY", "1,10,100,1000")
+MIN_OPS = 100
+
+# crud, schema, update schema, value for a new record, value for an updated record
+RECORD_TYPES = {
+    "A": (ACrud, ARecord, ARecordUpdate, lambda i: [f"10.200.{i >> 8 & 255}.{i & 255}"], lambda i: ["10.201.0.1"]),
+    "CNAME": (CNAMECrud, CNAMERecord, CNAMERecordUpdate, lambda i: "target.example.com", lambda i: "other.example.com"),
+    "TXT": (TXTCrud, TXTRecord, TXTRecordUpdate, lambda i: f"bench {i}", lambda i: f"updated {i}"),
+}
+
+
+@pytest.fixture(scope="module")
+def results():
+    """Collects the results of every cell, writes them out once the module is done"""
+    collected = {}
+    yield collected
+    if collected:
+        print_results(collected)
+        write_results(BENCHMARK, collected)
+
+
+@pytest.mark.benchmark
+@pytest.mark.slow
+@pytest.mark.asyncio
+@pytest.mark.parametrize("zone_size", ZONE_SIZES, ids=lambda size: f"zone={size}")
+@pytest.mark.parametrize("record_type", RECORD_TYPES.keys())
+async def test_crud_throughput(record_type, zone_size, moto_zone, results):
+    """Measure ops/sec and p50/p99 latency of each CRUD operation at each concurrency"""
+    crud_type, schema, update_schema, new_value, updated_value = RECORD_TYPES[record_type]
+    config = moto_zone["config"].copy(update={"aws_requests_per_second": 1_000_000})
+    zone_id = moto_zone["zone_id"]
+    zone_name = moto_zone["name"]
+    this_run = {}
+
+    async with AccountPool(config, session=moto_zone["session"]) as accounts:
+        async with accounts.client() as client:
+            await seed_zone(client, zone_id, zone_name, zone_size)
+        crud = crud_type(config=config, logger=LOGGER, accounts=accounts)
+
+        for concurrency in CONCURRENCY:
+            count = max(MIN_OPS, concurrency)
+            records = [
+                schema(hosted_zone_id=zone_id, name=f"bench-{concurrency}-{i}.{zone_name}", value=new_value(i))
+                for i in range(count)
+            ]
+            update = update_schema(value=updated_value(0))
+            prefix = f"{record_type}/zone={zone_size}/concurrency={concurrency}"
+
+            this_run[f"{prefix}/create"] = await run_concurrent(
+                lambda i: crud.create(record_in=records[i]), count, concurrency
+            )
+            this_run[f"{prefix}/get"] = await run_concurrent(
+                lambda i: crud.get(hosted_zone_id=zone_id, name=records[i].name), count, concurrency
+            )
+            this_run[f"{prefix}/update"] = await run_concurrent(
+                lambda i: crud.update(record_current=records[i], record_update=update), count, concurrency
+            )
+            current = [record.copy(update={"value": update.value, "ttl": update.ttl}) for record in records]
+            this_run[f"{prefix}/remove"] = await run_concurrent(
+                lambda i: crud.remove(record_in=current[i]), count, concurrency
+            )
+
+    results.update(this_run)
+    found = regressions(this_run, load_baseline(BENCHMARK))
+    assert not found, "Regressed against the baseline:\n" + "\n".join(found)
@@ -0,0 +1,67 @@
+"""Benchmark creating the first route53 and sts clients with botocore's data loader and with the operator's
+
+Each loader runs in two fresh interpreters, one times the clients and one measures the memory they keep with
+tracemalloc. Results are written to .benchmarks/data_loader.json.
+"""
+import json
+import subprocess
+import sys
+
+import pytest
+
+from tests.benchmarks._helpers import write_results
+
+BENCHMARK = "data_loader"
+SESSIONS = 3
+CLIENT_SCRIPT = """
+import asyncio, gc, json, sys, time, tracemalloc
+from aiobotocore.session import get_session
+from route53_operator.lib.aws import new_session
+
+make_session = new_session if sys.argv[1] == "operator" else get_session
+kwargs = {"region_name": "us-east-1", "aws_access_key_id": "a", "aws_secret_access_key": "b"}
+
+
+async def main():
+    # every account with a role has a session of its own
+    sessions = [make_session() for _ in range(int(sys.argv[2]))]
+    for session in sessions:
+        async with session.create_client("route53", **kwargs), session.create_client("sts", **kwargs):
+            pass
+    return sessions
+
+
+if sys.argv[3] == "time":
+    start = time.perf_counter()
+    asyncio.run(main())
+    print(json.dumps({"clients_ms": round((time.perf_counter() - start) * 1000, 1)}))
+else:
+    tracemalloc.start()
+    sessions = asyncio.run(main())
+    gc.collect()
+    print(json.dumps({"kept_kb": tracemalloc.get_traced_memory()[0] // 1024}))
+"""
+
+
+@pytest.mark.benchmark
+@pytest.mark.slow
+def test_data_loader():
+    """The operator's loader creates clients faster and with less memory than botocore's"""
+    results = {}
+    for loader in ("botocore", "operator"):
+        results[loader] = {}
+        for measure in ("time", "memory"):
+            output = subprocess.run(
+                [sys.executable, "-c", CLIENT_SCRIPT, loader, str(SESSIONS), measure],
+                capture_output=True,
+                check=True,
+                text=True,
+            ).stdout
+            results[loader].update(json.loads(output.splitlines()[-1]))
+    write_results(BENCHMARK, results)
+    print(f"\n{'loader':<12}{'clients ms':>12}{'kept kB':>10}")
+    for loader, result in results.items():
+        print(f"{loader:<12}{result['clients_ms']:>12.1f}{result['kept_kb']:>10}")
+
+    assert results["operator"]["clients_ms"] < results["botocore"]["clients_ms"]
+    assert results["operator"]["kept_kb"] < results["botocore"]["kept_kb"]
@@ -0,0 +1,69 @@
+"""Benchmark how long the operator's entry points take to import, with python -X importtime
+
+The best of several fresh interpreters is compared against the budgets in baselines/import_time.json. Set
+R53_OP_BENCHMARK_UPDATE_BASELINE=1 to store new budgets. Cold start is what a rescheduled pod or a new HPA replica
+waits on before it handles its first event.
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+from tests.benchmarks._helpers import load_baseline
+from tests.benchmarks._helpers import TOLERANCE
+from tests.benchmarks._helpers import write_results
+
+BENCHMARK = "import_time"
+RUNS = int(os.environ.get("R53_OP_BENCHMARK_IMPORT_RUNS", "5"))
+ENTRY_POINTS = {
+    # the operator, what r53operator imports before kopf.run
+    "operator": "import route53_operator.__main__, route53_operator.handlers",
+    "cli": "import route53_operator.__main__",
+    "zone_import": "import route53_operator.lib.zone_import",
+    "crds": "from route53_operator.crds import CRDS",
+}
+
+
+def import_time(statement: str) -> dict[str, float]:
+    """
+    Run statement in a fresh interpreter with -X importtime
+
+    Returns:
+        dict[str, float]: The total import time, and the modules imported
+    """
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement], capture_output=True, check=True, text=True
+    ).stderr
+    # import time: self [us] | cumulative | imported package, top level imports aren't indented
+    total_us, modules = 0, 0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        modules += 1
+        if not name[1:].startswith(" "):
+            total_us += int(cumulative)
+    return {"total_ms": round(total_us / 1000, 1), "modules": modules}
+
+
+@pytest.mark.benchmark
+@pytest.mark.slow
+def test_import_time():
+    """Every entry point imports within its budget"""
+    results = {
+        name: min((import_time(statement) for _ in range(RUNS)), key=lambda result: result["total_ms"])
+        for name, statement in ENTRY_POINTS.items()
+    }
+    write_results(BENCHMARK, results)
+    print(f"\n{'entry point':<16}{'ms':>10}{'modules':>10}")
+    for name, result in results.items():
+        print(f"{name:<16}{result['total_ms']:>10.1f}{result['modules']:>10}")
+
+    budgets = load_baseline(BENCHMARK)
+    over = [
+        f"{name}: {result['total_ms']}ms, budget {budgets[name]['total_ms']}ms"
+        for name, result in results.items()
+        if name in budgets and result["total_ms"] > budgets[name]["total_ms"] * (1 + TOLERANCE)
+    ]
+    assert not over, "Over the import time budget:\n" + "\n".join(over)
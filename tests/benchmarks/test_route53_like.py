@@ -0,0 +1,69 @@
+"""Benchmark record creation against a moto Route53 that behaves like the real API
+
+The server injects Route53-like latency, throttles at 5 requests/second and rejects overlapping changes to a zone
+with PriorRequestNotComplete (see tests.moto_server.route53_like). Each profile changes the operator's rate limit or
+retry mode, and reports throughput alongside how many throttles and rejected changes the server handed out.
+"""
+from logging import getLogger
+
+import pytest
+
+from route53_operator.crud import ACrud
+from route53_operator.lib.aws import AccountPool
+from route53_operator.schemas.v1 import ARecord
+from tests.benchmarks._helpers import print_results
+from tests.benchmarks._helpers import run_concurrent
+from tests.benchmarks._helpers import write_results
+from tests.moto_server import route53_like
+
+LOGGER = getLogger(__name__)
+BENCHMARK = "route53_like"
+
+RECORDS = 40
+CONCURRENCY = 10
+
+PROFILES = {
+    "rate=4/adaptive": {"aws_requests_per_second": 4, "aws_retry_mode": "adaptive"},
+    "rate=4/standard": {"aws_requests_per_second": 4, "aws_retry_mode": "standard"},
+    "rate=5/adaptive": {"aws_requests_per_second": 5, "aws_retry_mode": "adaptive"},
+    "rate=10/adaptive": {"aws_requests_per_second": 10, "aws_retry_mode": "adaptive"},
+    "rate=10/standard": {"aws_requests_per_second": 10, "aws_retry_mode": "standard"},
+}
+
+
+@pytest.fixture(scope="module")
+def results():
+    """Collects the results of every profile, writes them out once the module is done"""
+    collected = {}
+    yield collected
+    if collected:
+        print_results(collected)
+        write_results(BENCHMARK, collected)
+
+
+@pytest.mark.benchmark
+@pytest.mark.slow
+@pytest.mark.asyncio
+@pytest.mark.route53_faults(route53_like(insync_delay=1))
+@pytest.mark.parametrize("profile", PROFILES.keys())
+async def test_route53_like_creates(profile, moto_zone, route53_faults, results):
+    """Create RECORDS records with CONCURRENCY in flight under one operator profile"""
+    config = moto_zone["config"].copy(update=PROFILES[profile])
+    route53_faults.stats.clear()
+
+    async with AccountPool(config, session=moto_zone["session"]) as accounts:
+        crud = ACrud(config=config, logger=LOGGER, accounts=accounts)
+        records = [
+            ARecord(
+                hosted_zone_id=moto_zone["zone_id"],
+                name=f"{profile.replace('/', '-').replace('=', '')}-{i}.{moto_zone['name']}",
+                value=["10.0.0.1"],
+            )
+            for i in range(RECORDS)
+        ]
+        result = await run_concurrent(lambda i: crud.create(record_in=records[i]), RECORDS, CONCURRENCY)
+
+    result["throttled"] = route53_faults.stats["Throttling"]
+    result["prior_request_not_complete"] = route53_faults.stats["PriorRequestNotComplete"]
+    print(f"\n{profile}: {result}")
+    results[f"create/{profile}"] = result
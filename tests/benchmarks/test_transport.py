@@ -0,0 +1,88 @@
+"""Benchmark the AWS transport profile from Config against sustained change throughput
+
+Every profile drives one shared client with a fixed number of concurrent UPSERTs and reports changes/second.
+The first profile is botocore's defaults, the second is our tuned defaults, and the rest change one setting at a
+time from the tuned defaults so the effect of each setting can be read off the table.
+"""
+import asyncio
+import time
+from logging import getLogger
+
+import pytest
+
+from route53_operator.lib.config import Config
+
+LOGGER = getLogger(__name__)
+
+CHANGES = 500
+CONCURRENCY = 50
+
+BOTOCORE_DEFAULTS = {
+    "aws_max_pool_connections": 10,
+    "aws_connect_timeout": 60,
+    "aws_read_timeout": 60,
+    "aws_tcp_keepalive": False,
+    "aws_keepalive_timeout": None,
+    "aws_retry_mode": "legacy",
+    "aws_max_attempts": 5,
+}
+
+PROFILES = {
+    "botocore-defaults": BOTOCORE_DEFAULTS,
+    "tuned": {},
+    "pool=10": {"aws_max_pool_connections": 10},
+    "pool=100": {"aws_max_pool_connections": 100},
+    "tcp_keepalive=off": {"aws_tcp_keepalive": False},
+    "keepalive_timeout=none": {"aws_keepalive_timeout": None},
+    "retry=legacy": {"aws_retry_mode": "legacy"},
+    "retry=standard": {"aws_retry_mode": "standard"},
+}
+
+
+async def sustained_changes(config: Config, session, hosted_zone_id: str, zone_name: str) -> float:
+    """Run CHANGES UPSERTs with CONCURRENCY in flight through one client, returns changes/second"""
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async with session.create_client("route53", **config.aws_client_kwargs) as client:
+
+        async def upsert(index: int) -> None:
+            async with semaphore:
+                await client.change_resource_record_sets(
+                    HostedZoneId=hosted_zone_id,
+                    ChangeBatch={
+                        "Changes": [
+                            {
+                                "Action": "UPSERT",
+                                "ResourceRecordSet": {
+                                    "Name": f"bench-{index % CONCURRENCY}.{zone_name}",
+                                    "Type": "A",
+                                    "TTL": 60,
+                                    "ResourceRecords": [{"Value": f"10.0.{index // 256 % 256}.{index % 256}"}],
+                                },
+                            }
+                        ]
+                    },
+                )
+
+        start = time.perf_counter()
+        await asyncio.gather(*(upsert(index) for index in range(CHANGES)))
+        elapsed = time.perf_counter() - start
+    return CHANGES / elapsed
+
+
+@pytest.mark.benchmark
+@pytest.mark.slow
+@pytest.mark.asyncio
+async def test_transport_profiles(moto_zone):
+    """Report sustained change throughput for each transport profile"""
+    results = {}
+    for profile, overrides in PROFILES.items():
+        config = moto_zone["config"].copy(update=overrides)
+        results[profile] = await sustained_changes(
+            config, moto_zone["session"], moto_zone["zone_id"], moto_zone["name"]
+        )
+
+    print(f"\n{'profile':<24}{'changes/s':>12}{'vs botocore':>14}")
+    for profile, ops in results.items():
+        print(f"{profile:<24}{ops:>12.1f}{ops / results['botocore-defaults']:>13.2f}x")
+    assert all(ops > 0 for ops in results.values())
@@ -90,6 +90,8 @@ def pytest_configure(config):
     """Configure our markers"""
     config.addinivalue_line("markers", "slow: Slow tests, exclude with -m 'not slow'")
     config.addinivalue_line("markers", "k8s: tests that use kind to spin up a k8s cluster, exclude with -m 'not k8s'")
+    config.addinivalue_line("markers", "benchmark: performance benchmarks, only run when R53_OP_BENCHMARK is set")
+    config.addinivalue_line("markers", "route53_faults: Route53Faults the moto route53_server injects")
 
 
 @pytest.fixture(scope="session")
@@ -357,3 +359,24 @@ async def create_localstack_hosted_zone(ls_session):
             "session": session,
             "config": ls_session["config"],
         }
+
+
+@pytest_asyncio.fixture(name="moto_zone")
+async def create_moto_hosted_zone(test_config, route53_server):
+    """Creates a hosted zone in an in-process moto server, no docker required"""
+    session = get_session()
+    config = test_config.copy(update={"aws_use_ssl": False, "aws_endpoint_url": route53_server})
+
+    zone_name = f"{''.join(random.choices(string.ascii_lowercase, k=8))}.com."
+    async with session.create_client("route53", **config.aws_client_kwargs) as client:
+        response = await client.create_hosted_zone(
+            Name=zone_name,
+            CallerReference="".join(random.choices(string.ascii_uppercase + string.ascii_lowercase, k=8)),
+        )
+    yield {
+        "zone_id": response["HostedZone"]["Id"],
+        "name": response["HostedZone"]["Name"],
+        "session": session,
+        "config": config,
+        "endpoint_url": route53_server,
+    }
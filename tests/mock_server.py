@@ -5,10 +5,11 @@ import multiprocessing
 import aiohttp
 import aiohttp.web
 import pytest
+import pytest_asyncio
 from aiohttp.web import StreamResponse
 
 # aiobotocore
-from tests.moto_server import MotoService, get_free_tcp_port, host
+from tests.moto_server import MotoService, Route53Faults, get_free_tcp_port, host
 
 _proxy_bypass = {
     "http": None,
@@ -161,4 +162,36 @@ async def ec2_server(server_scheme):
 @pytest.fixture
 async def kinesis_server(server_scheme):
     async with MotoService('kinesis', ssl=server_scheme == 'https') as svc:
-        yield svc.endpoint_url
\ No newline at end of file
+        yield svc.endpoint_url
+
+@pytest.fixture
+def route53_faults(request):
+    """Route53Faults for the route53_server, from the route53_faults mark.
+
+    Example:
+
+    @pytest.mark.route53_faults(requests_per_second=5, insync_delay=1)
+    async def test_throttled(moto_zone, route53_faults):
+        ...
+        assert route53_faults.stats["Throttling"] == 0
+    """
+    marker = request.node.get_closest_marker('route53_faults')
+    if marker is None:
+        return None
+    if marker.args:
+        return marker.args[0]
+    return Route53Faults(**marker.kwargs)
+
+
+@pytest_asyncio.fixture
+async def route53_server(server_scheme, route53_faults):
+    async with MotoService(
+        'route53', ssl=server_scheme == 'https', faults=route53_faults
+    ) as svc:
+        yield svc.endpoint_url
+
+
+@pytest_asyncio.fixture
+async def sts_server(server_scheme):
+    async with MotoService('sts', ssl=server_scheme == 'https') as svc:
+        yield svc.endpoint_url
@@ -1,13 +1,23 @@
 import asyncio
 import functools
+import itertools
 import logging
+import math
+import multiprocessing
 import os
+import random
+import re
 import socket
 import threading
 import time
+from collections import Counter
+from dataclasses import dataclass
+from dataclasses import field
 
 # Third Party
 import aiohttp
+import moto.route53.exceptions
+import moto.route53.models
 import moto.server
 import werkzeug.serving
 
@@ -28,15 +38,243 @@ def get_free_tcp_port(release_socket: bool = False):
     return sckt, port
 
 
+@dataclass
+class LatencyDistribution:
+    """A log-normal latency, described by its median and p99 in seconds"""
+
+    median: float
+    p99: float | None = None
+
+    def sample(self, rng: random.Random) -> float:
+        if self.p99 is None or self.p99 <= self.median:
+            return self.median
+        # 2.326 is the z-score of the 99th percentile
+        sigma = math.log(self.p99 / self.median) / 2.326
+        return rng.lognormvariate(math.log(self.median), sigma)
+
+
+@dataclass
+class Route53Faults:
+    """Faults the moto Route53 server injects so it behaves more like the real API.
+
+    latency: per operation latency, keyed by operation name (e.g. ChangeResourceRecordSets), "*" applies to the rest
+    requests_per_second: account level rate limit, requests over it get a Throttling error
+    prior_request_not_complete: reject a change to a zone while another change to the same zone is in flight
+    insync_delay: seconds a change reports PENDING before it reports INSYNC
+    stats: count of requests per operation and of each injected error
+    """
+
+    latency: dict[str, LatencyDistribution] = field(default_factory=dict)
+    requests_per_second: float | None = None
+    burst: float | None = None
+    prior_request_not_complete: bool = False
+    insync_delay: float = 0
+    seed: int | None = None
+    stats: Counter = field(default_factory=Counter)
+
+
+def route53_like(insync_delay: float = 2, requests_per_second: float = 5) -> Route53Faults:
+    """Faults roughly matching the real Route53 API, with INSYNC shortened so tests finish"""
+    return Route53Faults(
+        latency={
+            "ChangeResourceRecordSets": LatencyDistribution(0.15, 0.6),
+            "ListResourceRecordSets": LatencyDistribution(0.05, 0.25),
+            "*": LatencyDistribution(0.04, 0.2),
+        },
+        requests_per_second=requests_per_second,
+        prior_request_not_complete=True,
+        insync_delay=insync_delay,
+    )
+
+
+_ROUTE53_OPERATIONS = (
+    ("POST", re.compile(r"^/[\d-]+/hostedzone/(?P<zone_id>[^/]+)/rrset/?$"), "ChangeResourceRecordSets"),
+    ("GET", re.compile(r"^/[\d-]+/hostedzone/(?P<zone_id>[^/]+)/rrset/?$"), "ListResourceRecordSets"),
+    ("GET", re.compile(r"^/[\d-]+/change/(?P<change_id>[^/]+)$"), "GetChange"),
+    ("GET", re.compile(r"^/[\d-]+/hostedzone/(?P<zone_id>[^/]+)$"), "GetHostedZone"),
+    ("POST", re.compile(r"^/[\d-]+/hostedzone$"), "CreateHostedZone"),
+    ("GET", re.compile(r"^/[\d-]+/hostedzone$"), "ListHostedZones"),
+)
+_ERROR_RESPONSE = (
+    '<?xml version="1.0"?>\n<ErrorResponse xmlns="https://route53.amazonaws.com/doc/2013-04-01/">'
+    "<Error><Type>Sender</Type><Code>{code}</Code><Message>{message}</Message></Error>"
+    "<RequestId>{request_id}</RequestId></ErrorResponse>"
+)
+_CHANGE_ID = re.compile(rb"<Id>/change/[^<]+</Id>")
+
+
+def route53_reverse_name(name: str) -> str:
+    """A name with its labels reversed and its trailing dot kept, the key Route53 lists record sets by.
+
+    moto drops the dot, which sorts a-b.example.com. after a.example.com. where Route53 sorts it before.
+    """
+    return ".".join(reversed(name.rstrip(".").split("."))) + "."
+
+
+def _reject_existing_creates(change_resource_record_sets):
+    """Reject a ChangeBatch that CREATEs a record set the zone already has, whatever its values.
+
+    moto only rejects a CREATE identical to an earlier one, and applies the changes before a failing one.
+    """
+
+    @functools.wraps(change_resource_record_sets)
+    def wrapper(self, zoneid, change_list):
+        existing = {(rrset.name, rrset.type_) for rrset in self.get_hosted_zone(zoneid).rrsets}
+        for change in change_list:
+            name = change["ResourceRecordSet"]["Name"].rstrip(".") + "."
+            key = (name, change["ResourceRecordSet"]["Type"])
+            if change["Action"] == "DELETE":
+                existing.discard(key)
+            elif change["Action"] == "CREATE" and key in existing:
+                raise moto.route53.exceptions.ResourceRecordAlreadyExists(name=name, _type=key[1])
+            else:
+                existing.add(key)
+        return change_resource_record_sets(self, zoneid, change_list)
+
+    wrapper.rejects_existing_creates = True
+    return wrapper
+
+
+def route53_semantics():
+    """Patch moto to list and change record sets the way Route53 does"""
+    moto.route53.models.reverse_domain_name = route53_reverse_name
+    backend = moto.route53.models.Route53Backend
+    if not getattr(backend.change_resource_record_sets, "rejects_existing_creates", False):
+        backend.change_resource_record_sets = _reject_existing_creates(backend.change_resource_record_sets)
+
+
+def route53_operation(method: str, path: str) -> tuple[str, dict[str, str]]:
+    """The Route53 operation name and the ids in the path of a request"""
+    for op_method, pattern, name in _ROUTE53_OPERATIONS:
+        match = pattern.match(path)
+        if method == op_method and match:
+            return name, match.groupdict()
+    return "Other", {}
+
+
+class FaultInjectionMiddleware:
+    """WSGI middleware that injects Route53Faults in front of the moto app.
+
+    The server is threaded, so injected latency overlaps between concurrent requests like it does against AWS.
+    """
+
+    def __init__(self, app, faults: Route53Faults):
+        self._app = app
+        self._faults = faults
+        self._rng = random.Random(faults.seed)
+        self._lock = threading.Lock()
+        self._tokens = self._burst = faults.burst or faults.requests_per_second or 0
+        self._updated = time.monotonic()
+        self._busy_zones = set()
+        self._changes = {}
+        self._change_ids = itertools.count(1)
+
+    def _throttled(self) -> bool:
+        if self._faults.requests_per_second is None:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._burst, self._tokens + (now - self._updated) * self._faults.requests_per_second)
+            self._updated = now
+            if self._tokens < 1:
+                return True
+            self._tokens -= 1
+            return False
+
+    def _error(self, start_response, code: str, message: str):
+        self._faults.stats[code] += 1
+        body = _ERROR_RESPONSE.format(code=code, message=message, request_id=next(self._change_ids)).encode()
+        start_response("400 Bad Request", [("Content-Type", "text/xml"), ("Content-Length", str(len(body)))])
+        return [body]
+
+    def _sleep(self, operation: str) -> None:
+        latency = self._faults.latency.get(operation, self._faults.latency.get("*"))
+        if latency is not None:
+            with self._lock:
+                seconds = latency.sample(self._rng)
+            time.sleep(seconds)
+
+    def _call_app(self, environ) -> tuple[str, list, bytes]:
+        captured = {}
+
+        def capture(status, headers, exc_info=None):
+            captured["status"], captured["headers"] = status, headers
+
+        body = b"".join(self._app(environ, capture))
+        return captured["status"], captured["headers"], body
+
+    def _respond(self, start_response, status: str, headers: list, body: bytes):
+        headers = [(k, v) for k, v in headers if k.lower() != "content-length"]
+        start_response(status, headers + [("Content-Length", str(len(body)))])
+        return [body]
+
+    def _change_status(self, change_id: str) -> bytes:
+        with self._lock:
+            submitted = self._changes.get(change_id)
+        if submitted is None or time.monotonic() - submitted >= self._faults.insync_delay:
+            return b"<Status>INSYNC</Status>"
+        return b"<Status>PENDING</Status>"
+
+    def _change(self, environ, start_response, zone_id: str):
+        if self._faults.prior_request_not_complete:
+            with self._lock:
+                if zone_id in self._busy_zones:
+                    busy = True
+                else:
+                    busy = False
+                    self._busy_zones.add(zone_id)
+            if busy:
+                return self._error(
+                    start_response,
+                    "PriorRequestNotComplete",
+                    "The request was rejected because Route 53 was still processing a prior request.",
+                )
+        try:
+            self._sleep("ChangeResourceRecordSets")
+            status, headers, body = self._call_app(environ)
+        finally:
+            if self._faults.prior_request_not_complete:
+                with self._lock:
+                    self._busy_zones.discard(zone_id)
+        if status.startswith("200"):
+            # moto hands out the same change id for every change, give each one its own so GetChange can track it
+            change_id = f"C{next(self._change_ids):012X}"
+            with self._lock:
+                self._changes[change_id] = time.monotonic()
+            body = _CHANGE_ID.sub(f"<Id>/change/{change_id}</Id>".encode(), body)
+            body = body.replace(b"<Status>INSYNC</Status>", self._change_status(change_id))
+        return self._respond(start_response, status, headers, body)
+
+    def __call__(self, environ, start_response):
+        operation, ids = route53_operation(environ["REQUEST_METHOD"], environ.get("PATH_INFO", ""))
+        if operation == "Other":
+            return self._app(environ, start_response)
+        self._faults.stats[operation] += 1
+        if self._throttled():
+            return self._error(start_response, "Throttling", "Rate exceeded")
+        if operation == "ChangeResourceRecordSets":
+            return self._change(environ, start_response, ids["zone_id"])
+        self._sleep(operation)
+        status, headers, body = self._call_app(environ)
+        if operation == "GetChange" and status.startswith("200"):
+            body = body.replace(b"<Status>INSYNC</Status>", self._change_status(ids["change_id"]))
+        return self._respond(start_response, status, headers, body)
+
+
 class MotoService:
     """Will Create MotoService.
     Service is ref-counted so there will only be one per process. Real Service will
     be returned by `__aenter__`."""
 
-    _services = dict()  # {name: instance}
+    _services = dict()  # {(name, id(faults)): instance}
 
-    def __init__(self, service_name: str, port: int = None, ssl: bool = False):
+    def __init__(
+        self, service_name: str, port: int = None, ssl: bool = False, faults: Route53Faults | None = None
+    ):
         self._service_name = service_name
+        self._faults = faults
+        # servers with different faults behave differently, and each faults object counts its own stats
+        self._key = (service_name, id(faults))
 
         if port:
             self._socket = None
@@ -72,9 +310,9 @@ class MotoService:
         return wrapper
 
     async def __aenter__(self):
-        svc = self._services.get(self._service_name)
+        svc = self._services.get(self._key)
         if svc is None:
-            self._services[self._service_name] = self
+            self._services[self._key] = self
             self._refcount = 1
             await self._start()
             return self
@@ -90,14 +328,18 @@ class MotoService:
             self._socket = None
 
         if self._refcount == 0:
-            del self._services[self._service_name]
+            del self._services[self._key]
             await self._stop()
 
     def _server_entry(self):
+        route53_semantics()
         self._main_app = moto.server.DomainDispatcherApplication(
             moto.server.create_backend_app, service=self._service_name
         )
         self._main_app.debug = True
+        app = self._main_app
+        if self._faults is not None:
+            app = FaultInjectionMiddleware(self._main_app, self._faults)
 
         if self._socket:
             self._socket.close()  # release right before we use it
@@ -106,7 +348,7 @@ class MotoService:
         self._server = werkzeug.serving.make_server(
             self._ip_address,
             self._port,
-            self._main_app,
+            app,
             True,
             ssl_context=self._ssl_ctx,
         )
@@ -142,4 +384,46 @@ class MotoService:
         if self._server:
             self._server.shutdown()
 
-        self._thread.join()
\ No newline at end of file
+        self._thread.join()
+
+def _serve_in_process(service_name: str, port: int, faults: Route53Faults | None):
+    # a request log line per call would dominate a load test
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    MotoService(service_name, port=port, faults=faults)._server_entry()
+
+
+class MotoProcess:
+    """Runs a MotoService in a child process, so that its CPU and memory are not
+    counted against the process under test."""
+
+    def __init__(self, service_name: str, faults: Route53Faults | None = None):
+        self._service_name = service_name
+        self._port = get_free_tcp_port(True)
+        self._process = multiprocessing.get_context('spawn').Process(
+            target=_serve_in_process,
+            args=(service_name, self._port, faults),
+            daemon=True,
+        )
+
+    @property
+    def endpoint_url(self):
+        return f'http://{host}:{self._port}'
+
+    async def __aenter__(self):
+        self._process.start()
+        async with aiohttp.ClientSession() as session:
+            start = time.time()
+            while time.time() - start < _CONNECT_TIMEOUT:
+                if not self._process.is_alive():
+                    break
+                try:
+                    async with session.get(self.endpoint_url + '/static', timeout=_CONNECT_TIMEOUT):
+                        return self
+                except (asyncio.TimeoutError, aiohttp.ClientConnectionError):
+                    await asyncio.sleep(0.5)
+        self._process.terminate()
+        raise Exception(f"Can not start service: {self._service_name}")
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self._process.terminate()
+        self._process.join()
@@ -0,0 +1,430 @@
+"""In-process scale harness for the operator's handlers
+
+Drives the record handlers (see handlers.v1._record) directly with synthetic create, resume, update and delete events
+for N records spread over M hosted zones. There is no Kubernetes involved: handler results go to a fake status sink,
+the way kopf would write them to each CR's status, and Route53 is the moto stand-in running in a child process so its
+memory is not counted against the operator.
+
+Reports events/second for each phase, Route53 API calls per record, Kubernetes Events per record, and the peak memory
+allocated by the operator.
+
+Usage:
+    python -m tests.scale.harness --records 20000 --zones 10
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+import tracemalloc
+from collections import Counter
+from dataclasses import dataclass
+from dataclasses import field
+from pathlib import Path
+from typing import Any
+
+import kopf
+
+from route53_operator import handlers  # noqa: F401
+from route53_operator.crud.authoritative import get_zone_reconciler
+from route53_operator.crud.batch import get_delete_aggregator
+from route53_operator.crud.gc import get_orphan_collector
+from route53_operator.crud.reads import get_read_batcher
+from route53_operator.handlers.v1._record import RECORD_HANDLERS
+from route53_operator.lib.aws import get_account_pool
+from route53_operator.lib.aws import get_session
+from route53_operator.lib.config import get_config
+from route53_operator.lib.conflicts import get_conflict_index
+from route53_operator.lib.debounce import get_debouncer
+from route53_operator.lib.events import get_event_aggregator
+from route53_operator.lib.journal import get_change_journal
+from route53_operator.lib.singleflight import get_read_flights
+from route53_operator.lib.zone_cache import get_zone_cache
+from route53_operator.schemas.v1 import ARecord
+from route53_operator.schemas.v1 import CNAMERecord
+from route53_operator.schemas.v1 import TXTRecord
+from tests.moto_server import MotoProcess
+from tests.moto_server import Route53Faults
+
+LOGGER = logging.getLogger("route53_operator.scale")
+# operator singletons built from the config, cleared whenever the harness changes the environment
+CACHED_FACTORIES = (
+    get_config,
+    get_account_pool,
+    get_zone_cache,
+    get_change_journal,
+    get_conflict_index,
+    get_event_aggregator,
+    get_read_flights,
+    get_read_batcher,
+    get_delete_aggregator,
+    get_debouncer,
+    get_zone_reconciler,
+    get_orphan_collector,
+)
+
+SCHEMAS = {"A": ARecord, "CNAME": CNAMERecord, "TXT": TXTRecord}
+SCHEMAS_BY_KIND = {schema._kind: record_type for record_type, schema in SCHEMAS.items()}
+# value for a new record and for an updated record, by record type
+VALUES = {
+    "A": (lambda i: [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}"], lambda i: [f"10.255.{i >> 8 & 255}.{i & 255}"]),
+    "CNAME": (lambda i: f"target-{i}.example.net", lambda i: f"updated-{i}.example.net"),
+    "TXT": (lambda i: f"scale {i}", lambda i: f"updated {i}"),
+}
+PHASES = ("create", "resume", "update", "delete")
+
+
+@dataclass
+class SyntheticObject:
+    """A CR the harness pretends exists in Kubernetes"""
+
+    resource: kopf.Resource
+    namespace: str
+    name: str
+    spec: dict[str, Any]
+    status: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def body(self) -> dict[str, Any]:
+        return {
+            "apiVersion": f"{self.resource.group}/{self.resource.version}",
+            "kind": self.resource.kind,
+            "metadata": {"name": self.name, "namespace": self.namespace, "uid": f"{self.namespace}/{self.name}"},
+            "spec": self.spec,
+            "status": self.status,
+        }
+
+
+class StatusSink:
+    """Stands in for the Kubernetes API, stores handler results in the object status like kopf does and counts Events"""
+
+    def __init__(self):
+        self.writes = 0
+        self.events = 0
+
+    def write(self, obj: SyntheticObject, handler_id: str, result: Any, patch: kopf.Patch) -> None:
+        if result is not None:
+            obj.status[handler_id] = result
+        obj.status.update(patch.get("status", {}))
+        self.writes += 1
+
+    def post_event(self, reference: dict[str, Any], event_type: str, reason: str, message: str) -> None:
+        self.events += 1
+
+
+class LogCounter(logging.Handler):
+    """Counts the messages handlers log, each of them an Event when kopf posts logs at DEBUG"""
+
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self.messages = 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.messages += 1
+
+
+class ApiCallCounter:
+    """Counts Route53 API calls by operation, and attempts including retries, with botocore event hooks"""
+
+    def __init__(self):
+        self.calls = Counter()
+        self.attempts = 0
+
+    def register(self, session) -> None:
+        session.register("before-call.route53", self._on_call)
+        session.register("before-send.route53", self._on_send)
+
+    def _on_call(self, model, **kwargs) -> None:
+        self.calls[model.name] += 1
+
+    def _on_send(self, **kwargs) -> None:
+        self.attempts += 1
+
+    def snapshot(self) -> tuple[Counter, int]:
+        return Counter(self.calls), self.attempts
+
+
+def resource_for(schema) -> kopf.Resource:
+    """The kopf resource of a record schema, matching the CRDs"""
+    return kopf.Resource(
+        group=".".join(tuple(reversed(schema._namespace))[-2:]),
+        version=schema._version,
+        plural=schema._plural,
+        kind=schema._kind,
+        singular=schema._singular,
+        namespaced=True,
+    )
+
+
+class ScaleHarness:
+    """
+    Runs synthetic events through the registered handlers
+
+    Args:
+        endpoint_url (str): Route53 endpoint, e.g. a MotoProcess
+        records (int): Number of records
+        zones (int): Number of hosted zones the records are spread over
+        record_types (tuple[str]): Record types to create, records are spread over them
+        concurrency (int): Objects handled at the same time, like kopf's worker limit
+        namespaces (int): Number of namespaces the records are spread over
+        config_overrides (dict[str, str] | None): Extra operator config, as environment variables
+    """
+
+    def __init__(
+        self,
+        endpoint_url: str,
+        records: int,
+        zones: int,
+        record_types: tuple[str] = ("A", "CNAME", "TXT"),
+        concurrency: int = 1000,
+        namespaces: int = 1,
+        config_overrides: dict[str, str] | None = None,
+    ):
+        self.records = records
+        self.zones = zones
+        self.record_types = record_types
+        self.concurrency = concurrency
+        self.namespaces = namespaces
+        self.sink = StatusSink()
+        self.api_calls = ApiCallCounter()
+        self.logs = LogCounter()
+        self.objects: list[SyntheticObject] = []
+        self.errors: list[str] = []
+        self._environ = {
+            "AWS_ENDPOINT_URL": endpoint_url,
+            "AWS_USE_SSL": "false",
+            "AWS_ACCESS_KEY_ID": "x",
+            "AWS_SECRET_ACCESS_KEY": "x",
+            # measure the operator, not the Route53 budget, unless asked to
+            "AWS_REQUESTS_PER_SECOND": "1000000",
+            **(config_overrides or {}),
+        }
+
+    def _configure(self) -> dict[str, str | None]:
+        """Point the operator's config at the stand-in, returns the environment to restore afterwards"""
+        saved = {key: os.environ.get(key) for key in self._environ}
+        os.environ.update(self._environ)
+        for factory in CACHED_FACTORIES:
+            factory.cache_clear()
+        self.api_calls.register(get_session())
+        return saved
+
+    def _restore(self, saved: dict[str, str | None]) -> None:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        for factory in CACHED_FACTORIES:
+            factory.cache_clear()
+
+    async def _create_zones(self) -> list[tuple[str, str]]:
+        zones = []
+        async with get_account_pool(get_config()).client() as client:
+            for index in range(self.zones):
+                response = await client.create_hosted_zone(
+                    Name=f"scale-{index}.example.com.", CallerReference=f"scale-{index}-{time.time()}"
+                )
+                zones.append((response["HostedZone"]["Id"], response["HostedZone"]["Name"]))
+        return zones
+
+    def _build_objects(self, zones: list[tuple[str, str]]) -> None:
+        for index in range(self.records):
+            record_type = self.record_types[index % len(self.record_types)]
+            zone_id, zone_name = zones[index % len(zones)]
+            spec = {
+                "hosted_zone_id": zone_id,
+                "name": f"record-{index}.{zone_name}",
+                "ttl": 60,
+                "value": VALUES[record_type][0](index),
+            }
+            self.objects.append(
+                SyntheticObject(
+                    resource=resource_for(SCHEMAS[record_type]),
+                    namespace=f"namespace-{index % self.namespaces}",
+                    name=f"record-{index}",
+                    spec=spec,
+                )
+            )
+
+    async def _dispatch(self, obj: SyntheticObject, phase: str, old: dict[str, Any] | None = None) -> None:
+        handler = getattr(RECORD_HANDLERS[SCHEMAS_BY_KIND[obj.resource.kind]], phase)
+        body = obj.body
+        old_body = {**body, "spec": old} if old is not None else None
+        new_body = body if phase in ("create", "update") else None
+        patch = kopf.Patch()
+        kwargs = {
+            "body": body,
+            "spec": obj.spec,
+            "meta": body["metadata"],
+            "status": obj.status,
+            "name": obj.name,
+            "namespace": obj.namespace,
+            "uid": body["metadata"]["uid"],
+            "labels": {},
+            "annotations": {},
+            "patch": patch,
+            "logger": LOGGER,
+            "reason": kopf.Reason(phase),
+            "old": old_body,
+            "new": new_body,
+            "diff": (),
+            "retry": 0,
+            "started": None,
+            "runtime": None,
+            "memo": kopf.Memo(),
+            "resource": obj.resource,
+            "param": None,
+        }
+        handler_id = handler.__name__
+        if phase == "update":
+            # the update handler is a field handler, it sees only the spec like kopf's adjust_cause
+            kwargs["old"] = old
+            kwargs["new"] = obj.spec
+            handler_id = f"{handler_id}/spec"
+        try:
+            result = await handler(**kwargs)
+        except Exception as exc:
+            self.errors.append(f"{phase} {obj.namespace}/{obj.name}: {exc!r}")
+            return
+        self.sink.write(obj, handler_id, result, patch)
+
+    async def _phase(self, phase: str) -> dict[str, Any]:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        calls_before, attempts_before = self.api_calls.snapshot()
+        reads = get_read_flights(get_config())
+        reads_before, shared_before = reads.calls, reads.shared
+        writes_before = self.sink.writes
+        events = get_event_aggregator(get_config())
+        logs_before, transitions_before = self.logs.messages, events.recorded
+        errors_before = len(self.errors)
+
+        async def handle(index: int, obj: SyntheticObject) -> None:
+            async with semaphore:
+                old = None
+                if phase == "update":
+                    record_type = SCHEMAS_BY_KIND[obj.resource.kind]
+                    old = dict(obj.spec)
+                    obj.spec = {**obj.spec, "value": VALUES[record_type][1](index)}
+                await self._dispatch(obj, phase, old=old)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(handle(index, obj) for index, obj in enumerate(self.objects)))
+        elapsed = time.perf_counter() - start
+
+        calls_after, attempts_after = self.api_calls.snapshot()
+        calls = calls_after - calls_before
+        return {
+            "events": len(self.objects),
+            "seconds": round(elapsed, 3),
+            "events_per_sec": round(len(self.objects) / elapsed, 2),
+            "api_calls": dict(calls),
+            "api_calls_per_record": round(sum(calls.values()) / len(self.objects), 3),
+            "api_attempts_per_record": round((attempts_after - attempts_before) / len(self.objects), 3),
+            "read_dedup_ratio": round((reads.shared - shared_before) / max(reads.calls - reads_before, 1), 3),
+            "status_writes": self.sink.writes - writes_before,
+            "log_messages_per_record": round((self.logs.messages - logs_before) / len(self.objects), 3),
+            "transition_events_per_record": round((events.recorded - transitions_before) / len(self.objects), 3),
+            "errors": len(self.errors) - errors_before,
+        }
+
+    async def run(self, phases: tuple[str] = PHASES) -> dict[str, Any]:
+        """
+        Run every phase over every synthetic object
+
+        Returns:
+            dict[str, Any]: Report with a result per phase and the peak memory
+        """
+        saved = self._configure()
+        get_event_aggregator(get_config())._post = self.sink.post_event
+        level, propagate = LOGGER.level, LOGGER.propagate
+        LOGGER.setLevel(logging.DEBUG)
+        LOGGER.propagate = False
+        LOGGER.addHandler(self.logs)
+        tracemalloc.start()
+        try:
+            zones = await self._create_zones()
+            self._build_objects(zones)
+            report = {
+                "records": self.records,
+                "zones": self.zones,
+                "record_types": list(self.record_types),
+                "concurrency": self.concurrency,
+                "phases": {},
+            }
+            for phase in phases:
+                report["phases"][phase] = await self._phase(phase)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+            LOGGER.removeHandler(self.logs)
+            LOGGER.setLevel(level)
+            LOGGER.propagate = propagate
+            await get_orphan_collector(get_config()).close()
+            await get_zone_reconciler(get_config()).close()
+            await get_event_aggregator(get_config()).close()
+            await get_zone_cache(get_config()).close()
+            await get_account_pool(get_config()).close()
+            self._restore(saved)
+        report["peak_memory_mb"] = round(peak / 1024 / 1024, 2)
+        report["peak_memory_bytes_per_record"] = round(peak / self.records)
+        report["event_writes"] = self.sink.events
+        report["first_errors"] = self.errors[:10]
+        return report
+
+
+def print_report(report: dict[str, Any]) -> None:
+    """Print a report as a table"""
+    print(
+        f"\n{report['records']} records over {report['zones']} zones, concurrency {report['concurrency']}, "
+        f"peak memory {report['peak_memory_mb']}MB ({report['peak_memory_bytes_per_record']} bytes/record)"
+    )
+    print(f"{'phase':<10}{'events/s':>10}{'seconds':>10}{'calls/rec':>11}{'attempts/rec':>14}{'errors':>8}")
+    for phase, result in report["phases"].items():
+        print(
+            f"{phase:<10}{result['events_per_sec']:>10.1f}{result['seconds']:>10.1f}"
+            f"{result['api_calls_per_record']:>11.2f}{result['api_attempts_per_record']:>14.2f}{result['errors']:>8}"
+        )
+    for error in report["first_errors"]:
+        print(f"  {error}")
+
+
+async def main(args: argparse.Namespace) -> dict[str, Any]:
+    faults = Route53Faults(requests_per_second=args.route53_rate) if args.route53_rate else None
+    async with MotoProcess("route53", faults=faults) as route53:
+        harness = ScaleHarness(
+            route53.endpoint_url,
+            records=args.records,
+            zones=args.zones,
+            record_types=tuple(args.types.split(",")),
+            concurrency=args.concurrency,
+            namespaces=args.namespaces,
+            config_overrides=dict(override.split("=", 1) for override in args.config),
+        )
+        return await harness.run()
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=1000, help="number of record CRs")
+    parser.add_argument("--zones", type=int, default=10, help="number of hosted zones")
+    parser.add_argument("--namespaces", type=int, default=1, help="number of namespaces")
+    parser.add_argument("--types", default="A,CNAME,TXT", help="comma separated record types")
+    parser.add_argument("--concurrency", type=int, default=1000, help="objects handled at the same time")
+    parser.add_argument("--route53-rate", type=float, default=None, help="throttle the stand-in at this rate")
+    parser.add_argument(
+        "--config", action="append", default=[], help="operator config as ENV_VAR=value, may be repeated"
+    )
+    parser.add_argument("--output", type=Path, default=None, help="write the report as JSON to this file")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    arguments = parse_args()
+    result = asyncio.run(main(arguments))
+    print_report(result)
+    if arguments.output is not None:
+        arguments.output.parent.mkdir(parents=True, exist_ok=True)
+        arguments.output.write_text(json.dumps(result, indent=2))
@@ -0,0 +1,31 @@
+"""Smoke test the scale harness, which also runs every registered record handler end to end"""
+import pytest
+
+from tests.moto_server import MotoProcess
+from tests.scale.harness import ScaleHarness
+
+
+@pytest.mark.slow
+@pytest.mark.asyncio
+async def test_scale_harness():
+    """Every phase handles every record without errors, with the expected Route53 calls"""
+    async with MotoProcess("route53") as route53:
+        report = await ScaleHarness(route53.endpoint_url, records=30, zones=3, concurrency=10).run()
+
+    assert report["first_errors"] == []
+    for phase in report["phases"].values():
+        assert phase["events"] == 30
+        assert phase["errors"] == 0
+        assert phase["status_writes"] == 30
+    # create and update change the record then read it back, resume reads it, reads of a zone share range scans and
+    # deletes to a zone share ChangeBatches
+    assert 1 < report["phases"]["create"]["api_calls_per_record"] < 2
+    # at most one scan per zone for every wave of 10 concurrent resumes
+    assert report["phases"]["resume"]["api_calls"]["ListResourceRecordSets"] <= 9
+    assert 1 < report["phases"]["update"]["api_calls_per_record"] < 2
+    assert report["phases"]["delete"]["api_calls_per_record"] < 1
+    # every create logs several messages, a record that changed gets one Event and one that didn't gets none
+    assert report["phases"]["create"]["log_messages_per_record"] >= 2
+    assert report["phases"]["create"]["transition_events_per_record"] == 1
+    assert report["phases"]["resume"]["transition_events_per_record"] == 0
+    assert report["phases"]["update"]["transition_events_per_record"] == 1
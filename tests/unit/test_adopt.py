@@ -0,0 +1,133 @@
+"""Test adopting the records of a hosted zone"""
+import logging
+import math
+
+import pytest
+
+from route53_operator.crud.a import ACrud
+from route53_operator.handlers.v1._base import create_record
+from route53_operator.lib.adopt import ADOPTED_ANNOTATION
+from route53_operator.lib.adopt import ZoneAdopter
+from route53_operator.lib.aws import AccountPool
+from route53_operator.lib.changes import submit_changes
+from route53_operator.lib.ownership import claim_record_set
+from route53_operator.lib.zone_cache import ZoneCache
+from route53_operator.schemas.v1 import ARecord
+
+LOGGER = logging.getLogger(__name__)
+
+
+@pytest.fixture(name="change_calls")
+def count_change_calls(moto_zone):
+    """Names of the ChangeResourceRecordSets calls made, clients must be created after this fixture"""
+    calls = []
+
+    def count_changes(**kwargs):
+        calls.append(kwargs["model"].name)
+
+    moto_zone["session"].register("before-call.route53.ChangeResourceRecordSets", count_changes)
+    yield calls
+    moto_zone["session"].unregister("before-call.route53.ChangeResourceRecordSets", count_changes)
+
+
+@pytest.mark.asyncio
+async def test_adopt(moto_zone, change_calls):
+    """Unclaimed records become adopted record objects, listed a page at a time and claimed in full ChangeBatches"""
+    config = moto_zone["config"].copy(update={"ownership_enabled": True})
+    zone_id, zone_name = moto_zone["zone_id"], moto_zone["name"]
+    records = [
+        {"Name": f"r{i}.{zone_name}", "Type": "A", "TTL": 60, "ResourceRecords": [{"Value": f"10.0.{i // 256}.{i % 256}"}]}
+        for i in range(400)
+    ]
+    records += [
+        {"Name": f"claimed.{zone_name}", "Type": "A", "TTL": 60, "ResourceRecords": [{"Value": "10.1.0.1"}]},
+        claim_record_set(f"claimed.{zone_name}", "A", "other"),
+        {"Name": f"mx.{zone_name}", "Type": "MX", "TTL": 60, "ResourceRecords": [{"Value": "10 mail.example.com."}]},
+        {"Name": f"www.{zone_name}", "Type": "CNAME", "TTL": 60, "ResourceRecords": [{"Value": "r1.example.com."}]},
+    ]
+    applied = []
+
+    def apply(obj: dict):
+        if obj["metadata"]["name"].startswith("r7."):
+            raise ValueError("the object could not be applied")
+        applied.append(obj)
+
+    async with AccountPool(config, session=moto_zone["session"]) as accounts:
+        await submit_changes(accounts, zone_id, [{"Action": "CREATE", "ResourceRecordSet": rs} for rs in records])
+        change_calls.clear()
+        adopter = ZoneAdopter(config, zone_id, namespace="dns", apply=apply, concurrency=4, logger=LOGGER)
+        report = await adopter.adopt(accounts)
+        snapshot = await ZoneCache(accounts).load(zone_id)
+
+        # SOA and NS are in the zone too
+        assert report.record_sets == len(records) + 2
+        assert report.list_calls == math.ceil(report.record_sets / 300)
+        assert (report.adopted, report.invalid) == (400, 1)
+        assert report.skipped == {"claimed": 1, "MX": 1, "SOA": 1, "NS": 1}
+        # claims are CREATEs, which count once against the 1000 records and 32000 characters of a ChangeBatch
+        assert len(change_calls) == report.change_calls == 1
+        assert snapshot.owner(f"r399.{zone_name}", "A") == "default"
+        assert snapshot.owner(f"claimed.{zone_name}", "A") == "other"
+        # a record whose object could not be applied is not claimed, garbage collection would delete it
+        assert snapshot.owner(f"r7.{zone_name}", "A") is None
+
+        prefix = zone_name.rstrip(".")
+        names = {obj["metadata"]["name"] for obj in applied}
+        assert f"r0.{prefix}-a" in names and f"www.{prefix}-cname" in names
+        assert f"claimed.{prefix}-a" not in names
+
+        # the first reconcile of an adopted object doesn't write to Route53
+        adopted = next(obj for obj in applied if obj["metadata"]["name"] == f"r0.{prefix}-a")
+        crud = ACrud(config=config, logger=LOGGER, accounts=accounts)
+        change_calls.clear()
+        status = await create_record(crud, ARecord, adopted["spec"], adopted["metadata"]["annotations"])
+        assert status["value"] == ["10.0.0.0"]
+        assert change_calls == []
+
+        # once the spec changes it no longer matches the record it was adopted from
+        changed = {**adopted["spec"], "value": ["10.2.0.1"]}
+        annotations = {ADOPTED_ANNOTATION: adopted["metadata"]["annotations"][ADOPTED_ANNOTATION]}
+        await create_record(crud, ARecord, changed, annotations)
+        assert len(change_calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_adopt_dry_run(moto_zone):
+    """A dry run reports what would be adopted without applying or claiming anything"""
+    applied = []
+    async with AccountPool(moto_zone["config"], session=moto_zone["session"]) as accounts:
+        adopter = ZoneAdopter(moto_zone["config"], moto_zone["zone_id"], namespace="dns", apply=applied.append)
+        report = await adopter.adopt(accounts, dry_run=True)
+    assert report.adopted == 0
+    assert report.list_calls == 1
+    assert applied == []
+
+
+@pytest.mark.asyncio
+async def test_adopt_claim_race(moto_zone, change_calls):
+    """A record another owner claims while it is adopted stays theirs, the other adopted records are claimed"""
+    config = moto_zone["config"].copy(update={"ownership_enabled": True})
+    zone_id, zone_name = moto_zone["zone_id"], moto_zone["name"]
+    records = [
+        {"Name": f"r{i}.{zone_name}", "Type": "A", "TTL": 60, "ResourceRecords": [{"Value": f"10.0.0.{i}"}]}
+        for i in range(5)
+    ]
+
+    class RacingAdopter(ZoneAdopter):
+        async def _claim(self, accounts, groups, report):
+            if not change_calls:
+                claim = claim_record_set(f"r2.{zone_name}", "A", "other")
+                await submit_changes(accounts, zone_id, [{"Action": "CREATE", "ResourceRecordSet": claim}])
+            await super()._claim(accounts, groups, report)
+
+    async with AccountPool(config, session=moto_zone["session"]) as accounts:
+        await submit_changes(accounts, zone_id, [{"Action": "CREATE", "ResourceRecordSet": rs} for rs in records])
+        change_calls.clear()
+        adopter = RacingAdopter(config, zone_id, namespace="dns", apply=lambda obj: None, logger=LOGGER)
+        report = await adopter.adopt(accounts)
+        snapshot = await ZoneCache(accounts).load(zone_id)
+
+    assert report.adopted == 5
+    assert [error.split(":")[0] for error in report.errors] == [f"r2.{zone_name}"]
+    assert snapshot.owner(f"r2.{zone_name}", "A") == "other"
+    assert [snapshot.owner(f"r{i}.{zone_name}", "A") for i in (0, 1, 3, 4)] == ["default"] * 4
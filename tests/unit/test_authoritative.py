@@ -0,0 +1,159 @@
+"""Test whole-zone reconciliation of authoritative zones"""
+from logging import getLogger
+
+import pytest
+
+from route53_operator.crud import ZoneReconciler
+from route53_operator.lib.aws import AccountPool
+from route53_operator.lib.changes import submit_changes
+from route53_operator.lib.ownership import claim_record_set
+from route53_operator.lib.zone_cache import ZoneCache
+from route53_operator.schemas.v1 import ARecord
+from route53_operator.schemas.v1 import RecordSet
+from route53_operator.schemas.v1 import TXTRecord
+
+LOGGER = getLogger(__name__)
+
+
+def obj(name: str, spec: dict, created: str = "2024-01-01T00:00:00Z") -> dict:
+    return {"metadata": {"name": name, "namespace": "default", "creationTimestamp": created}, "spec": spec}
+
+
+@pytest.mark.asyncio
+async def test_zone_reconciler(moto_zone):
+    """One listing, one diff: missing and changed records are written, unmanaged ones deleted, the apex is kept"""
+    zone_id, zone_name = moto_zone["zone_id"], moto_zone["name"]
+    config = moto_zone["config"].copy(update={"authoritative_zones": [zone_id]})
+    calls = []
+
+    def count_changes(**kwargs):
+        calls.append(len(kwargs["params"]["ChangeBatch"]["Changes"]))
+
+    objects = [
+        (ARecord, obj("www", {"hosted_zone_id": zone_id, "name": f"www.{zone_name}", "value": ["10.0.0.1"]})),
+        # a newer object naming the same record loses
+        (ARecord, obj("www2", {"hosted_zone_id": zone_id, "name": f"www.{zone_name}", "value": ["10.0.0.9"]}, "~")),
+        # an object whose spec doesn't validate still keeps its record
+        (ARecord, obj("bad", {"hosted_zone_id": zone_id, "name": f"bad.{zone_name}", "value": ["not an ip"]})),
+        (
+            RecordSet,
+            obj(
+                "bundle",
+                {
+                    "hosted_zone_id": zone_id,
+                    "entries": [{"type": "TXT", "name": f"{i}.{zone_name}", "value": ['"v"']} for i in "abc"],
+                },
+            ),
+        ),
+    ]
+
+    async def list_objects():
+        return objects
+
+    moto_zone["session"].register("before-parameter-build.route53.ChangeResourceRecordSets", count_changes)
+    try:
+        async with AccountPool(config, session=moto_zone["session"]) as accounts:
+            existing = [
+                ARecord(hosted_zone_id=zone_id, name=f"www.{zone_name}", value=["10.0.0.2"]),
+                ARecord(hosted_zone_id=zone_id, name=f"bad.{zone_name}", value=["10.0.0.3"]),
+                ARecord(hosted_zone_id=zone_id, name=f"unmanaged.{zone_name}", value=["10.0.0.4"]),
+                TXTRecord(hosted_zone_id=zone_id, name=f"a.{zone_name}", value='"v"'),
+            ]
+            await submit_changes(
+                accounts, zone_id, [{"Action": "CREATE", "ResourceRecordSet": record.recordset} for record in existing]
+            )
+            zone_cache = ZoneCache(accounts)
+            reconciler = ZoneReconciler(config, accounts, objects=list_objects, zone_cache=zone_cache, logger=LOGGER)
+            assert reconciler.authoritative(f"/hostedzone/{zone_id}")
+            assert not reconciler.authoritative(zone_id, "other-account")
+
+            (report,) = await reconciler.reconcile(dry_run=True)
+            assert (report.desired, report.unchanged, report.upserts, report.deletes) == (4, 1, 3, 1)
+            calls.clear()
+            (report,) = await reconciler.reconcile()
+            (again,) = await reconciler.reconcile()
+
+            snapshot = await zone_cache.load(zone_id)
+            assert snapshot.get(f"www.{zone_name}", "A")["ResourceRecords"] == [{"Value": "10.0.0.1"}]
+            assert snapshot.get(f"bad.{zone_name}", "A") is not None
+            assert snapshot.get(f"unmanaged.{zone_name}", "A") is None
+            assert all(snapshot.get(f"{i}.{zone_name}", "TXT") is not None for i in "abc")
+            assert snapshot.get(zone_name, "SOA") is not None and snapshot.get(zone_name, "NS") is not None
+    finally:
+        moto_zone["session"].unregister("before-parameter-build.route53.ChangeResourceRecordSets", count_changes)
+
+    assert calls == [4]
+    assert (report.change_batches, again.upserts, again.deletes, again.unchanged) == (1, 0, 0, 4)
+
+
+@pytest.mark.asyncio
+async def test_zone_reconciler_foreign_claims(moto_zone):
+    """Records claimed by another owner are left alone, the rest of the diff goes through"""
+    zone_id, zone_name = moto_zone["zone_id"], moto_zone["name"]
+    config = moto_zone["config"].copy(
+        update={"authoritative_zones": [zone_id], "ownership_enabled": True, "ownership_owner_id": "cluster-a"}
+    )
+    objects = [
+        (ARecord, obj("theirs", {"hosted_zone_id": zone_id, "name": f"theirs.{zone_name}", "value": ["10.0.0.1"]})),
+        (ARecord, obj("mine", {"hosted_zone_id": zone_id, "name": f"mine.{zone_name}", "value": ["10.0.0.2"]})),
+    ]
+
+    async def list_objects():
+        return objects
+
+    async with AccountPool(config, session=moto_zone["session"]) as accounts:
+        records = [
+            ARecord(hosted_zone_id=zone_id, name=f"theirs.{zone_name}", value=["10.0.0.5"]).recordset,
+            ARecord(hosted_zone_id=zone_id, name=f"orphan.{zone_name}", value=["10.0.0.6"]).recordset,
+            claim_record_set(f"theirs.{zone_name}", "A", "cluster-b"),
+            claim_record_set(f"orphan.{zone_name}", "A", "cluster-b"),
+        ]
+        await submit_changes(
+            accounts, zone_id, [{"Action": "CREATE", "ResourceRecordSet": record} for record in records]
+        )
+        zone_cache = ZoneCache(accounts)
+        reconciler = ZoneReconciler(config, accounts, objects=list_objects, zone_cache=zone_cache, logger=LOGGER)
+        (report,) = await reconciler.reconcile()
+        assert (report.foreign, report.upserts, report.deletes, report.failed) == (2, 1, 0, 0)
+
+        snapshot = await zone_cache.load(zone_id)
+        assert snapshot.get(f"theirs.{zone_name}", "A")["ResourceRecords"] == [{"Value": "10.0.0.5"}]
+        assert snapshot.get(f"orphan.{zone_name}", "A") is not None
+        assert snapshot.owner(f"theirs.{zone_name}", "A") == "cluster-b"
+        assert snapshot.owner(f"mine.{zone_name}", "A") == "cluster-a"
+
+
+@pytest.mark.asyncio
+async def test_zone_reconciler_bisects_rejected_batches(moto_zone):
+    """A change Route53 rejects fails on its own, the others in its ChangeBatch are applied"""
+    zone_id, zone_name = moto_zone["zone_id"], moto_zone["name"]
+    config = moto_zone["config"].copy(
+        update={"authoritative_zones": [zone_id], "ownership_enabled": True, "ownership_owner_id": "cluster-a"}
+    )
+    objects = [
+        (ARecord, obj(f"r{i}", {"hosted_zone_id": zone_id, "name": f"r{i}.{zone_name}", "value": ["10.0.0.1"]}))
+        for i in range(4)
+    ]
+
+    async def list_objects():
+        return objects
+
+    async with AccountPool(config, session=moto_zone["session"]) as accounts:
+        zone_cache = ZoneCache(accounts)
+        listing = [record_set async for record_set in zone_cache.stream(zone_id)]
+        # another owner claims a record after the zone was streamed, the CREATE of our claim is rejected
+        claim = claim_record_set(f"r2.{zone_name}", "A", "cluster-b")
+        await submit_changes(accounts, zone_id, [{"Action": "CREATE", "ResourceRecordSet": claim}])
+
+        async def stream(hosted_zone_id, account=None):
+            for record_set in listing:
+                yield record_set
+
+        zone_cache.stream = stream
+        reconciler = ZoneReconciler(config, accounts, objects=list_objects, zone_cache=zone_cache, logger=LOGGER)
+        (report,) = await reconciler.reconcile()
+        assert (report.upserts, report.failed, report.change_batches) == (4, 1, 2)
+
+        snapshot = await ZoneCache(accounts).load(zone_id)
+        assert [snapshot.get(f"r{i}.{zone_name}", "A") is not None for i in range(4)] == [True, True, False, True]
+        assert snapshot.owner(f"r2.{zone_name}", "A") == "cluster-b"
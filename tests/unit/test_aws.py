@@ -0,0 +1,63 @@
+"""Test the AWS account pool from src/route53_operator/lib/aws.py"""
+import pytest
+from botocore.exceptions import UnknownServiceError
+
+from route53_operator.exceptions import UnknownAccountError
+from route53_operator.lib.aws import AccountPool
+from route53_operator.lib.aws import get_data_loader
+from route53_operator.lib.aws import new_session
+
+
+def test_unknown_account(test_config):
+    """Asking for an account that is not configured raises"""
+    pool = AccountPool(test_config)
+    with pytest.raises(UnknownAccountError):
+        pool.account("nope")
+
+
+@pytest.mark.asyncio
+async def test_default_account_reuses_client(moto_zone):
+    """The operator's own account keeps one client open across requests"""
+    async with AccountPool(moto_zone["config"], session=moto_zone["session"]) as pool:
+        async with pool.client() as first:
+            await first.get_hosted_zone(Id=moto_zone["zone_id"])
+        async with pool.client() as second:
+            await second.get_hosted_zone(Id=moto_zone["zone_id"])
+        assert first is second
+
+
+@pytest.mark.asyncio
+async def test_assumed_role_account(moto_zone, sts_server):
+    """An account with a role assumes it on start and keeps the credentials for its client"""
+    config = moto_zone["config"].copy(
+        update={
+            "aws_accounts": {"other": "arn:aws:iam::123456789012:role/route53-operator"},
+            "aws_sts_endpoint_url": sts_server,
+        }
+    )
+    async with AccountPool(config, session=moto_zone["session"]) as pool:
+        await pool.start()
+        account = pool.account("other")
+        assert account.started
+        assert account.credentials_expiration is not None
+        async with pool.client("other") as client:
+            credentials = await client._request_signer._credentials.get_frozen_credentials()
+            assert credentials.access_key != config.aws_access_key_id
+
+
+@pytest.mark.asyncio
+async def test_service_data_loader(moto_zone):
+    """Sessions share one loader that only knows about route53 and sts"""
+    loader = get_data_loader()
+    assert loader.list_available_services("service-2") == ["route53", "sts"]
+    with pytest.raises(UnknownServiceError):
+        loader.load_service_model("s3", "service-2")
+    for partition in loader.load_data("endpoints")["partitions"]:
+        assert set(partition["services"]) <= {"route53", "sts"}
+
+    session = new_session()
+    assert session.get_component("data_loader") is new_session().get_component("data_loader") is loader
+    async with AccountPool(moto_zone["config"], session=session) as pool:
+        async with pool.client() as client:
+            response = await client.get_hosted_zone(Id=moto_zone["zone_id"])
+    assert response["HostedZone"]["Name"] == moto_zone["name"]
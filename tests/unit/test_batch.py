@@ -0,0 +1,102 @@
+"""Test the delete aggregator and ChangeBatch helpers"""
+import asyncio
+from logging import getLogger
+
+import pytest
+
+from route53_operator.crud import ACrud
+from route53_operator.crud import DeleteAggregator
+from route53_operator.exceptions import RecordNotFoundError
+from route53_operator.lib.aws import AccountPool
+from route53_operator.lib.changes import chunk_changes
+from route53_operator.lib.changes import normalize_zone_id
+from route53_operator.lib.zone_cache import ZoneCache
+from route53_operator.lib.zone_store import ZoneStore
+from route53_operator.schemas.v1 import ARecord
+
+LOGGER = getLogger(__name__)
+
+
+def _change(action: str, values: list[str]) -> dict:
+    return {
+        "Action": action,
+        "ResourceRecordSet": {
+            "Name": "test.example.com.",
+            "Type": "TXT",
+            "TTL": 300,
+            "ResourceRecords": [{"Value": value} for value in values],
+        },
+    }
+
+
+def test_chunk_changes_limits():
+    """Batches are split on the record and character limits, UPSERTs count twice"""
+    deletes = [_change("DELETE", ["a", "b"]) for _ in range(10)]
+    assert [len(batch) for batch in chunk_changes(deletes, max_records=6)] == [3, 3, 3, 1]
+    assert [len(batch) for batch in chunk_changes(deletes, max_chars=5)] == [2, 2, 2, 2, 2]
+    upserts = [_change("UPSERT", ["a"]) for _ in range(4)]
+    assert [len(batch) for batch in chunk_changes(upserts, max_records=4)] == [2, 2]
+    assert chunk_changes([]) == []
+
+
+@pytest.mark.asyncio
+async def test_delete_aggregator_coalesces(moto_zone):
+    """Concurrent deletes to a zone go out in one ChangeBatch, even when a spec is stale or the record is gone"""
+    config = moto_zone["config"].copy(update={"delete_batch_window": 0.2, "change_poll_interval": 0.1})
+    calls = []
+
+    def count_changes(**kwargs):
+        calls.append(kwargs["model"].name)
+
+    moto_zone["session"].register("before-call.route53.ChangeResourceRecordSets", count_changes)
+    try:
+        async with AccountPool(config, session=moto_zone["session"]) as accounts:
+            crud = ACrud(config=config, logger=LOGGER, accounts=accounts)
+            records = [
+                ARecord(hosted_zone_id=moto_zone["zone_id"], name=f"r{i}.{moto_zone['name']}", value=["10.0.0.1"])
+                for i in range(20)
+            ]
+            for record in records:
+                await crud.create(record_in=record)
+            calls.clear()
+
+            aggregator = DeleteAggregator(config, accounts, ZoneCache(accounts), logger=LOGGER)
+            stale = records[0].copy(update={"ttl": 60})
+            missing = ARecord(hosted_zone_id=moto_zone["zone_id"], name=f"gone.{moto_zone['name']}", value=["1.1.1.1"])
+            # the zone id with and without its /hostedzone/ prefix is the same zone
+            bare = [
+                record.copy(update={"hosted_zone_id": normalize_zone_id(record.hosted_zone_id)})
+                for record in records[1:10]
+            ]
+            await asyncio.gather(*(aggregator.delete(record) for record in [stale, missing, *bare, *records[10:]]))
+
+            for record in records:
+                with pytest.raises(RecordNotFoundError):
+                    await crud.get(hosted_zone_id=moto_zone["zone_id"], name=record.name)
+    finally:
+        moto_zone["session"].unregister("before-call.route53.ChangeResourceRecordSets", count_changes)
+
+    # the first batch is rejected for the stale and missing records, the zone is loaded and the rest go out together
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_delete_with_restored_snapshot(tmp_path, moto_zone):
+    """A record created while the operator was down is deleted, not taken for gone because the restored zone lacks it"""
+    config = moto_zone["config"].copy(update={"delete_batch_window": 0, "change_poll_interval": 0.1})
+    path = str(tmp_path / "zones.db")
+    record = ARecord(hosted_zone_id=moto_zone["zone_id"], name=f"late.{moto_zone['name']}", value=["10.0.0.1"])
+
+    async with AccountPool(config, session=moto_zone["session"]) as accounts:
+        cache = ZoneCache(accounts, ZoneStore(path))
+        await cache.load(moto_zone["zone_id"])
+        await cache.close()
+        crud = ACrud(config=config, logger=LOGGER, accounts=accounts, zone_cache=ZoneCache(accounts))
+        await crud.create(record_in=record)
+
+        cache = ZoneCache(accounts, ZoneStore(path))
+        assert cache.restore() == 1
+        await DeleteAggregator(config, accounts, cache, logger=LOGGER).delete(record)
+        await cache.close()
+        with pytest.raises(RecordNotFoundError):
+            await crud.get(hosted_zone_id=moto_zone["zone_id"], name=record.name)
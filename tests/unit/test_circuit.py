@@ -0,0 +1,84 @@
+"""Test circuit breaking of calls to Route53"""
+import pytest
+from botocore.exceptions import ClientError
+from botocore.exceptions import EndpointConnectionError
+
+from route53_operator import kopf
+from route53_operator.exceptions import CircuitOpenError
+from route53_operator.exceptions import InvalidRecordChange
+from route53_operator.handlers.v1._base import throttled
+from route53_operator.lib.aws import AccountPool
+from route53_operator.lib.circuit import CircuitBreaker
+from route53_operator.lib.circuit import CLOSED
+from route53_operator.lib.circuit import HALF_OPEN
+from route53_operator.lib.circuit import OPEN
+
+
+def client_error(code: str, status: int = 400) -> ClientError:
+    response = {"Error": {"Code": code}, "ResponseMetadata": {"HTTPStatusCode": status}}
+    return ClientError(response, "ChangeResourceRecordSets")
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_circuit_breaker():
+    """Outages open the circuit, it fails fast while open, probes when half open and closes once a probe succeeds"""
+    clock = Clock()
+    circuit = CircuitBreaker("change_resource_record_sets in account None", 3, 10, 300, clock=clock)
+    circuit.after_call(circuit.before_call(), client_error("Throttling"))
+    circuit.after_call(circuit.before_call(), EndpointConnectionError(endpoint_url="https://route53.amazonaws.com"))
+    # an answer shows the API works, even when it is an error
+    try:
+        raise InvalidRecordChange("Invalid record change") from client_error("InvalidChangeBatch")
+    except InvalidRecordChange as exc:
+        circuit.after_call(circuit.before_call(), exc)
+    assert (circuit.state, circuit.failures) == (CLOSED, 0)
+    for _ in range(3):
+        circuit.after_call(circuit.before_call(), client_error("ServiceUnavailable", 503))
+    assert circuit.state == OPEN
+
+    clock.now = 4
+    with pytest.raises(CircuitOpenError) as exc_info:
+        circuit.before_call()
+    # the retries are spread over the open period after it ends
+    assert 6 <= exc_info.value.retry_after <= 16
+
+    clock.now = 10
+    probe = circuit.before_call()
+    assert probe and circuit.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        circuit.before_call()
+    circuit.after_call(probe, client_error("InternalFailure", 500))
+    # opening again before it closed doubles the period
+    clock.now = 29
+    with pytest.raises(CircuitOpenError):
+        circuit.before_call()
+
+    clock.now = 30
+    circuit.after_call(circuit.before_call())
+    assert (circuit.state, circuit.opened) == (CLOSED, 0)
+
+
+@pytest.mark.asyncio
+async def test_account_circuit(moto_zone):
+    """Calls of an operation fail fast once its circuit opened, and handlers retry them once it may let them through"""
+    config = moto_zone["config"].copy(update={"circuit_failure_threshold": 1, "circuit_open_seconds": 30})
+    async with AccountPool(config, session=moto_zone["session"]) as accounts:
+        with pytest.raises(ClientError):
+            async with accounts.client(operation="get_change"):
+                raise client_error("Throttling")
+        with pytest.raises(kopf.TemporaryError) as exc_info:
+            with throttled(None, None):
+                async with accounts.client(operation="get_change"):
+                    raise AssertionError("no call while the circuit is open")
+        assert 30 <= exc_info.value.delay <= 60
+        # other operations have circuits of their own
+        async with accounts.client(operation="get_hosted_zone") as client:
+            await client.get_hosted_zone(Id=moto_zone["zone_id"])
+        assert accounts.circuit_states() == {"": {"get_change": OPEN, "get_hosted_zone": CLOSED}}
@@ -0,0 +1,40 @@
+"""Test the Config from src/route53_operator/lib/config.py"""
+import pytest
+from pydantic import ValidationError
+
+from route53_operator.lib.config import Config
+
+
+def test_transport_profile_defaults():
+    """The tuned transport profile ends up in the AioConfig"""
+    botoconfig = Config().aws_client_kwargs["config"]
+    assert botoconfig.max_pool_connections == 50
+    assert botoconfig.connect_timeout == 5
+    assert botoconfig.read_timeout == 20
+    assert botoconfig.tcp_keepalive is True
+    assert botoconfig.retries == {"mode": "adaptive", "total_max_attempts": 5}
+    assert botoconfig.connector_args["keepalive_timeout"] == 12
+
+
+def test_transport_profile_overrides():
+    """Transport settings can be overridden"""
+    config = Config(aws_max_pool_connections=5, aws_retry_mode="standard", aws_max_attempts=2)
+    botoconfig = config.aws_client_kwargs["config"]
+    assert botoconfig.max_pool_connections == 5
+    assert botoconfig.retries == {"mode": "standard", "total_max_attempts": 2}
+
+
+def test_keepalive_timeout():
+    """The keepalive timeout is positive or None"""
+    assert Config(aws_keepalive_timeout=None).aws_keepalive_timeout is None
+    for timeout in (0, -1):
+        with pytest.raises(ValidationError):
+            Config(aws_keepalive_timeout=timeout)
+
+
+def test_log_sample_rates_are_fractions():
+    """Sample rates outside of 0 to 1 are refused"""
+    assert Config(log_sample_rates={"route53_operator": 0.25}).log_sample_rates == {"route53_operator": 0.25}
+    for rate in (-0.1, 1.5):
+        with pytest.raises(ValidationError):
+            Config(log_sample_rates={"route53_operator": rate})
@@ -0,0 +1,89 @@
+"""Test conflicts between record objects claiming the same record"""
+import kopf
+import pytest
+
+from route53_operator.handlers.v1._base import check_conflicts
+from route53_operator.handlers.v1._base import release_claim
+from route53_operator.handlers.v1._base import watch_record
+from route53_operator.handlers.v1.record_set import entry_conflicts
+from route53_operator.handlers.v1.record_set import retry_conflicts
+from route53_operator.lib.conflicts import ConflictIndex
+from route53_operator.schemas.v1 import ARecord
+from route53_operator.schemas.v1 import RecordSet
+from route53_operator.schemas.v1 import TXTRecord
+
+
+def body(namespace: str, value: str, created: str, status: dict | None = None) -> dict:
+    return {
+        "metadata": {"namespace": namespace, "name": "www", "creationTimestamp": created},
+        "spec": {"hosted_zone_id": "/hostedzone/Z1", "name": "www.example.com", "value": [value]},
+        "status": status or {},
+    }
+
+
+def test_conflicts():
+    """The oldest object wins its record, the others get a conflict and must not write or delete it"""
+    index = ConflictIndex(retry_delay=5)
+    older = body("team-a", "10.0.0.1", "2023-01-01T00:00:00Z")
+    newer = body("team-b", "10.0.0.2", "2023-02-01T00:00:00Z")
+    watch_record(index, ARecord, {"type": "ADDED", "object": older})
+    # the same name as another kind is a different record
+    watch_record(index, TXTRecord, {"type": "ADDED", "object": {**newer, "spec": {**newer["spec"], "value": "x"}}})
+
+    check_conflicts(index, ARecord, older, kopf.Patch())
+    patch = kopf.Patch()
+    with pytest.raises(kopf.TemporaryError) as raised:
+        check_conflicts(index, ARecord, newer, patch)
+    assert raised.value.delay == 5
+    assert patch == {"status": {"conflict": "A record www.example.com. is managed by team-a/www"}}
+    assert list(index.conflicts().values()) == [["team-a/www", "team-b/www"]]
+
+    assert release_claim(index, ARecord, newer) is False
+    assert index.conflicts() == {}
+    # once the winner is gone the other object takes the record over and its conflict is cleared
+    watch_record(index, ARecord, {"type": "DELETED", "object": older})
+    patch = kopf.Patch()
+    check_conflicts(index, ARecord, body("team-b", "10.0.0.2", "", status={"conflict": "..."}), patch)
+    assert patch == {"status": {"conflict": None}}
+    assert index.conflicts() == {}
+
+
+def test_record_set_conflicts():
+    """Entries of a RecordSet and record objects naming the same record don't overwrite each other"""
+    index = ConflictIndex(retry_delay=5)
+    older = body("team-a", "10.0.0.1", "2023-01-01T00:00:00Z")
+    watch_record(index, ARecord, {"type": "ADDED", "object": older})
+    record_set = {
+        "metadata": {"namespace": "team-b", "name": "web", "creationTimestamp": "2023-02-01T00:00:00Z"},
+        "spec": {
+            "hosted_zone_id": "Z1",
+            "entries": [
+                {"type": "A", "name": "www.example.com.", "value": ["10.0.0.2"]},
+                {"type": "A", "name": "api.example.com.", "value": ["10.0.0.2"]},
+            ],
+        },
+    }
+    patch = kopf.Patch()
+    assert entry_conflicts(index, record_set, patch) == [("www.example.com.", "A")]
+    assert patch.status["conflict"] == "A record www.example.com. is managed by team-a/www"
+    status = {"hosted_zone_id": "Z1", "change_id": "C1", "entries": []}
+    with pytest.raises(kopf.TemporaryError) as raised:
+        retry_conflicts(index, status, patch, "create_record_set")
+    assert raised.value.delay == 5
+    # the state of every entry is kept while the set is retried
+    assert patch.status["create_record_set"] == status
+
+    # a newer record object loses to the set
+    newer = {**body("team-c", "10.0.0.3", "2023-03-01T00:00:00Z"), "spec": {**older["spec"], "name": "api.example.com"}}
+    with pytest.raises(kopf.TemporaryError):
+        check_conflicts(index, ARecord, newer, kopf.Patch())
+
+    watch_record(index, ARecord, {"type": "DELETED", "object": older})
+    patch = kopf.Patch()
+    assert entry_conflicts(index, {**record_set, "status": {"conflict": "..."}}, patch) == []
+    assert patch == {"status": {"conflict": None}}
+    assert retry_conflicts(index, status, patch, "create_record_set") is status
+    # once the set is gone the record object takes its record over
+    watch_record(index, RecordSet, {"type": "DELETED", "object": record_set})
+    check_conflicts(index, ARecord, newer, kopf.Patch())
+    assert index.conflicts() == {}
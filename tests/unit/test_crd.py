@@ -1,11 +1,12 @@
 from route53_operator.crds import ARecordCRD
 from route53_operator.crds import CNAMERecordCRD
+from route53_operator.crds import RecordSetCRD
 from route53_operator.crds import TXTRecordCRD
 import yaml
 import pytest
 import pytest
 
-CRD_OBJECTS = [ARecordCRD, CNAMERecordCRD, TXTRecordCRD]
+CRD_OBJECTS = [ARecordCRD, CNAMERecordCRD, TXTRecordCRD, RecordSetCRD]
 
 
 @pytest.mark.parametrize("crd", CRD_OBJECTS)
@@ -18,3 +18,40 @@ async def test_a_crud_create(ls_zone):
     assert result.hosted_zone_id == ls_zone["zone_id"]
     assert result.name == f"test.{ls_zone['name']}"
     assert str(result.value[0]) == "10.10.0.1"
+
+
+@pytest.mark.asyncio
+async def test_a_crud_create_moto(moto_zone):
+    """Test the A CRUD create method against moto"""
+    from route53_operator.crud.a import ACrud
+    from route53_operator.lib.aws import AccountPool
+
+    async with AccountPool(moto_zone["config"], session=moto_zone["session"]) as accounts:
+        this_crud = ACrud(config=moto_zone["config"], logger=LOGGER, accounts=accounts)
+        this_record = ARecord(
+            hosted_zone_id=moto_zone["zone_id"], name=f"test.{moto_zone['name']}", value=["10.10.0.1"]
+        )
+        result = await this_crud.create(record_in=this_record)
+    assert result.hosted_zone_id == moto_zone["zone_id"]
+    assert result.name == f"test.{moto_zone['name']}"
+    assert str(result.value[0]) == "10.10.0.1"
+
+
+@pytest.mark.asyncio
+async def test_crud_dependencies(tmp_path, moto_zone):
+    """Passing an account pool keeps the journal, read flights and read batching"""
+    from route53_operator.crud.cname import CNAMECrud
+    from route53_operator.lib.aws import AccountPool
+    from route53_operator.lib.journal import get_change_journal
+    from route53_operator.lib.singleflight import get_read_flights
+
+    config = moto_zone["config"].copy(
+        update={"read_batch_window": 0.01, "change_journal_path": str(tmp_path / "changes.journal")}
+    )
+    async with AccountPool(config, session=moto_zone["session"]) as accounts:
+        this_crud = CNAMECrud(config=config, logger=LOGGER, accounts=accounts)
+        assert this_crud._journal is get_change_journal(config)
+        assert this_crud._reads is get_read_flights(config)
+        assert this_crud._read_batcher is not None
+        assert this_crud._zone_cache._accounts is accounts
+    await get_change_journal(config).close()
@@ -0,0 +1,54 @@
+"""Test coalescing of rapid spec edits"""
+import pytest
+
+from route53_operator.lib.debounce import Debouncer
+from route53_operator.schemas.v1 import ARecord
+
+
+def body(generation: int, value: str) -> dict:
+    return {
+        "metadata": {"uid": "u1", "name": "www", "namespace": "default", "generation": generation},
+        "spec": {"hosted_zone_id": "Z1", "name": "www.example.com.", "value": [value]},
+    }
+
+
+@pytest.mark.asyncio
+async def test_settle():
+    """Edits that arrive while waiting are folded into one, and the wait is bounded"""
+    bodies = iter([body(2, "10.0.0.2"), body(3, "10.0.0.3"), body(3, "10.0.0.3")])
+
+    async def fetch(schema, namespace, name):
+        assert (schema, namespace, name) == (ARecord, "default", "www")
+        return next(bodies)
+
+    debouncer = Debouncer(0.01, 5, fetch=fetch)
+    spec = await debouncer.settle(ARecord, body(1, "10.0.0.1"))
+    assert spec["value"] == ["10.0.0.3"]
+    assert debouncer.coalesced == 2
+
+    generation = iter(range(2, 1000))
+
+    async def always_changing(schema, namespace, name):
+        return body(next(generation), "10.0.0.4")
+
+    debouncer = Debouncer(0.01, 0.05, fetch=always_changing)
+    assert (await debouncer.settle(ARecord, body(1, "10.0.0.1")))["value"] == ["10.0.0.4"]
+    assert debouncer.coalesced < 10
+
+    async def unused(schema, namespace, name):
+        raise AssertionError("no read without a quiet period")
+
+    debouncer = Debouncer(0, 5, fetch=unused)
+    assert (await debouncer.settle(ARecord, body(1, "10.0.0.1")))["value"] == ["10.0.0.1"]
+
+
+def test_applied():
+    """The spec last applied for an object is remembered until the object is gone"""
+    debouncer = Debouncer(1, 5)
+    first, second = body(1, "10.0.0.1"), body(2, "10.0.0.2")
+    assert not debouncer.applied(first, first["spec"])
+    debouncer.done(first, second["spec"])
+    assert debouncer.applied(second, second["spec"])
+    assert not debouncer.applied(second, first["spec"])
+    debouncer.forget(second)
+    assert not debouncer.applied(second, second["spec"])
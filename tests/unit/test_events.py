@@ -0,0 +1,108 @@
+"""Test aggregating the transition Events of record objects"""
+import asyncio
+
+import pytest
+from botocore.exceptions import ClientError
+
+from route53_operator.handlers.v1._base import throttled
+from route53_operator.lib.events import APPLIED
+from route53_operator.lib.events import CONFLICT
+from route53_operator.lib.events import EventAggregator
+from route53_operator.lib.events import THROTTLED
+
+
+def body(name: str) -> dict:
+    return {
+        "apiVersion": "route53.dns/v1",
+        "kind": "ARecord",
+        "metadata": {"name": name, "namespace": "default", "uid": f"uid-{name}"},
+        "spec": {"name": f"{name}.example.com."},
+    }
+
+
+@pytest.mark.asyncio
+async def test_event_aggregator(test_config):
+    """Repeats fold into one Event with a count, and the per object and global limits hold Events back"""
+    config = test_config.copy(
+        update={"event_flush_interval": 0.01, "event_object_rate": 0.001, "event_object_burst": 2, "event_rate": 1000}
+    )
+    posted = []
+    events = EventAggregator(config, post=lambda *event: posted.append(event))
+
+    for _ in range(5):
+        events.record(body("www"), CONFLICT, "conflicts with default/other")
+    events.record(body("www"), APPLIED, "Created A www.example.com.")
+    events.record(body("www"), APPLIED, "Updated A www.example.com.")
+    events.record(body("api"), APPLIED, "Created A api.example.com.")
+    with pytest.raises(ValueError):
+        events.record(body("www"), "Creating", "not a transition")
+    await asyncio.sleep(0.05)
+
+    assert [(reference["metadata"]["name"], *rest) for reference, *rest in posted] == [
+        ("www", "Warning", CONFLICT, "conflicts with default/other (5 times)"),
+        ("www", "Normal", APPLIED, "Created A www.example.com."),
+        ("api", "Normal", APPLIED, "Created A api.example.com."),
+    ]
+    # www used its burst, its third Event waits
+    assert len(events) == 1
+    assert (events.recorded, events.folded, events.posted) == (8, 4, 3)
+    await events.close()
+
+
+@pytest.mark.asyncio
+async def test_event_aggregator_global_limit(test_config):
+    """Over the global limit Events wait, and closing posts what the limit allows"""
+    config = test_config.copy(update={"event_flush_interval": 60, "event_rate": 0.1})
+    posted = []
+    events = EventAggregator(config, post=lambda *event: posted.append(event))
+    for index in range(20):
+        events.record(body(f"r{index}"), APPLIED, "Created")
+    await events.close()
+    # the global burst is event_rate * event_flush_interval
+    assert len(posted) == 6
+    assert len(events) == 14
+
+
+@pytest.mark.asyncio
+async def test_event_aggregator_forget(test_config):
+    """A forgotten object's rate limit is dropped once its pending Events are posted, and not spent over the global
+    limit"""
+    config = test_config.copy(
+        update={"event_flush_interval": 60, "event_object_rate": 100, "event_object_burst": 1, "event_rate": 1000}
+    )
+    posted = []
+    events = EventAggregator(config, post=lambda *event: posted.append(event))
+    events.record(body("www"), APPLIED, "Created A www.example.com.")
+    events.record(body("www"), APPLIED, "Updated A www.example.com.")
+    assert events.flush() == 1
+    events.forget(body("www"))
+    assert "uid-www" in events._object_limits
+    await asyncio.sleep(0.02)
+    assert events.flush() == 1
+    assert not events._object_limits
+    assert not events._forgotten
+
+    config = config.copy(update={"event_rate": 0.1, "event_flush_interval": 10})
+    events = EventAggregator(config, post=lambda *event: posted.append(event))
+    events.record(body("www"), APPLIED, "Created A www.example.com.")
+    events.record(body("api"), APPLIED, "Created A api.example.com.")
+    assert events.flush() == 1
+    # api waits for the global limit without spending its own
+    assert list(events._object_limits) == ["uid-www"]
+    await events.close()
+
+
+@pytest.mark.asyncio
+async def test_throttled(test_config):
+    """A call Route53 throttles records a Throttled Event and still raises"""
+    config = test_config.copy(update={"event_flush_interval": 60})
+    events = EventAggregator(config, post=lambda *event: None)
+    error = ClientError({"Error": {"Code": "Throttling", "Message": "Rate exceeded"}}, "ChangeResourceRecordSets")
+    with pytest.raises(ClientError):
+        with throttled(events, body("www")):
+            raise error
+    with pytest.raises(KeyError):
+        with throttled(events, body("www")):
+            raise KeyError("not throttled")
+    assert [key[1] for key in events._pending] == [THROTTLED]
+    await events.close()
@@ -0,0 +1,87 @@
+"""Test the orphaned record garbage collector"""
+from logging import getLogger
+
+import pytest
+
+from route53_operator.crud import ACrud
+from route53_operator.crud import OrphanCollector
+from route53_operator.lib.aws import AccountPool
+from route53_operator.lib.changes import normalize_name
+from route53_operator.lib.changes import normalize_zone_id
+from route53_operator.lib.changes import route53_sort_key
+from route53_operator.lib.changes import submit_changes
+from route53_operator.lib.kube import LiveRecord
+from route53_operator.lib.ownership import claim_name
+from route53_operator.lib.ownership import claim_record_set
+from route53_operator.lib.zone_cache import ZoneCache
+from route53_operator.schemas.v1 import ARecord
+
+LOGGER = getLogger(__name__)
+
+
+def test_route53_sort_key():
+    """Names sort by their reversed labels, the way list_resource_record_sets returns them"""
+    assert route53_sort_key("WWW.example.com") == "com.example.www."
+    names = ["b.example.com.", "example.com.", "a-b.example.com.", "x.a.example.com.", "a.example.com."]
+    assert sorted(names, key=route53_sort_key) == [
+        "example.com.",
+        "a-b.example.com.",
+        "a.example.com.",
+        "x.a.example.com.",
+        "b.example.com.",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_orphan_collector(moto_zone):
+    """Claimed records without a record object are deleted with their claims, nothing else is touched"""
+    config = moto_zone["config"].copy(update={"ownership_enabled": True, "gc_rate_fraction": 1})
+    zone_id = moto_zone["zone_id"]
+    # a-b and its claim sort before a, the trailing dot of a sorts after the hyphen
+    names = [f"{label}.{moto_zone['name']}" for label in ("a", "a-b", "b", "c")]
+    live = [LiveRecord(None, normalize_zone_id(zone_id), normalize_name(names[2]), "A")]
+
+    async def live_records():
+        return live
+
+    async with AccountPool(config, session=moto_zone["session"]) as accounts:
+        crud = ACrud(config=config, logger=LOGGER, accounts=accounts, zone_cache=ZoneCache(accounts))
+        for name in names[:3]:
+            await crud.create(record_in=ARecord(hosted_zone_id=zone_id, name=name, value=["10.0.0.1"]))
+        foreign = ARecord(hosted_zone_id=zone_id, name=names[3], value=["10.0.0.2"]).recordset
+        others = claim_record_set(names[3], "A", "another-operator")
+        await submit_changes(
+            accounts,
+            zone_id,
+            [{"Action": "CREATE", "ResourceRecordSet": foreign}, {"Action": "CREATE", "ResourceRecordSet": others}],
+        )
+
+        collector = OrphanCollector(config, accounts, live_records=live_records, logger=LOGGER)
+        report = await collector.collect(dry_run=True)
+        assert report.orphans == 2
+        assert report.deleted == 0
+        assert set(report.orphan_names) == {f"{normalize_name(name)} A" for name in names[:2]}
+
+        report = await collector.collect(dry_run=False)
+        assert report.deleted == 2
+        assert report.api_calls == 2
+
+        snapshot = await ZoneCache(accounts).load(zone_id)
+        for name in names[:2]:
+            assert snapshot.get(name, "A") is None
+            assert snapshot.get(claim_name(name, "A"), "TXT") is None
+        assert snapshot.owner(names[2], "A") == "default"
+        assert snapshot.owner(names[3], "A") == "another-operator"
+        assert snapshot.get(names[3], "A") is not None
+
+        # b is an orphan once its record object is gone, but listing the zone uses the whole budget
+        live.clear()
+        report = await OrphanCollector(
+            config.copy(update={"gc_max_api_calls": 1, "gc_hosted_zones": [zone_id]}),
+            accounts,
+            live_records=live_records,
+            logger=LOGGER,
+        ).collect(dry_run=False)
+        assert report.orphans == 1
+        assert report.deleted == 0
+        assert report.budget_exhausted is True
@@ -0,0 +1,49 @@
+"""Test what each entry point imports, the import time budget is benchmarked in tests/benchmarks/test_import_time.py"""
+import json
+import subprocess
+import sys
+
+import pytest
+
+
+def imported_modules(statement: str) -> set[str]:
+    """The modules a fresh interpreter has imported after running statement"""
+    output = subprocess.run(
+        [sys.executable, "-c", f"{statement}; import json, sys; print(json.dumps(sorted(sys.modules)))"],
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+    return set(json.loads(output.splitlines()[-1]))
+
+
+@pytest.mark.parametrize(
+    "statement,not_imported",
+    [
+        # the CLI only imports what the command it runs needs
+        ("import route53_operator.__main__", {"kopf", "pykube", "botocore", "route53_operator.handlers"}),
+        ("import route53_operator.lib.zone_import", {"kopf", "pykube", "aiobotocore"}),
+        # the operator doesn't import the CLI commands or the CRD generator
+        (
+            "import route53_operator.handlers",
+            {"route53_operator.lib.adopt", "route53_operator.lib.zone_import", "route53_operator.crds"},
+        ),
+        # a CRD only imports its own module
+        ("from route53_operator.crds import ARecordCRD", {"kopf", "route53_operator.crds.cname"}),
+    ],
+)
+def test_lazy_imports(statement, not_imported):
+    """Entry points don't import modules only other entry points use"""
+    assert imported_modules(statement) & not_imported == set()
+
+
+def test_lazy_package_attributes():
+    """The kopf registry and CRDs are still there when asked for"""
+    from route53_operator import crds
+    from route53_operator import kopf_registry
+    from route53_operator import kopf_registry as again
+
+    assert kopf_registry is again
+    assert [crd.__name__ for crd in crds.CRDS] == ["ARecordCRD", "CNAMERecordCRD", "TXTRecordCRD", "RecordSetCRD"]
+    with pytest.raises(AttributeError):
+        crds.MXRecordCRD
@@ -0,0 +1,180 @@
+"""Test the change journal"""
+import asyncio
+import logging
+import os
+import threading
+import time
+
+import pytest
+
+from route53_operator.crud.a import ACrud
+from route53_operator.lib.aws import AccountPool
+from route53_operator.lib.changes import submit_changes
+from route53_operator.lib.config import Config
+from route53_operator.lib.journal import ChangeJournal
+from route53_operator.lib.journal import DONE
+from route53_operator.lib.zone_cache import ZoneCache
+from route53_operator.schemas.v1 import ARecord
+
+LOGGER = logging.getLogger(__name__)
+
+
+def create(name: str, value: str) -> dict:
+    return {
+        "Action": "CREATE",
+        "ResourceRecordSet": {"Name": name, "Type": "A", "TTL": 60, "ResourceRecords": [{"Value": value}]},
+    }
+
+
+@pytest.mark.asyncio
+async def test_replay(tmp_path, moto_zone):
+    """Open batches are finished on replay, only the changes that never reached Route53 are sent again"""
+    config = moto_zone["config"].copy(update={"change_poll_interval": 0.1})
+    zone_id, zone_name = moto_zone["zone_id"], moto_zone["name"]
+    path = str(tmp_path / "changes.journal")
+
+    async with AccountPool(config, session=moto_zone["session"]) as accounts:
+        journal = ChangeJournal(path)
+        # sent, but the operator died before journaling that Route53 accepted it
+        sent = create(f"sent.{zone_name}", "10.0.0.1")
+        await journal.intend(zone_id, [sent], refs=["default/sent"])
+        await submit_changes(accounts, zone_id, [sent])
+        # died before sending
+        await journal.intend(zone_id, [create(f"unsent.{zone_name}", "10.0.0.2")], refs=["default/unsent"])
+        # accepted, died waiting for INSYNC
+        accepted = create(f"accepted.{zone_name}", "10.0.0.3")
+        entry = await journal.intend(zone_id, [accepted], refs=["default/accepted"])
+        await journal.submitted(entry, (await submit_changes(accounts, zone_id, [accepted]))["Id"])
+        finished = await journal.intend(zone_id, [create(f"finished.{zone_name}", "10.0.0.4")])
+        journal.finish(finished)
+        await journal.close()
+
+        journal = ChangeJournal(path)
+        assert len(journal.pending()) == 3
+        zone_cache = ZoneCache(accounts)
+        assert await journal.replay(accounts, zone_cache, config) == 3
+        assert journal.pending() == []
+        snapshot = await zone_cache.load(zone_id)
+        assert snapshot.get(f"unsent.{zone_name}", "A") is not None
+        assert snapshot.get(f"finished.{zone_name}", "A") is None
+
+        # the create handler of a replayed object picks up the record instead of creating it again
+        crud = ACrud(config=config, logger=LOGGER, accounts=accounts, zone_cache=zone_cache, journal=journal)
+        record = await crud.create(
+            record_in=ARecord(hosted_zone_id=zone_id, name=f"sent.{zone_name}", ttl=60, value=["10.0.0.1"]),
+            ref="default/sent",
+        )
+        assert [str(value) for value in record.value] == ["10.0.0.1"]
+        assert journal.recovered("default/unsent") == DONE
+        await journal.close()
+
+    # compaction leaves nothing behind once every batch is finished
+    assert ChangeJournal(path).pending() == []
+    with open(path, encoding="utf-8") as lines:
+        assert lines.read() == ""
+
+
+@pytest.mark.asyncio
+async def test_replay_crud_change(tmp_path, moto_zone):
+    """A CRUD change Route53 accepted is replayed by its change id, without listing the zone"""
+    config = moto_zone["config"].copy(update={"change_poll_interval": 0.1})
+    zone_id, zone_name = moto_zone["zone_id"], moto_zone["name"]
+    path = str(tmp_path / "changes.journal")
+
+    async with AccountPool(config, session=moto_zone["session"]) as accounts:
+        journal = ChangeJournal(path)
+        # the operator dies after Route53 accepted the change, before the batch is finished
+        journal.finish = lambda entry, status=DONE: None
+        crud = ACrud(config=config, logger=LOGGER, accounts=accounts, zone_cache=ZoneCache(accounts), journal=journal)
+        await crud.create(
+            record_in=ARecord(hosted_zone_id=zone_id, name=f"crashed.{zone_name}", ttl=60, value=["10.0.0.1"]),
+            ref="default/crashed",
+        )
+        await journal.close()
+
+        journal = ChangeJournal(path)
+        [entry] = journal.pending()
+        assert entry.change_id is not None
+        zone_cache = ZoneCache(accounts)
+
+        async def load(hosted_zone_id, account=None):
+            raise AssertionError("a change with an id is polled, its zone isn't listed")
+
+        zone_cache.load = load
+        assert await journal.replay(accounts, zone_cache, config) == 1
+        assert journal.recovered("default/crashed") == DONE
+        await journal.close()
+
+
+@pytest.mark.asyncio
+async def test_group_commit(tmp_path, monkeypatch):
+    """Batches journaled in the same loop tick wait for one fsync, run off the event loop"""
+    syncs = []
+
+    def fsync(fd):
+        syncs.append(threading.current_thread())
+        os.fdatasync(fd)
+
+    monkeypatch.setattr("route53_operator.lib.journal.os.fsync", fsync)
+    journal = ChangeJournal(str(tmp_path / "changes.journal"))
+    entries = await asyncio.gather(
+        *(journal.intend("Z1", [create(f"r{i}.example.com.", "10.0.0.1")]) for i in range(20))
+    )
+    assert len(syncs) == 1
+    assert syncs[0] is not threading.main_thread()
+    await journal.intend("Z1", [create("late.example.com.", "10.0.0.2")])
+    assert len(syncs) == 2
+    await journal.close()
+    assert len(ChangeJournal(str(tmp_path / "changes.journal")).pending()) == len(entries) + 1
+
+
+@pytest.mark.asyncio
+async def test_replay_concurrent(tmp_path, monkeypatch):
+    """Batches are replayed at the same time, a slow INSYNC doesn't hold up the others"""
+    waiting = []
+
+    async def wait_for_insync(accounts, change_id, **kwargs):
+        waiting.append(change_id)
+        await asyncio.sleep(0.2)
+
+    monkeypatch.setattr("route53_operator.lib.journal.wait_for_insync", wait_for_insync)
+    journal = ChangeJournal(str(tmp_path / "changes.journal"))
+    for index in range(10):
+        entry = await journal.intend("Z1", [create(f"r{index}.example.com.", "10.0.0.1")], refs=[f"default/r{index}"])
+        await journal.submitted(entry, f"C{index}")
+    started = asyncio.get_running_loop().time()
+    assert await journal.replay(None, None, Config(change_poll_interval=0.1)) == 10
+    assert asyncio.get_running_loop().time() - started < 1
+    assert len(waiting) == 10
+    assert journal.recovered("default/r9") == DONE
+    await journal.close()
+
+
+@pytest.mark.asyncio
+async def test_compaction(tmp_path, monkeypatch):
+    """Compaction rewrites the file off the event loop, and keeps the lines written while it runs"""
+    syncs = []
+
+    def fsync(fd):
+        syncs.append(threading.current_thread())
+        time.sleep(0.05)
+        os.fdatasync(fd)
+
+    monkeypatch.setattr("route53_operator.lib.journal.os.fsync", fsync)
+    path = str(tmp_path / "changes.journal")
+    # the last finish starts the compaction
+    journal = ChangeJournal(path, compact_after=18)
+    kept = await journal.intend("Z1", [create("kept.example.com.", "10.0.0.1")])
+    for index in range(10):
+        journal.finish(await journal.intend("Z1", [create(f"r{index}.example.com.", "10.0.0.1")]))
+    compacting = journal._compacting
+    assert compacting is not None
+    # written while the file is rewritten
+    await asyncio.sleep(0)
+    late = await journal.intend("Z1", [create("late.example.com.", "10.0.0.2")])
+    assert compacting.done()
+    await journal.close()
+    assert threading.main_thread() not in syncs
+    assert {entry.batch_id for entry in ChangeJournal(path).pending()} == {kept.batch_id, late.batch_id}
+    with open(path, encoding="utf-8") as lines:
+        assert len(lines.readlines()) == 2
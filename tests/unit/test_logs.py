@@ -0,0 +1,88 @@
+"""Test the operator's non blocking, structured logging"""
+import io
+import json
+import logging
+import queue
+
+import pytest
+
+from route53_operator.lib.logs import JSONFormatter
+from route53_operator.lib.logs import log_fields
+from route53_operator.lib.logs import NonBlockingQueueHandler
+from route53_operator.lib.logs import SamplingFilter
+from route53_operator.lib.logs import setup_logging
+
+
+def make_record(name: str, level: int = logging.DEBUG, msg: str = "message", **extra) -> logging.LogRecord:
+    return logging.makeLogRecord(
+        {"name": name, "levelno": level, "levelname": logging.getLevelName(level), "msg": msg, **extra}
+    )
+
+
+def test_json_formatter():
+    """Records are one line of JSON with the fields a log call set and the object kopf logged for"""
+    fields = log_fields(record="www.example.com.", zone="Z1", change_id="C1", account=None)
+    assert "account" not in fields
+    with pytest.raises(ValueError):
+        log_fields(name="www.example.com.")
+    record = make_record(
+        "route53_operator.crud",
+        logging.INFO,
+        "Creating record %s",
+        args=("www.example.com.",),
+        k8s_ref={"namespace": "default", "name": "www"},
+        **fields,
+    )
+    entry = json.loads(JSONFormatter().format(record))
+    assert entry["message"] == "Creating record www.example.com."
+    assert entry["level"] == "INFO"
+    assert entry["object"] == "default/www"
+    assert (entry["record"], entry["zone"], entry["change_id"]) == ("www.example.com.", "Z1", "C1")
+
+
+def test_sampling_filter():
+    """Debug records of a sampled logger are thinned out, other levels and loggers are kept"""
+    sampling = SamplingFilter({"route53_operator": 0.5, "route53_operator.crud": 0.1})
+    kept = [sampling.filter(make_record("route53_operator.crud.a")) for _ in range(100)]
+    assert sum(kept) == 10
+    kept = [sampling.filter(make_record("route53_operator.lib")) for _ in range(100)]
+    assert sum(kept) == 50
+    assert all(sampling.filter(make_record("route53_operator.crud", logging.INFO)) for _ in range(10))
+    assert all(sampling.filter(make_record("kopf")) for _ in range(10))
+    assert sampling.sampled_out == 140
+    # rates that are not the inverse of a whole number are kept exactly, not rounded
+    sampling = SamplingFilter({"route53_operator": 0.4})
+    kept = [sampling.filter(make_record("route53_operator")) for _ in range(100)]
+    assert sum(kept) == 40
+    assert kept[:5] == [False, False, True, False, True]
+    sampling = SamplingFilter({"route53_operator": 0})
+    assert not any(sampling.filter(make_record("route53_operator")) for _ in range(10))
+
+
+def test_queue_handler_drops_when_full():
+    """A full queue drops records instead of blocking the caller"""
+    handler = NonBlockingQueueHandler(queue.Queue(2))
+    for index in range(5):
+        handler.handle(make_record("route53_operator", logging.INFO, "record %s", args=(index,)))
+    assert handler.queue.qsize() == 2
+    assert handler.dropped == 3
+    assert handler.queue.get_nowait().msg == "record 0"
+
+
+def test_setup_logging(test_config):
+    """Records logged on the caller's thread are written as JSON by the listener"""
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    stream = io.StringIO()
+    listener = setup_logging(test_config.copy(update={"log_level": "DEBUG", "log_format": "json"}), stream=stream)
+    try:
+        logging.getLogger("route53_operator.test").debug("Change %s", "C1", extra=log_fields(change_id="C1"))
+    finally:
+        listener.stop()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        for handler in handlers:
+            root.addHandler(handler)
+        root.setLevel(level)
+    entries = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [(entry["message"], entry["change_id"]) for entry in entries] == [("Change C1", "C1")]
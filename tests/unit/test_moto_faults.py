@@ -0,0 +1,81 @@
+"""Test the operator against the fault injecting moto Route53 from tests/moto_server.py"""
+import asyncio
+
+import pytest
+from botocore.exceptions import ClientError
+
+from route53_operator.lib.aws import AccountPool
+from tests.moto_server import LatencyDistribution
+
+
+def a_change(zone_name: str, index: int) -> dict:
+    return {
+        "Changes": [
+            {
+                "Action": "UPSERT",
+                "ResourceRecordSet": {
+                    "Name": f"fault-{index}.{zone_name}",
+                    "Type": "A",
+                    "TTL": 60,
+                    "ResourceRecords": [{"Value": "10.0.0.1"}],
+                },
+            }
+        ]
+    }
+
+
+@pytest.mark.asyncio
+@pytest.mark.route53_faults(requests_per_second=5)
+async def test_rate_limit_avoids_throttling(moto_zone, route53_faults):
+    """Requests through an AccountPool limited below the account's rate never get throttled"""
+    # leave headroom under the server's limit, two buckets at the same rate race on network jitter
+    config = moto_zone["config"].copy(update={"aws_requests_per_second": 4, "aws_retry_mode": "legacy"})
+    # the moto_zone fixture spent a token creating the zone
+    await asyncio.sleep(1)
+    async with AccountPool(config, session=moto_zone["session"]) as accounts:
+
+        async def get_zone():
+            async with accounts.client() as client:
+                await client.get_hosted_zone(Id=moto_zone["zone_id"])
+
+        await asyncio.gather(*(get_zone() for _ in range(10)))
+    assert route53_faults.stats["Throttling"] == 0
+    assert route53_faults.stats["GetHostedZone"] == 10
+
+
+@pytest.mark.asyncio
+@pytest.mark.route53_faults(
+    prior_request_not_complete=True, latency={"ChangeResourceRecordSets": LatencyDistribution(0.2)}
+)
+async def test_prior_request_not_complete(moto_zone, route53_faults):
+    """Overlapping changes to one zone are rejected with PriorRequestNotComplete"""
+    config = moto_zone["config"].copy(update={"aws_requests_per_second": 1000, "aws_max_attempts": 1})
+    async with AccountPool(config, session=moto_zone["session"]) as accounts:
+
+        async def change(index: int):
+            async with accounts.client() as client:
+                await client.change_resource_record_sets(
+                    HostedZoneId=moto_zone["zone_id"], ChangeBatch=a_change(moto_zone["name"], index)
+                )
+
+        results = await asyncio.gather(change(0), change(1), return_exceptions=True)
+    errors = [result for result in results if isinstance(result, ClientError)]
+    assert len(errors) == 1
+    assert errors[0].response["Error"]["Code"] == "PriorRequestNotComplete"
+
+
+@pytest.mark.asyncio
+@pytest.mark.route53_faults(insync_delay=0.5)
+async def test_change_insync_delay(moto_zone, route53_faults):
+    """Changes report PENDING until the insync delay has passed"""
+    async with AccountPool(moto_zone["config"], session=moto_zone["session"]) as accounts:
+        async with accounts.client() as client:
+            response = await client.change_resource_record_sets(
+                HostedZoneId=moto_zone["zone_id"], ChangeBatch=a_change(moto_zone["name"], 0)
+            )
+            assert response["ChangeInfo"]["Status"] == "PENDING"
+            change = await client.get_change(Id=response["ChangeInfo"]["Id"])
+            assert change["ChangeInfo"]["Status"] == "PENDING"
+            await asyncio.sleep(0.5)
+            change = await client.get_change(Id=response["ChangeInfo"]["Id"])
+            assert change["ChangeInfo"]["Status"] == "INSYNC"
@@ -0,0 +1,105 @@
+"""Test record ownership claims"""
+from logging import getLogger
+
+import pytest
+
+from route53_operator.crud import ACrud
+from route53_operator.crud import DeleteAggregator
+from route53_operator.exceptions import RecordOwnershipError
+from route53_operator.lib.aws import AccountPool
+from route53_operator.lib.changes import submit_changes
+from route53_operator.lib.ownership import claim_name
+from route53_operator.lib.ownership import claim_record_set
+from route53_operator.lib.ownership import parse_claim
+from route53_operator.lib.zone_cache import ZoneCache
+from route53_operator.schemas.v1 import ARecord
+from route53_operator.schemas.v1 import ARecordUpdate
+
+LOGGER = getLogger(__name__)
+
+
+def test_parse_claim():
+    """A claim names the record it claims and its owner, other TXT records are not claims"""
+    claim = claim_record_set("WWW.example.com", "A", "blue")
+    assert claim["Name"] == "_r53op-a.www.example.com."
+    assert parse_claim(claim) == (("www.example.com.", "A"), "blue")
+    assert parse_claim({"Name": "www.example.com.", "Type": "TXT", "ResourceRecords": [{"Value": '"x"'}]}) is None
+    assert parse_claim({**claim, "ResourceRecords": [{"Value": '"heritage=someone-else"'}]}) is None
+
+
+@pytest.fixture(name="change_calls")
+def count_change_calls(moto_zone):
+    """Names of the ChangeResourceRecordSets calls made, clients must be created after this fixture"""
+    calls = []
+
+    def count_changes(**kwargs):
+        calls.append(kwargs["model"].name)
+
+    moto_zone["session"].register("before-call.route53.ChangeResourceRecordSets", count_changes)
+    yield calls
+    moto_zone["session"].unregister("before-call.route53.ChangeResourceRecordSets", count_changes)
+
+
+@pytest.mark.asyncio
+async def test_ownership_claims(moto_zone, change_calls):
+    """Claims are written with their record, checked before changes and deleted with their record"""
+    config = moto_zone["config"].copy(
+        update={"ownership_enabled": True, "delete_batch_window": 0, "change_poll_interval": 0.1}
+    )
+    zone_id = moto_zone["zone_id"]
+
+    async with AccountPool(config, session=moto_zone["session"]) as accounts:
+        foreign = ARecord(hosted_zone_id=zone_id, name=f"foreign.{moto_zone['name']}", value=["10.0.0.1"])
+        await submit_changes(accounts, zone_id, [{"Action": "CREATE", "ResourceRecordSet": foreign.recordset}])
+
+        zone_cache = ZoneCache(accounts)
+        crud = ACrud(config=config, logger=LOGGER, accounts=accounts, zone_cache=zone_cache)
+        with pytest.raises(RecordOwnershipError):
+            await crud.create(record_in=foreign)
+
+        owned = ARecord(hosted_zone_id=zone_id, name=f"owned.{moto_zone['name']}", value=["10.0.0.2"])
+        change_calls.clear()
+        await crud.create(record_in=owned)
+        # the claim went in the same ChangeBatch as the record
+        assert len(change_calls) == 1
+        assert zone_cache.snapshot(zone_id).owner(owned.name, "A") == "default"
+
+        other = ACrud(
+            config=config.copy(update={"ownership_owner_id": "other"}),
+            logger=LOGGER,
+            accounts=accounts,
+            zone_cache=zone_cache,
+        )
+        with pytest.raises(RecordOwnershipError):
+            await other.update(record_current=owned, record_update=ARecordUpdate(value=["10.0.0.3"]))
+
+        await DeleteAggregator(config, accounts, zone_cache, logger=LOGGER).delete(owned)
+        snapshot = await ZoneCache(accounts).load(zone_id)
+    assert snapshot.get(owned.name, "A") is None
+    assert snapshot.get(claim_name(owned.name, "A"), "TXT") is None
+    assert snapshot.get(foreign.name, "A") is not None
+
+
+@pytest.mark.asyncio
+async def test_claim_race(moto_zone):
+    """Of two owners that both saw a record unclaimed, the second one's claim is rejected and it loses the record"""
+    config = moto_zone["config"].copy(update={"ownership_enabled": True})
+    zone_id = moto_zone["zone_id"]
+    record = ARecord(hosted_zone_id=zone_id, name=f"race.{moto_zone['name']}", value=["10.0.0.1"])
+
+    async with AccountPool(config, session=moto_zone["session"]) as accounts:
+        crud = ACrud(config=config, logger=LOGGER, accounts=accounts, zone_cache=ZoneCache(accounts))
+        late_cache = ZoneCache(accounts)
+        await late_cache.load(zone_id)
+        late = ACrud(
+            config=config.copy(update={"ownership_owner_id": "other"}),
+            logger=LOGGER,
+            accounts=accounts,
+            zone_cache=late_cache,
+        )
+        await crud.create(record_in=record)
+        with pytest.raises(RecordOwnershipError):
+            await late.update(record_current=record, record_update=ARecordUpdate(value=["10.0.0.2"]))
+        snapshot = await ZoneCache(accounts).load(zone_id)
+    assert snapshot.owner(record.name, "A") == "default"
+    assert snapshot.get(record.name, "A")["ResourceRecords"] == [{"Value": "10.0.0.1"}]
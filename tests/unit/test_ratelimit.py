@@ -0,0 +1,80 @@
+"""Test the rate limiting from src/route53_operator/lib/ratelimit.py"""
+import asyncio
+import time
+
+import pytest
+
+from route53_operator.lib.ratelimit import current_priority
+from route53_operator.lib.ratelimit import FairTokenBucket
+from route53_operator.lib.ratelimit import GC
+from route53_operator.lib.ratelimit import INTERACTIVE
+from route53_operator.lib.ratelimit import priority
+from route53_operator.lib.ratelimit import tenant
+from route53_operator.lib.ratelimit import TokenBucket
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_limits_rate():
+    """Acquiring more than the burst waits for tokens to refill"""
+    bucket = TokenBucket(rate=20)
+    start = time.monotonic()
+    await asyncio.gather(*(bucket.acquire() for _ in range(30)))
+    # 20 tokens are available immediately, the other 10 take half a second to refill
+    assert time.monotonic() - start >= 0.45
+
+
+@pytest.mark.asyncio
+async def test_fair_token_bucket_priorities():
+    """While classes wait, each is served by its weight: a new interactive call doesn't wait behind a sweep"""
+    bucket = FairTokenBucket(rate=200, weights={INTERACTIVE: 8, GC: 1}, burst=1)
+    order = []
+
+    async def call(name: str):
+        with priority(name):
+            await bucket.acquire()
+        order.append(name)
+
+    sweep = [asyncio.create_task(call(GC)) for _ in range(20)]
+    await asyncio.sleep(0.02)
+    users = [asyncio.create_task(call(INTERACTIVE)) for _ in range(16)]
+    await asyncio.gather(*sweep, *users)
+
+    assert current_priority() == INTERACTIVE
+    assert bucket.granted == {GC: 20, INTERACTIVE: 16} and not bucket.waiting()
+    contended = order[order.index(INTERACTIVE) :][:18]
+    # 8 interactive calls for every call of the sweep, which is never starved
+    assert 1 <= contended.count(GC) <= 3
+    assert order[-1] == GC
+
+
+@pytest.mark.asyncio
+async def test_fair_token_bucket_tenants():
+    """Tenants take turns, so a noisy tenant only delays itself, and a quota bounds a tenant even when alone"""
+    bucket = FairTokenBucket(rate=500, burst=1, tenant_weights={"quiet": 2}, tenant_quotas={"capped": 50})
+    order = []
+
+    async def call(name: str):
+        with tenant(name):
+            await bucket.acquire()
+        order.append(name)
+
+    noisy = [asyncio.create_task(call("noisy")) for _ in range(40)]
+    await asyncio.sleep(0.01)
+    quiet = [asyncio.create_task(call("quiet")) for _ in range(4)]
+    await asyncio.sleep(0)
+    assert bucket.tenant_stats()["quiet"]["waiting"] == 4
+    await asyncio.gather(*noisy, *quiet)
+
+    # the quiet tenant gets two calls for every one of the noisy tenant until it is done
+    contended = order[order.index("quiet") :][:6]
+    assert contended.count("quiet") == 4
+    stats = bucket.tenant_stats()
+    assert stats["noisy"]["granted"] == 40 and stats["noisy"]["waiting"] == 0
+    assert stats["quiet"]["max_wait_seconds"] < stats["noisy"]["max_wait_seconds"]
+
+    start = time.monotonic()
+    await asyncio.gather(*(call("capped") for _ in range(10)))
+    # 50 calls per second, after its burst of 50 is spent
+    assert time.monotonic() - start < 0.1
+    await asyncio.gather(*(call("capped") for _ in range(50)))
+    assert time.monotonic() - start >= 0.15
@@ -0,0 +1,66 @@
+"""Test range-scan record reads"""
+import asyncio
+
+import pytest
+
+from route53_operator.crud.reads import ReadBatcher
+from route53_operator.lib.aws import AccountPool
+from route53_operator.lib.changes import submit_changes
+
+
+@pytest.mark.asyncio
+async def test_read_batcher(moto_zone):
+    """Reads of a zone are answered by as few pages as cover them, missing records included"""
+    config = moto_zone["config"].copy(update={"read_batch_window": 0.01})
+    zone_id, zone_name = moto_zone["zone_id"], moto_zone["name"]
+    changes = [
+        {
+            "Action": "CREATE",
+            "ResourceRecordSet": {
+                "Name": f"r{i:03}.{zone_name}",
+                "Type": "A",
+                "TTL": 60,
+                "ResourceRecords": [{"Value": f"10.0.{i // 256}.{i % 256}"}],
+            },
+        }
+        for i in range(500)
+    ]
+
+    async with AccountPool(config, session=moto_zone["session"]) as accounts:
+        await submit_changes(accounts, zone_id, changes)
+        batcher = ReadBatcher(config, accounts)
+        # every other record, a type the zone doesn't have and names past the end of the zone
+        reads = [(f"r{i:03}.{zone_name}", "A") for i in range(0, 500, 2)]
+        reads += [(f"r001.{zone_name}", "TXT"), (f"zzz.{zone_name}", "A"), (f"R499.{zone_name}", "A")]
+        results = await asyncio.gather(*(batcher.get(zone_id, name, record_type) for name, record_type in reads))
+
+    assert [result["ResourceRecords"] for result in results[:2]] == [[{"Value": "10.0.0.0"}], [{"Value": "10.0.0.2"}]]
+    assert all(result is not None for result in results[:250])
+    assert results[250:252] == [None, None]
+    assert results[252]["Name"] == f"r499.{zone_name}"
+    # the scans start at r000, 500 record sets in pages of 300
+    assert batcher.calls == 2
+    assert batcher.reads == len(reads)
+
+
+@pytest.mark.asyncio
+async def test_read_batcher_hyphenated_names(moto_zone):
+    """Route53 lists api-v2 before api, a page starting at api would miss it"""
+    config = moto_zone["config"].copy(update={"read_batch_window": 0.01})
+    zone_id, zone_name = moto_zone["zone_id"], moto_zone["name"]
+    names = [f"{label}.{zone_name}" for label in ("api", "api-v2", "api.eu", "api-v2.eu")]
+    changes = [
+        {
+            "Action": "CREATE",
+            "ResourceRecordSet": {"Name": name, "Type": "A", "TTL": 60, "ResourceRecords": [{"Value": "10.0.0.1"}]},
+        }
+        for name in names
+    ]
+
+    async with AccountPool(config, session=moto_zone["session"]) as accounts:
+        await submit_changes(accounts, zone_id, changes)
+        batcher = ReadBatcher(config, accounts)
+        results = await asyncio.gather(*(batcher.get(zone_id, name, "A") for name in names))
+
+    assert [result["Name"] for result in results] == names
+    assert batcher.calls == 1
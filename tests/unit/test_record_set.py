@@ -0,0 +1,106 @@
+"""Test RecordSets, bundles of records applied in one ChangeBatch"""
+from logging import getLogger
+
+import pytest
+from pydantic import ValidationError
+
+from route53_operator.crds import RecordSetCRD
+from route53_operator.crud import RecordSetCrud
+from route53_operator.lib.aws import AccountPool
+from route53_operator.lib.changes import record_key
+from route53_operator.lib.kube import live_records
+from route53_operator.lib.zone_cache import ZoneCache
+from route53_operator.schemas.v1 import RecordSet
+
+LOGGER = getLogger(__name__)
+
+
+def record_set(zone_id: str, zone_name: str, entries: list[tuple[str, str, list[str]]]) -> RecordSet:
+    return RecordSet(
+        hosted_zone_id=zone_id,
+        entries=[{"type": kind, "name": f"{name}.{zone_name}", "value": value} for kind, name, value in entries],
+    )
+
+
+def test_record_set_schema():
+    """Entries are validated by the schema of their type, and a record can't be in a set twice"""
+    with pytest.raises(ValidationError):
+        record_set("Z1", "example.com.", [("A", "www", ["not an ip"])])
+    with pytest.raises(ValidationError):
+        record_set("Z1", "example.com.", [("CNAME", "www", ["a.example.com.", "b.example.com."])])
+    with pytest.raises(ValidationError):
+        record_set("Z1", "example.com.", [("A", "www", ["10.0.0.1"]), ("A", "WWW", ["10.0.0.2"])])
+    spec = record_set("Z1", "example.com.", [("A", "www", ["10.0.0.1"]), ("TXT", "www", ['"hello"'])]).dict()
+    assert [record.record_type for record in live_records(RecordSet, spec)] == ["A", "TXT"]
+    # nested models are inlined, CRDs can't refer to definitions
+    entries = RecordSetCRD().to_crd()["spec"]["versions"][0]["schema"]["openAPIV3Schema"]["properties"]["spec"]
+    assert entries["properties"]["entries"]["items"]["properties"]["type"]["enum"] == ["A", "CNAME", "TXT"]
+
+
+@pytest.mark.asyncio
+async def test_record_set_apply(moto_zone):
+    """A set is applied as one diff in one ChangeBatch, unchanged entries are left alone and dropped ones deleted"""
+    config = moto_zone["config"]
+    zone_id, zone_name = moto_zone["zone_id"], moto_zone["name"]
+    calls = []
+
+    def count_changes(**kwargs):
+        calls.append(len(kwargs["params"]["ChangeBatch"]["Changes"]))
+
+    moto_zone["session"].register("before-parameter-build.route53.ChangeResourceRecordSets", count_changes)
+    try:
+        async with AccountPool(config, session=moto_zone["session"]) as accounts:
+            zone_cache = ZoneCache(accounts)
+            crud = RecordSetCrud(config, LOGGER, accounts=accounts, zone_cache=zone_cache)
+            first = record_set(zone_id, zone_name, [("A", f"r{i}", ["10.0.0.1"]) for i in range(20)])
+            status = await crud.apply(first)
+            assert {entry["state"] for entry in status["entries"]} == {"Created"}
+
+            second = record_set(
+                zone_id,
+                zone_name,
+                [("A", "r0", ["10.0.0.2"]), *[("A", f"r{i}", ["10.0.0.1"]) for i in range(1, 10)]],
+            )
+            status = await crud.apply(second, previous=first)
+            states = [entry["state"] for entry in status["entries"]]
+            assert states == ["Updated"] + ["Unchanged"] * 9 + ["Deleted"] * 10
+            assert (await crud.apply(second))["change_id"] is None
+
+            snapshot = await zone_cache.load(zone_id)
+            assert snapshot.get(f"r0.{zone_name}", "A")["ResourceRecords"] == [{"Value": "10.0.0.2"}]
+            assert snapshot.get(f"r10.{zone_name}", "A") is None
+
+            await crud.delete(second)
+            snapshot = await zone_cache.load(zone_id)
+            assert all(snapshot.get(f"r{i}.{zone_name}", "A") is None for i in range(20))
+    finally:
+        moto_zone["session"].unregister("before-parameter-build.route53.ChangeResourceRecordSets", count_changes)
+
+    # create, update with deletes, delete: one call each
+    assert calls == [20, 11, 10]
+
+
+@pytest.mark.asyncio
+async def test_record_set_conflicts(moto_zone):
+    """Entries another object manages are neither written nor deleted"""
+    config = moto_zone["config"]
+    zone_id, zone_name = moto_zone["zone_id"], moto_zone["name"]
+    async with AccountPool(config, session=moto_zone["session"]) as accounts:
+        zone_cache = ZoneCache(accounts)
+        crud = RecordSetCrud(config, LOGGER, accounts=accounts, zone_cache=zone_cache)
+        conflicts = [record_key(f"taken.{zone_name}", "A")]
+        first = record_set(zone_id, zone_name, [("A", "mine", ["10.0.0.1"]), ("A", "taken", ["10.0.0.1"])])
+        status = await crud.apply(first, conflicts=conflicts)
+        assert [entry["state"] for entry in status["entries"]] == ["Created", "Conflict"]
+        snapshot = await zone_cache.load(zone_id)
+        assert snapshot.get(f"taken.{zone_name}", "A") is None
+
+        # the other object wrote the record, dropping the entry or deleting the set leaves it alone
+        await crud.apply(record_set(zone_id, zone_name, [("A", "taken", ["10.0.0.2"])]))
+        second = record_set(zone_id, zone_name, [("A", "mine", ["10.0.0.1"])])
+        status = await crud.apply(second, previous=first, conflicts=conflicts)
+        assert [entry["state"] for entry in status["entries"]] == ["Unchanged"]
+        await crud.delete(first, conflicts=conflicts)
+        snapshot = await zone_cache.load(zone_id)
+        assert snapshot.get(f"mine.{zone_name}", "A") is None
+        assert snapshot.get(f"taken.{zone_name}", "A")["ResourceRecords"] == [{"Value": "10.0.0.2"}]
@@ -0,0 +1,65 @@
+"""Test sharing concurrent identical calls"""
+import asyncio
+import logging
+
+import pytest
+
+from route53_operator.crud.a import ACrud
+from route53_operator.exceptions import RecordNotFoundError
+from route53_operator.lib.aws import AccountPool
+from route53_operator.lib.singleflight import SingleFlight
+
+LOGGER = logging.getLogger(__name__)
+
+
+@pytest.mark.asyncio
+async def test_singleflight():
+    """Concurrent calls with one key make one call and share its result or exception"""
+    flights = SingleFlight()
+    made = []
+
+    async def call(key):
+        made.append(key)
+        await asyncio.sleep(0.01)
+        if key == "bad":
+            raise ValueError(key)
+        return key.upper()
+
+    results = await asyncio.gather(
+        *(flights.do(key, lambda key=key: call(key)) for key in ("a", "a", "b", "a", "bad", "bad")),
+        return_exceptions=True,
+    )
+    assert results[:4] == ["A", "A", "B", "A"]
+    assert all(isinstance(result, ValueError) for result in results[4:])
+    assert sorted(made) == ["a", "b", "bad"]
+    assert flights.dedup_ratio == 0.5
+    assert len(flights) == 0
+
+    # a caller that is cancelled doesn't cancel the call for the others
+    first = asyncio.ensure_future(flights.do("c", lambda: call("c")))
+    second = asyncio.ensure_future(flights.do("c", lambda: call("c")))
+    await asyncio.sleep(0)
+    first.cancel()
+    assert await second == "C"
+
+
+@pytest.mark.asyncio
+async def test_crud_get_shares_reads(moto_zone):
+    """Gets of one record at the same time make one list call"""
+    calls = []
+
+    def count_lists(**kwargs):
+        calls.append(kwargs["model"].name)
+
+    moto_zone["session"].register("before-call.route53.ListResourceRecordSets", count_lists)
+    try:
+        async with AccountPool(moto_zone["config"], session=moto_zone["session"]) as accounts:
+            crud = ACrud(config=moto_zone["config"], logger=LOGGER, accounts=accounts)
+            name = f"missing.{moto_zone['name']}"
+            results = await asyncio.gather(
+                *(crud.get(hosted_zone_id=moto_zone["zone_id"], name=name) for _ in range(10)), return_exceptions=True
+            )
+    finally:
+        moto_zone["session"].unregister("before-call.route53.ListResourceRecordSets", count_lists)
+    assert all(isinstance(result, RecordNotFoundError) for result in results)
+    assert len(calls) == 1
@@ -0,0 +1,96 @@
+"""Test the zone file parser and importer"""
+import pytest
+import yaml
+
+from route53_operator.exceptions import RecordOwnershipError
+from route53_operator.exceptions import ZoneFileError
+from route53_operator.lib.aws import AccountPool
+from route53_operator.lib.zone_cache import ZoneCache
+from route53_operator.lib.zone_import import ZoneImporter
+from route53_operator.lib.zonefile import parse_zone_file
+
+ZONE_FILE = """\
+$ORIGIN example.com.
+$TTL 1h
+@       IN  SOA ns1 hostmaster (
+                2023010101 ; serial
+                7200 3600 1209600 3600 )
+        IN  NS  ns1
+www     300 IN A 10.0.0.1
+            IN A 10.0.0.2
+mail        A   10.0.0.3 ; comment
+alias   CNAME www
+spf     TXT "v=spf1 include:example.net; -all"
+multi   TXT "one"
+multi   TXT "two"
+bad     A   not-an-ip
+"""
+
+
+def test_parse_zone_file():
+    """Directives, relative names, carried owners, parentheses, comments and quotes"""
+    record_sets = list(parse_zone_file(ZONE_FILE.splitlines(True), "ignored.com"))
+    by_key = {(record_set.name, record_set.record_type): record_set for record_set in record_sets}
+    assert by_key[("example.com.", "SOA")].values == ["ns1 hostmaster 2023010101 7200 3600 1209600 3600"]
+    assert by_key[("example.com.", "NS")].values == ["ns1.example.com."]
+    assert by_key[("www.example.com.", "A")].values == ["10.0.0.1", "10.0.0.2"]
+    assert by_key[("www.example.com.", "A")].ttl == 300
+    assert by_key[("mail.example.com.", "A")].ttl == 3600
+    assert by_key[("alias.example.com.", "CNAME")].values == ["www.example.com."]
+    assert by_key[("spf.example.com.", "TXT")].values == ['"v=spf1 include:example.net; -all"']
+    assert by_key[("multi.example.com.", "TXT")].values == ['"one"', '"two"']
+
+    with pytest.raises(ZoneFileError):
+        list(parse_zone_file(["www A (10.0.0.1\n"], "example.com"))
+    with pytest.raises(ZoneFileError):
+        list(parse_zone_file(["$INCLUDE other.zone\n"], "example.com"))
+    # a record set split up by other records would be sent twice, the second time without the first part's values
+    with pytest.raises(ZoneFileError, match="Line 3: A record www.example.com. continues the record set of line 1"):
+        list(parse_zone_file(["www A 10.0.0.1\n", 'www TXT "hello"\n', "www A 10.0.0.2\n"], "example.com"))
+
+
+def test_import_write_objects(tmp_path, test_config):
+    """Valid records become record objects in chunked files, the rest is reported"""
+    importer = ZoneImporter(test_config, hosted_zone_id="Z123", origin="example.com.", batch_size=2)
+    report = importer.write_objects(ZONE_FILE.splitlines(True), tmp_path, namespace="dns", chunk_size=2)
+
+    assert report.valid == 4
+    assert report.invalid == 2
+    assert report.skipped == {"SOA": 1, "NS": 1}
+    assert report.files == 2
+    objects = [obj for path in sorted(tmp_path.iterdir()) for obj in yaml.safe_load_all(path.read_text())]
+    assert [obj["metadata"]["name"] for obj in objects] == [
+        "www.example.com-a",
+        "mail.example.com-a",
+        "alias.example.com-cname",
+        "spf.example.com-txt",
+    ]
+    assert objects[0] == {
+        "apiVersion": "route53.dns/v1",
+        "kind": "ARecord",
+        "metadata": {"name": "www.example.com-a", "namespace": "dns"},
+        "spec": {"ttl": 300, "value": ["10.0.0.1", "10.0.0.2"], "hosted_zone_id": "Z123", "name": "www.example.com."},
+    }
+
+
+@pytest.mark.asyncio
+async def test_import_apply(moto_zone):
+    """Records are upserted in as few ChangeBatches as fit, and not at all when ownership is enabled"""
+    config = moto_zone["config"]
+    lines = [f"r{i} 60 IN A 10.0.{i // 256}.{i % 256}\n" for i in range(600)]
+    importer = ZoneImporter(config, hosted_zone_id=moto_zone["zone_id"], origin=moto_zone["name"])
+
+    async with AccountPool(config, session=moto_zone["session"]) as accounts:
+        report = await importer.apply(lines, accounts)
+        snapshot = await ZoneCache(accounts).load(moto_zone["zone_id"])
+        # claimed records without objects would be deleted as orphans by garbage collection
+        owned_config = config.copy(update={"ownership_enabled": True})
+        owned = ZoneImporter(owned_config, hosted_zone_id=moto_zone["zone_id"], origin=moto_zone["name"])
+        with pytest.raises(RecordOwnershipError):
+            await owned.apply(lines, accounts)
+
+    # an UPSERT counts 2 of the 1000 records a ChangeBatch holds
+    assert report.valid == 600
+    assert report.batches == 2
+    assert snapshot.get(f"r599.{moto_zone['name']}", "A")["ResourceRecords"] == [{"Value": "10.0.2.87"}]
+    assert not snapshot.owners()
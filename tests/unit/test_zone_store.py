@@ -0,0 +1,125 @@
+"""Test persisting zone snapshots"""
+import asyncio
+import threading
+
+import pytest
+
+from route53_operator.lib.aws import AccountPool
+from route53_operator.lib.changes import submit_changes
+from route53_operator.lib.zone_cache import ZoneCache
+from route53_operator.lib.zone_store import ZoneStore
+
+
+def a_record(name: str, value: str) -> dict:
+    return {"Name": name, "Type": "A", "TTL": 60, "ResourceRecords": [{"Value": value}]}
+
+
+@pytest.fixture(name="list_calls")
+def count_list_calls(moto_zone):
+    """Number of ListResourceRecordSets calls made, clients must be created after this fixture"""
+    calls = []
+
+    def count_lists(**kwargs):
+        calls.append(kwargs["model"].name)
+
+    moto_zone["session"].register("before-call.route53.ListResourceRecordSets", count_lists)
+    yield calls
+    moto_zone["session"].unregister("before-call.route53.ListResourceRecordSets", count_lists)
+
+
+@pytest.mark.asyncio
+async def test_restore(tmp_path, moto_zone, list_calls):
+    """A restored zone is used without listing it, then listed once in the background to catch up"""
+    zone_id, zone_name = moto_zone["zone_id"], moto_zone["name"]
+    path = str(tmp_path / "zones.db")
+
+    async with AccountPool(moto_zone["config"], session=moto_zone["session"]) as accounts:
+        cache = ZoneCache(accounts, ZoneStore(path))
+        await cache.load(zone_id)
+        change = {"Action": "CREATE", "ResourceRecordSet": a_record(f"www.{zone_name}", "10.0.0.1")}
+        await submit_changes(accounts, zone_id, [change])
+        cache.apply(zone_id, [change])
+        # the change is written in a worker thread, close waits for it
+        await cache.close()
+        # a change made while the operator is down
+        await submit_changes(
+            accounts, zone_id, [{"Action": "CREATE", "ResourceRecordSet": a_record(f"api.{zone_name}", "10.0.0.2")}]
+        )
+
+        store = ZoneStore(path)
+        cache = ZoneCache(accounts, store)
+        list_calls.clear()
+        assert cache.restore() == 1
+        snapshot = await cache.get(zone_id)
+        assert not snapshot.verified
+        assert snapshot.get(f"www.{zone_name}", "A")["ResourceRecords"] == [{"Value": "10.0.0.1"}]
+        assert list_calls == []
+
+        # the background listing replaces the restored snapshot
+        await asyncio.gather(*cache._verifying.values())
+        snapshot = await cache.get(zone_id)
+        assert snapshot.verified
+        assert snapshot.get(f"api.{zone_name}", "A") is not None
+        assert len(list_calls) == 1
+        stored = {record_set["Name"] for record_set in store.record_sets(zone_id)}
+        assert {f"www.{zone_name}", f"api.{zone_name}"} <= stored
+        await cache.close()
+
+
+def test_store_replace_counts_drift(tmp_path):
+    """Replacing a zone only rewrites the record sets that changed"""
+    store = ZoneStore(str(tmp_path / "zones.db"))
+    first = [a_record("a.example.com.", "10.0.0.1"), a_record("b.example.com.", "10.0.0.2")]
+    assert store.replace("/hostedzone/Z1", first) == 2
+    # b is removed and c added
+    assert store.replace("Z1", [first[0], a_record("c.example.com.", "10.0.0.3")]) == 2
+    assert sorted(record_set["Name"] for record_set in store.record_sets("Z1")) == ["a.example.com.", "c.example.com."]
+    assert store.zones() == [(None, "Z1")]
+    store.close()
+
+
+@pytest.mark.asyncio
+async def test_apply_while_listing(moto_zone):
+    """A change applied while a zone is listed is in the snapshot the listing makes"""
+    zone_id, zone_name = moto_zone["zone_id"], moto_zone["name"]
+    change = {"Action": "CREATE", "ResourceRecordSet": a_record(f"www.{zone_name}", "10.0.0.1")}
+    cache = None
+
+    def apply_change(**kwargs):
+        cache.apply(zone_id, [change])
+
+    moto_zone["session"].register("before-call.route53.ListResourceRecordSets", apply_change)
+    try:
+        async with AccountPool(moto_zone["config"], session=moto_zone["session"]) as accounts:
+            cache = ZoneCache(accounts)
+            snapshot = await cache.load(zone_id)
+    finally:
+        moto_zone["session"].unregister("before-call.route53.ListResourceRecordSets", apply_change)
+    assert snapshot.get(f"www.{zone_name}", "A") is not None
+
+
+@pytest.mark.asyncio
+async def test_store_writes_batched(tmp_path, moto_zone):
+    """Changes applied within one loop tick are written to the store in one transaction, off the event loop"""
+    zone_id, zone_name = moto_zone["zone_id"], moto_zone["name"]
+    store = ZoneStore(str(tmp_path / "zones.db"))
+    transactions = []
+    apply = store.apply
+
+    def count_transactions(applied):
+        transactions.append(threading.current_thread())
+        apply(applied)
+
+    store.apply = count_transactions
+    async with AccountPool(moto_zone["config"], session=moto_zone["session"]) as accounts:
+        cache = ZoneCache(accounts, store)
+        await cache.load(zone_id)
+        for i in range(50):
+            change = {"Action": "CREATE", "ResourceRecordSet": a_record(f"r{i}.{zone_name}", "10.0.0.1")}
+            cache.apply(zone_id, [change])
+        await cache.flush()
+        names = {record_set["Name"] for record_set in store.record_sets(zone_id)}
+        assert {f"r{i}.{zone_name}" for i in range(50)} <= names
+        await cache.close()
+    assert len(transactions) == 1
+    assert transactions[0] is not threading.main_thread()